@@ -1,22 +1,37 @@
 """
 Smart Inventory Management System - Main Application
 """
-from flask import Flask, request, send_from_directory, jsonify
+from flask import Flask, request, send_from_directory, jsonify, g, make_response
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, jwt_required
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
+from functools import wraps
 from backend.config import Config
-from database.database import get_db_connection, init_db
+from database.database import get_pool, init_db, PoolTimeoutError
 from backend.reporting import generate_inventory_report, export_inventory_csv, get_admin_analytics
+from backend.stock_history import get_stock_as_of, create_stock_checkpoint, run_checkpoint_job
 from backend.dashboard import get_dashboard_stats
-from backend.orders import create_order, get_user_orders, get_all_orders_admin, update_order_status
+from backend.orders import (create_order, checkout_order, get_user_orders, get_all_orders_admin, update_order_status,
+                            bulk_update_order_status)
+from backend.reservations import run_reservation_sweeper
 from backend.auth import (register_user, login_user, get_current_user, 
                           refresh_token, change_user_role, change_password,
                           get_all_users, delete_user, update_profile, get_user_stats)
-from backend.alerts import get_active_alerts, acknowledge_alert, get_alert_history, create_custom_alert
-from backend.inventory import (get_all_products, create_product, get_product, update_product,
-                               delete_product, update_stock, get_stock_movements, get_categories, get_suppliers)
+from backend.alert_engine import start_alert_engine
+from backend.alerts import (get_active_alerts, acknowledge_alert, acknowledge_alerts, get_alert_history,
+                            create_custom_alert, compact_alerts, run_alert_compaction)
+from backend.inbox import get_inbox, get_unread_count, mark_inbox_read, dismiss_inbox_alert
+from backend.inventory import (get_all_products, create_product, bulk_import_products, get_product, update_product,
+                               delete_product, update_stock, batch_update_stock, get_stock_movements,
+                               get_categories, get_suppliers)
 from backend.transactions import get_all_transactions, get_transaction, create_transaction
+from backend.catalog import get_catalog_products
+from backend.stream import open_event_stream, create_stream_token
+from backend.table_versions import table_etag
+from backend.idempotency import (get_cache as get_idempotency_cache, request_fingerprint, claim_key, complete_key,
+                                 release_key, run_idempotency_purge, MAX_KEY_LENGTH)
+from backend.utils import start_periodic_job
 import os
+import threading
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='frontend', static_url_path='')
@@ -39,15 +54,148 @@ def invalid_token_callback(error):
 def missing_token_callback(error):
     return jsonify({'error': 'Authentication required.', 'token_missing': True}), 401
 
-# Database connection
-db = None
+# Stream tokens (POST /api/stream/token) sit in a URL, so they open streams and nothing else
+@jwt.token_verification_loader
+def token_scope_callback(jwt_header, jwt_payload):
+    return jwt_payload.get('scope') != 'stream' or request.endpoint == 'event_stream'
 
+@jwt.token_verification_failed_loader
+def token_scope_failed_callback(jwt_header, jwt_payload):
+    return jsonify({'error': 'Invalid token. Please log in again.', 'token_invalid': True}), 401
+
+# Database connection - each request checks out its own pooled connection
 def get_db():
-    """Get database connection"""
-    global db
-    if db is None:
-        db = get_db_connection()
-    return db
+    """Get the database connection for the current request"""
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+# Background jobs - started once per process, by whichever process serves requests
+_background_started = False
+_background_lock = threading.Lock()
+
+def start_background_jobs():
+    """Start the periodic jobs and the alert engine (once per process; BACKGROUND_JOBS=False skips them)"""
+    global _background_started
+    with _background_lock:
+        if _background_started or not Config.BACKGROUND_JOBS:
+            return
+        _background_started = True
+    start_periodic_job('stock-checkpoint', Config.STOCK_CHECKPOINT_INTERVAL, run_checkpoint_job,
+                       first_run_after=60)
+    start_periodic_job('reservation-sweeper', Config.RESERVATION_SWEEP_INTERVAL, run_reservation_sweeper,
+                       first_run_after=Config.RESERVATION_SWEEP_INTERVAL)
+    start_periodic_job('idempotency-purge', Config.IDEMPOTENCY_PURGE_INTERVAL, run_idempotency_purge,
+                       first_run_after=Config.IDEMPOTENCY_PURGE_INTERVAL)
+    start_periodic_job('alert-compaction', Config.ALERT_COMPACT_INTERVAL, run_alert_compaction,
+                       first_run_after=Config.ALERT_COMPACT_INTERVAL)
+    if Config.ALERT_ENGINE:
+        start_alert_engine()
+
+@app.before_request
+def ensure_background_jobs():
+    """Start background work on the first request, under any server (flask run, gunicorn, uWSGI...)"""
+    if not _background_started and Config.BACKGROUND_JOBS:
+        start_background_jobs()
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Return the request's connection to the pool"""
+    db = g.pop('db', None)
+    if db is not None:
+        get_pool().release(db)
+
+def conditional_get(*tables):
+    """
+    Answer If-None-Match with 304 when none of `tables` changed
+    The ETag covers the tables' change counters, the query string and the
+    caller's identity, so the view only runs when its data may differ.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            variant = f"{request.full_path}|{get_jwt_identity() or 'anonymous'}"
+            etag = table_etag(get_db(), tables, variant)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def idempotent(view):
+    """
+    Honor an Idempotency-Key header on a create endpoint
+    The first request with a key runs and its response is stored; repeats of
+    the same request (same user, endpoint and body) get that response back
+    without running the view again. Views should store it themselves with
+    record_response() before they commit; otherwise it is stored here, in a
+    transaction of its own. See backend/idempotency.py.
+    """
+    def replay(status, body, mimetype):
+        response = make_response(body, status)
+        response.mimetype = mimetype
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters'}), 400
+
+        scope = (int(get_jwt_identity()), f'{request.method} {request.path}', key)
+        request_hash = request_fingerprint(request.get_data())
+        cache = get_idempotency_cache()
+        mismatch = jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+
+        cached = cache.get(scope)
+        if cached is not None:
+            if cached[0] != request_hash:
+                return mismatch
+            return replay(*cached[1:])
+
+        db = get_db()
+        state, found = claim_key(db, *scope, request_hash)
+        if state == 'pending':
+            if found != request_hash:
+                return mismatch
+            return jsonify({'error': 'A request with this Idempotency-Key is still being processed'}), 409
+        if state == 'completed':
+            stored_hash, status, body, mimetype, ttl_left = found
+            if stored_hash != request_hash:
+                return mismatch
+            cache.put(scope, ttl_left, stored_hash, status, body, mimetype)
+            return replay(status, body, mimetype)
+
+        # Views that call record_response() store the response in their own transaction
+        g.idempotency_scope = scope
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            release_key(db, *scope)
+            raise
+        finally:
+            g.pop('idempotency_scope', None)
+            recorded = g.pop('idempotency_recorded', False)
+        if response.status_code >= 300:
+            # Rejected or failed requests wrote nothing; the same key may be retried
+            release_key(db, *scope)
+            return response
+        body = response.get_data(as_text=True)
+        if not recorded:
+            complete_key(db, *scope, response.status_code, body, response.mimetype)
+        cache.put(scope, Config.IDEMPOTENCY_TTL, request_hash, response.status_code, body, response.mimetype)
+        return response
+    return wrapper
 
 # Serve frontend files
 @app.route('/')
@@ -124,7 +272,14 @@ def profile_stats():
 @app.route('/api/products', methods=['GET'])
 @jwt_required(optional=True)
 def products_list():
-    """Get all products"""
+    """Get all products; listings without a search come from the in-memory catalog"""
+    if Config.CATALOG_SNAPSHOT and not request.args.get('search'):
+        return get_catalog_products(get_db)
+    return products_from_db()
+
+@conditional_get('products')
+def products_from_db():
+    """Get products from the database"""
     return get_all_products(get_db())
 
 @app.route('/api/products', methods=['POST'])
@@ -133,8 +288,15 @@ def products_create():
     """Create a new product"""
     return create_product(get_db())
 
+@app.route('/api/products/bulk', methods=['POST'])
+@jwt_required()
+def products_bulk_import():
+    """Import products from a CSV or NDJSON upload"""
+    return bulk_import_products(get_db())
+
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 @jwt_required()
+@conditional_get('products')
 def products_get(product_id):
     """Get a single product"""
     return get_product(get_db(), product_id)
@@ -157,20 +319,29 @@ def products_stock_update(product_id):
     """Update product stock"""
     return update_stock(get_db(), product_id)
 
+@app.route('/api/stock/batch', methods=['PUT'])
+@jwt_required()
+def stock_batch_update():
+    """Apply a batch of stock movements"""
+    return batch_update_stock(get_db())
+
 @app.route('/api/products/<int:product_id>/movements', methods=['GET'])
 @jwt_required()
+@conditional_get('products', 'stock_movements')
 def products_movements(product_id):
     """Get stock movements for a product"""
     return get_stock_movements(get_db(), product_id)
 
 @app.route('/api/categories', methods=['GET'])
-@jwt_required()
+@jwt_required(optional=True)
+@conditional_get('products')
 def categories_list():
     """Get all categories"""
     return get_categories(get_db())
 
 @app.route('/api/suppliers', methods=['GET'])
 @jwt_required()
+@conditional_get('products')
 def suppliers_list():
     """Get all suppliers"""
     return get_suppliers(get_db())
@@ -178,11 +349,12 @@ def suppliers_list():
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return {'status': 'ok', 'message': 'Server is running'}, 200
+    return {'status': 'ok', 'message': 'Server is running', 'db_pool': get_pool().stats()}, 200
 
 # Alerts Routes
 @app.route('/api/alerts', methods=['GET'])
 @jwt_required()
+@conditional_get('alerts', 'alert_reads')
 def alerts_list():
     return get_active_alerts(get_db())
 
@@ -191,8 +363,15 @@ def alerts_list():
 def alerts_acknowledge(alert_id):
     return acknowledge_alert(get_db(), alert_id)
 
+@app.route('/api/alerts/acknowledge', methods=['PUT'])
+@jwt_required()
+def alerts_acknowledge_bulk():
+    """Acknowledge many alerts by ID or filter (Admin only)"""
+    return acknowledge_alerts(get_db())
+
 @app.route('/api/alerts/history', methods=['GET'])
 @jwt_required()
+@conditional_get('alerts')
 def alerts_history():
     return get_alert_history(get_db())
 
@@ -202,9 +381,38 @@ def alerts_custom_create():
     """Create custom broadcast alert (Admin only)"""
     return create_custom_alert(get_db())
 
+@app.route('/api/alerts/compact', methods=['POST'])
+@jwt_required()
+def alerts_compact():
+    """Fold repeated closed alerts into one row each (Admin only)"""
+    return compact_alerts(get_db())
+
+# Inbox Routes (per-user read state of alerts)
+@app.route('/api/inbox', methods=['GET'])
+@jwt_required()
+def inbox_list():
+    return get_inbox(get_db())
+
+@app.route('/api/inbox/unread', methods=['GET'])
+@jwt_required()
+def inbox_unread():
+    return get_unread_count(get_db())
+
+@app.route('/api/inbox/read', methods=['PUT'])
+@jwt_required()
+def inbox_mark_read():
+    """Mark every alert up to ?through (default: all) as read"""
+    return mark_inbox_read(get_db())
+
+@app.route('/api/inbox/<int:alert_id>/read', methods=['PUT'])
+@jwt_required()
+def inbox_dismiss(alert_id):
+    return dismiss_inbox_alert(get_db(), alert_id)
+
 # Transactions Routes
 @app.route('/api/transactions', methods=['GET'])
 @jwt_required()
+@conditional_get('transactions')
 def transactions_list():
     return get_all_transactions(get_db())
 
@@ -215,6 +423,7 @@ def transactions_get(transaction_id):
 
 @app.route('/api/transactions', methods=['POST'])
 @jwt_required()
+@idempotent
 def transactions_create():
     return create_transaction(get_db())
 
@@ -229,26 +438,49 @@ def reports_inventory():
 def reports_export():
     return export_inventory_csv(get_db())
 
+@app.route('/api/reports/stock-as-of', methods=['GET'])
+@jwt_required()
+def reports_stock_as_of():
+    """Stock on hand at a past date, rebuilt from the nearest checkpoint"""
+    return get_stock_as_of(get_db())
+
+@app.route('/api/reports/stock-checkpoints', methods=['POST'])
+@jwt_required()
+def reports_stock_checkpoint():
+    """Take a stock checkpoint now (admin only)"""
+    return create_stock_checkpoint(get_db())
+
 @app.route('/api/stats', methods=['GET'])
 @jwt_required()
+@conditional_get('products', 'stock_movements', 'users', 'alerts')
 def stats_dashboard():
     """Get dashboard statistics"""
     return get_dashboard_stats(get_db())
 
 @app.route('/api/orders', methods=['POST'])
 @jwt_required()
+@idempotent
 def orders_create():
     """Create a new order"""
     return create_order(get_db())
 
+@app.route('/api/orders/checkout', methods=['POST'])
+@jwt_required()
+@idempotent
+def orders_checkout():
+    """Place one order for a whole cart"""
+    return checkout_order(get_db())
+
 @app.route('/api/orders', methods=['GET'])
 @jwt_required()
+@conditional_get('orders', 'products')
 def orders_user_list():
     """Get orders for current user"""
     return get_user_orders(get_db())
 
 @app.route('/api/admin/orders', methods=['GET'])
 @jwt_required()
+@conditional_get('orders', 'products', 'users')
 def admin_orders_list():
     """Get all orders (Admin only)"""
     return get_all_orders_admin(get_db())
@@ -259,12 +491,31 @@ def admin_order_status_update(order_id):
     """Update order status (Admin only)"""
     return update_order_status(get_db(), order_id)
 
+@app.route('/api/admin/orders/status', methods=['POST'])
+@jwt_required()
+def admin_order_status_bulk_update():
+    """Move many orders to one status (Admin only)"""
+    return bulk_update_order_status(get_db())
+
 @app.route('/api/admin/analytics', methods=['GET'])
 @jwt_required()
 def admin_analytics():
     """Get advanced admin analytics"""
     return get_admin_analytics(get_db())
 
+# Live updates
+@app.route('/api/stream/token', methods=['POST'])
+@jwt_required()
+def stream_token():
+    """Short-lived token for opening /api/stream from an EventSource"""
+    return create_stream_token()
+
+@app.route('/api/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def event_stream():
+    """Server-Sent Events: alerts, stock, dashboard counters and order status (EventSource sends ?jwt=<stream token>)"""
+    return open_event_stream(get_db())
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -274,6 +525,10 @@ def not_found(error):
 def internal_error(error):
     return {'error': 'Internal server error'}, 500
 
+@app.errorhandler(PoolTimeoutError)
+def pool_timeout(error):
+    return {'error': 'Server is busy. Please try again.'}, 503
+
 if __name__ == '__main__':
     # Initialize database on first run
     print("Starting Smart Inventory Management System...")
@@ -282,6 +537,11 @@ if __name__ == '__main__':
     # Initialize database
     init_db()
     
+    # Start background work right away in the serving process (not the debug
+    # reloader's watcher); other servers start it on the first request
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs()
+    
     print("Server starting on http://localhost:5000")
     print("Open http://localhost:5000 in your browser")
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,245 @@
+"""
+Stock alert engine
+
+Keeps the alerts table in step with product stock:
+- 'out_of_stock' while an active product has nothing on hand
+- 'low_stock' while it has some, but no more than its min_stock_level
+At most one such alert is open (resolved_at IS NULL) per product and type.
+When a product moves to the other state the open alert is resolved and the
+new one opened; when it recovers, its alert is resolved (and drops out of
+the active list).
+
+Nothing is evaluated on the request path. Write paths already
+publish('products', product_ids=...) after they commit; the engine's
+subscriber only adds those IDs to a pending set. A worker thread waits
+ALERT_DEBOUNCE seconds after the first change so bursts of movements on
+the same products coalesce, then evaluates just the pending products,
+ALERT_BATCH_SIZE per transaction. On start it reconciles the products that
+are low or have an open alert (low_stock_products plus open alerts), never
+the whole catalog.
+"""
+import threading
+from backend.events import subscribe, unsubscribe, publish
+from backend.table_versions import bump_table_versions
+
+ALERT_TYPES = ('low_stock', 'out_of_stock')
+
+def stock_alert_type(product):
+    """The alert a product's stock calls for, or None"""
+    if not product['is_active']:
+        return None
+    if product['quantity_in_stock'] <= 0:
+        return 'out_of_stock'
+    if product['quantity_in_stock'] <= product['min_stock_level']:
+        return 'low_stock'
+    return None
+
+def stock_alert_message(product, alert_type):
+    if alert_type == 'out_of_stock':
+        return f"{product['product_name']} ({product['sku']}) is out of stock"
+    return (f"{product['product_name']} ({product['sku']}) is low on stock: "
+            f"{product['quantity_in_stock']} left, minimum {product['min_stock_level']}")
+
+def evaluate_stock_alerts(db_connection, product_ids):
+    """
+    Open and resolve stock alerts for the given products in one transaction
+    Returns (opened, resolved) alert counts.
+    """
+    from backend.config import Config
+    from database.database import begin_write
+    use_sqlite = Config.USE_SQLITE
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return 0, 0
+    p = '?' if use_sqlite else '%s'
+    placeholders = ', '.join([p] * len(product_ids))
+    lock_clause = '' if use_sqlite else ' FOR UPDATE'
+
+    cursor = db_connection.cursor()
+    try:
+        begin_write(db_connection)
+        cursor.execute(f"""
+            SELECT product_id, sku, product_name, quantity_in_stock, min_stock_level, is_active
+            FROM products WHERE product_id IN ({placeholders}){lock_clause}
+        """, product_ids)
+        wanted = {}
+        for row in cursor.fetchall():
+            alert_type = stock_alert_type(row)
+            if alert_type:
+                wanted[row['product_id']] = (alert_type, stock_alert_message(row, alert_type))
+
+        cursor.execute(f"""
+            SELECT alert_id, product_id, alert_type FROM alerts
+            WHERE resolved_at IS NULL AND product_id IN ({placeholders})
+              AND alert_type IN ({', '.join([p] * len(ALERT_TYPES))}){lock_clause}
+            ORDER BY alert_id
+        """, product_ids + list(ALERT_TYPES))
+        open_alerts = set()
+        to_resolve = []
+        for row in cursor.fetchall():
+            key = (row['product_id'], row['alert_type'])
+            current = wanted.get(row['product_id'])
+            if current is None or current[0] != row['alert_type'] or key in open_alerts:
+                to_resolve.append(row['alert_id'])
+            else:
+                open_alerts.add(key)
+        to_open = [(product_id, alert_type, message)
+                   for product_id, (alert_type, message) in sorted(wanted.items())
+                   if (product_id, alert_type) not in open_alerts]
+
+        if to_resolve:
+            cursor.execute(f"""
+                UPDATE alerts
+                SET resolved_at = CURRENT_TIMESTAMP, is_acknowledged = 1,
+                    acknowledged_at = COALESCE(acknowledged_at, CURRENT_TIMESTAMP)
+                WHERE alert_id IN ({', '.join([p] * len(to_resolve))})
+            """, to_resolve)
+        created = []
+        if to_open:
+            cursor.executemany(f"""
+                INSERT INTO alerts (product_id, alert_type, alert_message, is_acknowledged, created_at)
+                VALUES ({p}, {p}, {p}, 0, CURRENT_TIMESTAMP)
+            """, to_open)
+            # Read the new alerts back for the 'alerts' event
+            opened_ids = [product_id for product_id, _, _ in to_open]
+            cursor.execute(f"""
+                SELECT alert_id, product_id, alert_type, alert_message, is_acknowledged, created_at FROM alerts
+                WHERE resolved_at IS NULL AND product_id IN ({', '.join([p] * len(opened_ids))})
+                  AND alert_type IN ({', '.join([p] * len(ALERT_TYPES))})
+            """, opened_ids + list(ALERT_TYPES))
+            opened = set((product_id, alert_type) for product_id, alert_type, _ in to_open)
+            created = [dict(row) for row in cursor.fetchall() if (row['product_id'], row['alert_type']) in opened]
+        if to_resolve or to_open:
+            bump_table_versions(cursor, use_sqlite, 'alerts')
+        db_connection.commit()
+    except Exception:
+        db_connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    if to_resolve or to_open:
+        publish('alerts', created=created, resolved=to_resolve)
+    return len(to_open), len(to_resolve)
+
+def reconcile_candidates(db_connection):
+    """Products that may need an alert opened or resolved: low ones and ones with an open alert"""
+    from backend.config import Config
+    p = '?' if Config.USE_SQLITE else '%s'
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT product_id FROM low_stock_products
+            UNION
+            SELECT product_id FROM alerts
+            WHERE resolved_at IS NULL AND product_id IS NOT NULL AND alert_type IN ({', '.join([p] * len(ALERT_TYPES))})
+        """, list(ALERT_TYPES))
+        return [row['product_id'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+class AlertEngine:
+    """Background worker evaluating stock alerts for changed products"""
+
+    def __init__(self, debounce, batch_size):
+        self.debounce = debounce
+        self.batch_size = batch_size
+        self.pending = set()          # product IDs changed since the last evaluation
+        self.reconcile = True         # re-check low products and open alerts (on start)
+        self.busy = False
+        self.condition = threading.Condition()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.stats = {'batches': 0, 'products': 0, 'opened': 0, 'resolved': 0}
+
+    # Event subscriber: cheap, runs on the request thread after commit
+
+    def notify(self, product_ids=None):
+        with self.condition:
+            if product_ids is None:
+                self.reconcile = True
+            else:
+                self.pending.update(product_ids)
+            self.condition.notify()
+
+    def start(self):
+        subscribe('products', self.notify)
+        self.thread = threading.Thread(target=self.run, name='alert-engine', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        unsubscribe('products', self.notify)
+        self.stopping.set()
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued change has been evaluated; returns False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: not (self.pending or self.reconcile or self.busy), timeout)
+
+    # Worker
+
+    def run(self):
+        from database.database import get_pool
+        while not self.stopping.is_set():
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.pending or self.reconcile or self.stopping.is_set())
+                self.busy = True
+            # Let a burst of movements on the same products collapse into one pass
+            if self.stopping.wait(self.debounce):
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+                break
+            with self.condition:
+                pending, reconcile = self.pending, self.reconcile
+                self.pending, self.reconcile = set(), False
+
+            pool = connection = None
+            try:
+                # Acquiring can time out too; that must not end the thread or drop the queue
+                pool = get_pool()
+                connection = pool.acquire()
+                if reconcile:
+                    pending.update(reconcile_candidates(connection))
+                    reconcile = False
+                product_ids = sorted(pending)
+                for start in range(0, len(product_ids), self.batch_size):
+                    batch = product_ids[start:start + self.batch_size]
+                    opened, resolved = evaluate_stock_alerts(connection, batch)
+                    pending.difference_update(batch)
+                    self.stats['batches'] += 1
+                    self.stats['products'] += len(batch)
+                    self.stats['opened'] += opened
+                    self.stats['resolved'] += resolved
+            except Exception as e:
+                print(f"Alert engine failed: {e}")
+                # Keep the rest queued and back off before retrying
+                with self.condition:
+                    self.pending.update(pending)
+                    self.reconcile = self.reconcile or reconcile
+                self.stopping.wait(max(self.debounce, 1))
+            finally:
+                if connection is not None:
+                    pool.release(connection)
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def start_alert_engine():
+    """Start the process-wide alert engine (once); returns it"""
+    global _engine
+    from backend.config import Config
+    with _engine_lock:
+        if _engine is None:
+            _engine = AlertEngine(Config.ALERT_DEBOUNCE, Config.ALERT_BATCH_SIZE)
+            _engine.start()
+        return _engine
@@ -4,14 +4,26 @@ Low-Stock Alerts and Notification Module - Milestone 3
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+from backend.table_versions import bump_table_versions
+from backend.events import publish
 
 # Get all active alerts
 @jwt_required()
 def get_active_alerts(db_connection):
+    """
+    Admins get the unacknowledged work queue; everyone else gets their own
+    unread alerts (see backend/inbox.py), capped at INBOX_UNREAD_CAP
+    """
     try:
+        user_id = int(get_jwt_identity())
         cursor = db_connection.cursor()
         from backend.config import Config
         use_sqlite = Config.USE_SQLITE
+        if not _is_admin(cursor, use_sqlite, user_id):
+            from backend.inbox import list_unread
+            alerts = list_unread(cursor, use_sqlite, user_id, Config.INBOX_UNREAD_CAP)
+            cursor.close()
+            return jsonify({'alerts': alerts, 'total': len(alerts)}), 200
         query = "SELECT alert_id, product_id, alert_type, alert_message, is_acknowledged, created_at FROM alerts WHERE is_acknowledged = 0 ORDER BY created_at DESC"
         cursor.execute(query)
         rows = cursor.fetchall()
@@ -28,11 +40,16 @@ def get_active_alerts(db_connection):
 # Acknowledge alert
 @jwt_required()
 def acknowledge_alert(db_connection, alert_id):
+    """Admins close the alert for everyone; other users only mark it read for themselves"""
     try:
         user_id = int(get_jwt_identity())
         cursor = db_connection.cursor()
         from backend.config import Config
         use_sqlite = Config.USE_SQLITE
+        if not _is_admin(cursor, use_sqlite, user_id):
+            cursor.close()
+            from backend.inbox import dismiss_inbox_alert
+            return dismiss_inbox_alert(db_connection, alert_id)
         # Check if alert exists
         query = "SELECT alert_id FROM alerts WHERE alert_id = ? AND is_acknowledged = 0" if use_sqlite else "SELECT alert_id FROM alerts WHERE alert_id = %s AND is_acknowledged = 0"
         cursor.execute(query, (alert_id,))
@@ -44,8 +61,10 @@ def acknowledge_alert(db_connection, alert_id):
             cursor.execute("UPDATE alerts SET is_acknowledged = 1, acknowledged_at = CURRENT_TIMESTAMP, acknowledged_by = ? WHERE alert_id = ?", (user_id, alert_id))
         else:
             cursor.execute("UPDATE alerts SET is_acknowledged = 1, acknowledged_at = CURRENT_TIMESTAMP, acknowledged_by = %s WHERE alert_id = %s", (user_id, alert_id))
+        bump_table_versions(cursor, use_sqlite, 'alerts')
         db_connection.commit()
         cursor.close()
+        publish('alerts', acknowledged=[alert_id])
         return jsonify({'message': 'Alert acknowledged successfully'}), 200
     except Exception as e:
         return jsonify({'error': f'Failed to acknowledge alert: {str(e)}'}), 500
@@ -53,23 +72,262 @@ def acknowledge_alert(db_connection, alert_id):
 # Get alert history
 @jwt_required()
 def get_alert_history(db_connection):
+    """
+    Acknowledged and resolved alerts, most recently closed first, one page at a time
+    Pages are ordered by (acknowledged_at, alert_id) descending; pass the
+    returned next_cursor as ?cursor= to fetch the following page.
+    Query params: limit, cursor
+    """
     try:
         cursor = db_connection.cursor()
         from backend.config import Config
+        from backend.utils import parse_limit, encode_cursor, decode_cursor
         use_sqlite = Config.USE_SQLITE
-        query = "SELECT alert_id, product_id, alert_type, alert_message, is_acknowledged, created_at, acknowledged_at, acknowledged_by FROM alerts WHERE is_acknowledged = 1 ORDER BY acknowledged_at DESC"
-        cursor.execute(query)
+        p = '?' if use_sqlite else '%s'
+        try:
+            limit = parse_limit(request.args.get('limit'), Config.ALERTS_PAGE_SIZE, Config.ALERTS_PAGE_MAX)
+            cursor_token = request.args.get('cursor')
+            after = decode_cursor(cursor_token, 2) if cursor_token else None
+            if after and not (isinstance(after[0], str) and isinstance(after[1], int)):
+                raise ValueError('Invalid cursor')
+        except ValueError as e:
+            cursor.close()
+            return jsonify({'error': str(e)}), 400
+
+        keyset = ''
+        params = []
+        if after:
+            # Keyset: the leading bound lets the index range start at the cursor
+            keyset = f"AND acknowledged_at <= {p} AND (acknowledged_at < {p} OR alert_id < {p})"
+            params = [after[0], after[0], after[1]]
+        cursor.execute(f"""
+            SELECT alert_id, product_id, alert_type, alert_message, is_acknowledged, created_at, acknowledged_at,
+                   acknowledged_by, resolved_at, occurrence_count, first_occurred_at
+            FROM alerts
+            WHERE is_acknowledged = 1 {keyset}
+            ORDER BY acknowledged_at DESC, alert_id DESC
+            LIMIT {p}
+        """, params + [limit + 1])
         rows = cursor.fetchall()
         cursor.close()
         if use_sqlite:
             from database.database import dict_from_row
             alerts = [dict_from_row(row) for row in rows]
         else:
-            alerts = rows
-        return jsonify({'alerts': alerts, 'total': len(alerts)}), 200
+            alerts = list(rows)
+        has_more = len(alerts) > limit
+        alerts = alerts[:limit]
+        next_cursor = None
+        if has_more:
+            last = alerts[-1]
+            next_cursor = encode_cursor([str(last['acknowledged_at']), last['alert_id']])
+        return jsonify({'alerts': alerts, 'total': len(alerts), 'next_cursor': next_cursor, 'has_more': has_more}), 200
     except Exception as e:
         return jsonify({'error': f'Failed to get alert history: {str(e)}'}), 500
 
+def _is_admin(cursor, use_sqlite, user_id):
+    query = "SELECT role FROM users WHERE user_id = ?" if use_sqlite else "SELECT role FROM users WHERE user_id = %s"
+    cursor.execute(query, (user_id,))
+    row = cursor.fetchone()
+    return bool(row) and row['role'] == 'admin'
+
+# Acknowledge many alerts at once (Admin only)
+@jwt_required()
+def acknowledge_alerts(db_connection):
+    """
+    Acknowledge a set of active alerts with one set-based update
+    Body: {alert_ids: [...]} or {filter: {alert_type, category, product_id}}
+    (filter keys combine with AND; at least one is required)
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        from backend.config import Config
+        from database.database import begin_write
+        use_sqlite = Config.USE_SQLITE
+        p = '?' if use_sqlite else '%s'
+
+        alert_ids = data.get('alert_ids')
+        filters = data.get('filter')
+        conditions = []
+        params = []
+        if alert_ids is not None:
+            if filters is not None:
+                return jsonify({'error': 'Send either alert_ids or filter, not both'}), 400
+            if not isinstance(alert_ids, list) or not alert_ids:
+                return jsonify({'error': 'alert_ids must be a non-empty list'}), 400
+            if len(alert_ids) > Config.ALERT_BULK_MAX:
+                return jsonify({'error': f'At most {Config.ALERT_BULK_MAX} alerts can be acknowledged at once'}), 400
+            try:
+                alert_ids = sorted({int(alert_id) for alert_id in alert_ids})
+            except (TypeError, ValueError):
+                return jsonify({'error': 'alert_ids must be integers'}), 400
+            conditions.append(f"alert_id IN ({', '.join([p] * len(alert_ids))})")
+            params.extend(alert_ids)
+        elif isinstance(filters, dict) and filters:
+            unknown = set(filters) - {'alert_type', 'category', 'product_id'}
+            if unknown:
+                return jsonify({'error': f"Unknown filter: {', '.join(sorted(unknown))}"}), 400
+            if filters.get('alert_type'):
+                conditions.append(f"alert_type = {p}")
+                params.append(filters['alert_type'])
+            if filters.get('product_id') is not None:
+                conditions.append(f"product_id = {p}")
+                params.append(filters['product_id'])
+            if filters.get('category'):
+                conditions.append(f"""product_id IN (SELECT product_id FROM products WHERE category_id =
+                                      (SELECT category_id FROM categories WHERE category_name = {p}))""")
+                params.append(filters['category'])
+            if not conditions:
+                return jsonify({'error': 'filter must set alert_type, category or product_id'}), 400
+        else:
+            return jsonify({'error': 'alert_ids or filter is required'}), 400
+
+        cursor = db_connection.cursor()
+        if not _is_admin(cursor, use_sqlite, user_id):
+            cursor.close()
+            return jsonify({'error': 'Admin access required'}), 403
+        lock_clause = '' if use_sqlite else ' FOR UPDATE'
+        try:
+            begin_write(db_connection)
+            # The matching active alerts, then one UPDATE per chunk of their IDs
+            cursor.execute(f"""
+                SELECT alert_id FROM alerts WHERE is_acknowledged = 0 AND {' AND '.join(conditions)}{lock_clause}
+            """, params)
+            acknowledged = [row['alert_id'] for row in cursor.fetchall()]
+            for start in range(0, len(acknowledged), 500):
+                chunk = acknowledged[start:start + 500]
+                cursor.execute(f"""
+                    UPDATE alerts SET is_acknowledged = 1, acknowledged_at = CURRENT_TIMESTAMP, acknowledged_by = {p}
+                    WHERE alert_id IN ({', '.join([p] * len(chunk))})
+                """, [user_id] + chunk)
+            if acknowledged:
+                bump_table_versions(cursor, use_sqlite, 'alerts')
+            db_connection.commit()
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        if acknowledged:
+            publish('alerts', acknowledged=acknowledged)
+        return jsonify({
+            'message': f'{len(acknowledged)} alerts acknowledged',
+            'acknowledged': len(acknowledged),
+            'alert_ids': acknowledged
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to acknowledge alerts: {str(e)}'}), 500
+
+def compact_alert_history(db_connection, min_age, batch_size):
+    """
+    Fold closed alerts of the same product and type, closed more than
+    min_age seconds ago, into their most recent row: occurrence_count adds
+    up and first_occurred_at keeps the earliest created_at. batch_size
+    groups per transaction, until none are left. Inbox dismissals of the
+    removed rows are deleted in the same transaction. Returns (groups, rows removed).
+    """
+    from backend.config import Config
+    from database.database import begin_write
+    use_sqlite = Config.USE_SQLITE
+    p = '?' if use_sqlite else '%s'
+    if use_sqlite:
+        cutoff = f"datetime('now', {p})"
+        age = f'-{int(min_age)} seconds'
+    else:
+        cutoff = f"NOW() - INTERVAL {p} SECOND"
+        age = int(min_age)
+
+    groups = removed = 0
+    while True:
+        cursor = db_connection.cursor()
+        try:
+            begin_write(db_connection)
+            cursor.execute(f"""
+                SELECT product_id, alert_type, MAX(alert_id) AS keep_id, COUNT(*) AS row_count,
+                       SUM(occurrence_count) AS occurrences,
+                       MIN(COALESCE(first_occurred_at, created_at)) AS first_occurred_at
+                FROM alerts
+                WHERE is_acknowledged = 1 AND acknowledged_at <= {cutoff} AND product_id IS NOT NULL
+                GROUP BY product_id, alert_type
+                HAVING COUNT(*) > 1
+                LIMIT {p}
+            """, (age, batch_size))
+            batch = cursor.fetchall()
+            if batch:
+                cursor.executemany(f"""
+                    UPDATE alerts SET occurrence_count = {p}, first_occurred_at = {p} WHERE alert_id = {p}
+                """, [(int(row['occurrences']), row['first_occurred_at'], row['keep_id']) for row in batch])
+                # Unary + keeps the planner on the (product_id, alert_type) index.
+                # Users' dismissals of the folded rows go with them; the kept row keeps its own.
+                cursor.executemany(f"""
+                    DELETE FROM alert_dismissals WHERE alert_id IN (
+                        SELECT alert_id FROM alerts
+                        WHERE +is_acknowledged = 1 AND +acknowledged_at <= {cutoff}
+                          AND product_id = {p} AND alert_type = {p} AND alert_id < {p}
+                    )
+                """, [(age, row['product_id'], row['alert_type'], row['keep_id']) for row in batch])
+                cursor.executemany(f"""
+                    DELETE FROM alerts
+                    WHERE +is_acknowledged = 1 AND +acknowledged_at <= {cutoff}
+                      AND product_id = {p} AND alert_type = {p} AND alert_id < {p}
+                """, [(age, row['product_id'], row['alert_type'], row['keep_id']) for row in batch])
+                bump_table_versions(cursor, use_sqlite, 'alerts')
+            db_connection.commit()
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        groups += len(batch)
+        removed += sum(int(row['row_count']) - 1 for row in batch)
+        if len(batch) < batch_size:
+            return groups, removed
+
+# Compact alert history now (Admin only)
+@jwt_required()
+def compact_alerts(db_connection):
+    """Run the alert history compaction; ?min_age= seconds overrides ALERT_COMPACT_AGE"""
+    try:
+        user_id = int(get_jwt_identity())
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        cursor = db_connection.cursor()
+        is_admin = _is_admin(cursor, use_sqlite, user_id)
+        cursor.close()
+        if not is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        try:
+            min_age = int(request.args.get('min_age', Config.ALERT_COMPACT_AGE))
+            if min_age < 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': 'min_age must be a non-negative number of seconds'}), 400
+        groups, removed = compact_alert_history(db_connection, min_age, Config.ALERT_COMPACT_BATCH)
+        return jsonify({
+            'message': f'Folded {removed} repeated alerts into {groups} rows',
+            'groups': groups,
+            'removed': removed
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to compact alerts: {str(e)}'}), 500
+
+def run_alert_compaction():
+    """Periodic job: compact old alert history"""
+    from backend.config import Config
+    from database.database import get_pool
+    pool = get_pool()
+    connection = pool.acquire()
+    try:
+        groups, removed = compact_alert_history(connection, Config.ALERT_COMPACT_AGE, Config.ALERT_COMPACT_BATCH)
+        if removed:
+            print(f"Compacted {removed} alerts into {groups} rows")
+    finally:
+        pool.release(connection)
+
 # Create custom broadcast alert (Admin only)
 @jwt_required()
 def create_custom_alert(db_connection):
@@ -108,8 +366,18 @@ def create_custom_alert(db_connection):
                 "INSERT INTO alerts (product_id, alert_type, alert_message, is_acknowledged, created_at) VALUES (NULL, %s, %s, 0, CURRENT_TIMESTAMP)",
                 (alert_type, message)
             )
+        alert_id = cursor.lastrowid
+        bump_table_versions(cursor, use_sqlite, 'alerts')
         db_connection.commit()
         cursor.close()
+        publish('alerts', created=[{
+            'alert_id': alert_id,
+            'product_id': None,
+            'alert_type': alert_type,
+            'alert_message': message,
+            'is_acknowledged': 0,
+            'created_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        }])
         return jsonify({'message': 'Alert created successfully'}), 201
     except Exception as e:
         return jsonify({'error': f'Failed to create alert: {str(e)}'}), 500
@@ -6,6 +6,9 @@ from flask import jsonify, request
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from datetime import datetime
 import re
+from backend.table_versions import bump_table_versions
+from backend.events import publish
+from backend.inbox import seed_read_cursor
 
 def hash_password(password):
     """Hash a password using bcrypt"""
@@ -135,9 +138,11 @@ def register_user(db_connection):
             """
         
         cursor.execute(query, (username, email, password_hash, role, first_name, last_name, phone, created_by))
-        db_connection.commit()
-        
         user_id = cursor.lastrowid
+        # Alerts raised before the account existed start out read
+        seed_read_cursor(cursor, use_sqlite, user_id)
+        bump_table_versions(cursor, use_sqlite, 'users')
+        db_connection.commit()
         cursor.close()
         
         return jsonify({
@@ -389,6 +394,7 @@ def change_user_role(db_connection):
                 (new_role, user_id)
             )
         
+        bump_table_versions(cursor, use_sqlite, 'users')
         db_connection.commit()
         cursor.close()
         
@@ -551,14 +557,19 @@ def delete_user(db_connection, user_id):
         if int(user_id) == current_user_id:
             return jsonify({'error': 'You cannot delete yourself'}), 400
             
-        # Delete user
+        # Delete user (their orders are deleted with them)
+        from backend.orders import forget_user_orders
+        released = forget_user_orders(cursor, use_sqlite, int(user_id))
         if use_sqlite:
             cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
         else:
             cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
             
+        bump_table_versions(cursor, use_sqlite, 'users', 'orders', *(['products'] if released else []))
         db_connection.commit()
         cursor.close()
+        if released:
+            publish('products', product_ids=released)
         return jsonify({'message': 'User deleted successfully'}), 200
         
     except Exception as e:
@@ -605,7 +616,8 @@ def update_profile(db_connection):
                 SET first_name = %s, last_name = %s, email = %s, phone = %s
                 WHERE user_id = %s
             """, (first_name, last_name, email, phone, user_id))
-            
+        # Names and emails appear in ETag-cached listings (admin orders, users)
+        bump_table_versions(cursor, use_sqlite, 'users')
         db_connection.commit()
         cursor.close()
         return jsonify({'message': 'Profile updated successfully'}), 200
@@ -0,0 +1,374 @@
+"""
+In-memory catalog snapshot for product listings
+
+GET /api/products without a search is answered from a CatalogSnapshot
+instead of the database. It holds the active products column by column
+(array.array for the numeric columns, lists with interned strings for the
+rest) along with the row order by (product_name, product_id). Filtered
+listings are cached per filter until the snapshot next changes.
+
+The snapshot is kept current without full rebuilds:
+- write paths publish('products', product_ids=...) after they commit; those
+  rows are re-read before the next listing is served
+- at most every CATALOG_SYNC_INTERVAL seconds a listing reads the products
+  change counter in table_versions; if another process has written since,
+  the rows whose updated_at is newer than the last sync (less
+  CATALOG_SYNC_OVERLAP, to cover transactions that committed late) are
+  re-read
+Rows are read from the database without holding the snapshot's lock; it is
+taken only to merge them in or swap a full reload in place.
+"""
+from flask import jsonify, request, make_response
+from datetime import datetime, timedelta
+import array
+import hashlib
+import os
+import sys
+import threading
+import time
+from backend.events import subscribe
+from backend.inventory import PRODUCT_FIELDS
+from backend.table_versions import get_table_versions
+
+# NOT NULL integer columns, stored unboxed
+INT_COLUMNS = ('product_id', 'quantity_in_stock', 'reserved_quantity')
+# Short values repeated across many products share one string object
+INTERNED_COLUMNS = ('category', 'supplier', 'unit_of_measure')
+# Filtered views kept between changes
+MAX_CACHED_VIEWS = 64
+
+def _to_datetime(value):
+    """Timestamps come back as str from SQLite and datetime from MySQL"""
+    return value if isinstance(value, datetime) else datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+
+class CatalogSnapshot:
+    """Columnar copy of the active products"""
+    __slots__ = ('use_sqlite', 'columns', 'rows', 'free', 'order', 'order_stale', 'views',
+                 'generation', 'version', 'watermark', 'probed_at', 'pending', 'reload_all',
+                 'requested', 'applied',
+                 'lock', 'refresh_lock', 'pending_lock', 'token')
+
+    def __init__(self, use_sqlite):
+        self.use_sqlite = use_sqlite
+        self.columns = self._empty_columns()
+        self.rows = {}                    # product_id -> position in the columns
+        self.free = []                    # positions of removed products, reused first
+        self.order = array.array('q')     # positions sorted by (product_name, product_id)
+        self.order_stale = False
+        self.views = {}                   # (category, supplier, low_stock) -> positions
+        self.generation = 0               # bumped on every change, part of the ETag
+        self.version = None               # products change counter at the last sync
+        self.watermark = None             # database time of the last sync
+        self.probed_at = 0.0
+        self.pending = set()              # product IDs published since the last refresh
+        self.reload_all = True
+        self.requested = 1                # mark_stale calls so far (the first load counts)
+        self.applied = 0                  # value of requested covered by the last refresh
+        self.lock = threading.Lock()          # the columns, order and views
+        self.refresh_lock = threading.Lock()  # database reads and the sync state
+        self.pending_lock = threading.Lock()
+        self.token = os.urandom(8).hex()  # keeps ETags from matching across restarts
+
+    def _empty_columns(self):
+        columns = {}
+        for field in PRODUCT_FIELDS:
+            if field in INT_COLUMNS:
+                columns[field] = array.array('q')
+            elif field == 'unit_price' and self.use_sqlite:
+                columns[field] = array.array('d')  # REAL on SQLite; MySQL DECIMALs stay exact
+            else:
+                columns[field] = []
+        return columns
+
+    # Event subscriber
+
+    def mark_stale(self, product_ids=None):
+        """Queue products for re-reading; None re-reads the whole catalog"""
+        with self.pending_lock:
+            self.requested += 1
+            if product_ids is None:
+                self.reload_all = True
+            else:
+                self.pending.update(product_ids)
+
+    # Loading: database reads run under refresh_lock only; self.lock is taken
+    # just to merge the fetched rows, so listings with nothing new to show are
+    # not held up by another request's reads
+
+    def refresh(self, get_connection):
+        """Apply queued changes and, when due, probe for other processes' writes"""
+        if self.applied == self.requested and time.monotonic() - self.probed_at < self._sync_interval():
+            return
+
+        # One refresh at a time, so rows read earlier are never merged over newer
+        # ones; a listing waits here only while changes it must show are read
+        with self.refresh_lock:
+            with self.pending_lock:
+                reload_all, pending, requested = self.reload_all, self.pending, self.requested
+                self.reload_all, self.pending = False, set()
+            now = time.monotonic()
+            due = now - self.probed_at >= self._sync_interval()
+            if not (reload_all or pending or due):
+                self.applied = requested  # the refresh this one waited for covered it
+                return
+            try:
+                connection = get_connection()
+                if reload_all:
+                    self._load(connection)
+                else:
+                    if pending:
+                        self._reload(connection, sorted(pending))
+                    if due:
+                        self._sync(connection)
+                if reload_all or due:
+                    self.probed_at = now
+                self.applied = requested
+            except Exception:
+                # Keep the work queued for the next listing
+                self.mark_stale(None if reload_all else pending)
+                raise
+
+    def _sync_interval(self):
+        from backend.config import Config
+        return Config.CATALOG_SYNC_INTERVAL
+
+    def _select(self, cursor, where, params):
+        cursor.execute(f"SELECT {', '.join(PRODUCT_FIELDS)} FROM products WHERE {where}", params)
+        return cursor.fetchall()
+
+    def _database_now(self, cursor):
+        cursor.execute("SELECT CURRENT_TIMESTAMP AS now")
+        row = cursor.fetchone()
+        return row[0] if self.use_sqlite else row['now']
+
+    def _load(self, connection):
+        """Read every active product into a new snapshot, then swap its columns in"""
+        version = get_table_versions(connection, ['products']).get('products', 0)
+        cursor = connection.cursor()
+        watermark = self._database_now(cursor)
+        rows = self._select(cursor, 'is_active = 1' if self.use_sqlite else 'is_active = TRUE', ())
+        cursor.close()
+
+        fresh = CatalogSnapshot(self.use_sqlite)
+        fresh._apply(rows)
+        with self.lock:
+            self.columns, self.rows, self.free = fresh.columns, fresh.rows, fresh.free
+            self.order_stale = True
+            self.views = {}
+            self.generation += 1
+        self.version, self.watermark = version, watermark
+
+    def _reload(self, connection, product_ids):
+        """Re-read the given products"""
+        placeholder = '?' if self.use_sqlite else '%s'
+        cursor = connection.cursor()
+        fetched = []
+        for start in range(0, len(product_ids), 500):
+            chunk = product_ids[start:start + 500]
+            fetched.append((self._select(cursor, f"product_id IN ({', '.join([placeholder] * len(chunk))})", chunk), chunk))
+        cursor.close()
+        with self.lock:
+            for rows, chunk in fetched:
+                self._apply(rows, chunk)
+
+    def _sync(self, connection):
+        """Re-read products changed since the last sync, if the change counter moved"""
+        version = get_table_versions(connection, ['products']).get('products', 0)
+        if version == self.version:
+            return
+        cursor = connection.cursor()
+        watermark = self._database_now(cursor)
+        from backend.config import Config
+        since = _to_datetime(self.watermark) - timedelta(seconds=Config.CATALOG_SYNC_OVERLAP)
+        rows = self._select(cursor, 'updated_at >= ?' if self.use_sqlite else 'updated_at >= %s',
+                            (since.strftime('%Y-%m-%d %H:%M:%S'),))
+        cursor.close()
+        with self.lock:
+            self._apply(rows)
+        self.version, self.watermark = version, watermark
+
+    # Merging (call with self.lock held)
+
+    def _apply(self, rows, product_ids=()):
+        """Store fetched product rows; requested IDs that came back empty are removed"""
+        seen = set()
+        for row in rows:
+            product_id = row['product_id']
+            seen.add(product_id)
+            if row['is_active']:
+                self._upsert(row)
+            else:
+                self._remove(product_id)
+        for product_id in product_ids:
+            if product_id not in seen:
+                self._remove(product_id)
+        self.views = {}
+        self.generation += 1
+
+    def _upsert(self, row):
+        position = self.rows.get(row['product_id'])
+        if position is None:
+            if self.free:
+                position = self.free.pop()
+            else:
+                position = len(self.columns['product_id'])
+                for column in self.columns.values():
+                    column.append(0 if isinstance(column, array.array) else None)
+            self.rows[row['product_id']] = position
+            self.order_stale = True
+        elif self.columns['product_name'][position] != row['product_name']:
+            self.order_stale = True
+
+        for field, column in self.columns.items():
+            value = row[field]
+            if field in INTERNED_COLUMNS and value is not None:
+                value = sys.intern(value)
+            column[position] = value
+
+    def _remove(self, product_id):
+        position = self.rows.pop(product_id, None)
+        if position is None:
+            return
+        for column in self.columns.values():
+            if not isinstance(column, array.array):
+                column[position] = None  # release the strings
+        self.free.append(position)
+        self.order_stale = True
+
+    # Reading (call with self.lock held)
+
+    def _ordered(self):
+        if self.order_stale:
+            names, ids = self.columns['product_name'], self.columns['product_id']
+            self.order = array.array('q', sorted(self.rows.values(),
+                                                 key=lambda position: (names[position], ids[position])))
+            self.order_stale = False
+        return self.order
+
+    def view(self, category=None, supplier=None, low_stock=False):
+        """Positions of the matching products in listing order"""
+        positions = self._ordered()
+        if category is None and supplier is None and not low_stock:
+            return positions
+        key = (category, supplier, low_stock)
+        view = self.views.get(key)
+        if view is None:
+            columns = self.columns
+            # MySQL compares names case-insensitively
+            fold = (lambda value: value) if self.use_sqlite else (lambda value: value.lower() if value else value)
+            matches = positions
+            if category is not None:
+                category, categories = fold(category), columns['category']
+                matches = [position for position in matches if fold(categories[position]) == category]
+            if supplier is not None:
+                supplier, suppliers = fold(supplier), columns['supplier']
+                matches = [position for position in matches if fold(suppliers[position]) == supplier]
+            if low_stock:
+                quantities, minimums = columns['quantity_in_stock'], columns['min_stock_level']
+                matches = [position for position in matches
+                           if minimums[position] is not None and quantities[position] <= minimums[position]]
+            view = array.array('q', matches)
+            if len(self.views) >= MAX_CACHED_VIEWS:
+                self.views = {}
+            self.views[key] = view
+        return view
+
+    def start_after(self, view, name, product_id):
+        """Index of the first position in view sorted after (name, product_id)"""
+        names, ids = self.columns['product_name'], self.columns['product_id']
+        key = (name, product_id)
+        low, high = 0, len(view)
+        while low < high:
+            middle = (low + high) // 2
+            position = view[middle]
+            if (names[position], ids[position]) <= key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def rows_at(self, positions, fields):
+        """Build product dicts for the given positions"""
+        columns = [(field, self.columns[field]) for field in fields]
+        return [{field: column[position] for field, column in columns} for position in positions]
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """The process-wide catalog snapshot, subscribed to product change events"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            from backend.config import Config
+            _catalog = CatalogSnapshot(Config.USE_SQLITE)
+            subscribe('products', _catalog.mark_stale)
+        return _catalog
+
+def get_catalog_products(get_connection):
+    """
+    Get active products from the catalog snapshot, one page at a time
+    Same parameters and response as get_all_products except search, which
+    callers send to the database. get_connection is only called when the
+    snapshot needs to read changes.
+    """
+    try:
+        category = request.args.get('category')
+        supplier = request.args.get('supplier')
+        low_stock = request.args.get('low_stock') == 'true'
+        cursor_token = request.args.get('cursor')
+
+        from backend.config import Config
+        from backend.utils import parse_limit, parse_fields, decode_cursor, encode_cursor
+        try:
+            limit = parse_limit(request.args.get('limit'), Config.PRODUCTS_PAGE_SIZE, Config.PRODUCTS_PAGE_MAX)
+            fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS,
+                                  required=('product_id', 'product_name'))
+            after = decode_cursor(cursor_token, 2) if cursor_token else None
+            if after and not (isinstance(after[0], str) and isinstance(after[1], int)):
+                raise ValueError('Invalid cursor')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        catalog = get_catalog()
+        catalog.refresh(get_connection)
+        with catalog.lock:
+            etag = hashlib.sha1(f"{catalog.token}|{catalog.generation}|{request.full_path}".encode('utf-8')).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            view = catalog.view(category or None, supplier or None, low_stock)
+            start = catalog.start_after(view, after[0], after[1]) if after else 0
+            # One extra row tells whether another page follows
+            products = catalog.rows_at(view[start:start + limit + 1], fields)
+
+        has_more = len(products) > limit
+        products = products[:limit]
+        next_cursor = None
+        if has_more:
+            last = products[-1]
+            next_cursor = encode_cursor([last['product_name'], last['product_id']])
+
+        # Add low stock flag
+        if 'quantity_in_stock' in fields and 'min_stock_level' in fields:
+            for product in products:
+                product['is_low_stock'] = product['quantity_in_stock'] <= product['min_stock_level']
+        # Stock not held by open orders
+        if 'quantity_in_stock' in fields and 'reserved_quantity' in fields:
+            for product in products:
+                product['available_quantity'] = max(product['quantity_in_stock'] - product['reserved_quantity'], 0)
+
+        response = make_response(jsonify({
+            'products': products,
+            'total': len(products),
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }), 200)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to get products: {str(e)}'}), 500
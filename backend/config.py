@@ -15,8 +15,99 @@ class Config:
     # Database configuration
     USE_SQLITE = os.environ.get('USE_SQLITE', 'True').lower() == 'true'
     SQLITE_DB_PATH = os.environ.get('SQLITE_DB_PATH') or 'database/inventory.db'
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE') or 'production'  # see database.SQLITE_PROFILES
 
+    # MySQL configuration (used when USE_SQLITE is false)
+    DB_HOST = os.environ.get('DB_HOST') or 'localhost'
+    DB_USER = os.environ.get('DB_USER') or 'root'
+    DB_PASSWORD = os.environ.get('DB_PASSWORD') or ''
+    DB_NAME = os.environ.get('DB_NAME') or 'inventory_db'
+    DB_PORT = int(os.environ.get('DB_PORT') or 3306)
+
+    # Connection pool configuration
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT') or 5)  # seconds to wait for a free connection
+    DB_POOL_HEALTH_CHECK_AFTER = float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER') or 30)  # ping connections idle longer than this
     
+    # Pagination limits for GET /api/products
+    PRODUCTS_PAGE_SIZE = int(os.environ.get('PRODUCTS_PAGE_SIZE') or 100)
+    PRODUCTS_PAGE_MAX = int(os.environ.get('PRODUCTS_PAGE_MAX') or 500)
+
+    # Pagination limits for GET /api/products/<id>/movements
+    MOVEMENTS_PAGE_SIZE = int(os.environ.get('MOVEMENTS_PAGE_SIZE') or 100)
+    MOVEMENTS_PAGE_MAX = int(os.environ.get('MOVEMENTS_PAGE_MAX') or 1000)
+
+    # Pagination limits for GET /api/admin/orders
+    ORDERS_PAGE_SIZE = int(os.environ.get('ORDERS_PAGE_SIZE') or 50)
+    ORDERS_PAGE_MAX = int(os.environ.get('ORDERS_PAGE_MAX') or 500)
+
+    # Pagination limits for GET /api/alerts/history
+    ALERTS_PAGE_SIZE = int(os.environ.get('ALERTS_PAGE_SIZE') or 50)
+    ALERTS_PAGE_MAX = int(os.environ.get('ALERTS_PAGE_MAX') or 500)
+
+    # Bulk product import (POST /api/products/bulk)
+    BULK_IMPORT_CHUNK_SIZE = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE') or 1000)  # rows per transaction
+    BULK_IMPORT_MAX_ROWS = int(os.environ.get('BULK_IMPORT_MAX_ROWS') or 500000)
+    BULK_IMPORT_MAX_ERRORS = int(os.environ.get('BULK_IMPORT_MAX_ERRORS') or 1000)  # row errors listed in the response
+
+    # Batch stock movements (PUT /api/stock/batch)
+    STOCK_BATCH_MAX_LINES = int(os.environ.get('STOCK_BATCH_MAX_LINES') or 1000)
+
+    # Background work (periodic jobs and the alert engine), started once per serving process
+    BACKGROUND_JOBS = os.environ.get('BACKGROUND_JOBS', 'True').lower() == 'true'
+
+    # Stock checkpoints for point-in-time reports (GET /api/reports/stock-as-of)
+    STOCK_CHECKPOINT_INTERVAL = int(os.environ.get('STOCK_CHECKPOINT_INTERVAL') or 86400)  # seconds between checkpoints
+
+    # In-memory catalog snapshot serving GET /api/products listings
+    CATALOG_SNAPSHOT = os.environ.get('CATALOG_SNAPSHOT', 'True').lower() == 'true'
+    CATALOG_SYNC_INTERVAL = float(os.environ.get('CATALOG_SYNC_INTERVAL') or 2)  # seconds between table_versions probes
+    CATALOG_SYNC_OVERLAP = int(os.environ.get('CATALOG_SYNC_OVERLAP') or 60)  # re-read window for slow commits, seconds
+
+    # Cart checkout (POST /api/orders/checkout)
+    CHECKOUT_MAX_LINES = int(os.environ.get('CHECKOUT_MAX_LINES') or 100)
+
+    # Bulk order status changes (POST /api/admin/orders/status)
+    ORDER_BULK_MAX = int(os.environ.get('ORDER_BULK_MAX') or 1000)
+
+    # Stock reservations held by open orders
+    RESERVATION_TTL = int(os.environ.get('RESERVATION_TTL') or 172800)  # seconds an unshipped order holds its stock
+    RESERVATION_SWEEP_INTERVAL = int(os.environ.get('RESERVATION_SWEEP_INTERVAL') or 60)  # seconds between expiry sweeps
+    RESERVATION_SWEEP_BATCH = int(os.environ.get('RESERVATION_SWEEP_BATCH') or 500)  # reservations expired per transaction
+
+    # Stock alert engine (opens and resolves low/out-of-stock alerts in the background)
+    ALERT_ENGINE = os.environ.get('ALERT_ENGINE', 'True').lower() == 'true'
+    ALERT_DEBOUNCE = float(os.environ.get('ALERT_DEBOUNCE') or 0.5)  # seconds to collect a burst of changes
+    ALERT_BATCH_SIZE = int(os.environ.get('ALERT_BATCH_SIZE') or 500)  # products evaluated per transaction
+
+    # Alert acknowledgement in bulk (PUT /api/alerts/acknowledge) and history compaction
+    ALERT_BULK_MAX = int(os.environ.get('ALERT_BULK_MAX') or 1000)  # alert_ids per request
+    ALERT_COMPACT_AGE = int(os.environ.get('ALERT_COMPACT_AGE') or 604800)  # seconds closed before an alert is folded
+    ALERT_COMPACT_INTERVAL = int(os.environ.get('ALERT_COMPACT_INTERVAL') or 86400)  # seconds between compactions
+    ALERT_COMPACT_BATCH = int(os.environ.get('ALERT_COMPACT_BATCH') or 500)  # product/type groups per transaction
+
+    # Dashboard statistics cache (GET /api/stats)
+    DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL') or 30)  # seconds an unchanged payload is reused; 0 disables
+    DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE') or 1000)  # cached payloads (admins share one)
+
+    # Per-user alert inbox (GET /api/inbox)
+    INBOX_PAGE_SIZE = int(os.environ.get('INBOX_PAGE_SIZE') or 50)  # alerts per page by default
+    INBOX_PAGE_MAX = int(os.environ.get('INBOX_PAGE_MAX') or 200)  # largest ?limit accepted
+    INBOX_UNREAD_CAP = int(os.environ.get('INBOX_UNREAD_CAP') or 99)  # unread counts stop here (shown as 99+)
+
+    # Server-Sent Events stream (GET /api/stream)
+    STREAM_MAX_CLIENTS = int(os.environ.get('STREAM_MAX_CLIENTS') or 100)  # open streams per process
+    STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE') or 256)  # undelivered events before a stream is dropped
+    STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT') or 15)  # seconds of silence before a heartbeat
+    STREAM_COALESCE = float(os.environ.get('STREAM_COALESCE') or 0.25)  # seconds to collect stock changes into one event
+    STREAM_TOKEN_EXPIRES = timedelta(seconds=int(os.environ.get('STREAM_TOKEN_EXPIRES') or 60))  # lifetime of the token a stream is opened with
+
+    # Idempotency-Key handling for order and transaction creation
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL') or 86400)  # seconds a stored response is replayed
+    IDEMPOTENCY_PENDING_TIMEOUT = int(os.environ.get('IDEMPOTENCY_PENDING_TIMEOUT') or 60)  # seconds before an unfinished claim can be retaken
+    IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE') or 10000)  # responses kept in memory per process
+    IDEMPOTENCY_PURGE_INTERVAL = int(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL') or 3600)  # seconds between expired-key purges
+
     # CORS configuration
     CORS_HEADERS = 'Content-Type'
 
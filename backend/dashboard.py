@@ -1,132 +1,189 @@
 """
 Dashboard statistics and extra features - Milestone 4
+
+The scalar figures (product, low-stock, today's movement and user counts,
+the latest broadcast) come from one statement; "today" is a created_at
+range in UTC, like the stored timestamps, so it is answered from
+idx_movements_created and agrees with the stream's movements_today
+counter. The whole payload is cached per role: admins share one entry, other users each get their own
+(their recent movements are their own). An entry is served while the
+table_versions counters of the tables it reads are unchanged, which every
+write bumps in any process, and for at most DASHBOARD_CACHE_TTL seconds.
 """
 from flask import jsonify
 from flask_jwt_extended import get_jwt_identity
-import datetime
+from collections import OrderedDict
+import threading
+import time
+from backend.table_versions import get_table_versions
+from backend.utils import utc_today, day_bounds
+
+DASHBOARD_TABLES = ['products', 'stock_movements', 'users', 'alerts']
+
+class DashboardCache:
+    """Bounded LRU of dashboard payloads, valid while the table versions match"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (scope, day) -> (expires, versions, payload)
+        self.lock = threading.Lock()
+
+    def get(self, key, versions):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic() or entry[1] != versions:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key, versions, payload):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, versions, payload)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_dashboard_cache():
+    """The process-wide dashboard cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from backend.config import Config
+            _cache = DashboardCache(Config.DASHBOARD_CACHE_TTL, Config.DASHBOARD_CACHE_SIZE)
+        return _cache
+
+def read_dashboard_stats(cursor, use_sqlite, user_id, role, today):
+    """Run the dashboard queries: the combined figures, recent movements and (admins) top products"""
+    start, end = day_bounds(today)
+
+    # 1-4, 7. Product, low-stock, today's movement and active user counts and the latest broadcast
+    if use_sqlite:
+        cursor.execute("""
+            SELECT (SELECT COUNT(*) FROM products WHERE is_active = 1) AS total_products,
+                   (SELECT COUNT(*) FROM low_stock_products) AS low_stock_count,
+                   (SELECT COUNT(*) FROM stock_movements WHERE created_at >= ? AND created_at < ?) AS total_transactions,
+                   (SELECT COUNT(*) FROM users WHERE is_active = 1) AS active_users,
+                   (SELECT alert_message FROM alerts
+                    WHERE alert_type IN ('Broadcast', 'Urgent', 'Maintenance')
+                    AND is_acknowledged = 0 AND product_id IS NULL
+                    ORDER BY created_at DESC LIMIT 1) AS latest_broadcast
+        """, (start, end))
+    else:
+        cursor.execute("""
+            SELECT (SELECT COUNT(*) FROM products WHERE is_active = 1) AS total_products,
+                   (SELECT COUNT(*) FROM low_stock_products) AS low_stock_count,
+                   (SELECT COUNT(*) FROM stock_movements WHERE created_at >= %s AND created_at < %s) AS total_transactions,
+                   (SELECT COUNT(*) FROM users WHERE is_active = 1) AS active_users,
+                   (SELECT alert_message FROM alerts
+                    WHERE alert_type IN ('Broadcast', 'Urgent', 'Maintenance')
+                    AND is_acknowledged = 0 AND product_id IS NULL
+                    ORDER BY created_at DESC LIMIT 1) AS latest_broadcast
+        """, (start, end))
+    figures = cursor.fetchone()
+
+    # 5. Recent Movements (Feature enhancement)
+    # Admins see everyone's, Employees see their own
+    if role == 'admin':
+        cursor.execute("""
+            SELECT m.*, p.product_name, u.username
+            FROM stock_movements m
+            JOIN products p ON m.product_id = p.product_id
+            LEFT JOIN users u ON m.created_by = u.user_id
+            ORDER BY m.created_at DESC LIMIT 5
+        """)
+    else:
+        if use_sqlite:
+            cursor.execute("""
+                SELECT m.*, p.product_name
+                FROM stock_movements m
+                JOIN products p ON m.product_id = p.product_id
+                WHERE m.created_by = ?
+                ORDER BY m.created_at DESC LIMIT 5
+            """, (user_id,))
+        else:
+            cursor.execute("""
+                SELECT m.*, p.product_name
+                FROM stock_movements m
+                JOIN products p ON m.product_id = p.product_id
+                WHERE m.created_by = %s
+                ORDER BY m.created_at DESC LIMIT 5
+            """, (user_id,))
+    movements_raw = cursor.fetchall()
+    if use_sqlite:
+        from database.database import dict_from_row
+        recent_movements = [dict_from_row(row) for row in movements_raw]
+    else:
+        recent_movements = list(movements_raw)
+
+    # 6. Top Products (Admin only)
+    top_products = []
+    if role == 'admin':
+        cursor.execute("""
+            SELECT p.product_name, p.quantity_in_stock, p.unit_of_measure
+            FROM products p
+            WHERE is_active = 1
+            ORDER BY quantity_in_stock DESC LIMIT 3
+        """)
+        top_raw = cursor.fetchall()
+        if use_sqlite:
+            top_products = [dict_from_row(row) for row in top_raw]
+        else:
+            top_products = list(top_raw)
+
+    return {
+        'total_products': int(figures['total_products']),
+        'low_stock_count': int(figures['low_stock_count']),
+        'total_transactions': int(figures['total_transactions']),
+        'active_users': int(figures['active_users']),
+        'recent_movements': recent_movements,
+        'top_products': top_products,
+        'latest_broadcast': figures['latest_broadcast'],
+        'role': role
+    }
 
 def get_dashboard_stats(db_connection):
     try:
         cursor = db_connection.cursor()
         from backend.config import Config
         use_sqlite = Config.USE_SQLITE
-        
+
         user_id = int(get_jwt_identity())
-        
+
         # Get user role
         if use_sqlite:
             cursor.execute("SELECT role FROM users WHERE user_id = ?", (user_id,))
         else:
             cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
         role_row = cursor.fetchone()
-        role = role_row[0] if isinstance(role_row, tuple) else role_row['role']
-
-        # 1. Total Products
-        cursor.execute("SELECT COUNT(*) as total FROM products WHERE is_active = 1")
-        total_products = cursor.fetchone()
-        total_products = total_products[0] if isinstance(total_products, tuple) else total_products['total']
-
-        # 2. Low Stock Count
-        cursor.execute("SELECT COUNT(*) as total FROM products WHERE quantity_in_stock <= min_stock_level AND is_active = 1")
-        low_stock = cursor.fetchone()
-        low_stock = low_stock[0] if isinstance(low_stock, tuple) else low_stock['total']
-
-        # 3. Transactions Today
-        today = datetime.date.today().strftime('%Y-%m-%d')
-        if use_sqlite:
-            cursor.execute("SELECT COUNT(*) as total FROM stock_movements WHERE date(created_at) = ?", (today,))
-        else:
-            cursor.execute("SELECT COUNT(*) as total FROM stock_movements WHERE DATE(created_at) = %s", (today,))
-        transactions = cursor.fetchone()
-        transactions = transactions[0] if isinstance(transactions, tuple) else transactions['total']
-
-        # 4. Active Users (Admin only see actual count, users see 1 for simplicity or same)
-        cursor.execute("SELECT COUNT(*) as total FROM users WHERE is_active = 1")
-        active_users = cursor.fetchone()
-        active_users = active_users[0] if isinstance(active_users, tuple) else active_users['total']
-
-        # 5. Recent Movements (Feature enhancement)
-        # Admins see everyone's, Employees see their own
-        if role == 'admin':
-            if use_sqlite:
-                cursor.execute("""
-                    SELECT m.*, p.product_name, u.username 
-                    FROM stock_movements m 
-                    JOIN products p ON m.product_id = p.product_id 
-                    LEFT JOIN users u ON m.created_by = u.user_id 
-                    ORDER BY m.created_at DESC LIMIT 5
-                """)
-            else:
-                cursor.execute("""
-                    SELECT m.*, p.product_name, u.username 
-                    FROM stock_movements m 
-                    JOIN products p ON m.product_id = p.product_id 
-                    LEFT JOIN users u ON m.created_by = u.user_id 
-                    ORDER BY m.created_at DESC LIMIT 5
-                """)
-        else:
-            if use_sqlite:
-                cursor.execute("""
-                    SELECT m.*, p.product_name 
-                    FROM stock_movements m 
-                    JOIN products p ON m.product_id = p.product_id 
-                    WHERE m.created_by = ? 
-                    ORDER BY m.created_at DESC LIMIT 5
-                """, (user_id,))
-            else:
-                cursor.execute("""
-                    SELECT m.*, p.product_name 
-                    FROM stock_movements m 
-                    JOIN products p ON m.product_id = p.product_id 
-                    WHERE m.created_by = %s 
-                    ORDER BY m.created_at DESC LIMIT 5
-                """, (user_id,))
-        
-        movements_raw = cursor.fetchall()
-        recent_movements = []
-        if use_sqlite:
-            from database.database import dict_from_row
-            recent_movements = [dict_from_row(row) for row in movements_raw]
-        else:
-            recent_movements = movements_raw
-
-        # 6. Top Products (Admin only)
-        top_products = []
-        if role == 'admin':
-            cursor.execute("""
-                SELECT p.product_name, p.quantity_in_stock, p.unit_of_measure 
-                FROM products p 
-                WHERE is_active = 1 
-                ORDER BY quantity_in_stock DESC LIMIT 3
-            """)
-            top_raw = cursor.fetchall()
-            if use_sqlite:
-                top_products = [dict_from_row(row) for row in top_raw]
-            else:
-                top_products = top_raw
-
-        # 7. Latest Broadcast (Announcement)
-        cursor.execute("""
-            SELECT alert_message FROM alerts 
-            WHERE alert_type IN ('Broadcast', 'Urgent', 'Maintenance') 
-            AND is_acknowledged = 0 AND product_id IS NULL 
-            ORDER BY created_at DESC LIMIT 1
-        """)
-        broadcast_row = cursor.fetchone()
-        latest_broadcast = broadcast_row[0] if isinstance(broadcast_row, tuple) else (broadcast_row['alert_message'] if broadcast_row else None)
+        if not role_row:
+            cursor.close()
+            return jsonify({'error': 'User not found'}), 404
+        role = role_row['role']
 
+        today = utc_today()
+        key = ('admin' if role == 'admin' else (role, user_id), today)
+        versions = get_table_versions(db_connection, DASHBOARD_TABLES)
+        cache = get_dashboard_cache()
+        stats = cache.get(key, versions)
+        if stats is None:
+            stats = read_dashboard_stats(cursor, use_sqlite, user_id, role, today)
+            cache.put(key, versions, stats)
         cursor.close()
 
-        return jsonify({
-            'total_products': total_products,
-            'low_stock_count': low_stock,
-            'total_transactions': transactions,
-            'active_users': active_users,
-            'recent_movements': recent_movements,
-            'top_products': top_products,
-            'latest_broadcast': latest_broadcast,
-            'role': role
-        }), 200
+        return jsonify(stats), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
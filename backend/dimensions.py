@@ -0,0 +1,75 @@
+"""
+Category and supplier dimension tables
+
+Products reference a categories row and a suppliers row (category_id,
+supplier_id) next to the denormalized category/supplier text. Each
+dimension row carries product_count, the number of active products that
+reference it, maintained in the same transaction as every product write.
+Listing categories or suppliers then reads the small dimension table
+instead of a DISTINCT scan over products.
+"""
+from collections import Counter
+
+# field -> (table, id column, name column)
+DIMENSIONS = {
+    'category': ('categories', 'category_id', 'category_name'),
+    'supplier': ('suppliers', 'supplier_id', 'supplier_name')
+}
+
+def _dimension_ids(cursor, use_sqlite, field, names):
+    """Look up {name: id} for existing dimension rows"""
+    table, key, name_column = DIMENSIONS[field]
+    placeholder = '?' if use_sqlite else '%s'
+    cursor.execute(
+        f"SELECT {key}, {name_column} FROM {table} WHERE {name_column} IN ({', '.join([placeholder] * len(names))})",
+        names
+    )
+    rows = cursor.fetchall()
+    if use_sqlite:
+        return {row[1]: row[0] for row in rows}
+    ids = {row[name_column]: row[key] for row in rows}
+    # MySQL compares names case-insensitively; map every requested spelling
+    folded = {name.lower(): dimension_id for name, dimension_id in ids.items()}
+    return {name: ids.get(name, folded.get(name.lower())) for name in names if name.lower() in folded}
+
+def ensure_dimension_ids(cursor, use_sqlite, field, names):
+    """Return {name: id} for the given names, creating the missing dimension rows"""
+    names = sorted(set(names))
+    if not names:
+        return {}
+    ids = _dimension_ids(cursor, use_sqlite, field, names)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        table, _, name_column = DIMENSIONS[field]
+        placeholder = '?' if use_sqlite else '%s'
+        insert = 'INSERT OR IGNORE' if use_sqlite else 'INSERT IGNORE'  # another writer may add it first
+        cursor.executemany(f"{insert} INTO {table} ({name_column}) VALUES ({placeholder})",
+                           [(name,) for name in missing])
+        ids.update(_dimension_ids(cursor, use_sqlite, field, missing))
+    return ids
+
+def adjust_product_counts(cursor, use_sqlite, field, deltas):
+    """Apply {dimension_id: delta} changes to product_count"""
+    table, key, _ = DIMENSIONS[field]
+    changes = [(delta, dimension_id) for dimension_id, delta in Counter(deltas).items()
+               if dimension_id is not None and delta]
+    if not changes:
+        return
+    placeholder = '?' if use_sqlite else '%s'
+    cursor.executemany(
+        f"UPDATE {table} SET product_count = product_count + {placeholder} WHERE {key} = {placeholder}",
+        changes
+    )
+
+def list_dimension_names(db_connection, field):
+    """Names of the dimension rows referenced by at least one active product"""
+    from backend.config import Config
+    use_sqlite = Config.USE_SQLITE
+    table, _, name_column = DIMENSIONS[field]
+    cursor = db_connection.cursor()
+    cursor.execute(f"SELECT {name_column} FROM {table} WHERE product_count > 0 ORDER BY {name_column} ASC")
+    rows = cursor.fetchall()
+    cursor.close()
+    if use_sqlite:
+        return [row[0] for row in rows]
+    return [row[name_column] for row in rows]
@@ -0,0 +1,42 @@
+"""
+In-process publish/subscribe hub
+
+Write paths publish a topic after they commit:
+- publish('products', product_ids=[...]) whenever product rows or their stock change
+- publish('alerts', created=[alert, ...], acknowledged=[id, ...], resolved=[id, ...])
+- publish('orders', orders=[{order_id, user_id, status}, ...]) when orders are placed or change status
+- publish('inbox', user_id=..., read_through=..., dismissed=[id, ...]) when a user reads notifications
+In-memory read models (such as the catalog snapshot) subscribe and mark
+what they hold as stale; the event stream forwards them to browsers. Callbacks run synchronously on the publishing
+thread, so they must be cheap and must not touch the database; a failing
+subscriber is logged and never fails the write that published.
+
+Events only reach subscribers in the same process. Read models that can be
+shared with other processes also poll table_versions to catch their writes.
+"""
+import threading
+
+_subscribers = {}
+_lock = threading.Lock()
+
+def subscribe(topic, callback):
+    """Call callback(**payload) for every event published on topic"""
+    with _lock:
+        _subscribers.setdefault(topic, []).append(callback)
+
+def unsubscribe(topic, callback):
+    """Stop delivering topic events to callback"""
+    with _lock:
+        callbacks = _subscribers.get(topic, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+def publish(topic, **payload):
+    """Deliver an event to the topic's subscribers (call after commit)"""
+    with _lock:
+        callbacks = list(_subscribers.get(topic, []))
+    for callback in callbacks:
+        try:
+            callback(**payload)
+        except Exception as e:
+            print(f"Event subscriber for '{topic}' failed: {e}")
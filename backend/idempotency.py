@@ -0,0 +1,232 @@
+"""
+Idempotency keys for create endpoints
+
+A client that may retry a POST sends an Idempotency-Key header. The first
+request with a given key claims it with a 'pending' row in
+idempotency_keys, runs, and stores its response there. Any later request
+with the same key (same user and endpoint) gets that stored response back
+without running validation or writes again, from any worker process.
+
+- the request body is hashed; reusing a key with a different body is an
+  error (422) rather than a replay
+- a key whose first request is still running answers 409; a pending claim
+  older than IDEMPOTENCY_PENDING_TIMEOUT (a crashed worker) can be taken over
+- only successful responses are stored; a rejected (4xx) or failed (5xx)
+  request wrote nothing, so it releases the claim and may be retried
+- create views store their response with record_response() inside their
+  own write transaction, so the write and its stored response commit
+  together: a worker that dies right after the commit still leaves a
+  completed key, never a pending claim that a retry could take over once
+  IDEMPOTENCY_PENDING_TIMEOUT passes and write a second time
+- stored responses expire after IDEMPOTENCY_TTL seconds; a periodic job
+  deletes expired rows
+
+Completed responses never change, so each process also keeps the most
+recently used ones in a bounded in-memory LRU cache (IDEMPOTENCY_CACHE_SIZE
+entries) in front of the table.
+"""
+from flask import g, current_app
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import threading
+import time
+
+MAX_KEY_LENGTH = 255
+
+class IdempotencyCache:
+    """Bounded LRU of completed responses with per-entry expiry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (user_id, endpoint, key) -> (expires, request_hash, status, body, mimetype)
+        self.lock = threading.Lock()
+
+    def get(self, scope):
+        with self.lock:
+            entry = self.entries.get(scope)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[scope]
+                return None
+            self.entries.move_to_end(scope)
+            return entry[1:]
+
+    def put(self, scope, ttl, request_hash, status, body, mimetype):
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[scope] = (time.monotonic() + ttl, request_hash, status, body, mimetype)
+            self.entries.move_to_end(scope)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """The process-wide cache of completed responses"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from backend.config import Config
+            _cache = IdempotencyCache(Config.IDEMPOTENCY_CACHE_SIZE)
+        return _cache
+
+def request_fingerprint(body):
+    """Hash of the raw request body"""
+    return hashlib.sha256(body or b'').hexdigest()
+
+def _to_datetime(value):
+    """Timestamps come back as str from SQLite and datetime from MySQL"""
+    return value if isinstance(value, datetime) else datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+
+def claim_key(db_connection, user_id, endpoint, key, request_hash):
+    """
+    Claim an idempotency key, or find its earlier request
+    Returns ('claimed', None), ('completed', (request_hash, status, body,
+    mimetype, ttl_left)) or ('pending', request_hash). Commits.
+    """
+    from backend.config import Config
+    use_sqlite = Config.USE_SQLITE
+    cursor = db_connection.cursor()
+    try:
+        for _ in range(2):
+            if use_sqlite:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO idempotency_keys (user_id, endpoint, idempotency_key, request_hash, expires_at)
+                    VALUES (?, ?, ?, ?, datetime('now', ?))
+                """, (user_id, endpoint, key, request_hash, f'+{Config.IDEMPOTENCY_PENDING_TIMEOUT} seconds'))
+            else:
+                cursor.execute("""
+                    INSERT IGNORE INTO idempotency_keys (user_id, endpoint, idempotency_key, request_hash, expires_at)
+                    VALUES (%s, %s, %s, %s, NOW() + INTERVAL %s SECOND)
+                """, (user_id, endpoint, key, request_hash, Config.IDEMPOTENCY_PENDING_TIMEOUT))
+            claimed = cursor.rowcount > 0
+            db_connection.commit()
+            if claimed:
+                return 'claimed', None
+
+            if use_sqlite:
+                cursor.execute("""
+                    SELECT request_hash, status, response_status, response_body, response_type,
+                           expires_at, CURRENT_TIMESTAMP AS now
+                    FROM idempotency_keys WHERE user_id = ? AND endpoint = ? AND idempotency_key = ?
+                """, (user_id, endpoint, key))
+            else:
+                cursor.execute("""
+                    SELECT request_hash, status, response_status, response_body, response_type,
+                           expires_at, CURRENT_TIMESTAMP AS now
+                    FROM idempotency_keys WHERE user_id = %s AND endpoint = %s AND idempotency_key = %s
+                """, (user_id, endpoint, key))
+            row = cursor.fetchone()
+            if row is None:
+                continue  # released between the insert and the read: claim again
+            ttl_left = (_to_datetime(row['expires_at']) - _to_datetime(row['now'])).total_seconds()
+            if ttl_left <= 0:
+                # Expired (or an abandoned claim): drop it and claim again
+                release_key(db_connection, user_id, endpoint, key)
+                continue
+            if row['status'] == 'pending':
+                return 'pending', row['request_hash']
+            return 'completed', (row['request_hash'], row['response_status'], row['response_body'],
+                                 row['response_type'], ttl_left)
+        return 'pending', request_hash
+    except Exception:
+        db_connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def _store_response(cursor, use_sqlite, user_id, endpoint, key, status, body, mimetype):
+    """Mark a claimed key completed with its response and start its TTL"""
+    from backend.config import Config
+    if use_sqlite:
+        cursor.execute("""
+            UPDATE idempotency_keys
+            SET status = 'completed', response_status = ?, response_body = ?, response_type = ?,
+                expires_at = datetime('now', ?)
+            WHERE user_id = ? AND endpoint = ? AND idempotency_key = ?
+        """, (status, body, mimetype, f'+{Config.IDEMPOTENCY_TTL} seconds', user_id, endpoint, key))
+    else:
+        cursor.execute("""
+            UPDATE idempotency_keys
+            SET status = 'completed', response_status = %s, response_body = %s, response_type = %s,
+                expires_at = NOW() + INTERVAL %s SECOND
+            WHERE user_id = %s AND endpoint = %s AND idempotency_key = %s
+        """, (status, body, mimetype, Config.IDEMPOTENCY_TTL, user_id, endpoint, key))
+
+def record_response(cursor, use_sqlite, payload, status):
+    """
+    Build a view's JSON response and, when the request holds an idempotency
+    key, store it in the view's open transaction (call before commit)
+    """
+    response = current_app.json.response(payload)
+    response.status_code = status
+    scope = g.get('idempotency_scope')
+    if scope is not None:
+        _store_response(cursor, use_sqlite, *scope, status, response.get_data(as_text=True), response.mimetype)
+        g.idempotency_recorded = True
+    return response
+
+def complete_key(db_connection, user_id, endpoint, key, status, body, mimetype):
+    """Store the response for a claimed key and start its TTL. Commits."""
+    from backend.config import Config
+    use_sqlite = Config.USE_SQLITE
+    cursor = db_connection.cursor()
+    try:
+        _store_response(cursor, use_sqlite, user_id, endpoint, key, status, body, mimetype)
+        db_connection.commit()
+    except Exception:
+        db_connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def release_key(db_connection, user_id, endpoint, key):
+    """Forget a key so its request can run again. Commits."""
+    from backend.config import Config
+    use_sqlite = Config.USE_SQLITE
+    cursor = db_connection.cursor()
+    try:
+        if use_sqlite:
+            cursor.execute("""
+                DELETE FROM idempotency_keys WHERE user_id = ? AND endpoint = ? AND idempotency_key = ?
+            """, (user_id, endpoint, key))
+        else:
+            cursor.execute("""
+                DELETE FROM idempotency_keys WHERE user_id = %s AND endpoint = %s AND idempotency_key = %s
+            """, (user_id, endpoint, key))
+        db_connection.commit()
+    except Exception:
+        db_connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def purge_expired_keys(db_connection):
+    """Delete expired keys; returns how many were removed"""
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute("DELETE FROM idempotency_keys WHERE expires_at <= CURRENT_TIMESTAMP")
+        removed = cursor.rowcount
+        db_connection.commit()
+        return removed
+    except Exception:
+        db_connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def run_idempotency_purge():
+    """Periodic job: delete expired idempotency keys"""
+    from database.database import get_pool
+    pool = get_pool()
+    connection = pool.acquire()
+    try:
+        removed = purge_expired_keys(connection)
+        if removed:
+            print(f"Purged {removed} expired idempotency keys")
+    finally:
+        pool.release(connection)
@@ -0,0 +1,284 @@
+"""
+Per-user alert inbox
+
+Alerts are written once, as global rows; what each user has read is kept
+beside them rather than copied per user (fan-out on read):
+- alert_read_cursors.read_through: every alert with alert_id at or below it
+  is read. "Mark all read" only moves this high-water mark forward.
+- alert_dismissals: alerts above the mark that the user read one at a time.
+  Moving the mark past them deletes them, so the set never holds more than
+  the user's unread window.
+
+An alert is unread for a user when alert_id > read_through and it is not in
+their dismissals. Listings walk the alerts primary key backwards from a
+cursor and the unread count walks it forwards from the mark, stopping at
+INBOX_UNREAD_CAP, so neither depends on how many alerts or users there are.
+A new user's mark starts at the newest alert, so they are not handed the
+whole backlog as unread. The global is_acknowledged flag is untouched: it is
+the admins' work queue, not anyone's read state. Read-state writes bump the
+alert_reads change counter so per-user alert listings revalidate.
+"""
+from flask import jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from backend.events import publish
+from backend.table_versions import bump_table_versions
+
+def get_read_through(cursor, use_sqlite, user_id):
+    """The user's high-water mark (0 before they first read anything)"""
+    if use_sqlite:
+        cursor.execute("SELECT read_through FROM alert_read_cursors WHERE user_id = ?", (user_id,))
+    else:
+        cursor.execute("SELECT read_through FROM alert_read_cursors WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    return row['read_through'] if row else 0
+
+def seed_read_cursor(cursor, use_sqlite, user_id):
+    """Start a new user's mark at the newest alert (call before commit)"""
+    if use_sqlite:
+        cursor.execute("""
+            INSERT OR IGNORE INTO alert_read_cursors (user_id, read_through)
+            SELECT ?, COALESCE(MAX(alert_id), 0) FROM alerts
+        """, (user_id,))
+    else:
+        cursor.execute("""
+            INSERT IGNORE INTO alert_read_cursors (user_id, read_through)
+            SELECT %s, COALESCE(MAX(alert_id), 0) FROM alerts
+        """, (user_id,))
+
+def count_unread(cursor, use_sqlite, user_id, read_through, cap):
+    """Unread alerts above the mark, counting at most cap + 1"""
+    if use_sqlite:
+        cursor.execute("""
+            SELECT COUNT(*) AS total FROM (
+                SELECT a.alert_id FROM alerts a
+                WHERE a.alert_id > ?
+                  AND NOT EXISTS (SELECT 1 FROM alert_dismissals d WHERE d.user_id = ? AND d.alert_id = a.alert_id)
+                LIMIT ?
+            ) unread
+        """, (read_through, user_id, cap + 1))
+    else:
+        cursor.execute("""
+            SELECT COUNT(*) AS total FROM (
+                SELECT a.alert_id FROM alerts a
+                WHERE a.alert_id > %s
+                  AND NOT EXISTS (SELECT 1 FROM alert_dismissals d WHERE d.user_id = %s AND d.alert_id = a.alert_id)
+                LIMIT %s
+            ) unread
+        """, (read_through, user_id, cap + 1))
+    row = cursor.fetchone()
+    return int(row['total'])
+
+def _unread_summary(cursor, use_sqlite, user_id, read_through):
+    from backend.config import Config
+    unread = count_unread(cursor, use_sqlite, user_id, read_through, Config.INBOX_UNREAD_CAP)
+    return {
+        'unread_count': min(unread, Config.INBOX_UNREAD_CAP),
+        'unread_more': unread > Config.INBOX_UNREAD_CAP
+    }
+
+def list_unread(cursor, use_sqlite, user_id, limit):
+    """The user's unread alerts, newest first, at most limit of them"""
+    read_through = get_read_through(cursor, use_sqlite, user_id)
+    if use_sqlite:
+        cursor.execute("""
+            SELECT a.alert_id, a.product_id, pr.product_name, a.alert_type, a.alert_message,
+                   a.is_acknowledged, a.created_at
+            FROM alerts a
+            LEFT JOIN products pr ON pr.product_id = a.product_id
+            WHERE a.alert_id > ?
+              AND NOT EXISTS (SELECT 1 FROM alert_dismissals d WHERE d.user_id = ? AND d.alert_id = a.alert_id)
+            ORDER BY a.alert_id DESC
+            LIMIT ?
+        """, (read_through, user_id, limit))
+    else:
+        cursor.execute("""
+            SELECT a.alert_id, a.product_id, pr.product_name, a.alert_type, a.alert_message,
+                   a.is_acknowledged, a.created_at
+            FROM alerts a
+            LEFT JOIN products pr ON pr.product_id = a.product_id
+            WHERE a.alert_id > %s
+              AND NOT EXISTS (SELECT 1 FROM alert_dismissals d WHERE d.user_id = %s AND d.alert_id = a.alert_id)
+            ORDER BY a.alert_id DESC
+            LIMIT %s
+        """, (read_through, user_id, limit))
+    rows = cursor.fetchall()
+    if use_sqlite:
+        from database.database import dict_from_row
+        return [dict_from_row(row) for row in rows]
+    return list(rows)
+
+# Get the current user's inbox
+@jwt_required()
+def get_inbox(db_connection):
+    """
+    The user's alerts, newest first, with a per-user is_read flag
+    Query params: limit, cursor (next_cursor of the previous page), unread=1
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        from backend.config import Config
+        from backend.utils import parse_limit, encode_cursor, decode_cursor
+        use_sqlite = Config.USE_SQLITE
+        p = '?' if use_sqlite else '%s'
+        try:
+            limit = parse_limit(request.args.get('limit'), Config.INBOX_PAGE_SIZE, Config.INBOX_PAGE_MAX)
+            cursor_token = request.args.get('cursor')
+            before = decode_cursor(cursor_token, 1)[0] if cursor_token else None
+            if before is not None and not isinstance(before, int):
+                raise ValueError('Invalid cursor')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        unread_only = request.args.get('unread', '').lower() in ('1', 'true', 'yes')
+
+        cursor = db_connection.cursor()
+        read_through = get_read_through(cursor, use_sqlite, user_id)
+        conditions = []
+        params = [read_through, user_id]
+        if before is not None:
+            conditions.append(f"a.alert_id < {p}")
+            params.append(before)
+        if unread_only:
+            conditions.append(f"a.alert_id > {p} AND d.alert_id IS NULL")
+            params.append(read_through)
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        cursor.execute(f"""
+            SELECT a.alert_id, a.product_id, pr.product_name, a.alert_type, a.alert_message,
+                   a.created_at, a.resolved_at,
+                   CASE WHEN a.alert_id <= {p} OR d.alert_id IS NOT NULL THEN 1 ELSE 0 END AS is_read
+            FROM alerts a
+            LEFT JOIN alert_dismissals d ON d.user_id = {p} AND d.alert_id = a.alert_id
+            LEFT JOIN products pr ON pr.product_id = a.product_id
+            {where}
+            ORDER BY a.alert_id DESC
+            LIMIT {p}
+        """, params + [limit + 1])
+        rows = cursor.fetchall()
+        summary = _unread_summary(cursor, use_sqlite, user_id, read_through)
+        cursor.close()
+        if use_sqlite:
+            from database.database import dict_from_row
+            alerts = [dict_from_row(row) for row in rows]
+        else:
+            alerts = list(rows)
+        has_more = len(alerts) > limit
+        alerts = alerts[:limit]
+        for alert in alerts:
+            alert['is_read'] = bool(alert['is_read'])
+        next_cursor = encode_cursor([alerts[-1]['alert_id']]) if has_more else None
+        return jsonify({
+            'alerts': alerts,
+            'total': len(alerts),
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'read_through': read_through,
+            **summary
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to get inbox: {str(e)}'}), 500
+
+# Unread count for the navigation badge
+@jwt_required()
+def get_unread_count(db_connection):
+    try:
+        user_id = int(get_jwt_identity())
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        cursor = db_connection.cursor()
+        read_through = get_read_through(cursor, use_sqlite, user_id)
+        summary = _unread_summary(cursor, use_sqlite, user_id, read_through)
+        cursor.close()
+        return jsonify({'read_through': read_through, **summary}), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to get unread count: {str(e)}'}), 500
+
+# Mark everything up to an alert as read
+@jwt_required()
+def mark_inbox_read(db_connection):
+    """
+    Body (optional): {through: alert_id}; defaults to the newest alert
+    The mark never moves back, nor past the newest alert: alerts raised later
+    must still arrive unread.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        data = request.get_json(silent=True) or {}
+        through = data.get('through')
+        if through is not None:
+            try:
+                through = int(through)
+                if through < 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return jsonify({'error': 'through must be a non-negative alert ID'}), 400
+
+        cursor = db_connection.cursor()
+        try:
+            cursor.execute("SELECT MAX(alert_id) AS newest FROM alerts")
+            row = cursor.fetchone()
+            newest = row['newest'] or 0
+            through = newest if through is None else min(through, newest)
+            if use_sqlite:
+                cursor.execute("INSERT OR IGNORE INTO alert_read_cursors (user_id, read_through) VALUES (?, 0)", (user_id,))
+                cursor.execute("""
+                    UPDATE alert_read_cursors SET read_through = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE user_id = ? AND read_through < ?
+                """, (through, user_id, through))
+                # Dismissals at or below the mark are implied by it now
+                cursor.execute("DELETE FROM alert_dismissals WHERE user_id = ? AND alert_id <= ?", (user_id, through))
+            else:
+                cursor.execute("INSERT IGNORE INTO alert_read_cursors (user_id, read_through) VALUES (%s, 0)", (user_id,))
+                cursor.execute("""
+                    UPDATE alert_read_cursors SET read_through = %s
+                    WHERE user_id = %s AND read_through < %s
+                """, (through, user_id, through))
+                cursor.execute("DELETE FROM alert_dismissals WHERE user_id = %s AND alert_id <= %s", (user_id, through))
+            bump_table_versions(cursor, use_sqlite, 'alert_reads')
+            db_connection.commit()
+            read_through = get_read_through(cursor, use_sqlite, user_id)
+            summary = _unread_summary(cursor, use_sqlite, user_id, read_through)
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        publish('inbox', user_id=user_id, read_through=read_through, dismissed=[])
+        return jsonify({'message': 'Notifications marked as read', 'read_through': read_through, **summary}), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to mark notifications as read: {str(e)}'}), 500
+
+# Mark one alert as read
+@jwt_required()
+def dismiss_inbox_alert(db_connection, alert_id):
+    try:
+        user_id = int(get_jwt_identity())
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        cursor = db_connection.cursor()
+        try:
+            if use_sqlite:
+                cursor.execute("SELECT alert_id FROM alerts WHERE alert_id = ?", (alert_id,))
+            else:
+                cursor.execute("SELECT alert_id FROM alerts WHERE alert_id = %s", (alert_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Alert not found'}), 404
+            read_through = get_read_through(cursor, use_sqlite, user_id)
+            if alert_id > read_through:
+                # Below the mark it is already read; only the unread window needs a row
+                if use_sqlite:
+                    cursor.execute("INSERT OR IGNORE INTO alert_dismissals (user_id, alert_id) VALUES (?, ?)", (user_id, alert_id))
+                else:
+                    cursor.execute("INSERT IGNORE INTO alert_dismissals (user_id, alert_id) VALUES (%s, %s)", (user_id, alert_id))
+                bump_table_versions(cursor, use_sqlite, 'alert_reads')
+                db_connection.commit()
+            summary = _unread_summary(cursor, use_sqlite, user_id, read_through)
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        publish('inbox', user_id=user_id, read_through=read_through, dismissed=[alert_id])
+        return jsonify({'message': 'Notification marked as read', 'read_through': read_through, **summary}), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to mark notification as read: {str(e)}'}), 500
@@ -4,13 +4,77 @@ Product and Inventory Management Module - Milestone 2
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+import csv
+import io
+from collections import Counter
+import json
 import re
+from backend.table_versions import bump_table_versions
+from backend.stock import apply_stock_movement, StockMovementError
+from backend.dimensions import DIMENSIONS, ensure_dimension_ids, adjust_product_counts, list_dimension_names
+from backend.low_stock import refresh_low_stock
+from backend.events import publish
 
 def validate_sku(sku):
     """Validate SKU format (alphanumeric with hyphens/underscores)"""
     pattern = r'^[A-Za-z0-9_-]+$'
     return re.match(pattern, sku) is not None
 
+PRODUCT_REQUIRED_FIELDS = ['sku', 'product_name', 'category', 'supplier', 'unit_price']
+
+def _optional_field(data, field, default):
+    """Value of an optional input field; missing or empty values fall back to the default"""
+    value = data.get(field)
+    if value is None or str(value).strip() == '':
+        return default
+    return value
+
+def parse_product_fields(data):
+    """
+    Apply the product field rules to one input record (JSON body, CSV row)
+    Returns (fields, None) on success or (None, error_message)
+    """
+    for field in PRODUCT_REQUIRED_FIELDS:
+        if data.get(field) is None or not str(data[field]).strip():
+            return None, f'{field} is required'
+    
+    try:
+        unit_price = float(data['unit_price'])
+        quantity_in_stock = int(_optional_field(data, 'quantity_in_stock', 0))
+        min_stock_level = int(_optional_field(data, 'min_stock_level', 10))
+    except ValueError as e:
+        return None, f'Invalid numeric value: {str(e)}'
+    
+    fields = {
+        'sku': str(data['sku']).strip().upper(),
+        'product_name': str(data['product_name']).strip(),
+        'description': str(_optional_field(data, 'description', '')).strip(),
+        'category': str(data['category']).strip(),
+        'supplier': str(data['supplier']).strip(),
+        'unit_price': unit_price,
+        'quantity_in_stock': quantity_in_stock,
+        'min_stock_level': min_stock_level,
+        'unit_of_measure': str(_optional_field(data, 'unit_of_measure', 'units')).strip(),
+        'image_url': str(_optional_field(data, 'image_url', '')).strip()
+    }
+    
+    # Validate SKU format
+    if not validate_sku(fields['sku']):
+        return None, 'Invalid SKU format. Use only letters, numbers, hyphens, and underscores'
+    
+    # Validate unit price
+    if unit_price <= 0:
+        return None, 'Unit price must be greater than 0'
+    
+    # Validate quantities
+    if quantity_in_stock < 0:
+        return None, 'Quantity in stock cannot be negative'
+    
+    if min_stock_level < 0:
+        return None, 'Minimum stock level cannot be negative'
+    
+    return fields, None
+
 def create_product(db_connection):
     """
     Create a new product
@@ -21,37 +85,20 @@ def create_product(db_connection):
         
         data = request.get_json()
         
-        # Validate required fields
-        required_fields = ['sku', 'product_name', 'category', 'supplier', 'unit_price']
-        for field in required_fields:
-            if field not in data or not str(data[field]).strip():
-                return jsonify({'error': f'{field} is required'}), 400
-        
-        sku = data['sku'].strip().upper()
-        product_name = data['product_name'].strip()
-        description = data.get('description', '').strip()
-        category = data['category'].strip()
-        supplier = data['supplier'].strip()
-        unit_price = float(data['unit_price'])
-        quantity_in_stock = int(data.get('quantity_in_stock', 0))
-        min_stock_level = int(data.get('min_stock_level', 10))
-        unit_of_measure = data.get('unit_of_measure', 'units').strip()
-        image_url = data.get('image_url', '').strip()
-        
-        # Validate SKU format
-        if not validate_sku(sku):
-            return jsonify({'error': 'Invalid SKU format. Use only letters, numbers, hyphens, and underscores'}), 400
-        
-        # Validate unit price
-        if unit_price <= 0:
-            return jsonify({'error': 'Unit price must be greater than 0'}), 400
-        
-        # Validate quantities
-        if quantity_in_stock < 0:
-            return jsonify({'error': 'Quantity in stock cannot be negative'}), 400
-        
-        if min_stock_level < 0:
-            return jsonify({'error': 'Minimum stock level cannot be negative'}), 400
+        fields, error = parse_product_fields(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        sku = fields['sku']
+        product_name = fields['product_name']
+        description = fields['description']
+        category = fields['category']
+        supplier = fields['supplier']
+        unit_price = fields['unit_price']
+        quantity_in_stock = fields['quantity_in_stock']
+        min_stock_level = fields['min_stock_level']
+        unit_of_measure = fields['unit_of_measure']
+        image_url = fields['image_url']
         
         # Check if using SQLite or MySQL
         from backend.config import Config
@@ -69,25 +116,34 @@ def create_product(db_connection):
             cursor.close()
             return jsonify({'error': f'Product with SKU {sku} already exists'}), 400
         
+        # Resolve (or create) the category and supplier rows
+        category_id = ensure_dimension_ids(cursor, use_sqlite, 'category', [category])[category]
+        supplier_id = ensure_dimension_ids(cursor, use_sqlite, 'supplier', [supplier])[supplier]
+        
         # Insert product
         if use_sqlite:
             cursor.execute("""
                 INSERT INTO products (sku, product_name, description, category, supplier, 
+                                    category_id, supplier_id,
                                     unit_price, quantity_in_stock, min_stock_level, 
                                     unit_of_measure, image_url, created_by, updated_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (sku, product_name, description, category, supplier, unit_price,
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (sku, product_name, description, category, supplier, category_id, supplier_id, unit_price,
                   quantity_in_stock, min_stock_level, unit_of_measure, image_url, user_id, user_id))
         else:
             cursor.execute("""
                 INSERT INTO products (sku, product_name, description, category, supplier, 
+                                    category_id, supplier_id,
                                     unit_price, quantity_in_stock, min_stock_level, 
                                     unit_of_measure, image_url, created_by, updated_by)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (sku, product_name, description, category, supplier, unit_price,
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (sku, product_name, description, category, supplier, category_id, supplier_id, unit_price,
                   quantity_in_stock, min_stock_level, unit_of_measure, image_url, user_id, user_id))
         
         product_id = cursor.lastrowid
+        adjust_product_counts(cursor, use_sqlite, 'category', {category_id: 1})
+        adjust_product_counts(cursor, use_sqlite, 'supplier', {supplier_id: 1})
+        refresh_low_stock(cursor, use_sqlite, [product_id])
         
         # If initial stock > 0, create a stock movement record
         if quantity_in_stock > 0:
@@ -108,8 +164,10 @@ def create_product(db_connection):
                 """, (product_id, 'stock-in', quantity_in_stock, 0, quantity_in_stock,
                       'INITIAL', 'Initial stock entry', user_id))
         
+        bump_table_versions(cursor, use_sqlite, 'products', 'stock_movements')
         db_connection.commit()
         cursor.close()
+        publish('products', product_ids=[product_id])
         
         return jsonify({
             'message': 'Product created successfully',
@@ -130,58 +188,312 @@ def create_product(db_connection):
     except Exception as e:
         return jsonify({'error': f'Failed to create product: {str(e)}'}), 500
 
+BULK_CSV_TYPES = ('text/csv', 'application/csv')
+BULK_NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+
+def _read_csv_records(stream):
+    """Yield (row_number, record, error) for each data row of a CSV upload"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row_number, row in enumerate(reader, start=1):
+        record = {key.strip().lower(): value for key, value in row.items() if key}
+        yield row_number, record, None
+
+def _read_ndjson_records(stream):
+    """Yield (row_number, record, error) for each non-blank line of an NDJSON upload"""
+    row_number = 0
+    for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f'Invalid JSON: {str(e)}'
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, 'Each line must be a JSON object'
+            continue
+        yield row_number, record, None
+
+def _import_product_chunk(db_connection, use_sqlite, chunk, user_id):
+    """
+    Write one chunk of validated rows in a single transaction
+    Returns (created_count, [(row_number, sku, error), ...])
+    """
+    placeholder = '?' if use_sqlite else '%s'
+    cursor = db_connection.cursor()
+    try:
+        # One set-based lookup for the SKUs that already exist
+        skus = [fields['sku'] for _, fields in chunk]
+        cursor.execute(
+            f"SELECT sku FROM products WHERE sku IN ({', '.join([placeholder] * len(skus))})",
+            skus
+        )
+        existing = {row[0] if use_sqlite else row['sku'] for row in cursor.fetchall()}
+        
+        errors = [(row_number, fields['sku'], f"Product with SKU {fields['sku']} already exists")
+                  for row_number, fields in chunk if fields['sku'] in existing]
+        rows = [fields for _, fields in chunk if fields['sku'] not in existing]
+        if not rows:
+            return 0, errors
+        
+        category_ids = ensure_dimension_ids(cursor, use_sqlite, 'category', [f['category'] for f in rows])
+        supplier_ids = ensure_dimension_ids(cursor, use_sqlite, 'supplier', [f['supplier'] for f in rows])
+        
+        product_rows = [(f['sku'], f['product_name'], f['description'], f['category'], f['supplier'],
+                         category_ids[f['category']], supplier_ids[f['supplier']],
+                         f['unit_price'], f['quantity_in_stock'], f['min_stock_level'],
+                         f['unit_of_measure'], f['image_url'], user_id, user_id) for f in rows]
+        if use_sqlite:
+            cursor.executemany("""
+                INSERT INTO products (sku, product_name, description, category, supplier, 
+                                    category_id, supplier_id,
+                                    unit_price, quantity_in_stock, min_stock_level, 
+                                    unit_of_measure, image_url, created_by, updated_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, product_rows)
+        else:
+            cursor.executemany("""
+                INSERT INTO products (sku, product_name, description, category, supplier, 
+                                    category_id, supplier_id,
+                                    unit_price, quantity_in_stock, min_stock_level, 
+                                    unit_of_measure, image_url, created_by, updated_by)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, product_rows)
+        adjust_product_counts(cursor, use_sqlite, 'category', Counter(category_ids[f['category']] for f in rows))
+        adjust_product_counts(cursor, use_sqlite, 'supplier', Counter(supplier_ids[f['supplier']] for f in rows))
+        
+        # Initial stock movements and the low-stock set need the new product IDs
+        new_skus = [f['sku'] for f in rows]
+        cursor.execute(
+            f"SELECT product_id, sku FROM products WHERE sku IN ({', '.join([placeholder] * len(new_skus))})",
+            new_skus
+        )
+        id_rows = cursor.fetchall()
+        product_ids = {row[1]: row[0] for row in id_rows} if use_sqlite else \
+            {row['sku']: row['product_id'] for row in id_rows}
+        refresh_low_stock(cursor, use_sqlite, product_ids.values())
+        
+        stocked = {f['sku']: f['quantity_in_stock'] for f in rows if f['quantity_in_stock'] > 0}
+        if stocked:
+            movement_rows = [(product_ids[sku], 'stock-in', quantity, 0, quantity,
+                              'INITIAL', 'Initial stock entry', user_id)
+                             for sku, quantity in stocked.items()]
+            if use_sqlite:
+                cursor.executemany("""
+                    INSERT INTO stock_movements (product_id, movement_type, quantity, 
+                                                previous_quantity, new_quantity, 
+                                                reference_number, notes, created_by)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, movement_rows)
+            else:
+                cursor.executemany("""
+                    INSERT INTO stock_movements (product_id, movement_type, quantity, 
+                                                previous_quantity, new_quantity, 
+                                                reference_number, notes, created_by)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, movement_rows)
+        
+        bump_table_versions(cursor, use_sqlite, 'products', 'stock_movements')
+        db_connection.commit()
+        publish('products', product_ids=list(product_ids.values()))
+        return len(rows), errors
+    except Exception:
+        db_connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def bulk_import_products(db_connection):
+    """
+    Import products from a streamed CSV or NDJSON upload
+    Each row follows the same field rules as create_product. Rows are
+    written in chunks of BULK_IMPORT_CHUNK_SIZE, one transaction per chunk,
+    and the response lists every rejected row with its row number.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        
+        if request.mimetype in BULK_CSV_TYPES:
+            records = _read_csv_records(request.stream)
+        elif request.mimetype in BULK_NDJSON_TYPES:
+            records = _read_ndjson_records(request.stream)
+        else:
+            return jsonify({'error': 'Upload must be sent as text/csv or application/x-ndjson'}), 415
+        
+        received = 0
+        created = 0
+        failures = []
+        seen_skus = set()
+        chunk = []
+        
+        def flush():
+            nonlocal created
+            try:
+                count, chunk_errors = _import_product_chunk(db_connection, use_sqlite, chunk, user_id)
+            except Exception as e:
+                count, chunk_errors = 0, [(row_number, fields['sku'], f'Failed to import row: {str(e)}')
+                                          for row_number, fields in chunk]
+            created += count
+            failures.extend(chunk_errors)
+            chunk.clear()
+        
+        try:
+            for row_number, record, error in records:
+                if received >= Config.BULK_IMPORT_MAX_ROWS:
+                    failures.append((row_number, None, f'Upload exceeds {Config.BULK_IMPORT_MAX_ROWS} rows; remaining rows were not imported'))
+                    break
+                received += 1
+                
+                if error is None:
+                    fields, error = parse_product_fields(record)
+                if error:
+                    sku = record.get('sku') if record else None
+                    failures.append((row_number, sku, error))
+                    continue
+                
+                if fields['sku'] in seen_skus:
+                    failures.append((row_number, fields['sku'], f"Duplicate SKU {fields['sku']} in upload"))
+                    continue
+                seen_skus.add(fields['sku'])
+                
+                chunk.append((row_number, fields))
+                if len(chunk) >= Config.BULK_IMPORT_CHUNK_SIZE:
+                    flush()
+        except UnicodeDecodeError:
+            failures.append((received + 1, None, 'Upload must be UTF-8 encoded; remaining rows were not imported'))
+        
+        if chunk:
+            flush()
+        
+        failures.sort(key=lambda failure: failure[0])
+        return jsonify({
+            'message': f'Imported {created} of {received} products',
+            'received': received,
+            'created': created,
+            'failed': len(failures),
+            'errors': [{'row': row_number, 'sku': sku, 'error': error}
+                       for row_number, sku, error in failures[:Config.BULK_IMPORT_MAX_ERRORS]],
+            'errors_truncated': len(failures) > Config.BULK_IMPORT_MAX_ERRORS
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to import products: {str(e)}'}), 500
+
+def build_search_query(text, use_sqlite):
+    """
+    Turn free-text input into a full-text query where every word must match
+    as a prefix (FTS5 MATCH syntax on SQLite, boolean mode on MySQL)
+    Returns None if the input has no searchable words
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    if use_sqlite:
+        return ' '.join(f'"{word}"*' for word in words)
+    return ' '.join(f'+{word}*' for word in words)
+
+PRODUCT_FIELDS = ['product_id', 'sku', 'product_name', 'description', 'category', 'supplier',
+                  'unit_price', 'quantity_in_stock', 'reserved_quantity', 'min_stock_level', 'unit_of_measure',
+                  'image_url', 'is_active', 'created_at', 'updated_at']
+
 def get_all_products(db_connection):
-    """Get all products with optional filters"""
+    """
+    Get active products with optional filters, one page at a time
+    Pages are ordered by (product_name, product_id), or by relevance when
+    searching; pass the returned next_cursor as ?cursor= to fetch the
+    following page.
+    Query params: category, supplier, low_stock, search, limit, cursor,
+    fields (comma-separated projection)
+    """
     try:
         # Get query parameters for filtering
         category = request.args.get('category')
         supplier = request.args.get('supplier')
         low_stock = request.args.get('low_stock')  # 'true' or 'false'
-        search = request.args.get('search')  # Search by name or SKU
+        search = request.args.get('search')  # Full-text prefix search over SKU, name, description, category, supplier
+        cursor_token = request.args.get('cursor')
         
-        # Check if using SQLite or MySQL
         from backend.config import Config
+        from backend.utils import parse_limit, parse_fields, encode_cursor, decode_cursor
+        try:
+            limit = parse_limit(request.args.get('limit'), Config.PRODUCTS_PAGE_SIZE, Config.PRODUCTS_PAGE_MAX)
+            fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS,
+                                  required=('product_id', 'product_name'))
+            after = decode_cursor(cursor_token, 2) if cursor_token else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Check if using SQLite or MySQL
         use_sqlite = Config.USE_SQLITE
+        placeholder = '?' if use_sqlite else '%s'
         
         cursor = db_connection.cursor()
         
-        # Build query
-        query = """
-            SELECT product_id, sku, product_name, description, category, supplier,
-                   unit_price, quantity_in_stock, min_stock_level, unit_of_measure,
-                   image_url, is_active, created_at, updated_at
-            FROM products
-            WHERE is_active = {}
-        """.format(1 if use_sqlite else 'TRUE')
-        
+        search_query = build_search_query(search, use_sqlite) if search else None
         params = []
         
+        # Build query. Searches rank by relevance (lower search_rank is better)
+        # using the products_fts / FULLTEXT index instead of LIKE scans.
+        if search_query and use_sqlite:
+            query = """
+                SELECT {}, matches.search_rank
+                FROM products
+                JOIN (SELECT rowid AS match_id, rank AS search_rank
+                      FROM products_fts WHERE products_fts MATCH ?) matches
+                  ON matches.match_id = products.product_id
+                WHERE is_active = 1
+            """.format(', '.join(fields))
+            params.append(search_query)
+        elif search_query:
+            query = """
+                SELECT {}, -MATCH(sku, product_name, description, category, supplier)
+                           AGAINST (%s IN BOOLEAN MODE) AS search_rank
+                FROM products
+                WHERE is_active = TRUE
+                  AND MATCH(sku, product_name, description, category, supplier) AGAINST (%s IN BOOLEAN MODE)
+            """.format(', '.join(fields))
+            params.extend([search_query, search_query])
+        else:
+            # For low_stock, unary + keeps the planner off the name index so it
+            # starts from the small low_stock_products set and sorts that
+            query = """
+                SELECT {}
+                FROM products
+                WHERE {} = {}
+            """.format(', '.join(fields), '+is_active' if low_stock == 'true' else 'is_active', 1 if use_sqlite else 'TRUE')
+        
+        
         # Add filters
         if category:
-            query += " AND category = {}".format('?' if use_sqlite else '%s')
+            query += f" AND category_id = (SELECT category_id FROM categories WHERE category_name = {placeholder})"
             params.append(category)
         
         if supplier:
-            query += " AND supplier = {}".format('?' if use_sqlite else '%s')
+            query += f" AND supplier_id = (SELECT supplier_id FROM suppliers WHERE supplier_name = {placeholder})"
             params.append(supplier)
         
         if low_stock == 'true':
-            query += " AND quantity_in_stock <= min_stock_level"
-        
-        if search:
-            search_pattern = f"%{search}%"
-            query += " AND (product_name LIKE {} OR sku LIKE {})".format(
-                '?' if use_sqlite else '%s',
-                '?' if use_sqlite else '%s'
-            )
-            params.extend([search_pattern, search_pattern])
-        
-        query += " ORDER BY product_name ASC"
+            query += " AND product_id IN (SELECT product_id FROM low_stock_products)"
+        
+        # Keyset pagination: resume strictly after the last row of the previous page
+        sort_column = 'search_rank' if search_query else 'product_name'
+        if after and search_query and not use_sqlite:
+            # MySQL cannot reference a select alias in WHERE; use HAVING instead
+            query += f" HAVING (search_rank > {placeholder} OR (search_rank = {placeholder} AND product_id > {placeholder}))"
+            params.extend([after[0], after[0], after[1]])
+        elif after:
+            query += f" AND ({sort_column} > {placeholder} OR ({sort_column} = {placeholder} AND product_id > {placeholder}))"
+            params.extend([after[0], after[0], after[1]])
+        
+        # Fetch one extra row to learn whether another page follows
+        query += f" ORDER BY {sort_column} ASC, product_id ASC LIMIT {placeholder}"
+        params.append(limit + 1)
         
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+        cursor.execute(query, params)
         rows = cursor.fetchall()
         cursor.close()
         
@@ -190,15 +502,31 @@ def get_all_products(db_connection):
             from database.database import dict_from_row
             products = [dict_from_row(row) for row in rows]
         else:
-            products = rows
+            products = list(rows)
+        
+        has_more = len(products) > limit
+        products = products[:limit]
+        next_cursor = None
+        if has_more:
+            last = products[-1]
+            next_cursor = encode_cursor([last[sort_column], last['product_id']])
+        for product in products:
+            product.pop('search_rank', None)
         
         # Add low stock flag
-        for product in products:
-            product['is_low_stock'] = product['quantity_in_stock'] <= product['min_stock_level']
+        if 'quantity_in_stock' in fields and 'min_stock_level' in fields:
+            for product in products:
+                product['is_low_stock'] = product['quantity_in_stock'] <= product['min_stock_level']
+        # Stock not held by open orders
+        if 'quantity_in_stock' in fields and 'reserved_quantity' in fields:
+            for product in products:
+                product['available_quantity'] = max(product['quantity_in_stock'] - product['reserved_quantity'], 0)
         
         return jsonify({
             'products': products,
-            'total': len(products)
+            'total': len(products),
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }), 200
         
     except Exception as e:
@@ -216,7 +544,7 @@ def get_product(db_connection, product_id):
         if use_sqlite:
             cursor.execute("""
                 SELECT product_id, sku, product_name, description, category, supplier,
-                       unit_price, quantity_in_stock, min_stock_level, unit_of_measure,
+                       unit_price, quantity_in_stock, reserved_quantity, min_stock_level, unit_of_measure,
                        image_url, is_active, created_at, updated_at
                 FROM products
                 WHERE product_id = ? AND is_active = 1
@@ -224,7 +552,7 @@ def get_product(db_connection, product_id):
         else:
             cursor.execute("""
                 SELECT product_id, sku, product_name, description, category, supplier,
-                       unit_price, quantity_in_stock, min_stock_level, unit_of_measure,
+                       unit_price, quantity_in_stock, reserved_quantity, min_stock_level, unit_of_measure,
                        image_url, is_active, created_at, updated_at
                 FROM products
                 WHERE product_id = %s AND is_active = TRUE
@@ -244,6 +572,7 @@ def get_product(db_connection, product_id):
             product = row
         
         product['is_low_stock'] = product['quantity_in_stock'] <= product['min_stock_level']
+        product['available_quantity'] = max(product['quantity_in_stock'] - product['reserved_quantity'], 0)
         
         return jsonify({'product': product}), 200
         
@@ -268,11 +597,12 @@ def update_product(db_connection, product_id):
         
         # Check if product exists
         if use_sqlite:
-            cursor.execute("SELECT product_id FROM products WHERE product_id = ? AND is_active = 1", (product_id,))
+            cursor.execute("SELECT product_id, category_id, supplier_id FROM products WHERE product_id = ? AND is_active = 1", (product_id,))
         else:
-            cursor.execute("SELECT product_id FROM products WHERE product_id = %s AND is_active = TRUE", (product_id,))
+            cursor.execute("SELECT product_id, category_id, supplier_id FROM products WHERE product_id = %s AND is_active = TRUE", (product_id,))
         
-        if not cursor.fetchone():
+        current = cursor.fetchone()
+        if not current:
             cursor.close()
             return jsonify({'error': 'Product not found'}), 404
         
@@ -303,6 +633,16 @@ def update_product(db_connection, product_id):
                         return jsonify({'error': 'Minimum stock level cannot be negative'}), 400
                     update_fields.append(f"{field} = {'?' if use_sqlite else '%s'}")
                     params.append(value)
+                elif field in DIMENSIONS:
+                    # Move the product to another category/supplier row and its count with it
+                    value = str(data[field] or '').strip()
+                    new_id = ensure_dimension_ids(cursor, use_sqlite, field, [value])[value] if value else None
+                    old_id = current[f'{field}_id']
+                    if new_id != old_id:
+                        adjust_product_counts(cursor, use_sqlite, field, {old_id: -1, new_id: 1})
+                    update_fields.append(f"{field} = {'?' if use_sqlite else '%s'}")
+                    update_fields.append(f"{field}_id = {'?' if use_sqlite else '%s'}")
+                    params.extend([value, new_id])
                 else:
                     update_fields.append(f"{field} = {'?' if use_sqlite else '%s'}")
                     params.append(data[field].strip() if isinstance(data[field], str) else data[field])
@@ -323,8 +663,12 @@ def update_product(db_connection, product_id):
         query = f"UPDATE products SET {', '.join(update_fields)} WHERE product_id = {'?' if use_sqlite else '%s'}"
         
         cursor.execute(query, params)
+        if 'min_stock_level' in data:
+            refresh_low_stock(cursor, use_sqlite, [product_id])
+        bump_table_versions(cursor, use_sqlite, 'products')
         db_connection.commit()
         cursor.close()
+        publish('products', product_ids=[product_id])
         
         return jsonify({'message': 'Product updated successfully'}), 200
         
@@ -370,10 +714,10 @@ def delete_product(db_connection, product_id):
         
         # Check if product exists
         if use_sqlite:
-            cursor.execute("SELECT product_id, product_name FROM products WHERE product_id = ? AND is_active = 1", 
+            cursor.execute("SELECT product_id, product_name, category_id, supplier_id FROM products WHERE product_id = ? AND is_active = 1", 
                           (product_id,))
         else:
-            cursor.execute("SELECT product_id, product_name FROM products WHERE product_id = %s AND is_active = TRUE", 
+            cursor.execute("SELECT product_id, product_name, category_id, supplier_id FROM products WHERE product_id = %s AND is_active = TRUE", 
                           (product_id,))
         
         row = cursor.fetchone()
@@ -390,14 +734,52 @@ def delete_product(db_connection, product_id):
             cursor.execute("UPDATE products SET is_active = FALSE WHERE product_id = %s", 
                           (product_id,))
         
+        # The product no longer counts towards its category and supplier
+        adjust_product_counts(cursor, use_sqlite, 'category', {row['category_id']: -1})
+        adjust_product_counts(cursor, use_sqlite, 'supplier', {row['supplier_id']: -1})
+        refresh_low_stock(cursor, use_sqlite, [product_id])
+        
+        bump_table_versions(cursor, use_sqlite, 'products')
         db_connection.commit()
         cursor.close()
+        publish('products', product_ids=[product_id])
         
         return jsonify({'message': 'Product deleted successfully'}), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to delete product: {str(e)}'}), 500
 
+STOCK_MOVEMENT_TYPES = ['stock-in', 'stock-out', 'adjustment']
+
+def parse_stock_movement(data):
+    """
+    Apply the stock movement field rules to one input record
+    Returns (movement, None) on success or (None, error_message)
+    """
+    if data.get('movement_type') is None or data.get('quantity') is None:
+        return None, 'movement_type and quantity are required'
+    
+    movement_type = data['movement_type']
+    try:
+        quantity = int(data['quantity'])
+    except (TypeError, ValueError) as e:
+        return None, f'Invalid numeric value: {str(e)}'
+    
+    # Validate movement type
+    if movement_type not in STOCK_MOVEMENT_TYPES:
+        return None, 'movement_type must be stock-in, stock-out, or adjustment'
+    
+    # Validate quantity
+    if quantity <= 0:
+        return None, 'Quantity must be greater than 0'
+    
+    return {
+        'movement_type': movement_type,
+        'quantity': quantity,
+        'reference_number': str(data.get('reference_number') or '').strip(),
+        'notes': str(data.get('notes') or '').strip()
+    }, None
+
 def update_stock(db_connection, product_id):
     """
     Update product stock (stock-in or stock-out)
@@ -408,22 +790,14 @@ def update_stock(db_connection, product_id):
         
         data = request.get_json()
         
-        # Validate required fields
-        if 'movement_type' not in data or 'quantity' not in data:
-            return jsonify({'error': 'movement_type and quantity are required'}), 400
-        
-        movement_type = data['movement_type']
-        quantity = int(data['quantity'])
-        reference_number = data.get('reference_number', '').strip()
-        notes = data.get('notes', '').strip()
-        
-        # Validate movement type
-        if movement_type not in ['stock-in', 'stock-out', 'adjustment']:
-            return jsonify({'error': 'movement_type must be stock-in, stock-out, or adjustment'}), 400
+        movement, error = parse_stock_movement(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Validate quantity
-        if quantity <= 0:
-            return jsonify({'error': 'Quantity must be greater than 0'}), 400
+        movement_type = movement['movement_type']
+        quantity = movement['quantity']
+        reference_number = movement['reference_number']
+        notes = movement['notes']
         
         # Check if using SQLite or MySQL
         from backend.config import Config
@@ -431,73 +805,21 @@ def update_stock(db_connection, product_id):
         
         cursor = db_connection.cursor()
         
-        # Get current stock
-        if use_sqlite:
-            cursor.execute("SELECT quantity_in_stock FROM products WHERE product_id = ? AND is_active = 1", 
-                          (product_id,))
-        else:
-            cursor.execute("SELECT quantity_in_stock FROM products WHERE product_id = %s AND is_active = TRUE", 
-                          (product_id,))
-        
-        row = cursor.fetchone()
-        
-        if not row:
+        # Guarded single-statement update; no read-modify-write race
+        try:
+            result = apply_stock_movement(cursor, use_sqlite, product_id, movement_type, quantity,
+                                          user_id, reference_number, notes)
+        except StockMovementError as e:
+            db_connection.rollback()
             cursor.close()
-            return jsonify({'error': 'Product not found'}), 404
-        
-        # Get current quantity
-        if use_sqlite:
-            from database.database import dict_from_row
-            product_data = dict_from_row(row)
-            previous_quantity = product_data['quantity_in_stock']
-        else:
-            previous_quantity = row['quantity_in_stock']
-        
-        # Calculate new quantity
-        if movement_type == 'stock-in':
-            new_quantity = previous_quantity + quantity
-        elif movement_type == 'stock-out':
-            new_quantity = previous_quantity - quantity
-            if new_quantity < 0:
-                cursor.close()
-                return jsonify({'error': 'Insufficient stock. Cannot reduce stock below 0'}), 400
-        else:  # adjustment
-            new_quantity = quantity
-        
-        # Update product stock
-        if use_sqlite:
-            cursor.execute("""
-                UPDATE products 
-                SET quantity_in_stock = ?, updated_at = CURRENT_TIMESTAMP, updated_by = ?
-                WHERE product_id = ?
-            """, (new_quantity, user_id, product_id))
-        else:
-            cursor.execute("""
-                UPDATE products 
-                SET quantity_in_stock = %s, updated_by = %s
-                WHERE product_id = %s
-            """, (new_quantity, user_id, product_id))
-        
-        # Record stock movement
-        if use_sqlite:
-            cursor.execute("""
-                INSERT INTO stock_movements (product_id, movement_type, quantity, 
-                                            previous_quantity, new_quantity, 
-                                            reference_number, notes, created_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (product_id, movement_type, quantity, previous_quantity, new_quantity,
-                  reference_number, notes, user_id))
-        else:
-            cursor.execute("""
-                INSERT INTO stock_movements (product_id, movement_type, quantity, 
-                                            previous_quantity, new_quantity, 
-                                            reference_number, notes, created_by)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (product_id, movement_type, quantity, previous_quantity, new_quantity,
-                  reference_number, notes, user_id))
+            return jsonify({'error': str(e)}), e.status_code
+        previous_quantity = result['previous_quantity']
+        new_quantity = result['new_quantity']
         
+        bump_table_versions(cursor, use_sqlite, 'products', 'stock_movements')
         db_connection.commit()
         cursor.close()
+        publish('products', product_ids=[product_id])
         
         return jsonify({
             'message': 'Stock updated successfully',
@@ -514,12 +836,196 @@ def update_stock(db_connection, product_id):
     except Exception as e:
         return jsonify({'error': f'Failed to update stock: {str(e)}'}), 500
 
+def batch_update_stock(db_connection):
+    """
+    Apply many stock movements in one transaction (receiving and picking waves)
+    Body: {movements: [{product_id, movement_type, quantity, reference_number, notes}], atomic: true}
+    With atomic (the default) any failing line rolls back the whole batch;
+    otherwise valid lines are applied and failing lines are reported.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        
+        data = request.get_json()
+        lines = data.get('movements') if isinstance(data, dict) else None
+        if not isinstance(lines, list) or not lines:
+            return jsonify({'error': 'movements must be a non-empty list'}), 400
+        atomic = data.get('atomic', True)
+        if not isinstance(atomic, bool):
+            return jsonify({'error': 'atomic must be true or false'}), 400
+        
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        
+        if len(lines) > Config.STOCK_BATCH_MAX_LINES:
+            return jsonify({'error': f'A batch can hold at most {Config.STOCK_BATCH_MAX_LINES} movements'}), 400
+        
+        # Validate the shape of every line before touching the database
+        results = []
+        parsed = []
+        for line_number, line in enumerate(lines, start=1):
+            result = {'line': line_number, 'product_id': line.get('product_id') if isinstance(line, dict) else None}
+            results.append(result)
+            if not isinstance(line, dict):
+                result.update(status='failed', error='Each movement must be an object')
+                continue
+            movement, error = parse_stock_movement(line)
+            if not error:
+                try:
+                    movement['product_id'] = int(line.get('product_id'))
+                except (TypeError, ValueError):
+                    error = 'product_id is required'
+            if error:
+                result.update(status='failed', error=error)
+                continue
+            result['product_id'] = movement['product_id']
+            parsed.append((result, movement))
+        
+        from database.database import begin_write
+        cursor = db_connection.cursor()
+        try:
+            # One locked read of every product in the batch
+            begin_write(db_connection)
+            stock = {}
+            reserved = {}  # units held by open orders: on-hand stock may not drop below them
+            product_ids = sorted({movement['product_id'] for _, movement in parsed})
+            if product_ids:
+                placeholder = '?' if use_sqlite else '%s'
+                lock_clause = '' if use_sqlite else ' FOR UPDATE'
+                cursor.execute(
+                    f"SELECT product_id, quantity_in_stock, reserved_quantity FROM products "
+                    f"WHERE is_active = {'1' if use_sqlite else 'TRUE'} "
+                    f"AND product_id IN ({', '.join([placeholder] * len(product_ids))}){lock_clause}",
+                    product_ids
+                )
+                for row in cursor.fetchall():
+                    stock[row['product_id']] = row['quantity_in_stock']
+                    reserved[row['product_id']] = row['reserved_quantity']
+            
+            # Apply the lines in order against the running quantities
+            movement_rows = []
+            for result, movement in parsed:
+                product_id = movement['product_id']
+                if product_id not in stock:
+                    result.update(status='failed', error='Product not found')
+                    continue
+                previous_quantity = stock[product_id]
+                if movement['movement_type'] == 'stock-in':
+                    new_quantity = previous_quantity + movement['quantity']
+                elif movement['movement_type'] == 'stock-out':
+                    new_quantity = previous_quantity - movement['quantity']
+                    if new_quantity < reserved[product_id]:
+                        result.update(status='failed', error=(
+                            f'Insufficient stock. {reserved[product_id]} units are reserved by open orders'
+                            if reserved[product_id] > 0 else 'Insufficient stock. Cannot reduce stock below 0'))
+                        continue
+                else:  # adjustment
+                    new_quantity = movement['quantity']
+                    if new_quantity < reserved[product_id]:
+                        result.update(status='failed', error=(
+                            f'Cannot set stock below the {reserved[product_id]} units reserved by open orders'))
+                        continue
+                
+                stock[product_id] = new_quantity
+                result.update(status='applied', movement_type=movement['movement_type'],
+                              quantity=movement['quantity'],
+                              previous_quantity=previous_quantity, new_quantity=new_quantity)
+                movement_rows.append((product_id, movement['movement_type'], movement['quantity'],
+                                      previous_quantity, new_quantity,
+                                      movement['reference_number'], movement['notes'], user_id))
+            
+            failed = [result for result in results if result['status'] == 'failed']
+            if atomic and failed:
+                db_connection.rollback()
+                for result in results:
+                    if result['status'] == 'applied':
+                        result['status'] = 'rolled_back'
+                return jsonify({
+                    'error': 'Batch rejected; no movements were applied',
+                    'applied': 0,
+                    'failed': len(failed),
+                    'results': results
+                }), 400
+            
+            if movement_rows:
+                # One UPDATE per product with its final quantity, one INSERT per line
+                changed = {row[0]: stock[row[0]] for row in movement_rows}
+                if use_sqlite:
+                    cursor.executemany("""
+                        UPDATE products 
+                        SET quantity_in_stock = ?, updated_at = CURRENT_TIMESTAMP, updated_by = ?
+                        WHERE product_id = ?
+                    """, [(quantity, user_id, product_id) for product_id, quantity in changed.items()])
+                    cursor.executemany("""
+                        INSERT INTO stock_movements (product_id, movement_type, quantity, 
+                                                    previous_quantity, new_quantity, 
+                                                    reference_number, notes, created_by)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, movement_rows)
+                else:
+                    cursor.executemany("""
+                        UPDATE products 
+                        SET quantity_in_stock = %s, updated_by = %s
+                        WHERE product_id = %s
+                    """, [(quantity, user_id, product_id) for product_id, quantity in changed.items()])
+                    cursor.executemany("""
+                        INSERT INTO stock_movements (product_id, movement_type, quantity, 
+                                                    previous_quantity, new_quantity, 
+                                                    reference_number, notes, created_by)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    """, movement_rows)
+                refresh_low_stock(cursor, use_sqlite, changed)
+                bump_table_versions(cursor, use_sqlite, 'products', 'stock_movements')
+            db_connection.commit()
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        if movement_rows:
+            publish('products', product_ids=list(changed))
+        
+        return jsonify({
+            'message': f'Applied {len(movement_rows)} of {len(results)} stock movements',
+            'applied': len(movement_rows),
+            'failed': len(failed),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to update stock: {str(e)}'}), 500
+
 def get_stock_movements(db_connection, product_id):
-    """Get stock movement history for a product"""
+    """
+    Get stock movement history for a product, newest first, one page at a time
+    Pages are ordered by (created_at, movement_id) descending; pass the
+    returned next_cursor as ?cursor= to fetch the following page.
+    Query params: from, to (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS), movement_type
+    (comma-separated), limit, cursor, aggregate ('daily' returns per-day
+    in/out totals instead of rows)
+    """
     try:
-        # Check if using SQLite or MySQL
         from backend.config import Config
+        from backend.utils import parse_limit, parse_timestamp, encode_cursor, decode_cursor
+        aggregate = request.args.get('aggregate')
+        cursor_token = request.args.get('cursor')
+        try:
+            if aggregate not in (None, '', 'daily'):
+                raise ValueError("aggregate must be 'daily'")
+            limit = parse_limit(request.args.get('limit'), Config.MOVEMENTS_PAGE_SIZE, Config.MOVEMENTS_PAGE_MAX)
+            after = decode_cursor(cursor_token, 2) if cursor_token else None
+            date_from = parse_timestamp(request.args['from'], 'from') if request.args.get('from') else None
+            date_to = parse_timestamp(request.args['to'], 'to', end_of_day=True) if request.args.get('to') else None
+            movement_types = [t.strip() for t in request.args.get('movement_type', '').split(',') if t.strip()]
+            unknown = set(movement_types) - set(STOCK_MOVEMENT_TYPES)
+            if unknown:
+                raise ValueError(f"Unknown movement_type: {', '.join(sorted(unknown))}")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Check if using SQLite or MySQL
         use_sqlite = Config.USE_SQLITE
+        placeholder = '?' if use_sqlite else '%s'
         
         cursor = db_connection.cursor()
         
@@ -533,25 +1039,74 @@ def get_stock_movements(db_connection, product_id):
             cursor.close()
             return jsonify({'error': 'Product not found'}), 404
         
-        # Get movements
-        if use_sqlite:
-            cursor.execute("""
-                SELECT movement_id, product_id, movement_type, quantity,
-                       previous_quantity, new_quantity, reference_number, 
-                       notes, created_at, created_by
-                FROM stock_movements
-                WHERE product_id = ?
-                ORDER BY created_at DESC
-            """, (product_id,))
-        else:
-            cursor.execute("""
-                SELECT movement_id, product_id, movement_type, quantity,
-                       previous_quantity, new_quantity, reference_number, 
-                       notes, created_at, created_by
+        # Filters; all of them ride the (product_id, created_at) index
+        conditions = f"product_id = {placeholder}"
+        params = [product_id]
+        if date_from:
+            conditions += f" AND created_at >= {placeholder}"
+            params.append(date_from)
+        if date_to:
+            conditions += f" AND created_at <= {placeholder}"
+            params.append(date_to)
+        if movement_types:
+            conditions += f" AND movement_type IN ({', '.join([placeholder] * len(movement_types))})"
+            params.extend(movement_types)
+        
+        if aggregate == 'daily':
+            # Quantity changes are taken from previous/new_quantity so
+            # adjustments count as stock in or out as well. SQLite stores
+            # created_at as text, where the date prefix is cheaper than DATE()
+            day = 'substr(created_at, 1, 10)' if use_sqlite else 'DATE(created_at)'
+            cursor.execute(f"""
+                SELECT {day} AS day,
+                       COUNT(*) AS movements,
+                       SUM(CASE WHEN new_quantity > previous_quantity
+                                THEN new_quantity - previous_quantity ELSE 0 END) AS stock_in,
+                       SUM(CASE WHEN new_quantity < previous_quantity
+                                THEN previous_quantity - new_quantity ELSE 0 END) AS stock_out
                 FROM stock_movements
-                WHERE product_id = %s
-                ORDER BY created_at DESC
-            """, (product_id,))
+                WHERE {conditions}
+                GROUP BY {day}
+                ORDER BY day ASC
+            """, params)
+            rows = cursor.fetchall()
+            cursor.close()
+            
+            days = []
+            for row in rows:
+                day = {
+                    'date': str(row['day']),
+                    'movements': int(row['movements']),
+                    'stock_in': int(row['stock_in']),
+                    'stock_out': int(row['stock_out'])
+                }
+                day['net_change'] = day['stock_in'] - day['stock_out']
+                days.append(day)
+            
+            return jsonify({
+                'product_id': product_id,
+                'days': days,
+                'total_in': sum(day['stock_in'] for day in days),
+                'total_out': sum(day['stock_out'] for day in days)
+            }), 200
+        
+        # Keyset pagination: resume strictly after the last row of the previous page
+        # (the leading created_at bound lets the index seek instead of skipping earlier pages)
+        if after:
+            conditions += (f" AND created_at <= {placeholder}"
+                           f" AND (created_at < {placeholder} OR movement_id < {placeholder})")
+            params.extend([after[0], after[0], after[1]])
+        
+        # Fetch one extra row to learn whether another page follows
+        cursor.execute(f"""
+            SELECT movement_id, product_id, movement_type, quantity,
+                   previous_quantity, new_quantity, reference_number, 
+                   notes, created_at, created_by
+            FROM stock_movements
+            WHERE {conditions}
+            ORDER BY created_at DESC, movement_id DESC
+            LIMIT {placeholder}
+        """, params + [limit + 1])
         
         rows = cursor.fetchall()
         cursor.close()
@@ -561,71 +1116,38 @@ def get_stock_movements(db_connection, product_id):
             from database.database import dict_from_row
             movements = [dict_from_row(row) for row in rows]
         else:
-            movements = rows
+            movements = list(rows)
+        
+        has_more = len(movements) > limit
+        movements = movements[:limit]
+        next_cursor = None
+        if has_more:
+            last = movements[-1]
+            next_cursor = encode_cursor([last['created_at'], last['movement_id']])
         
         return jsonify({
             'movements': movements,
-            'total': len(movements)
+            'total': len(movements),
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to get stock movements: {str(e)}'}), 500
 
 def get_categories(db_connection):
-    """Get all unique product categories"""
+    """Get all product categories that have active products"""
     try:
-        # Check if using SQLite or MySQL
-        from backend.config import Config
-        use_sqlite = Config.USE_SQLITE
-        
-        cursor = db_connection.cursor()
-        
-        cursor.execute("""
-            SELECT DISTINCT category 
-            FROM products 
-            WHERE is_active = {} AND category IS NOT NULL AND category != ''
-            ORDER BY category ASC
-        """.format(1 if use_sqlite else 'TRUE'))
-        
-        rows = cursor.fetchall()
-        cursor.close()
-        
-        # Extract category names
-        if use_sqlite:
-            categories = [row[0] for row in rows]
-        else:
-            categories = [row['category'] for row in rows]
-        
+        categories = list_dimension_names(db_connection, 'category')
         return jsonify({'categories': categories}), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to get categories: {str(e)}'}), 500
 
 def get_suppliers(db_connection):
-    """Get all unique suppliers"""
+    """Get all suppliers that have active products"""
     try:
-        # Check if using SQLite or MySQL
-        from backend.config import Config
-        use_sqlite = Config.USE_SQLITE
-        
-        cursor = db_connection.cursor()
-        
-        cursor.execute("""
-            SELECT DISTINCT supplier 
-            FROM products 
-            WHERE is_active = {} AND supplier IS NOT NULL AND supplier != ''
-            ORDER BY supplier ASC
-        """.format(1 if use_sqlite else 'TRUE'))
-        
-        rows = cursor.fetchall()
-        cursor.close()
-        
-        # Extract supplier names
-        if use_sqlite:
-            suppliers = [row[0] for row in rows]
-        else:
-            suppliers = [row['supplier'] for row in rows]
-        
+        suppliers = list_dimension_names(db_connection, 'supplier')
         return jsonify({'suppliers': suppliers}), 200
         
     except Exception as e:
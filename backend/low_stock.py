@@ -0,0 +1,37 @@
+"""
+Materialized low-stock set
+
+low_stock_products holds one row per active product whose quantity is at
+or below its min_stock_level, with status 'out' when nothing is left.
+Every write that changes a product's quantity, threshold or active flag
+calls refresh_low_stock() for the products it touched, in the same
+transaction. Low-stock counts and lists then read this small table
+instead of scanning products.
+"""
+
+def refresh_low_stock(cursor, use_sqlite, product_ids):
+    """Recompute low-stock membership for the given products (call before commit)"""
+    product_ids = sorted({product_id for product_id in product_ids if product_id is not None})
+    if not product_ids:
+        return
+    placeholders = ', '.join(['?' if use_sqlite else '%s'] * len(product_ids))
+    cursor.execute(f"DELETE FROM low_stock_products WHERE product_id IN ({placeholders})", product_ids)
+    cursor.execute(f"""
+        INSERT INTO low_stock_products (product_id, status, quantity_in_stock, min_stock_level)
+        SELECT product_id, CASE WHEN quantity_in_stock <= 0 THEN 'out' ELSE 'low' END,
+               quantity_in_stock, min_stock_level
+        FROM products
+        WHERE product_id IN ({placeholders}) AND is_active = 1 AND quantity_in_stock <= min_stock_level
+    """, product_ids)
+
+def get_low_stock_counts(cursor):
+    """Return (low_stock_count, out_of_stock_count); low includes out"""
+    cursor.execute("""
+        SELECT COUNT(*) AS low_count,
+               COALESCE(SUM(CASE WHEN status = 'out' THEN 1 ELSE 0 END), 0) AS out_count
+        FROM low_stock_products
+    """)
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        return int(row['low_count']), int(row['out_count'])
+    return int(row[0]), int(row[1])
@@ -2,6 +2,102 @@ from flask import jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from database.database import dict_from_row
+from backend.table_versions import bump_table_versions
+from backend.low_stock import refresh_low_stock
+from backend.reservations import (reserve_stock, release_order_reservations, hold_order_reservations,
+                                  ReservationError)
+from backend.events import publish
+from backend.idempotency import record_response
+
+ORDER_STATUSES = ('Under Process', 'Shipped', 'Delivered', 'Cancelled')
+# Statuses each status may move to. Delivered and Cancelled are final: reopening
+# a delivered order would deduct its stock again on the next delivery, and a
+# cancelled one no longer holds its reservation.
+ORDER_TRANSITIONS = {
+    'Under Process': ('Shipped', 'Delivered', 'Cancelled'),
+    'Shipped': ('Delivered', 'Cancelled'),
+    'Delivered': (),
+    'Cancelled': (),
+}
+
+def _count_status_changes(cursor, use_sqlite, changes):
+    """Apply {(status, payment_status): delta} to order_status_counts (call before commit)"""
+    rows = [(delta, status, payment_status) for (status, payment_status), delta in sorted(changes.items()) if delta]
+    if not rows:
+        return
+    if use_sqlite:
+        cursor.executemany("""
+            UPDATE order_status_counts SET order_count = order_count + ? WHERE status = ? AND payment_status = ?
+        """, rows)
+    else:
+        cursor.executemany("""
+            UPDATE order_status_counts SET order_count = order_count + %s WHERE status = %s AND payment_status = %s
+        """, rows)
+
+def _insert_order(cursor, use_sqlite, user_id, lines, payment_method, shipping_address):
+    """
+    Write an order header and its lines (the caller commits)
+    lines: [{product_id, quantity, unit_price, line_total}]; the header's
+    product columns describe the first line. Returns (order_id, total_amount)
+    """
+    total_amount = round(sum(line['line_total'] for line in lines), 2)
+    first = lines[0]
+    payment_status = 'Pending' if payment_method == 'Cash on Delivery' else 'Paid'
+    
+    if use_sqlite:
+        query = """
+            INSERT INTO orders (user_id, product_id, quantity, unit_price, total_amount, status, payment_status, payment_method, shipping_address)
+            VALUES (?, ?, ?, ?, ?, 'Under Process', ?, ?, ?)
+        """
+    else:
+        query = """
+            INSERT INTO orders (user_id, product_id, quantity, unit_price, total_amount, status, payment_status, payment_method, shipping_address)
+            VALUES (%s, %s, %s, %s, %s, 'Under Process', %s, %s, %s)
+        """
+    cursor.execute(query, (user_id, first['product_id'], first['quantity'], first['unit_price'], total_amount,
+                           payment_status, payment_method, shipping_address))
+    order_id = cursor.lastrowid
+    _count_status_changes(cursor, use_sqlite, {('Under Process', payment_status): 1})
+    
+    rows = [(order_id, line['product_id'], line['quantity'], line['unit_price'], line['line_total']) for line in lines]
+    if use_sqlite:
+        cursor.executemany("""
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+    else:
+        cursor.executemany("""
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total)
+            VALUES (%s, %s, %s, %s, %s)
+        """, rows)
+    return order_id, total_amount
+
+def _is_admin(cursor, use_sqlite, user_id):
+    """Check the caller's role in the users table"""
+    if use_sqlite:
+        cursor.execute("SELECT role FROM users WHERE user_id = ?", (user_id,))
+    else:
+        cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    return bool(row) and row['role'] == 'admin'
+
+def forget_user_orders(cursor, use_sqlite, user_id):
+    """
+    Before a user is deleted (their orders go with them): drop the orders
+    from the status counts and release their reservations. Returns the
+    product IDs whose reserved quantity changed.
+    """
+    if use_sqlite:
+        cursor.execute("SELECT order_id, status, payment_status FROM orders WHERE user_id = ?", (user_id,))
+    else:
+        cursor.execute("SELECT order_id, status, payment_status FROM orders WHERE user_id = %s FOR UPDATE", (user_id,))
+    orders = cursor.fetchall()
+    changes = {}
+    for order in orders:
+        key = (order['status'], order['payment_status'])
+        changes[key] = changes.get(key, 0) - 1
+    _count_status_changes(cursor, use_sqlite, changes)
+    return release_order_reservations(cursor, use_sqlite, [order['order_id'] for order in orders], 'released')
 
 @jwt_required()
 def create_order(db_connection):
@@ -23,11 +119,17 @@ def create_order(db_connection):
         from backend.config import Config
         use_sqlite = Config.USE_SQLITE
         
-        # 1. Get product price and check stock
+        # 1. Get product price and check available stock (on hand less reserved)
         if use_sqlite:
-            cursor.execute("SELECT product_name, unit_price, quantity_in_stock FROM products WHERE product_id = ?", (product_id,))
+            cursor.execute("""
+                SELECT product_name, unit_price, quantity_in_stock - reserved_quantity AS available_quantity
+                FROM products WHERE product_id = ? AND is_active = 1
+            """, (product_id,))
         else:
-            cursor.execute("SELECT product_name, unit_price, quantity_in_stock FROM products WHERE product_id = %s", (product_id,))
+            cursor.execute("""
+                SELECT product_name, unit_price, quantity_in_stock - reserved_quantity AS available_quantity
+                FROM products WHERE product_id = %s AND is_active = TRUE
+            """, (product_id,))
             
         product = cursor.fetchone()
         if not product:
@@ -40,38 +142,146 @@ def create_order(db_connection):
         else:
             product_data = product
             
-        if product_data['quantity_in_stock'] < quantity:
+        if product_data['available_quantity'] < quantity:
             cursor.close()
             return jsonify({'error': 'Insufficient stock available'}), 400
             
         unit_price = product_data['unit_price']
-        total_amount = unit_price * quantity
         
-        # 2. Create Order (Status: Under Process)
-        payment_status = 'Pending' if payment_method == 'Cash on Delivery' else 'Paid'
+        # 2. Create Order (Status: Under Process) with its single line and reserve the stock
+        line = {
+            'product_id': product_id,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'line_total': unit_price * quantity
+        }
+        try:
+            order_id, total_amount = _insert_order(cursor, use_sqlite, user_id, [line],
+                                                   payment_method, shipping_address)
+            reserve_stock(cursor, use_sqlite, order_id, [line])
+            bump_table_versions(cursor, use_sqlite, 'orders', 'products')
+            response = record_response(cursor, use_sqlite, {
+                'message': 'Order placed successfully',
+                'order_id': order_id,
+                'total_amount': total_amount
+            }, 201)
+            db_connection.commit()
+        except ReservationError as e:
+            # Another order took the stock since it was checked
+            db_connection.rollback()
+            return jsonify({'error': str(e)}), 400
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        publish('products', product_ids=[product_id])
+        publish('orders', orders=[{'order_id': order_id, 'user_id': user_id, 'status': 'Under Process'}])
         
-        if use_sqlite:
-            query = """
-                INSERT INTO orders (user_id, product_id, quantity, unit_price, total_amount, status, payment_status, payment_method, shipping_address)
-                VALUES (?, ?, ?, ?, ?, 'Under Process', ?, ?, ?)
-            """
-        else:
-            query = """
-                INSERT INTO orders (user_id, product_id, quantity, unit_price, total_amount, status, payment_status, payment_method, shipping_address)
-                VALUES (%s, %s, %s, %s, %s, 'Under Process', %s, %s, %s)
-            """
-            
-        cursor.execute(query, (user_id, product_id, quantity, unit_price, total_amount, payment_status, payment_method, shipping_address))
-        db_connection.commit()
+        return response
         
-        order_id = cursor.lastrowid
-        cursor.close()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jwt_required()
+def checkout_order(db_connection):
+    """
+    Place one order for a whole cart
+    Body: items [{product_id, quantity}], shipping_address, payment_method
+    Prices and stock for all lines are read in one query; the header, its
+    lines and their stock reservations are written in one transaction.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json() or {}
+        items = data.get('items')
+        shipping_address = data.get('shipping_address', 'Default Address')
+        payment_method = data.get('payment_method', 'Cash on Delivery')
         
-        return jsonify({
-            'message': 'Order placed successfully',
-            'order_id': order_id,
-            'total_amount': total_amount
-        }), 201
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        if len(items) > Config.CHECKOUT_MAX_LINES:
+            return jsonify({'error': f'An order can have at most {Config.CHECKOUT_MAX_LINES} items'}), 400
+        
+        # Merge repeated products, keeping the cart order
+        quantities = {}
+        for line_number, item in enumerate(items, start=1):
+            try:
+                product_id = int(item.get('product_id'))
+                quantity = int(item.get('quantity'))
+            except (AttributeError, TypeError, ValueError):
+                quantity = 0
+            if quantity <= 0:
+                return jsonify({'error': f'Item {line_number}: valid product_id and quantity are required'}), 400
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        
+        cursor = db_connection.cursor()
+        placeholders = ', '.join(['?' if use_sqlite else '%s'] * len(quantities))
+        cursor.execute(f"""
+            SELECT product_id, product_name, unit_price, is_active,
+                   quantity_in_stock - reserved_quantity AS available_quantity
+            FROM products WHERE product_id IN ({placeholders})
+        """, list(quantities))
+        products = {row['product_id']: row for row in cursor.fetchall()}
+        
+        # Validate every line before writing anything
+        lines = []
+        errors = []
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if not product or not product['is_active']:
+                errors.append({'product_id': product_id, 'error': 'Product not found'})
+            elif product['available_quantity'] < quantity:
+                errors.append({
+                    'product_id': product_id,
+                    'product_name': product['product_name'],
+                    'available': max(product['available_quantity'], 0),
+                    'error': 'Insufficient stock available'
+                })
+            else:
+                lines.append({
+                    'product_id': product_id,
+                    'quantity': quantity,
+                    'unit_price': product['unit_price'],
+                    'line_total': round(product['unit_price'] * quantity, 2)
+                })
+        if errors:
+            cursor.close()
+            details = '; '.join(f"{error.get('product_name', error['product_id'])}: {error['error']}" for error in errors)
+            return jsonify({'error': f'Some items cannot be ordered ({details})', 'errors': errors}), 400
+        
+        try:
+            order_id, total_amount = _insert_order(cursor, use_sqlite, user_id, lines,
+                                                   payment_method, shipping_address)
+            reserve_stock(cursor, use_sqlite, order_id, lines)
+            bump_table_versions(cursor, use_sqlite, 'orders', 'products')
+            response = record_response(cursor, use_sqlite, {
+                'message': 'Order placed successfully',
+                'order_id': order_id,
+                'total_amount': total_amount,
+                'item_count': len(lines)
+            }, 201)
+            db_connection.commit()
+        except ReservationError as e:
+            # Another order took the stock since it was checked
+            db_connection.rollback()
+            product = products[e.product_id]
+            return jsonify({
+                'error': f"Some items cannot be ordered ({product['product_name']}: {str(e)})",
+                'errors': [{'product_id': e.product_id, 'product_name': product['product_name'], 'error': str(e)}]
+            }), 400
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        publish('products', product_ids=[line['product_id'] for line in lines])
+        publish('orders', orders=[{'order_id': order_id, 'user_id': user_id, 'status': 'Under Process'}])
+        
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -88,7 +298,8 @@ def get_user_orders(db_connection):
         
         if use_sqlite:
             query = """
-                SELECT o.*, p.product_name 
+                SELECT o.*, p.product_name,
+                       (SELECT COUNT(*) FROM order_items i WHERE i.order_id = o.order_id) AS item_count
                 FROM orders o
                 JOIN products p ON o.product_id = p.product_id
                 WHERE o.user_id = ?
@@ -96,7 +307,8 @@ def get_user_orders(db_connection):
             """
         else:
             query = """
-                SELECT o.*, p.product_name 
+                SELECT o.*, p.product_name,
+                       (SELECT COUNT(*) FROM order_items i WHERE i.order_id = o.order_id) AS item_count
                 FROM orders o
                 JOIN products p ON o.product_id = p.product_id
                 WHERE o.user_id = %s
@@ -111,7 +323,34 @@ def get_user_orders(db_connection):
             for row in rows:
                 orders.append(dict_from_row(row))
         else:
-            orders = rows
+            orders = list(rows)
+        
+        # Lines of all of the user's orders in one query
+        if use_sqlite:
+            query = """
+                SELECT i.order_id, i.product_id, p.product_name, i.quantity, i.unit_price, i.line_total
+                FROM order_items i
+                JOIN orders o ON o.order_id = i.order_id
+                JOIN products p ON p.product_id = i.product_id
+                WHERE o.user_id = ?
+                ORDER BY i.order_item_id
+            """
+        else:
+            query = """
+                SELECT i.order_id, i.product_id, p.product_name, i.quantity, i.unit_price, i.line_total
+                FROM order_items i
+                JOIN orders o ON o.order_id = i.order_id
+                JOIN products p ON p.product_id = i.product_id
+                WHERE o.user_id = %s
+                ORDER BY i.order_item_id
+            """
+        cursor.execute(query, (user_id,))
+        items = {}
+        for row in cursor.fetchall():
+            item = dict_from_row(row) if use_sqlite else dict(row)
+            items.setdefault(item.pop('order_id'), []).append(item)
+        for order in orders:
+            order['items'] = items.get(order['order_id'], [])
             
         cursor.close()
         return jsonify({'orders': orders}), 200
@@ -121,57 +360,329 @@ def get_user_orders(db_connection):
 
 @jwt_required()
 def get_all_orders_admin(db_connection):
-    """Retrieve all orders (Admins only)"""
+    """
+    Retrieve all orders, newest first, one page at a time (Admins only)
+    Pages are ordered by (created_at, order_id) descending; pass the
+    returned next_cursor as ?cursor= to fetch the following page.
+    Query params: status, payment_status, customer (username), from, to
+    (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS), limit, cursor
+    status_counts gives the number of orders per status under the other
+    filters (status itself is not applied to them).
+    """
     try:
-        # Check role
-        from flask_jwt_extended import get_jwt
-        claims = get_jwt()
-        # Note: In our current setup, identity is a string ID. Usually role is in claims.
-        # Let's verify role by checking DB if claims not enough.
-        # But for now assuming role check is done in app.py via custom decorator or simpler check.
-        
         user_id = int(get_jwt_identity())
         cursor = db_connection.cursor()
         
         from backend.config import Config
+        from backend.utils import parse_limit, parse_timestamp, encode_cursor, decode_cursor
         use_sqlite = Config.USE_SQLITE
+        p = '?' if use_sqlite else '%s'
         
         # Verify if admin
-        if use_sqlite:
-            cursor.execute("SELECT role FROM users WHERE user_id = ?", (user_id,))
+        if not _is_admin(cursor, use_sqlite, user_id):
+            cursor.close()
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        status = request.args.get('status')
+        payment_status = request.args.get('payment_status')
+        customer = request.args.get('customer')
+        cursor_token = request.args.get('cursor')
+        try:
+            if status and status not in ORDER_STATUSES:
+                raise ValueError(f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}")
+            if payment_status and payment_status not in ('Paid', 'Pending'):
+                raise ValueError('Invalid payment_status. Must be one of: Paid, Pending')
+            start = parse_timestamp(request.args.get('from'), 'from') if request.args.get('from') else None
+            end = parse_timestamp(request.args.get('to'), 'to', end_of_day=True) if request.args.get('to') else None
+            limit = parse_limit(request.args.get('limit'), Config.ORDERS_PAGE_SIZE, Config.ORDERS_PAGE_MAX)
+            after = decode_cursor(cursor_token, 2) if cursor_token else None
+            if after and not (isinstance(after[0], str) and isinstance(after[1], int)):
+                raise ValueError('Invalid cursor')
+        except ValueError as e:
+            cursor.close()
+            return jsonify({'error': str(e)}), 400
+        
+        # Filters other than status; each narrows an (x, created_at) index range
+        conditions = []
+        params = []
+        if payment_status:
+            conditions.append(f"o.payment_status = {p}")
+            params.append(payment_status)
+        if customer:
+            conditions.append(f"o.user_id = (SELECT user_id FROM users WHERE username = {p})")
+            params.append(customer)
+        if start:
+            conditions.append(f"o.created_at >= {p}")
+            params.append(start)
+        if end:
+            conditions.append(f"o.created_at <= {p}")
+            params.append(end)
+        
+        # Per-status counts come from order_status_counts unless a customer or
+        # date range narrows them; then they are counted over that index range
+        if customer or start or end:
+            cursor.execute(f"""
+                SELECT o.status, COUNT(*) AS order_count
+                FROM orders o JOIN users u ON o.user_id = u.user_id
+                WHERE {' AND '.join(conditions)}
+                GROUP BY o.status
+            """, params)
+        elif payment_status:
+            cursor.execute(f"""
+                SELECT status, order_count FROM order_status_counts WHERE payment_status = {p}
+            """, (payment_status,))
         else:
-            cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
+            cursor.execute("""
+                SELECT status, SUM(order_count) AS order_count FROM order_status_counts GROUP BY status
+            """)
+        status_counts = {row['status']: int(row['order_count']) for row in cursor.fetchall()
+                         if row['order_count']}
         
-        row = cursor.fetchone()
-        user_role = (dict_from_row(row)['role'] if use_sqlite else row['role']) if row else 'employee'
+        if status:
+            conditions.append(f"o.status = {p}")
+            params.append(status)
+        if after:
+            # Keyset: the leading bound lets the index range start at the cursor
+            conditions.append(f"o.created_at <= {p} AND (o.created_at < {p} OR o.order_id < {p})")
+            params.extend([after[0], after[0], after[1]])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
         
-        if user_role != 'admin':
-            cursor.close()
-            return jsonify({'error': 'Admin access required'}), 403
-
-        query = """
-            SELECT o.*, p.product_name, u.username as customer_name
+        # Fetch one extra row to learn whether another page follows
+        cursor.execute(f"""
+            SELECT o.*, p.product_name, u.username as customer_name,
+                   (SELECT COUNT(*) FROM order_items i WHERE i.order_id = o.order_id) AS item_count
             FROM orders o
             JOIN products p ON o.product_id = p.product_id
             JOIN users u ON o.user_id = u.user_id
-            ORDER BY o.created_at DESC
-        """
-        cursor.execute(query)
+            {where}
+            ORDER BY o.created_at DESC, o.order_id DESC
+            LIMIT {p}
+        """, params + [limit + 1])
         rows = cursor.fetchall()
-        
-        orders = []
-        if use_sqlite:
-            for row in rows:
-                orders.append(dict_from_row(row))
-        else:
-            orders = rows
-            
         cursor.close()
-        return jsonify({'orders': orders}), 200
+        
+        orders = [dict_from_row(row) for row in rows] if use_sqlite else list(rows)
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        next_cursor = None
+        if has_more:
+            last = orders[-1]
+            next_cursor = encode_cursor([str(last['created_at']), last['order_id']])
+        
+        return jsonify({
+            'orders': orders,
+            'total': len(orders),
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'status_counts': status_counts
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _transition_orders(cursor, use_sqlite, user_id, order_ids, new_status):
+    """
+    Move orders to new_status inside the caller's write transaction (after
+    begin_write; the caller commits or rolls back)
+    Only the moves in ORDER_TRANSITIONS are allowed; others fail with 400.
+    Delivering deducts the stock of every line: the lines of all orders are
+    read in one query, the products are locked once, and each product gets
+    one guarded decrement by its total over the batch while movements and
+    transactions are written with executemany. An order may use its own
+    reservation but not stock other orders have reserved; one that cannot be
+    delivered is skipped.
+    Returns (results, product_ids): one {order_id, status: 'updated' |
+    'unchanged' | 'failed', error, status_code, user_id} per order, and the
+    products whose stock or reservations changed.
+    """
+    p = '?' if use_sqlite else '%s'
+    lock_clause = '' if use_sqlite else ' FOR UPDATE'
+    
+    cursor.execute(f"""
+        SELECT order_id, user_id, status, payment_status FROM orders
+        WHERE order_id IN ({', '.join([p] * len(order_ids))}){lock_clause}
+    """, list(order_ids))
+    orders = {row['order_id']: row for row in cursor.fetchall()}
+    
+    results = {}
+    moving = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if not order:
+            results[order_id] = {'order_id': order_id, 'status': 'failed', 'error': 'Order not found', 'status_code': 404}
+        elif order['status'] == new_status:
+            results[order_id] = {'order_id': order_id, 'status': 'unchanged'}
+        elif new_status not in ORDER_TRANSITIONS.get(order['status'], ()):
+            results[order_id] = {
+                'order_id': order_id,
+                'status': 'failed',
+                'error': f"Cannot move a {order['status']} order to {new_status}",
+                'status_code': 400
+            }
+        else:
+            moving.append(order_id)
+    
+    movement_rows = []
+    transaction_rows = []
+    stock = {}
+    if new_status == 'Delivered' and moving:
+        # Lines of every order in one query, then one locked read of their products
+        cursor.execute(f"""
+            SELECT order_id, product_id, quantity, unit_price, line_total FROM order_items
+            WHERE order_id IN ({', '.join([p] * len(moving))}) ORDER BY order_id, order_item_id
+        """, moving)
+        items = {}
+        for row in cursor.fetchall():
+            items.setdefault(row['order_id'], []).append(row)
+        product_ids = sorted({item['product_id'] for lines in items.values() for item in lines})
+        held = {}
+        own = {}
+        if product_ids:
+            cursor.execute(f"""
+                SELECT product_id, quantity_in_stock, reserved_quantity FROM products
+                WHERE product_id IN ({', '.join([p] * len(product_ids))}){lock_clause}
+            """, product_ids)
+            for row in cursor.fetchall():
+                stock[row['product_id']] = row['quantity_in_stock']
+                held[row['product_id']] = row['reserved_quantity']
+            # Each order may use its own reservation, never another order's
+            cursor.execute(f"""
+                SELECT order_id, product_id, quantity FROM stock_reservations
+                WHERE order_id IN ({', '.join([p] * len(moving))}) AND status = 'active'
+            """, moving)
+            for row in cursor.fetchall():
+                reserved = own.setdefault(row['order_id'], {})
+                reserved[row['product_id']] = reserved.get(row['product_id'], 0) + row['quantity']
+        on_hand = dict(stock)
+        
+        # Deduct against running quantities, in request order
+        delivered = []
+        for order_id in moving:
+            lines = items.get(order_id, [])
+            needed = {}
+            for item in lines:
+                needed[item['product_id']] = needed.get(item['product_id'], 0) + item['quantity']
+            reserved = own.get(order_id, {})
+            missing = [product_id for product_id in sorted(needed) if product_id not in stock]
+            short = [product_id for product_id in sorted(needed) if product_id in stock and
+                     stock[product_id] - needed[product_id] < held[product_id] - reserved.get(product_id, 0)]
+            if missing or short:
+                if missing:
+                    product_id, error = missing[0], 'Product not found'
+                else:
+                    product_id = short[0]
+                    others = held[product_id] - reserved.get(product_id, 0)
+                    error = (f'Insufficient stock. {others} units are reserved by other orders' if others > 0
+                             else 'Insufficient stock. Cannot reduce stock below 0')
+                results[order_id] = {
+                    'order_id': order_id,
+                    'status': 'failed',
+                    'error': f'Cannot deliver order: {error} (product {product_id})',
+                    'status_code': 404 if missing else 400
+                }
+                continue
+            for product_id, quantity in reserved.items():
+                held[product_id] -= quantity
+            for item in lines:
+                previous_quantity = stock[item['product_id']]
+                stock[item['product_id']] = previous_quantity - item['quantity']
+                movement_rows.append((item['product_id'], 'stock-out', item['quantity'], previous_quantity,
+                                      stock[item['product_id']], f"ORD-{order_id}", None, user_id))
+                transaction_rows.append((item['product_id'], orders[order_id]['user_id'], item['quantity'],
+                                         item['unit_price'], item['line_total'], f"Order Delivered: ORD-{order_id}"))
+            delivered.append(order_id)
+        moving = delivered
+    
+    if not moving:
+        return [results[order_id] for order_id in order_ids], []
+    
+    placeholders = ', '.join([p] * len(moving))
+    if new_status == 'Delivered':
+        cursor.execute(f"""
+            UPDATE orders SET status = {p}, payment_status = 'Paid', updated_at = {p}
+            WHERE order_id IN ({placeholders})
+        """, [new_status, datetime.now()] + moving)
+    else:
+        cursor.execute(f"""
+            UPDATE orders SET status = {p}, updated_at = {p}
+            WHERE order_id IN ({placeholders})
+        """, [new_status, datetime.now()] + moving)
+    changes = {}
+    for order_id in moving:
+        order = orders[order_id]
+        results[order_id] = {'order_id': order_id, 'status': 'updated', 'user_id': order['user_id']}
+        before = (order['status'], order['payment_status'])
+        after = (new_status, 'Paid' if new_status == 'Delivered' else order['payment_status'])
+        changes[before] = changes.get(before, 0) - 1
+        changes[after] = changes.get(after, 0) + 1
+    _count_status_changes(cursor, use_sqlite, changes)
+    
+    # Reservations: cancelling gives the stock back, shipping holds it until
+    # delivery, and delivering hands it over to the stock-out below
+    changed_products = []
+    if new_status == 'Cancelled':
+        changed_products = release_order_reservations(cursor, use_sqlite, moving, 'released')
+    elif new_status == 'Shipped':
+        hold_order_reservations(cursor, use_sqlite, moving)
+    elif new_status == 'Delivered':
+        changed_products = release_order_reservations(cursor, use_sqlite, moving, 'fulfilled')
+    
+    bumped = ['orders']
+    if movement_rows:
+        # One guarded decrement per product by its total over the batch (the
+        # same single-statement form as apply_stock_movement), then one
+        # movement and one transaction per line. The delivered orders'
+        # reservations were fulfilled above, so reserved_quantity is now
+        # only what other orders hold.
+        deducted = sorted({row[0] for row in movement_rows})
+        for product_id in deducted:
+            total = on_hand[product_id] - stock[product_id]
+            if use_sqlite:
+                cursor.execute("""
+                    UPDATE products
+                    SET quantity_in_stock = quantity_in_stock - ?, updated_at = CURRENT_TIMESTAMP, updated_by = ?
+                    WHERE product_id = ? AND quantity_in_stock - reserved_quantity >= ?
+                """, (total, user_id, product_id, total))
+            else:
+                cursor.execute("""
+                    UPDATE products
+                    SET quantity_in_stock = quantity_in_stock - %s, updated_by = %s
+                    WHERE product_id = %s AND quantity_in_stock - reserved_quantity >= %s
+                """, (total, user_id, product_id, total))
+            if cursor.rowcount == 0:
+                # The rows are locked, so this only happens if something bypassed the lock: undo everything
+                raise RuntimeError(f'Stock of product {product_id} changed during delivery')
+        if use_sqlite:
+            cursor.executemany("""
+                INSERT INTO stock_movements (product_id, movement_type, quantity,
+                                            previous_quantity, new_quantity,
+                                            reference_number, notes, created_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, movement_rows)
+            cursor.executemany("""
+                INSERT INTO transactions (product_id, user_id, transaction_type, quantity, unit_price, total_amount, notes)
+                VALUES (?, ?, 'Sale', ?, ?, ?, ?)
+            """, transaction_rows)
+        else:
+            cursor.executemany("""
+                INSERT INTO stock_movements (product_id, movement_type, quantity,
+                                            previous_quantity, new_quantity,
+                                            reference_number, notes, created_by)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, movement_rows)
+            cursor.executemany("""
+                INSERT INTO transactions (product_id, user_id, transaction_type, quantity, unit_price, total_amount, notes)
+                VALUES (%s, %s, 'Sale', %s, %s, %s, %s)
+            """, transaction_rows)
+        refresh_low_stock(cursor, use_sqlite, deducted)
+        changed_products = sorted(set(changed_products) | set(deducted))
+        bumped += ['stock_movements', 'transactions']
+    if changed_products:
+        bumped.append('products')
+    bump_table_versions(cursor, use_sqlite, *bumped)
+    
+    return [results[order_id] for order_id in order_ids], changed_products
+
 @jwt_required()
 def update_order_status(db_connection, order_id):
     """Update order status and reflect in stock if delivered"""
@@ -182,99 +693,118 @@ def update_order_status(db_connection, order_id):
         
         if not new_status:
             return jsonify({'error': 'Status is required'}), 400
+        if new_status not in ORDER_STATUSES:
+            return jsonify({'error': f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}"}), 400
             
         cursor = db_connection.cursor()
         from backend.config import Config
+        from database.database import begin_write
         use_sqlite = Config.USE_SQLITE
         
         # Verify if admin
-        if use_sqlite:
-            cursor.execute("SELECT role FROM users WHERE user_id = ?", (user_id,))
-        else:
-            cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
+        if not _is_admin(cursor, use_sqlite, user_id):
+            cursor.close()
+            return jsonify({'error': 'Admin access required'}), 403
         
-        row = cursor.fetchone()
-        user_role = (dict_from_row(row)['role'] if use_sqlite else row['role']) if row else 'employee'
+        try:
+            begin_write(db_connection)
+            results, product_ids = _transition_orders(cursor, use_sqlite, user_id, [order_id], new_status)
+            result = results[0]
+            if result['status'] == 'failed':
+                db_connection.rollback()
+                return jsonify({'error': result['error']}), result['status_code']
+            db_connection.commit()
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        if product_ids:
+            publish('products', product_ids=product_ids)
+        if result['status'] == 'updated':
+            publish('orders', orders=[{'order_id': order_id, 'user_id': result['user_id'], 'status': new_status}])
+        return jsonify({'message': f'Order status updated to {new_status}'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jwt_required()
+def bulk_update_order_status(db_connection):
+    """
+    Move many orders to one status in a single transaction (Admins only)
+    Body: {order_ids: [...], status, atomic: true}
+    With atomic (the default) any order that cannot be moved rolls back the
+    whole batch; otherwise the other orders are updated and failures reported.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json()
+        order_ids = data.get('order_ids') if isinstance(data, dict) else None
+        new_status = data.get('status') if isinstance(data, dict) else None
         
-        if user_role != 'admin':
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        
+        if not isinstance(order_ids, list) or not order_ids:
+            return jsonify({'error': 'order_ids must be a non-empty list'}), 400
+        if len(order_ids) > Config.ORDER_BULK_MAX:
+            return jsonify({'error': f'A batch can hold at most {Config.ORDER_BULK_MAX} orders'}), 400
+        if new_status not in ORDER_STATUSES:
+            return jsonify({'error': f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}"}), 400
+        try:
+            # Drop repeated IDs, keeping the request order
+            order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'order_ids must be integers'}), 400
+        atomic = data.get('atomic', True)
+        if not isinstance(atomic, bool):
+            return jsonify({'error': 'atomic must be true or false'}), 400
+        
+        cursor = db_connection.cursor()
+        if not _is_admin(cursor, use_sqlite, user_id):
             cursor.close()
             return jsonify({'error': 'Admin access required'}), 403
-
-        # Get current order info
-        if use_sqlite:
-            cursor.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,))
-        else:
-            cursor.execute("SELECT * FROM orders WHERE order_id = %s", (order_id,))
         
-        order_row = cursor.fetchone()
-        if not order_row:
+        from database.database import begin_write
+        try:
+            begin_write(db_connection)
+            results, product_ids = _transition_orders(cursor, use_sqlite, user_id, order_ids, new_status)
+            changed_orders = [{'order_id': result['order_id'], 'user_id': result['user_id'], 'status': new_status}
+                              for result in results if result['status'] == 'updated']
+            for result in results:
+                result.pop('status_code', None)
+                result.pop('user_id', None)
+            failed = [result for result in results if result['status'] == 'failed']
+            if atomic and failed:
+                db_connection.rollback()
+                for result in results:
+                    if result['status'] == 'updated':
+                        result['status'] = 'rolled_back'
+                return jsonify({
+                    'error': 'Batch rejected; no orders were updated',
+                    'updated': 0,
+                    'failed': len(failed),
+                    'results': results
+                }), 400
+            db_connection.commit()
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
             cursor.close()
-            return jsonify({'error': 'Order not found'}), 404
-            
-        order = dict_from_row(order_row) if use_sqlite else order_row
-        old_status = order['status']
-
-        # Update Status and potentially Payment Status
-        if new_status == 'Delivered':
-            if use_sqlite:
-                cursor.execute("UPDATE orders SET status = ?, payment_status = 'Paid', updated_at = ? WHERE order_id = ?", 
-                              (new_status, datetime.now(), order_id))
-            else:
-                cursor.execute("UPDATE orders SET status = %s, payment_status = 'Paid', updated_at = %s WHERE order_id = %s", 
-                              (new_status, datetime.now(), order_id))
-        else:
-            if use_sqlite:
-                cursor.execute("UPDATE orders SET status = ?, updated_at = ? WHERE order_id = ?", 
-                              (new_status, datetime.now(), order_id))
-            else:
-                cursor.execute("UPDATE orders SET status = %s, updated_at = %s WHERE order_id = %s", 
-                              (new_status, datetime.now(), order_id))
+        if product_ids:
+            publish('products', product_ids=product_ids)
+        if changed_orders:
+            publish('orders', orders=changed_orders)
         
-        # If status changed to 'Delivered', reduce stock and create transaction record
-        if new_status == 'Delivered' and old_status != 'Delivered':
-            product_id = order['product_id']
-            qty = order['quantity']
-            
-            # Reduce stock
-            if use_sqlite:
-                cursor.execute("UPDATE products SET quantity_in_stock = quantity_in_stock - ? WHERE product_id = ?", (qty, product_id))
-                # Get new qty for stock movement record
-                cursor.execute("SELECT quantity_in_stock FROM products WHERE product_id = ?", (product_id,))
-            else:
-                cursor.execute("UPDATE products SET quantity_in_stock = quantity_in_stock - %s WHERE product_id = %s", (qty, product_id))
-                cursor.execute("SELECT quantity_in_stock FROM products WHERE product_id = %s", (product_id,))
-            
-            p_row = cursor.fetchone()
-            new_qty = (dict_from_row(p_row)['quantity_in_stock'] if use_sqlite else p_row['quantity_in_stock'])
-            
-            # Record stock movement
-            if use_sqlite:
-                cursor.execute("""
-                    INSERT INTO stock_movements (product_id, movement_type, quantity, previous_quantity, new_quantity, reference_number, created_by)
-                    VALUES (?, 'stock-out', ?, ?, ?, ?, ?)
-                """, (product_id, qty, new_qty + qty, new_qty, f"ORD-{order_id}", user_id))
-            else:
-                cursor.execute("""
-                    INSERT INTO stock_movements (product_id, movement_type, quantity, previous_quantity, new_quantity, reference_number, created_by)
-                    VALUES (%s, 'stock-out', %s, %s, %s, %s, %s)
-                """, (product_id, qty, new_qty + qty, new_qty, f"ORD-{order_id}", user_id))
-
-            # Record transaction for reporting
-            if use_sqlite:
-                cursor.execute("""
-                    INSERT INTO transactions (product_id, user_id, transaction_type, quantity, unit_price, total_amount, notes)
-                    VALUES (?, ?, 'Sale', ?, ?, ?, ?)
-                """, (product_id, order['user_id'], qty, order['unit_price'], order['total_amount'], f"Order Delivered: ORD-{order_id}"))
-            else:
-                cursor.execute("""
-                    INSERT INTO transactions (product_id, user_id, transaction_type, quantity, unit_price, total_amount, notes)
-                    VALUES (%s, %s, 'Sale', %s, %s, %s, %s)
-                """, (product_id, order['user_id'], qty, order['unit_price'], order['total_amount'], f"Order Delivered: ORD-{order_id}"))
-
-        db_connection.commit()
-        cursor.close()
-        return jsonify({'message': f'Order status updated to {new_status}'}), 200
+        updated = sum(1 for result in results if result['status'] == 'updated')
+        return jsonify({
+            'message': f'Updated {updated} of {len(results)} orders to {new_status}',
+            'updated': updated,
+            'unchanged': sum(1 for result in results if result['status'] == 'unchanged'),
+            'failed': len(failed),
+            'results': results
+        }), 200
         
     except Exception as e:
-        db_connection.rollback()
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': f'Failed to update orders: {str(e)}'}), 500
@@ -5,6 +5,7 @@ from flask import jsonify, request, send_file
 from flask_jwt_extended import jwt_required
 import csv
 import io
+from backend.low_stock import get_low_stock_counts
 
 @jwt_required()
 def generate_inventory_report(db_connection):
@@ -61,12 +62,8 @@ def get_admin_analytics(db_connection):
         total_products = row[0] or 0
         total_value = float(row[1] or 0)
 
-        # Low stock & out of stock
-        cursor.execute("SELECT COUNT(*) FROM products WHERE quantity_in_stock <= min_stock_level AND is_active = 1")
-        low_stock = cursor.fetchone()[0] or 0
-
-        cursor.execute("SELECT COUNT(*) FROM products WHERE quantity_in_stock = 0 AND is_active = 1")
-        out_of_stock = cursor.fetchone()[0] or 0
+        # Low stock & out of stock, from the maintained low-stock set
+        low_stock, out_of_stock = get_low_stock_counts(cursor)
 
         # Total users
         cursor.execute("SELECT COUNT(*) FROM users WHERE is_active = 1")
@@ -74,10 +71,10 @@ def get_admin_analytics(db_connection):
 
         # Top 5 low stock products
         cursor.execute("""
-            SELECT product_name, sku, quantity_in_stock, min_stock_level
-            FROM products
-            WHERE quantity_in_stock <= min_stock_level AND is_active = 1
-            ORDER BY quantity_in_stock ASC
+            SELECT p.product_name, p.sku, l.quantity_in_stock, l.min_stock_level
+            FROM low_stock_products l
+            JOIN products p ON p.product_id = l.product_id
+            ORDER BY l.quantity_in_stock ASC
             LIMIT 5
         """)
         low_stock_items_raw = cursor.fetchall()
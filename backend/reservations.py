@@ -0,0 +1,187 @@
+"""
+Stock reservations for open orders
+
+Placing an order reserves its quantities: one guarded UPDATE per line adds
+to products.reserved_quantity only while quantity_in_stock - reserved_quantity
+still covers it, and a stock_reservations row records the hold. The stock a
+shopper can still buy is therefore
+
+    available_quantity = quantity_in_stock - reserved_quantity
+
+read from the product row itself, however many orders are open.
+
+A reservation ends exactly once, moving from 'active' to
+- 'fulfilled' when the order is delivered (the stock-out takes over),
+- 'released' when the order is cancelled,
+- 'expired' when an unshipped order outlives RESERVATION_TTL; the periodic
+  sweeper expires them in batches and cancels their orders.
+Shipped orders hold their stock until delivered or cancelled.
+"""
+from backend.table_versions import bump_table_versions
+from backend.events import publish
+
+class ReservationError(Exception):
+    """Raised when an order line cannot be reserved"""
+    def __init__(self, message, product_id):
+        super().__init__(message)
+        self.product_id = product_id
+
+def reserve_stock(cursor, use_sqlite, order_id, lines):
+    """
+    Reserve every line of an order inside the caller's transaction
+    lines: [{product_id, quantity}]. Raises ReservationError for the first
+    line whose product is inactive or short; the caller rolls back.
+    """
+    from backend.config import Config
+
+    # Product order, so concurrent orders lock products in the same order
+    lines = sorted(lines, key=lambda line: line['product_id'])
+    for line in lines:
+        if use_sqlite:
+            cursor.execute("""
+                UPDATE products SET reserved_quantity = reserved_quantity + ?, updated_at = CURRENT_TIMESTAMP
+                WHERE product_id = ? AND is_active = 1 AND quantity_in_stock - reserved_quantity >= ?
+            """, (line['quantity'], line['product_id'], line['quantity']))
+        else:
+            cursor.execute("""
+                UPDATE products SET reserved_quantity = reserved_quantity + %s
+                WHERE product_id = %s AND is_active = TRUE AND quantity_in_stock - reserved_quantity >= %s
+            """, (line['quantity'], line['product_id'], line['quantity']))
+        if cursor.rowcount == 0:
+            raise ReservationError('Insufficient stock available', line['product_id'])
+
+    rows = [(order_id, line['product_id'], line['quantity'], Config.RESERVATION_TTL) for line in lines]
+    if use_sqlite:
+        cursor.executemany("""
+            INSERT INTO stock_reservations (order_id, product_id, quantity, expires_at)
+            VALUES (?, ?, ?, datetime('now', '+' || ? || ' seconds'))
+        """, rows)
+    else:
+        cursor.executemany("""
+            INSERT INTO stock_reservations (order_id, product_id, quantity, expires_at)
+            VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)
+        """, rows)
+
+def _end_reservations(cursor, use_sqlite, reservations, status):
+    """Mark locked active reservations as ended and give their stock back; returns the product IDs"""
+    if not reservations:
+        return []
+    p = '?' if use_sqlite else '%s'
+    ids = [row['reservation_id'] for row in reservations]
+    cursor.execute(f"""
+        UPDATE stock_reservations SET status = {p}, released_at = CURRENT_TIMESTAMP
+        WHERE reservation_id IN ({', '.join([p] * len(ids))})
+    """, [status] + ids)
+
+    released = {}
+    for row in reservations:
+        released[row['product_id']] = released.get(row['product_id'], 0) + row['quantity']
+    rows = [(quantity, quantity, product_id) for product_id, quantity in sorted(released.items())]
+    if use_sqlite:
+        cursor.executemany("""
+            UPDATE products
+            SET reserved_quantity = CASE WHEN reserved_quantity > ? THEN reserved_quantity - ? ELSE 0 END,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE product_id = ?
+        """, rows)
+    else:
+        cursor.executemany("""
+            UPDATE products
+            SET reserved_quantity = CASE WHEN reserved_quantity > %s THEN reserved_quantity - %s ELSE 0 END
+            WHERE product_id = %s
+        """, rows)
+    return sorted(released)
+
+def release_order_reservations(cursor, use_sqlite, order_ids, status):
+    """
+    End the orders' active reservations inside the caller's write transaction
+    status is 'fulfilled' or 'released'. Returns the product IDs whose
+    reserved quantity changed.
+    """
+    if not order_ids:
+        return []
+    p = '?' if use_sqlite else '%s'
+    lock_clause = '' if use_sqlite else ' FOR UPDATE'
+    cursor.execute(f"""
+        SELECT reservation_id, product_id, quantity FROM stock_reservations
+        WHERE order_id IN ({', '.join([p] * len(order_ids))}) AND status = 'active'{lock_clause}
+    """, list(order_ids))
+    return _end_reservations(cursor, use_sqlite, cursor.fetchall(), status)
+
+def hold_order_reservations(cursor, use_sqlite, order_ids):
+    """Keep the orders' active reservations until they are delivered or cancelled (on shipping)"""
+    if not order_ids:
+        return
+    p = '?' if use_sqlite else '%s'
+    cursor.execute(f"""
+        UPDATE stock_reservations SET expires_at = NULL
+        WHERE order_id IN ({', '.join([p] * len(order_ids))}) AND status = 'active'
+    """, list(order_ids))
+
+def expire_reservations(db_connection, batch_size):
+    """
+    Expire active reservations past their expires_at, batch_size per
+    transaction, until none are left, and cancel their orders in the same
+    transaction. Returns the number expired.
+    """
+    from backend.config import Config
+    from backend.orders import _transition_orders
+    from database.database import begin_write
+    use_sqlite = Config.USE_SQLITE
+
+    expired = 0
+    while True:
+        cursor = db_connection.cursor()
+        try:
+            begin_write(db_connection)
+            if use_sqlite:
+                cursor.execute("""
+                    SELECT reservation_id, order_id, product_id, quantity FROM stock_reservations
+                    WHERE status = 'active' AND expires_at <= CURRENT_TIMESTAMP
+                    ORDER BY expires_at LIMIT ?
+                """, (batch_size,))
+            else:
+                cursor.execute("""
+                    SELECT reservation_id, order_id, product_id, quantity FROM stock_reservations
+                    WHERE status = 'active' AND expires_at <= CURRENT_TIMESTAMP
+                    ORDER BY expires_at LIMIT %s FOR UPDATE
+                """, (batch_size,))
+            reservations = cursor.fetchall()
+            product_ids = _end_reservations(cursor, use_sqlite, reservations, 'expired')
+            # An order that no longer holds its stock is cancelled rather than left open
+            order_ids = sorted({row['order_id'] for row in reservations})
+            cancelled = []
+            if order_ids:
+                results, released = _transition_orders(cursor, use_sqlite, None, order_ids, 'Cancelled')
+                cancelled = [{'order_id': result['order_id'], 'user_id': result['user_id'], 'status': 'Cancelled'}
+                             for result in results if result['status'] == 'updated']
+                product_ids = sorted(set(product_ids) | set(released))
+            if product_ids:
+                bump_table_versions(cursor, use_sqlite, 'products')
+            db_connection.commit()
+        except Exception:
+            db_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        if product_ids:
+            publish('products', product_ids=product_ids)
+        if cancelled:
+            publish('orders', orders=cancelled)
+        expired += len(reservations)
+        if len(reservations) < batch_size:
+            return expired
+
+def run_reservation_sweeper():
+    """Periodic job: expire stale reservations"""
+    from backend.config import Config
+    from database.database import get_pool
+    pool = get_pool()
+    connection = pool.acquire()
+    try:
+        expired = expire_reservations(connection, Config.RESERVATION_SWEEP_BATCH)
+        if expired:
+            print(f"Expired {expired} stock reservations")
+    finally:
+        pool.release(connection)
@@ -0,0 +1,117 @@
+"""
+Shared stock mutation path
+
+Every change to products.quantity_in_stock goes through apply_stock_movement(),
+which changes the quantity with a single guarded UPDATE instead of reading it,
+computing the new value in Python and writing it back. Stock-outs only match
+rows that still hold enough stock beyond what open orders have reserved, so
+concurrent requests can neither oversell, take reserved units, nor overwrite
+each other's updates.
+"""
+import sqlite3
+from backend.low_stock import refresh_low_stock
+
+# UPDATE ... RETURNING is available from SQLite 3.35
+SQLITE_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+class StockMovementError(Exception):
+    """Raised when a stock movement cannot be applied"""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def apply_stock_movement(cursor, use_sqlite, product_id, movement_type, quantity, user_id,
+                         reference_number='', notes=None, active_only=True):
+    """
+    Apply one stock movement and record it in stock_movements, inside the
+    caller's transaction (the caller commits or rolls back)
+    movement_type is 'stock-in', 'stock-out' or 'adjustment' (set to quantity)
+    Returns {previous_quantity, new_quantity}; raises StockMovementError
+    """
+    p = '?' if use_sqlite else '%s'
+    active_clause = (' AND is_active = 1' if use_sqlite else ' AND is_active = TRUE') if active_only else ''
+    touch = f"updated_at = CURRENT_TIMESTAMP, updated_by = {p}" if use_sqlite else f"updated_by = {p}"
+
+    if movement_type == 'adjustment':
+        new_quantity = quantity
+        # Adjustments need the old value: lock the row before reading it
+        if use_sqlite:
+            cursor.execute(f"UPDATE products SET {touch} WHERE product_id = {p}{active_clause}", (user_id, product_id))
+            if cursor.rowcount == 0:
+                raise StockMovementError('Product not found', 404)
+            cursor.execute("SELECT quantity_in_stock, reserved_quantity FROM products WHERE product_id = ?", (product_id,))
+            row = cursor.fetchone()
+        else:
+            cursor.execute(f"SELECT quantity_in_stock, reserved_quantity FROM products WHERE product_id = %s{active_clause} FOR UPDATE",
+                           (product_id,))
+            row = cursor.fetchone()
+            if not row:
+                raise StockMovementError('Product not found', 404)
+        previous_quantity = row['quantity_in_stock']
+        if new_quantity < row['reserved_quantity']:
+            raise StockMovementError(
+                f"Cannot set stock below the {row['reserved_quantity']} units reserved by open orders")
+        cursor.execute(f"UPDATE products SET quantity_in_stock = {p}, {touch} WHERE product_id = {p}",
+                       (new_quantity, user_id, product_id))
+    else:
+        if movement_type == 'stock-in':
+            change = f"quantity_in_stock = quantity_in_stock + {p}"
+            guard = ''
+            params = (quantity, user_id, product_id)
+        else:
+            change = f"quantity_in_stock = quantity_in_stock - {p}"
+            # Units reserved by open orders are not available to manual stock-outs
+            guard = f" AND quantity_in_stock - reserved_quantity >= {p}"
+            params = (quantity, user_id, product_id, quantity)
+        statement = f"UPDATE products SET {change}, {touch} WHERE product_id = {p}{active_clause}{guard}"
+
+        if use_sqlite and SQLITE_RETURNING:
+            cursor.execute(f"{statement} RETURNING quantity_in_stock", params)
+            row = cursor.fetchone()
+            updated = row is not None
+            new_quantity = row[0] if updated else None
+        else:
+            cursor.execute(statement, params)
+            updated = cursor.rowcount > 0
+            new_quantity = None
+            if updated:
+                # The row stays locked by the UPDATE until commit, so this reads our own result
+                if use_sqlite:
+                    cursor.execute("SELECT quantity_in_stock FROM products WHERE product_id = ?", (product_id,))
+                    new_quantity = cursor.fetchone()[0]
+                else:
+                    cursor.execute("SELECT quantity_in_stock FROM products WHERE product_id = %s FOR UPDATE", (product_id,))
+                    new_quantity = cursor.fetchone()['quantity_in_stock']
+
+        if not updated:
+            # Nothing matched: tell a missing product apart from a short one
+            cursor.execute(f"SELECT reserved_quantity FROM products WHERE product_id = {p}{active_clause}", (product_id,))
+            row = cursor.fetchone()
+            if not row:
+                raise StockMovementError('Product not found', 404)
+            if row['reserved_quantity'] > 0:
+                raise StockMovementError(
+                    f"Insufficient stock. {row['reserved_quantity']} units are reserved by open orders")
+            raise StockMovementError('Insufficient stock. Cannot reduce stock below 0')
+
+        previous_quantity = new_quantity - quantity if movement_type == 'stock-in' else new_quantity + quantity
+
+    if use_sqlite:
+        cursor.execute("""
+            INSERT INTO stock_movements (product_id, movement_type, quantity,
+                                        previous_quantity, new_quantity,
+                                        reference_number, notes, created_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (product_id, movement_type, quantity, previous_quantity, new_quantity,
+              reference_number, notes, user_id))
+    else:
+        cursor.execute("""
+            INSERT INTO stock_movements (product_id, movement_type, quantity,
+                                        previous_quantity, new_quantity,
+                                        reference_number, notes, created_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (product_id, movement_type, quantity, previous_quantity, new_quantity,
+              reference_number, notes, user_id))
+
+    refresh_low_stock(cursor, use_sqlite, [product_id])
+    return {'previous_quantity': previous_quantity, 'new_quantity': new_quantity}
@@ -0,0 +1,276 @@
+"""
+Point-in-time stock reports
+
+A stock checkpoint copies every product's quantity_in_stock into
+stock_checkpoint_items and records the highest stock_movements id it
+covers (last_movement_id). Every movement row stores the quantity before
+and after it, so the stock on hand at any moment can be rebuilt from the
+nearest checkpoint by looking only at the movements in between:
+
+- forward from an earlier checkpoint, a product's quantity is the
+  new_quantity of its last movement up to the requested time
+- backward from a later checkpoint, it is the previous_quantity of its
+  first movement after the requested time
+
+Checkpoints are taken by a periodic background job (and on demand by admins).
+"""
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from datetime import datetime
+
+def take_stock_checkpoint(db_connection, min_age=None):
+    """
+    Snapshot all product quantities in one write-locked transaction
+    With min_age (seconds), skip if the latest checkpoint is younger than
+    that or no stock has moved since it. Returns the checkpoint or None.
+    """
+    from backend.config import Config
+    from database.database import begin_write
+    use_sqlite = Config.USE_SQLITE
+
+    cursor = db_connection.cursor()
+    try:
+        begin_write(db_connection)
+        # Highest movement covered; on MySQL the locking read also holds off new movements until commit
+        if use_sqlite:
+            cursor.execute("SELECT COALESCE(MAX(movement_id), 0) FROM stock_movements")
+            last_movement_id = cursor.fetchone()[0]
+        else:
+            cursor.execute("SELECT movement_id FROM stock_movements ORDER BY movement_id DESC LIMIT 1 FOR UPDATE")
+            row = cursor.fetchone()
+            last_movement_id = row['movement_id'] if row else 0
+
+        if min_age is not None:
+            if use_sqlite:
+                cursor.execute("""
+                    SELECT last_movement_id, taken_at > datetime('now', ?) AS recent
+                    FROM stock_checkpoints ORDER BY taken_at DESC LIMIT 1
+                """, (f'-{int(min_age)} seconds',))
+            else:
+                cursor.execute("""
+                    SELECT last_movement_id, taken_at > NOW() - INTERVAL %s SECOND AS recent
+                    FROM stock_checkpoints ORDER BY taken_at DESC LIMIT 1
+                """, (int(min_age),))
+            latest = cursor.fetchone()
+            if latest and (latest['recent'] or latest['last_movement_id'] == last_movement_id):
+                db_connection.rollback()
+                return None
+
+        if use_sqlite:
+            cursor.execute("INSERT INTO stock_checkpoints (last_movement_id) VALUES (?)", (last_movement_id,))
+        else:
+            cursor.execute("INSERT INTO stock_checkpoints (last_movement_id) VALUES (%s)", (last_movement_id,))
+        checkpoint_id = cursor.lastrowid
+
+        if use_sqlite:
+            cursor.execute("""
+                INSERT INTO stock_checkpoint_items (checkpoint_id, product_id, quantity)
+                SELECT ?, product_id, quantity_in_stock FROM products
+            """, (checkpoint_id,))
+        else:
+            cursor.execute("""
+                INSERT INTO stock_checkpoint_items (checkpoint_id, product_id, quantity)
+                SELECT %s, product_id, quantity_in_stock FROM products
+            """, (checkpoint_id,))
+        product_count = cursor.rowcount
+
+        if use_sqlite:
+            cursor.execute("UPDATE stock_checkpoints SET product_count = ? WHERE checkpoint_id = ?",
+                           (product_count, checkpoint_id))
+            cursor.execute("SELECT taken_at FROM stock_checkpoints WHERE checkpoint_id = ?", (checkpoint_id,))
+        else:
+            cursor.execute("UPDATE stock_checkpoints SET product_count = %s WHERE checkpoint_id = %s",
+                           (product_count, checkpoint_id))
+            cursor.execute("SELECT taken_at FROM stock_checkpoints WHERE checkpoint_id = %s", (checkpoint_id,))
+        taken_at = cursor.fetchone()['taken_at']
+        db_connection.commit()
+    except Exception:
+        db_connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return {
+        'checkpoint_id': checkpoint_id,
+        'taken_at': str(taken_at),
+        'last_movement_id': last_movement_id,
+        'product_count': product_count
+    }
+
+def run_checkpoint_job():
+    """Periodic job: take a checkpoint once the latest one is STOCK_CHECKPOINT_INTERVAL old"""
+    from backend.config import Config
+    from database.database import get_pool
+    pool = get_pool()
+    connection = pool.acquire()
+    try:
+        checkpoint = take_stock_checkpoint(connection, min_age=Config.STOCK_CHECKPOINT_INTERVAL)
+        if checkpoint:
+            print(f"Stock checkpoint {checkpoint['checkpoint_id']} taken ({checkpoint['product_count']} products)")
+    finally:
+        pool.release(connection)
+
+def parse_as_of(value):
+    """
+    Parse ?date= as 'YYYY-MM-DD' (end of that day) or 'YYYY-MM-DD HH:MM:SS'
+    Returns a 'YYYY-MM-DD HH:MM:SS' string; raises ValueError
+    """
+    from backend.utils import parse_timestamp
+    if not value:
+        raise ValueError('date is required (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS)')
+    return parse_timestamp(value, 'date', end_of_day=True)
+
+def _to_datetime(value):
+    """Checkpoint timestamps come back as str from SQLite and datetime from MySQL"""
+    return value if isinstance(value, datetime) else datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+
+def _nearest_checkpoint(cursor, use_sqlite, as_of):
+    """Return (checkpoint row, 'forward' | 'backward') for the checkpoint closest to as_of, or (None, 'forward')"""
+    p = '?' if use_sqlite else '%s'
+    cursor.execute(f"""
+        SELECT checkpoint_id, taken_at, last_movement_id FROM stock_checkpoints
+        WHERE taken_at <= {p} ORDER BY taken_at DESC LIMIT 1
+    """, (as_of,))
+    before = cursor.fetchone()
+    cursor.execute(f"""
+        SELECT checkpoint_id, taken_at, last_movement_id FROM stock_checkpoints
+        WHERE taken_at > {p} ORDER BY taken_at ASC LIMIT 1
+    """, (as_of,))
+    after = cursor.fetchone()
+
+    moment = _to_datetime(as_of)
+    if after and (not before or _to_datetime(after['taken_at']) - moment < moment - _to_datetime(before['taken_at'])):
+        return after, 'backward'
+    return before, 'forward'
+
+def _replay(cursor, use_sqlite, as_of, checkpoint, direction, product_id=None):
+    """Return {product_id: quantity at as_of} for products that moved between the checkpoint and as_of"""
+    p = '?' if use_sqlite else '%s'
+    product_clause = f" AND product_id = {p}" if product_id is not None else ''
+    extra = (product_id,) if product_id is not None else ()
+
+    if direction == 'forward':
+        start = checkpoint['taken_at'] if checkpoint else '0001-01-01 00:00:00'
+        watermark = checkpoint['last_movement_id'] if checkpoint else 0
+        cursor.execute(f"""
+            SELECT m.product_id, m.new_quantity AS quantity
+            FROM stock_movements m
+            JOIN (SELECT product_id, MAX(movement_id) AS movement_id
+                  FROM stock_movements
+                  WHERE created_at >= {p} AND created_at <= {p} AND movement_id > {p}{product_clause}
+                  GROUP BY product_id) last_moves ON last_moves.movement_id = m.movement_id
+        """, (start, as_of, watermark) + extra)
+    else:
+        cursor.execute(f"""
+            SELECT m.product_id, m.previous_quantity AS quantity
+            FROM stock_movements m
+            JOIN (SELECT product_id, MIN(movement_id) AS movement_id
+                  FROM stock_movements
+                  WHERE created_at > {p} AND created_at <= {p} AND movement_id <= {p}{product_clause}
+                  GROUP BY product_id) first_moves ON first_moves.movement_id = m.movement_id
+        """, (as_of, checkpoint['taken_at'], checkpoint['last_movement_id']) + extra)
+    return {row['product_id']: row['quantity'] for row in cursor.fetchall()}
+
+def get_stock_as_of(db_connection):
+    """
+    Stock on hand at a point in time, for one product or the whole catalog
+    Query params: date (required), product_id (optional)
+    Times are compared with the database clock (UTC on SQLite).
+    """
+    try:
+        try:
+            as_of = parse_as_of(request.args.get('date'))
+            product_id = request.args.get('product_id', type=int)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        p = '?' if use_sqlite else '%s'
+
+        cursor = db_connection.cursor()
+        checkpoint, direction = _nearest_checkpoint(cursor, use_sqlite, as_of)
+
+        # Quantities recorded at the checkpoint, then the movements in between
+        base = {}
+        if checkpoint:
+            if product_id is not None:
+                cursor.execute(f"""
+                    SELECT product_id, quantity FROM stock_checkpoint_items
+                    WHERE checkpoint_id = {p} AND product_id = {p}
+                """, (checkpoint['checkpoint_id'], product_id))
+            else:
+                cursor.execute(f"""
+                    SELECT product_id, quantity FROM stock_checkpoint_items WHERE checkpoint_id = {p}
+                """, (checkpoint['checkpoint_id'],))
+            base = {row['product_id']: row['quantity'] for row in cursor.fetchall()}
+        moved = _replay(cursor, use_sqlite, as_of, checkpoint, direction, product_id)
+
+        # Only products that existed at that time
+        if product_id is not None:
+            cursor.execute(f"""
+                SELECT product_id, sku, product_name, is_active FROM products
+                WHERE product_id = {p} AND created_at <= {p}
+            """, (product_id, as_of))
+        else:
+            cursor.execute(f"""
+                SELECT product_id, sku, product_name, is_active FROM products
+                WHERE created_at <= {p} ORDER BY product_name ASC
+            """, (as_of,))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        products = []
+        for row in rows:
+            product = dict(row)
+            product['is_active'] = bool(product['is_active'])
+            product['quantity'] = moved.get(product['product_id'], base.get(product['product_id'], 0))
+            products.append(product)
+
+        source = None
+        if checkpoint:
+            source = {
+                'checkpoint_id': checkpoint['checkpoint_id'],
+                'taken_at': str(checkpoint['taken_at']),
+                'direction': direction
+            }
+
+        if product_id is not None:
+            if not products:
+                return jsonify({'error': 'Product not found at that date'}), 404
+            return jsonify({'as_of': as_of, 'checkpoint': source, 'product': products[0]}), 200
+
+        return jsonify({
+            'as_of': as_of,
+            'checkpoint': source,
+            'products': products,
+            'total': len(products),
+            'total_quantity': sum(product['quantity'] for product in products)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to get stock as of date: {str(e)}'}), 500
+
+def create_stock_checkpoint(db_connection):
+    """Take a stock checkpoint now (admin only)"""
+    try:
+        user_id = int(get_jwt_identity())
+
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+
+        cursor = db_connection.cursor()
+        if use_sqlite:
+            cursor.execute("SELECT role FROM users WHERE user_id = ?", (user_id,))
+        else:
+            cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        if not row or row['role'] != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+
+        checkpoint = take_stock_checkpoint(db_connection)
+        return jsonify({'message': 'Stock checkpoint created', 'checkpoint': checkpoint}), 201
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to create stock checkpoint: {str(e)}'}), 500
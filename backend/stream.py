@@ -0,0 +1,310 @@
+"""
+Server-Sent Events push channel (GET /api/stream)
+
+Pages that show alerts, stock or dashboard counters keep one EventSource
+open instead of re-polling /api/alerts and /api/stats. The StreamHub
+subscribes to the in-process events hub and turns what write paths publish
+into small deltas:
+
+    alert     {action: 'created', alert: {...}}
+              {action: 'acknowledged' | 'resolved', alert_ids: [...]}
+    stock     {products: [{product_id, quantity_in_stock, reserved_quantity,
+                           available_quantity, min_stock_level, is_low_stock, is_active}]}
+    counters  {low_stock_count, out_of_stock_count, active_alerts, movements_today}
+    order     {orders: [{order_id, status}]}  (admins: every order; others: their own)
+    inbox     {read_through, dismissed: [...]}  (only to the user who read them, on every tab)
+    resync    {}  the connection fell behind; reload and reconnect
+
+Alert and order events carry everything they need and are fanned out on the
+publishing thread. Product events only carry IDs, so a worker thread
+collects them for STREAM_COALESCE seconds and reads the changed rows and
+the counters once per batch, however many clients are connected.
+
+Every message is encoded once and put on each connection's bounded queue
+(STREAM_QUEUE_SIZE). A connection whose queue is full is dropped with a
+'resync' event rather than slowing the publisher or growing without bound.
+Idle connections get a heartbeat comment every STREAM_HEARTBEAT seconds so
+proxies keep them open and dead clients are noticed.
+"""
+from flask import jsonify, Response
+from flask_jwt_extended import get_jwt_identity, get_jwt, get_jwt_request_location, create_access_token
+import json
+import queue
+import threading
+import time
+from backend.events import subscribe
+
+def encode_event(event, data):
+    """One SSE message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class StreamClient:
+    """One open /api/stream connection"""
+
+    def __init__(self, user_id, is_admin, queue_size):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        """Queue a message; a full queue drops the connection with a resync"""
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.queue.put_nowait(message)
+            except queue.Full:
+                # Too far behind: replace the backlog with the end-of-stream marker
+                self.closed = True
+                try:
+                    while True:
+                        self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.queue.put_nowait(None)
+
+class StreamHub:
+    """Fans published changes out to the open streams"""
+
+    def __init__(self, max_clients, queue_size, coalesce):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.coalesce = coalesce
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.pending = set()           # product IDs changed since the last stock event
+        self.counters_stale = False
+        self.condition = threading.Condition()
+
+    def start(self):
+        subscribe('alerts', self.on_alerts)
+        subscribe('orders', self.on_orders)
+        subscribe('inbox', self.on_inbox)
+        subscribe('products', self.on_products)
+        threading.Thread(target=self.run, name='stream-hub', daemon=True).start()
+
+    def connect(self, user_id, is_admin):
+        """Register a connection; None when the hub is full"""
+        with self.lock:
+            if len(self.clients) >= self.max_clients:
+                return None
+            client = StreamClient(user_id, is_admin, self.queue_size)
+            self.clients.add(client)
+            return client
+
+    def disconnect(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def broadcast(self, message, clients=None):
+        if clients is None:
+            with self.lock:
+                clients = list(self.clients)
+        for client in clients:
+            client.send(message)
+            if client.closed:
+                self.disconnect(client)
+
+    # Event subscribers (publishing thread; no database access)
+
+    def on_alerts(self, created=(), acknowledged=(), resolved=()):
+        if not self.clients:
+            return
+        for alert in created:
+            self.broadcast(encode_event('alert', {'action': 'created', 'alert': alert}))
+        if acknowledged:
+            self.broadcast(encode_event('alert', {'action': 'acknowledged', 'alert_ids': list(acknowledged)}))
+        if resolved:
+            self.broadcast(encode_event('alert', {'action': 'resolved', 'alert_ids': list(resolved)}))
+        with self.condition:
+            self.counters_stale = True
+            self.condition.notify()
+
+    def on_orders(self, orders):
+        """orders: [{order_id, user_id, status}]"""
+        with self.lock:
+            clients = list(self.clients)
+        everything = None
+        for client in clients:
+            if client.is_admin:
+                if everything is None:
+                    everything = encode_event('order', {'orders': [
+                        {'order_id': order['order_id'], 'status': order['status']} for order in orders]})
+                self.broadcast(everything, [client])
+            else:
+                mine = [{'order_id': order['order_id'], 'status': order['status']}
+                        for order in orders if order['user_id'] == client.user_id]
+                if mine:
+                    self.broadcast(encode_event('order', {'orders': mine}), [client])
+
+    def on_inbox(self, user_id, read_through, dismissed=()):
+        with self.lock:
+            clients = [client for client in self.clients if client.user_id == user_id]
+        if clients:
+            self.broadcast(encode_event('inbox', {'read_through': read_through, 'dismissed': list(dismissed)}), clients)
+
+    def on_products(self, product_ids=None):
+        if not self.clients:
+            return
+        with self.condition:
+            if product_ids is not None:
+                self.pending.update(product_ids)
+            self.counters_stale = True
+            self.condition.notify()
+
+    # Worker: stock rows and counters, read once per batch
+
+    def run(self):
+        from database.database import get_pool
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.counters_stale)
+            # Collect the rest of a burst of writes into one read
+            time.sleep(self.coalesce)
+            with self.condition:
+                product_ids, self.pending = sorted(self.pending), set()
+                self.counters_stale = False
+            if not self.clients:
+                continue
+
+            pool = connection = None
+            try:
+                pool = get_pool()
+                connection = pool.acquire()
+                for start in range(0, len(product_ids), 500):
+                    products = read_stock(connection, product_ids[start:start + 500])
+                    if products:
+                        self.broadcast(encode_event('stock', {'products': products}))
+                self.broadcast(encode_event('counters', read_counters(connection)))
+            except Exception as e:
+                # Keep the batch for the next pass and give the pool time to free up
+                print(f"Stream hub failed to read changes: {e}")
+                with self.condition:
+                    self.pending.update(product_ids)
+                    self.counters_stale = True
+                time.sleep(max(self.coalesce, 1))
+            finally:
+                if connection is not None:
+                    pool.release(connection)
+
+def read_stock(db_connection, product_ids):
+    """Stock fields of the given products"""
+    from backend.config import Config
+    p = '?' if Config.USE_SQLITE else '%s'
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT product_id, quantity_in_stock, reserved_quantity, min_stock_level, is_active
+            FROM products WHERE product_id IN ({', '.join([p] * len(product_ids))})
+        """, product_ids)
+        products = []
+        for row in cursor.fetchall():
+            products.append({
+                'product_id': row['product_id'],
+                'quantity_in_stock': row['quantity_in_stock'],
+                'reserved_quantity': row['reserved_quantity'],
+                'available_quantity': max(row['quantity_in_stock'] - row['reserved_quantity'], 0),
+                'min_stock_level': row['min_stock_level'],
+                'is_low_stock': row['quantity_in_stock'] <= row['min_stock_level'],
+                'is_active': bool(row['is_active'])
+            })
+        return products
+    finally:
+        cursor.close()
+
+def read_counters(db_connection):
+    """Dashboard counters that change with stock and alerts"""
+    from backend.config import Config
+    from backend.low_stock import get_low_stock_counts
+    from backend.utils import utc_today, day_bounds
+    p = '?' if Config.USE_SQLITE else '%s'
+    cursor = db_connection.cursor()
+    try:
+        low_stock, out_of_stock = get_low_stock_counts(cursor)
+        cursor.execute("SELECT COUNT(*) AS total FROM alerts WHERE is_acknowledged = 0")
+        row = cursor.fetchone()
+        active_alerts = row['total'] if isinstance(row, dict) else row[0]
+        cursor.execute(f"SELECT COUNT(*) AS total FROM stock_movements WHERE created_at >= {p} AND created_at < {p}",
+                       day_bounds(utc_today()))
+        row = cursor.fetchone()
+        movements_today = row['total'] if isinstance(row, dict) else row[0]
+        return {
+            'low_stock_count': low_stock,
+            'out_of_stock_count': out_of_stock,
+            'active_alerts': int(active_alerts),
+            'movements_today': int(movements_today)
+        }
+    finally:
+        cursor.close()
+
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_stream_hub():
+    """The process-wide hub, started on first use"""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            from backend.config import Config
+            _hub = StreamHub(Config.STREAM_MAX_CLIENTS, Config.STREAM_QUEUE_SIZE, Config.STREAM_COALESCE)
+            _hub.start()
+        return _hub
+
+def stream_events(hub, client, heartbeat):
+    """The response body of one stream"""
+    try:
+        yield 'retry: 3000\n\n' + encode_event('ready', {'user_id': client.user_id})
+        while True:
+            try:
+                message = client.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+                continue
+            if message is None:
+                yield encode_event('resync', {})
+                return
+            yield message
+    finally:
+        hub.disconnect(client)
+
+def create_stream_token():
+    """Short-lived token for opening a stream
+
+    EventSource cannot send headers, so the stream is authenticated from the
+    URL, where proxies and server logs can keep it. The token put there only
+    opens streams and expires after STREAM_TOKEN_EXPIRES; the login token
+    never leaves the Authorization header.
+    """
+    from backend.config import Config
+    token = create_access_token(identity=get_jwt_identity(), expires_delta=Config.STREAM_TOKEN_EXPIRES,
+                                additional_claims={'scope': 'stream'})
+    return jsonify({'token': token, 'expires_in': int(Config.STREAM_TOKEN_EXPIRES.total_seconds())}), 200
+
+def open_event_stream(db_connection):
+    """Open a Server-Sent Events stream for the current user"""
+    try:
+        if get_jwt_request_location() == 'query_string' and get_jwt().get('scope') != 'stream':
+            return jsonify({'error': 'Open the stream with a token from POST /api/stream/token', 'token_invalid': True}), 401
+        user_id = int(get_jwt_identity())
+        from backend.config import Config
+        use_sqlite = Config.USE_SQLITE
+        cursor = db_connection.cursor()
+        if use_sqlite:
+            cursor.execute("SELECT role FROM users WHERE user_id = ?", (user_id,))
+        else:
+            cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        if not row:
+            return jsonify({'error': 'User not found'}), 404
+
+        hub = get_stream_hub()
+        client = hub.connect(user_id, row['role'] == 'admin')
+        if client is None:
+            return jsonify({'error': 'Too many open streams. Please try again later.'}), 503
+        return Response(stream_events(hub, client, Config.STREAM_HEARTBEAT), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except Exception as e:
+        return jsonify({'error': f'Failed to open stream: {str(e)}'}), 500
@@ -0,0 +1,50 @@
+"""
+Per-table change counters used to build ETags for list endpoints
+
+Every write path bumps the counters of the tables it modifies, inside the
+same transaction as the write. GET handlers derive a strong ETag from the
+counters of the tables they read, so an unchanged response can be answered
+with 304 Not Modified without running its queries.
+"""
+import datetime
+import hashlib
+
+TRACKED_TABLES = ['products', 'stock_movements', 'orders', 'alerts', 'transactions', 'users', 'alert_reads']
+
+def bump_table_versions(cursor, use_sqlite, *tables):
+    """Increment the change counters of the given tables (call before commit)"""
+    placeholders = ', '.join(['?' if use_sqlite else '%s'] * len(tables))
+    cursor.execute(
+        f"UPDATE table_versions SET version = version + 1 WHERE table_name IN ({placeholders})",
+        tables
+    )
+
+def get_table_versions(db_connection, tables):
+    """Return {table_name: version} for the given tables in one query"""
+    from backend.config import Config
+    use_sqlite = Config.USE_SQLITE
+    placeholders = ', '.join(['?' if use_sqlite else '%s'] * len(tables))
+    cursor = db_connection.cursor()
+    cursor.execute(
+        f"SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders})",
+        tuple(tables)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    if use_sqlite:
+        return {row[0]: row[1] for row in rows}
+    return {row['table_name']: row['version'] for row in rows}
+
+def table_etag(db_connection, tables, variant=''):
+    """
+    Build a strong ETag from the tables' change counters
+    `variant` distinguishes responses that differ for the same data
+    (query string, requesting user). The current UTC date is mixed in so
+    responses containing "today" figures roll over at midnight UTC, when
+    their created_at range does.
+    """
+    versions = get_table_versions(db_connection, tables)
+    parts = [f"{table}:{versions.get(table, 0)}" for table in sorted(tables)]
+    parts.append(datetime.datetime.utcnow().date().isoformat())
+    parts.append(variant)
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
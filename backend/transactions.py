@@ -4,6 +4,8 @@ Transaction Management Module - Milestone 4
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+from backend.table_versions import bump_table_versions
+from backend.idempotency import record_response
 
 @jwt_required()
 def get_all_transactions(db_connection):
@@ -75,9 +77,12 @@ def create_transaction(db_connection):
                 INSERT INTO transactions (product_id, user_id, transaction_type, quantity, unit_price, total_amount, transaction_date, notes)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """, (product_id, user_id, transaction_type, quantity, unit_price, total_amount, transaction_date, notes))
-        db_connection.commit()
         transaction_id = cursor.lastrowid
+        bump_table_versions(cursor, use_sqlite, 'transactions')
+        response = record_response(cursor, use_sqlite,
+                                   {'message': 'Transaction created successfully', 'transaction_id': transaction_id}, 201)
+        db_connection.commit()
         cursor.close()
-        return jsonify({'message': 'Transaction created successfully', 'transaction_id': transaction_id}), 201
+        return response
     except Exception as e:
         return jsonify({'error': f'Failed to create transaction: {str(e)}'}), 500
@@ -0,0 +1,99 @@
+"""
+Shared helpers for paginated list endpoints and background jobs
+"""
+import base64
+import json
+import threading
+from datetime import datetime, timedelta
+
+def encode_cursor(values):
+    """Encode the sort-key values of the last row on a page as an opaque cursor"""
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor produced by encode_cursor
+    Raises ValueError if it is malformed or does not hold `size` values
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+def parse_limit(value, default, maximum):
+    """
+    Parse a ?limit= query parameter, clamped to [1, maximum]
+    Raises ValueError for non-numeric input
+    """
+    if value is None or value == '':
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return min(limit, maximum)
+
+def parse_fields(value, allowed, required=()):
+    """
+    Parse a ?fields=a,b,c projection against the allowed column list
+    Returns the selected columns in allowed order, always including `required`
+    Raises ValueError naming any unknown field
+    """
+    if not value:
+        return list(allowed)
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    requested.update(required)
+    return [field for field in allowed if field in requested]
+
+def parse_timestamp(value, name, end_of_day=False):
+    """
+    Parse a 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' query parameter
+    A bare date means the start of that day, or its last second with
+    end_of_day. Returns a 'YYYY-MM-DD HH:MM:SS' string; raises ValueError
+    """
+    value = value.strip().replace('T', ' ')
+    try:
+        if len(value) == 10:
+            moment = datetime.strptime(value, '%Y-%m-%d')
+            if end_of_day:
+                moment += timedelta(days=1, seconds=-1)
+        else:
+            moment = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise ValueError(f'{name} must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS')
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def utc_today():
+    """Today's date in UTC, the zone CURRENT_TIMESTAMP stores created_at in"""
+    return datetime.utcnow().date()
+
+def day_bounds(day):
+    """('YYYY-MM-DD', next day) for a half-open created_at >= ? AND created_at < ? range"""
+    return day.strftime('%Y-%m-%d'), (day + timedelta(days=1)).strftime('%Y-%m-%d')
+
+def start_periodic_job(name, interval, job, first_run_after=0):
+    """
+    Run job() every `interval` seconds on a daemon thread
+    Errors are printed and the schedule carries on. Returns a
+    threading.Event; set it to stop the job.
+    """
+    stop = threading.Event()
+
+    def run():
+        delay = first_run_after
+        while not stop.wait(delay):
+            try:
+                job()
+            except Exception as e:
+                print(f"Background job '{name}' failed: {e}")
+            delay = interval
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return stop
@@ -0,0 +1,124 @@
+"""
+Benchmark: GET /api/admin/orders as order history grows
+
+Seeds a scratch SQLite database with N orders spread over customers,
+statuses and a year of dates, then times admin listing requests through
+the Flask test client: the first page, a page deep into the history, and
+pages filtered by status, payment status, customer and date range. The
+per-request times should stay flat as --orders grows. For comparison it
+also times the old query that returned every order at once.
+
+Usage:
+    python benchmarks/admin_orders_benchmark.py [--orders 200000] [--customers 2000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from database.database import get_db_connection, init_db
+
+STATUSES = ['Under Process', 'Shipped', 'Delivered', 'Delivered', 'Delivered', 'Cancelled']
+
+def seed(orders, customers):
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='orders-bench-'), 'bench.db')
+    init_db()
+    connection = get_db_connection()
+    rng = random.Random(42)
+    connection.executemany(
+        "INSERT INTO products (sku, product_name, unit_price, quantity_in_stock) VALUES (?, ?, 10, 1000)",
+        [(f'SKU-{i}', f'Product {i}') for i in range(100)])
+    connection.executemany(
+        "INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, 'x', 'client')",
+        [(f'customer{i}', f'customer{i}@example.com') for i in range(customers)])
+
+    start = datetime(2025, 1, 1)
+    rows = []
+    for _ in range(orders):
+        created = start + timedelta(seconds=rng.randint(0, 365 * 86400))
+        payment = rng.choice(['Paid', 'Pending'])
+        rows.append((rng.randint(2, customers + 1), rng.randint(1, 100), 1, 10, 10, rng.choice(STATUSES),
+                     payment, 'UPI' if payment == 'Paid' else 'Cash on Delivery', 'Bench Street',
+                     created.strftime('%Y-%m-%d %H:%M:%S')))
+    connection.executemany("""
+        INSERT INTO orders (user_id, product_id, quantity, unit_price, total_amount, status, payment_status,
+                            payment_method, shipping_address, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    connection.execute("""
+        INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total)
+        SELECT order_id, product_id, quantity, unit_price, total_amount FROM orders
+    """)
+    # Status counts, as the write paths would maintain them
+    connection.execute("DELETE FROM order_status_counts")
+    connection.execute("""
+        INSERT INTO order_status_counts (status, payment_status, order_count)
+        SELECT status, payment_status, COUNT(*) FROM orders GROUP BY status, payment_status
+    """)
+    connection.commit()
+    return connection
+
+def milliseconds(client, url, headers, repeat):
+    client.get(url, headers=headers)  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.get_json()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Admin orders listing benchmark')
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20, help='requests per shape')
+    args = parser.parse_args()
+
+    print(f"Seeding {args.orders} orders for {args.customers} customers...")
+    connection = seed(args.orders, args.customers)
+
+    Config.BACKGROUND_JOBS = False  # no sweeper or alert engine running alongside the timed requests
+    from app import app
+    from flask_jwt_extended import create_access_token
+    from backend.utils import encode_cursor
+    client = app.test_client()
+    with app.app_context():
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+
+    middle = connection.execute(
+        "SELECT created_at, order_id FROM orders ORDER BY created_at DESC, order_id DESC LIMIT 1 OFFSET ?",
+        (args.orders // 2,)).fetchone()
+    deep_cursor = encode_cursor([middle[0], middle[1]])
+
+    shapes = [
+        ('first page', '/api/admin/orders'),
+        ('deep page', f'/api/admin/orders?cursor={deep_cursor}'),
+        ('status=Shipped', '/api/admin/orders?status=Shipped'),
+        ('payment_status=Pending', '/api/admin/orders?payment_status=Pending'),
+        ('customer', '/api/admin/orders?customer=customer7'),
+        ('one week', '/api/admin/orders?from=2025-06-01&to=2025-06-07'),
+    ]
+    print(f"\n{'request':<26} {'ms/request':>11}")
+    for label, url in shapes:
+        print(f"{label:<26} {milliseconds(client, url, headers, args.repeat):>11.2f}")
+
+    started = time.perf_counter()
+    connection.execute("""
+        SELECT o.*, p.product_name, u.username as customer_name,
+               (SELECT COUNT(*) FROM order_items i WHERE i.order_id = o.order_id) AS item_count
+        FROM orders o
+        JOIN products p ON o.product_id = p.product_id
+        JOIN users u ON o.user_id = u.user_id
+        ORDER BY o.created_at DESC
+    """).fetchall()
+    print(f"{'old full listing (query)':<26} {(time.perf_counter() - started) * 1000:>11.2f}")
+    connection.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Benchmark: stock movement cost with and without the alert engine
+
+Seeds a scratch SQLite database with products sitting just above their
+min_stock_level, then posts N stock movements (a stock-out and a stock-in
+on the same product, so it crosses the threshold both ways) through the
+Flask test client twice: once without the alert engine, once with it
+running. Reports
+the per-movement request time of each run, how many evaluation passes the
+engine needed for the burst, and the cost of the event subscriber itself,
+which is all the engine adds to a request.
+
+Usage:
+    python benchmarks/alert_engine_benchmark.py [--movements 5000] [--products 200] [--debounce 0.5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from database.database import get_db_connection, init_db
+
+def seed(products):
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='alerts-bench-'), 'bench.db')
+    init_db()
+    connection = get_db_connection()
+    connection.executemany(
+        "INSERT INTO products (sku, product_name, unit_price, quantity_in_stock, min_stock_level) VALUES (?, ?, 10, 11, 10)",
+        [(f'SKU-{i}', f'Product {i}') for i in range(products)])
+    connection.commit()
+    return connection
+
+def post_movements(client, headers, movements, products, rng):
+    started = time.perf_counter()
+    for i in range(movements):
+        if i % 2 == 0:
+            product_id = rng.randint(1, products)  # out to its minimum (low), then back in
+        movement = {'movement_type': 'stock-out' if i % 2 == 0 else 'stock-in', 'quantity': 1}
+        response = client.put(f'/api/products/{product_id}/stock', json=movement, headers=headers)
+        assert response.status_code == 200, response.get_json()
+    return (time.perf_counter() - started) / movements * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Alert engine overhead benchmark')
+    parser.add_argument('--movements', type=int, default=5000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--debounce', type=float, default=0.5, help='ALERT_DEBOUNCE, seconds')
+    args = parser.parse_args()
+
+    print(f"Seeding {args.products} products...")
+    connection = seed(args.products)
+    Config.ALERT_DEBOUNCE = args.debounce
+
+    Config.BACKGROUND_JOBS = False  # the benchmark runs its own engine
+    from app import app
+    from flask_jwt_extended import create_access_token
+    from backend.alert_engine import AlertEngine
+    client = app.test_client()
+    with app.app_context():
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+
+    rng = random.Random(42)
+    post_movements(client, headers, 200, args.products, rng)  # warm up
+    without_engine = post_movements(client, headers, args.movements, args.products, rng)
+
+    engine = AlertEngine(Config.ALERT_DEBOUNCE, Config.ALERT_BATCH_SIZE)
+    engine.start()
+    engine.wait_idle()
+    reconcile_passes, reconcile_checks = engine.stats['batches'], engine.stats['products']
+    with_engine = post_movements(client, headers, args.movements, args.products, rng)
+    started = time.perf_counter()
+    engine.wait_idle()
+    drain = time.perf_counter() - started
+    passes = engine.stats['batches'] - reconcile_passes
+    checks = engine.stats['products'] - reconcile_checks
+
+    calls = 100000
+    started = time.perf_counter()
+    for i in range(calls):
+        engine.notify([i % args.products + 1])
+    subscriber_us = (time.perf_counter() - started) / calls * 1e6
+    engine.wait_idle()
+    engine.stop()
+
+    open_alerts = connection.execute("SELECT COUNT(*) FROM alerts WHERE resolved_at IS NULL").fetchone()[0]
+    low = connection.execute("SELECT COUNT(*) FROM low_stock_products").fetchone()[0]
+    assert open_alerts == low, f'{open_alerts} open alerts for {low} low products'
+    connection.close()
+
+    print(f"\nwithout engine:       {without_engine:8.3f} ms/movement")
+    print(f"with engine:          {with_engine:8.3f} ms/movement ({with_engine - without_engine:+.3f})")
+    print(f"event subscriber:     {subscriber_us:8.2f} us/call")
+    print(f"evaluation passes:    {passes:8d} for {args.movements} movements "
+          f"({checks} product checks)")
+    print(f"drain after burst:    {drain:8.2f} s")
+    print(f"open alerts:          {open_alerts:8d} (= low-stock products)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark: delivering a day's orders one by one vs in one bulk request
+
+Seeds a scratch SQLite database with products and two identical sets of N
+open orders of a few lines each, then marks them Delivered through the Flask
+test client: the first set with a PUT /api/admin/orders/<id>/status per
+order, the second with POST /api/admin/orders/status (ORDER_BULK_MAX orders
+per request). Reports the wall time of each and checks both changed stock
+and reservations the same way.
+
+Usage:
+    python benchmarks/bulk_order_status_benchmark.py [--orders 2000] [--products 200] [--lines 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from database.database import get_db_connection, init_db
+
+def seed(products, orders, lines):
+    """
+    Fresh database with products and two identical sets of open, reserved
+    orders (the app's connection pool stays on one database, so both runs
+    share it); returns the two lists of order IDs
+    """
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='orders-bench-'), 'bench.db')
+    init_db()
+    connection = get_db_connection()
+    rng = random.Random(42)
+    connection.executemany(
+        "INSERT INTO products (sku, product_name, category, supplier, unit_price, quantity_in_stock) "
+        "VALUES (?, ?, 'Bench', 'Bench', ?, 1000000)",
+        [(f'SKU-{i}', f'Product {i}', round(rng.uniform(1, 100), 2)) for i in range(products)])
+
+    from backend.orders import _insert_order
+    from backend.reservations import reserve_stock
+    carts = []
+    for _ in range(orders):
+        picked = rng.sample(range(1, products + 1), lines)
+        carts.append([{'product_id': product_id, 'quantity': rng.randint(1, 5), 'unit_price': 10.0}
+                      for product_id in picked])
+    cursor = connection.cursor()
+    order_sets = []
+    for _ in range(2):
+        order_ids = []
+        for cart in carts:
+            order_lines = [dict(line, line_total=line['unit_price'] * line['quantity']) for line in cart]
+            order_id, _ = _insert_order(cursor, True, 1, order_lines, 'UPI', 'Bench Street')
+            reserve_stock(cursor, True, order_id, order_lines)
+            order_ids.append(order_id)
+        order_sets.append(order_ids)
+    connection.commit()
+    cursor.close()
+    return connection, order_sets
+
+def stock_of(connection):
+    return dict((row[0], (row[1], row[2])) for row in connection.execute(
+        "SELECT product_id, quantity_in_stock, reserved_quantity FROM products"))
+
+def change(before, after):
+    return {product_id: (after[product_id][0] - before[product_id][0], after[product_id][1] - before[product_id][1])
+            for product_id in before}
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk order status benchmark')
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=3, help='lines per order')
+    args = parser.parse_args()
+
+    Config.BACKGROUND_JOBS = False  # no sweeper or alert engine running alongside the timed requests
+    from app import app
+    from flask_jwt_extended import create_access_token
+    client = app.test_client()
+    with app.app_context():
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+
+    print(f"Seeding {args.orders} orders of {args.lines} lines over {args.products} products (twice)...")
+    connection, (single_ids, bulk_ids) = seed(args.products, args.orders, args.lines)
+
+    before = stock_of(connection)
+    started = time.perf_counter()
+    for order_id in single_ids:
+        response = client.put(f'/api/admin/orders/{order_id}/status', json={'status': 'Delivered'}, headers=headers)
+        assert response.status_code == 200, response.get_json()
+    one_by_one = time.perf_counter() - started
+    middle = stock_of(connection)
+
+    started = time.perf_counter()
+    for start in range(0, len(bulk_ids), Config.ORDER_BULK_MAX):
+        response = client.post('/api/admin/orders/status', headers=headers, json={
+            'order_ids': bulk_ids[start:start + Config.ORDER_BULK_MAX], 'status': 'Delivered'})
+        assert response.status_code == 200, response.get_json()
+    bulk = time.perf_counter() - started
+    assert change(middle, stock_of(connection)) == change(before, middle), 'bulk delivery changed stock differently'
+    connection.close()
+
+    print(f"\none request per order: {one_by_one:8.2f} s ({args.orders / one_by_one:8.0f} orders/s)")
+    print(f"bulk requests:         {bulk:8.2f} s ({args.orders / bulk:8.0f} orders/s)")
+    print(f"speedup:               {one_by_one / bulk:8.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Benchmark: GET /api/products from the in-memory catalog vs the database
+
+Seeds a scratch SQLite database with N products, then issues the same
+listing requests through the Flask test client with the catalog snapshot
+switched on and off, and reports requests per second for each. Also
+reports the memory the snapshot holds, scaled to 100k products, next to a
+plain list of row dicts holding the same data.
+
+Usage:
+    python benchmarks/catalog_snapshot_benchmark.py [--products 100000] [--seconds 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from database.database import get_db_connection, init_db
+
+WORDS = ['steel', 'wireless', 'mouse', 'laptop', 'chair', 'desk', 'cable', 'monitor', 'printer',
+         'paper', 'bottle', 'lamp', 'router', 'keyboard', 'drill', 'hammer', 'glove', 'marker']
+SHOP_FIELDS = 'product_name,description,category,unit_price,quantity_in_stock,unit_of_measure,image_url,is_active'
+
+def seed(count):
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='catalog-bench-'), 'bench.db')
+    init_db()
+    connection = get_db_connection()
+    rng = random.Random(42)
+    rows = []
+    for i in range(count):
+        name = ' '.join(rng.sample(WORDS, 3)).title()
+        rows.append((f'SKU-{i}', name, f'{name} for everyday use', f'Category {i % 40}', f'Supplier {i % 200}',
+                     round(rng.uniform(1, 500), 2), rng.randint(0, 200)))
+    connection.executemany(
+        "INSERT INTO products (sku, product_name, description, category, supplier, unit_price, quantity_in_stock) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    # Dimension rows and the low-stock set, as the write paths would maintain them
+    for table, key, name, field in (('categories', 'category_id', 'category_name', 'category'),
+                                    ('suppliers', 'supplier_id', 'supplier_name', 'supplier')):
+        connection.execute(f"INSERT OR IGNORE INTO {table} ({name}) SELECT DISTINCT {field} FROM products")
+        connection.execute(f"UPDATE products SET {key} = (SELECT {key} FROM {table} WHERE {name} = products.{field})")
+    connection.execute("""
+        INSERT INTO low_stock_products (product_id, status, quantity_in_stock, min_stock_level)
+        SELECT product_id, CASE WHEN quantity_in_stock <= 0 THEN 'out' ELSE 'low' END, quantity_in_stock, min_stock_level
+        FROM products WHERE is_active = 1 AND quantity_in_stock <= min_stock_level
+    """)
+    connection.commit()
+    return connection
+
+def measure_memory(connection):
+    """Bytes held by a loaded snapshot and by a list of row dicts with the same data"""
+    from backend.catalog import CatalogSnapshot
+    from database.database import dict_from_row
+
+    tracemalloc.start()
+    snapshot = CatalogSnapshot(True)
+    snapshot.refresh(lambda: connection)
+    snapshot.view()
+    columnar = tracemalloc.get_traced_memory()[0]
+    del snapshot
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    rows = [dict_from_row(row) for row in connection.execute("SELECT * FROM products WHERE is_active = 1")]
+    dicts = tracemalloc.get_traced_memory()[0]
+    del rows
+    tracemalloc.stop()
+    return columnar, dicts
+
+def requests_per_second(client, url, seconds):
+    client.get(url)  # warm up (and load the snapshot)
+    done = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+        done += 1
+    return done / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description='Catalog snapshot benchmark')
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--seconds', type=float, default=3, help='time spent on each request shape and path')
+    args = parser.parse_args()
+
+    print(f"Seeding {args.products} products...")
+    connection = seed(args.products)
+
+    Config.BACKGROUND_JOBS = False  # no sweeper or alert engine running alongside the timed requests
+    from app import app
+    client = app.test_client()
+
+    # A cursor from the middle of the listing, for a deep page
+    middle = connection.execute(
+        "SELECT product_name, product_id FROM products WHERE is_active = 1 ORDER BY product_name, product_id LIMIT 1 OFFSET ?",
+        (args.products // 2,)).fetchone()
+    from backend.utils import encode_cursor
+    deep_cursor = encode_cursor([middle[0], middle[1]])
+
+    shapes = [
+        ('first page (100)', '/api/products'),
+        ('shop page (500, projected)', f'/api/products?limit=500&fields={SHOP_FIELDS}'),
+        ('deep page (100)', f'/api/products?cursor={deep_cursor}'),
+        ('category filter', '/api/products?category=Category%207'),
+        ('low stock', '/api/products?low_stock=true'),
+    ]
+
+    print(f"\n{'request':<28} {'database req/s':>15} {'catalog req/s':>15} {'speedup':>8}")
+    for label, url in shapes:
+        Config.CATALOG_SNAPSHOT = False
+        database = requests_per_second(client, url, args.seconds)
+        Config.CATALOG_SNAPSHOT = True
+        catalog = requests_per_second(client, url, args.seconds)
+        print(f"{label:<28} {database:>15.0f} {catalog:>15.0f} {catalog / database:>7.1f}x")
+
+    columnar, dicts = measure_memory(connection)
+    scale = 100000 / args.products
+    print(f"\nMemory per 100k products: catalog snapshot {columnar * scale / 1e6:.1f} MB, "
+          f"list of row dicts {dicts * scale / 1e6:.1f} MB")
+    connection.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
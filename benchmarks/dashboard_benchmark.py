@@ -0,0 +1,148 @@
+"""
+Benchmark: dashboard statistics (GET /api/stats) before and after
+
+Seeds a scratch SQLite database with products, users and N stock movements
+spread over the last 90 days, then times
+- the previous implementation: eight separate statements, with today's
+  movements counted by date(created_at) = ?
+- the combined statement set the endpoint now runs on a cache miss
+- the endpoint through the Flask test client, with the cache off and on
+and, on their own, the two ways of counting today's movements.
+
+Usage:
+    python benchmarks/dashboard_benchmark.py [--movements 1000000] [--products 1000] [--repeat 50]
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from backend.utils import utc_today, day_bounds
+from database.database import get_db_connection, init_db
+
+def seed(movements, products, users):
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='dashboard-bench-'), 'bench.db')
+    init_db()
+    connection = get_db_connection()
+    connection.executemany(
+        "INSERT INTO products (sku, product_name, unit_price, quantity_in_stock, min_stock_level) VALUES (?, ?, 10, ?, 10)",
+        [(f'SKU-{i}', f'Product {i}', i % 50) for i in range(products)])
+    connection.executemany(
+        "INSERT INTO users (username, email, password_hash, role, first_name) VALUES (?, ?, 'x', 'employee', 'Bench')",
+        [(f'user{i}', f'user{i}@example.com') for i in range(users)])
+    connection.execute("""
+        INSERT INTO low_stock_products (product_id, status, quantity_in_stock, min_stock_level)
+        SELECT product_id, CASE WHEN quantity_in_stock <= 0 THEN 'out' ELSE 'low' END, quantity_in_stock, min_stock_level
+        FROM products WHERE is_active = 1 AND quantity_in_stock <= min_stock_level
+    """)
+    # Movements spread evenly over the last 90 days, newest first by ID
+    connection.execute("""
+        WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+        INSERT INTO stock_movements (product_id, movement_type, quantity, previous_quantity, new_quantity,
+                                     created_at, created_by)
+        SELECT x % ? + 1, CASE WHEN x % 2 THEN 'stock-in' ELSE 'stock-out' END, 1, 10, 11,
+               datetime('now', '-' || (x * 7776000 / ?) || ' seconds'), x % ? + 1
+        FROM n
+    """, (movements, products, movements, users + 1))
+    connection.commit()
+    return connection
+
+def legacy_stats(connection, user_id):
+    """The eight statements the endpoint used to run"""
+    today = datetime.date.today().strftime('%Y-%m-%d')  # as it was: the local date
+    role = connection.execute("SELECT role FROM users WHERE user_id = ?", (user_id,)).fetchone()['role']
+    connection.execute("SELECT COUNT(*) as total FROM products WHERE is_active = 1").fetchone()
+    connection.execute("SELECT COUNT(*) AS low_count FROM low_stock_products").fetchone()
+    connection.execute("SELECT COUNT(*) as total FROM stock_movements WHERE date(created_at) = ?", (today,)).fetchone()
+    connection.execute("SELECT COUNT(*) as total FROM users WHERE is_active = 1").fetchone()
+    connection.execute("""
+        SELECT m.*, p.product_name, u.username FROM stock_movements m
+        JOIN products p ON m.product_id = p.product_id LEFT JOIN users u ON m.created_by = u.user_id
+        ORDER BY m.created_at DESC LIMIT 5
+    """).fetchall()
+    connection.execute("""
+        SELECT p.product_name, p.quantity_in_stock, p.unit_of_measure FROM products p
+        WHERE is_active = 1 ORDER BY quantity_in_stock DESC LIMIT 3
+    """).fetchall()
+    connection.execute("""
+        SELECT alert_message FROM alerts WHERE alert_type IN ('Broadcast', 'Urgent', 'Maintenance')
+        AND is_acknowledged = 0 AND product_id IS NULL ORDER BY created_at DESC LIMIT 1
+    """).fetchone()
+    return role
+
+def combined_stats(connection, user_id):
+    from backend.dashboard import read_dashboard_stats
+    cursor = connection.cursor()
+    role = cursor.execute("SELECT role FROM users WHERE user_id = ?", (user_id,)).fetchone()['role']
+    stats = read_dashboard_stats(cursor, True, user_id, role, utc_today())
+    cursor.close()
+    return stats
+
+def timed(function, repeat):
+    function()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Dashboard statistics benchmark')
+    parser.add_argument('--movements', type=int, default=1000000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"Seeding {args.movements} movements...")
+    started = time.perf_counter()
+    connection = seed(args.movements, args.products, args.users)
+    print(f"seeded in {time.perf_counter() - started:.1f} s")
+
+    start, end = day_bounds(utc_today())
+    by_date = timed(lambda: connection.execute(
+        "SELECT COUNT(*) FROM stock_movements WHERE date(created_at) = ?", (start,)).fetchone(), args.repeat)
+    by_range = timed(lambda: connection.execute(
+        "SELECT COUNT(*) FROM stock_movements WHERE created_at >= ? AND created_at < ?", (start, end)).fetchone(), args.repeat)
+    legacy = timed(lambda: legacy_stats(connection, 1), args.repeat)
+    combined = timed(lambda: combined_stats(connection, 1), args.repeat)
+    today_count = connection.execute(
+        "SELECT COUNT(*) FROM stock_movements WHERE created_at >= ? AND created_at < ?", (start, end)).fetchone()[0]
+    assert combined_stats(connection, 1)['total_transactions'] == today_count
+
+    Config.BACKGROUND_JOBS = False  # no sweeper or alert engine running alongside the timed requests
+    from app import app
+    from flask_jwt_extended import create_access_token
+    from backend.dashboard import get_dashboard_cache
+    client = app.test_client()
+    with app.app_context():
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+    cache = get_dashboard_cache()
+    ttl = cache.ttl
+
+    def request():
+        response = client.get('/api/stats', headers=headers)
+        assert response.status_code == 200, response.get_json()
+
+    cache.ttl = 0
+    cache.clear()
+    uncached = timed(request, args.repeat)
+    cache.ttl = ttl
+    cached = timed(request, args.repeat)
+    connection.close()
+
+    print(f"\ntoday's movements:    {today_count:8d} of {args.movements}")
+    print(f"date(created_at) = ?: {by_date:8.2f} ms")
+    print(f"created_at range:     {by_range:8.2f} ms")
+    print(f"\nbefore (8 queries):   {legacy:8.2f} ms")
+    print(f"after (3 queries):    {combined:8.2f} ms")
+    print(f"\nGET /api/stats, no cache: {uncached:8.2f} ms")
+    print(f"GET /api/stats, cached:   {cached:8.2f} ms")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
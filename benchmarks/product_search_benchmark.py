@@ -0,0 +1,87 @@
+"""
+Benchmark: product search via FTS5 vs the old LIKE '%term%' scan
+
+Seeds a scratch SQLite database with N products (the FTS triggers index
+them as they are inserted), then times get_all_products(?search=...)
+against the previous LIKE query for a few search terms.
+
+Usage:
+    python benchmarks/product_search_benchmark.py [--products 1000000] [--runs 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from database.database import get_db_connection, init_db
+
+WORDS = ['steel', 'wireless', 'mouse', 'laptop', 'chair', 'desk', 'cable', 'monitor', 'printer',
+         'paper', 'bottle', 'lamp', 'router', 'keyboard', 'drill', 'hammer', 'glove', 'marker']
+TERMS = ['laptop', 'wire', 'SKU-12345', 'steel desk', 'zzz-no-match']
+
+LIKE_QUERY = """
+    SELECT product_id, sku, product_name FROM products
+    WHERE is_active = 1 AND (product_name LIKE ? OR sku LIKE ?)
+    ORDER BY product_name ASC LIMIT 100
+"""
+
+def seed(count):
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='search-bench-'), 'bench.db')
+    init_db()
+    connection = get_db_connection()
+    rng = random.Random(42)
+    batch = []
+    for i in range(count):
+        name = ' '.join(rng.sample(WORDS, 3)).title()
+        batch.append((f'SKU-{i}', name, f'{name} for everyday use', f'Category {i % 40}', f'Supplier {i % 200}'))
+        if len(batch) == 10000:
+            connection.executemany(
+                "INSERT INTO products (sku, product_name, description, category, supplier, unit_price) VALUES (?, ?, ?, ?, ?, 1.0)", batch)
+            batch = []
+    if batch:
+        connection.executemany(
+            "INSERT INTO products (sku, product_name, description, category, supplier, unit_price) VALUES (?, ?, ?, ?, ?, 1.0)", batch)
+    connection.commit()
+    return connection
+
+def time_ms(func, runs):
+    func()  # warm the page cache
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - started) * 1000 / runs
+
+def main():
+    parser = argparse.ArgumentParser(description='Product search benchmark')
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    connection = seed(args.products)
+    print(f"Seeded {args.products} products in {time.perf_counter() - started:.1f}s\n")
+
+    Config.BACKGROUND_JOBS = False  # no sweeper or alert engine running alongside the timed requests
+    from app import app
+    from backend.inventory import get_all_products
+
+    print(f"{'term':<16}{'LIKE ms':>10}{'FTS ms':>10}{'FTS hits (page)':>18}")
+    for term in TERMS:
+        pattern = f'%{term}%'
+        like_ms = time_ms(lambda: connection.execute(LIKE_QUERY, (pattern, pattern)).fetchall(), args.runs)
+
+        def fts_search():
+            with app.test_request_context('/api/products', query_string={'search': term, 'limit': 100}):
+                return get_all_products(connection)
+
+        fts_ms = time_ms(fts_search, args.runs)
+        hits = fts_search()[0].get_json()['total']
+        print(f"{term:<16}{like_ms:>10.2f}{fts_ms:>10.2f}{hits:>18}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: concurrent readers and writers against each SQLite profile
+
+Seeds a scratch database, then runs reader threads (product listing and
+movement history queries) alongside writer threads (the update_stock
+sequence: SELECT, UPDATE products, INSERT stock_movements, COMMIT) for a
+fixed duration per profile and reports throughput.
+
+Usage:
+    python benchmarks/sqlite_profile_benchmark.py [--readers 4] [--writers 2] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from database.database import SQLITE_PROFILES, get_db_connection, init_db
+
+PRODUCTS = 2000
+
+def seed(path, profile):
+    """Create a fresh database at path using the given profile"""
+    Config.SQLITE_DB_PATH = path
+    Config.SQLITE_PROFILE = profile
+    init_db()
+    connection = get_db_connection()
+    connection.executemany(
+        "INSERT INTO products (sku, product_name, category, supplier, unit_price, quantity_in_stock) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f'SKU-{i}', f'Product {i:05d}', f'Category {i % 20}', f'Supplier {i % 50}', 9.99, 1000)
+         for i in range(PRODUCTS)])
+    connection.commit()
+    connection.close()
+
+def reader(stop, counters):
+    connection = get_db_connection()
+    done = 0
+    while not stop.is_set():
+        product_id = random.randint(1, PRODUCTS)
+        connection.execute(
+            "SELECT product_id, sku, product_name, quantity_in_stock FROM products WHERE is_active = 1 ORDER BY product_name LIMIT 50"
+        ).fetchall()
+        connection.execute(
+            "SELECT * FROM stock_movements WHERE product_id = ? ORDER BY created_at DESC LIMIT 20", (product_id,)
+        ).fetchall()
+        done += 1
+    connection.close()
+    counters['reads'] += done
+
+def writer(stop, counters):
+    connection = get_db_connection()
+    done = errors = 0
+    while not stop.is_set():
+        product_id = random.randint(1, PRODUCTS)
+        try:
+            row = connection.execute(
+                "SELECT quantity_in_stock FROM products WHERE product_id = ?", (product_id,)).fetchone()
+            previous = row['quantity_in_stock']
+            connection.execute(
+                "UPDATE products SET quantity_in_stock = ?, updated_at = CURRENT_TIMESTAMP WHERE product_id = ?",
+                (previous + 1, product_id))
+            connection.execute(
+                "INSERT INTO stock_movements (product_id, movement_type, quantity, previous_quantity, new_quantity) VALUES (?, 'stock-in', 1, ?, ?)",
+                (product_id, previous, previous + 1))
+            connection.commit()
+            done += 1
+        except sqlite3.OperationalError:
+            connection.rollback()
+            errors += 1
+    connection.close()
+    counters['writes'] += done
+    counters['write_errors'] += errors
+
+def run(profile, readers, writers, seconds):
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    seed(os.path.join(directory, 'bench.db'), profile)
+
+    counters = {'reads': 0, 'writes': 0, 'write_errors': 0}
+    lock = threading.Lock()
+
+    def guarded(target):
+        def body():
+            local = {'reads': 0, 'writes': 0, 'write_errors': 0}
+            target(stop, local)
+            with lock:
+                for key, value in local.items():
+                    counters[key] += value
+        return body
+
+    stop = threading.Event()
+    threads = ([threading.Thread(target=guarded(reader)) for _ in range(readers)] +
+               [threading.Thread(target=guarded(writer)) for _ in range(writers)])
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'reads_per_sec': counters['reads'] / seconds,
+        'writes_per_sec': counters['writes'] / seconds,
+        'write_errors': counters['write_errors']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds}s per profile\n")
+    print(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'write errors':>15}")
+    for profile in SQLITE_PROFILES:
+        result = run(profile, args.readers, args.writers, args.seconds)
+        print(f"{profile:<12}{result['reads_per_sec']:>12.0f}{result['writes_per_sec']:>12.0f}{result['write_errors']:>15}")
+
+if __name__ == '__main__':
+    main()
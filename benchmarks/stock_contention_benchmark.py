@@ -0,0 +1,140 @@
+"""
+Stress test: concurrent stock movements through PUT /api/products/<id>/stock
+
+Seeds a scratch SQLite database with a few products, then runs many threads
+that hammer the same products with random stock-in / stock-out requests.
+Afterwards it checks that no update was lost and nothing was oversold:
+
+- every product's final quantity equals its initial quantity plus the
+  accepted stock-ins minus the accepted stock-outs
+- quantities never went below zero
+- each product's stock_movements rows form an unbroken chain
+  (previous_quantity of one row == new_quantity of the row before it)
+
+Reports accepted movements per second. Exits 1 if any check fails.
+
+Usage:
+    python benchmarks/stock_contention_benchmark.py [--threads 8] [--requests 500] [--products 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from database.database import get_db_connection, init_db
+
+INITIAL_STOCK = 50
+
+def seed(products):
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='stock-bench-'), 'bench.db')
+    init_db()
+    connection = get_db_connection()
+    connection.executemany(
+        "INSERT INTO products (sku, product_name, category, supplier, unit_price, quantity_in_stock) VALUES (?, ?, 'Bench', 'Bench', 1.0, ?)",
+        [(f'BENCH-{i}', f'Bench product {i}', INITIAL_STOCK) for i in range(products)]
+    )
+    connection.commit()
+    ids = [row[0] for row in connection.execute("SELECT product_id FROM products ORDER BY product_id")]
+    connection.close()
+    return ids
+
+def worker(app, token, product_ids, requests, seed_value, tally, lock):
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    rng = random.Random(seed_value)
+    local = {}
+    for _ in range(requests):
+        product_id = rng.choice(product_ids)
+        # Bias towards stock-out so the products regularly run dry
+        movement_type = 'stock-out' if rng.random() < 0.6 else 'stock-in'
+        quantity = rng.randint(1, 5)
+        response = client.put(f'/api/products/{product_id}/stock', headers=headers,
+                              json={'movement_type': movement_type, 'quantity': quantity})
+        key = (product_id, movement_type, response.status_code)
+        entry = local.setdefault(key, [0, 0])
+        entry[0] += 1
+        entry[1] += quantity
+    with lock:
+        for key, (count, quantity) in local.items():
+            entry = tally.setdefault(key, [0, 0])
+            entry[0] += count
+            entry[1] += quantity
+
+def check(product_ids, tally):
+    connection = get_db_connection()
+    failures = []
+    for product_id in product_ids:
+        stock_in = tally.get((product_id, 'stock-in', 200), [0, 0])[1]
+        stock_out = tally.get((product_id, 'stock-out', 200), [0, 0])[1]
+        expected = INITIAL_STOCK + stock_in - stock_out
+        actual = connection.execute("SELECT quantity_in_stock FROM products WHERE product_id = ?", (product_id,)).fetchone()[0]
+        if actual != expected:
+            failures.append(f"product {product_id}: quantity {actual}, expected {expected} (lost update)")
+        if actual < 0:
+            failures.append(f"product {product_id}: negative quantity {actual} (oversold)")
+
+        previous = INITIAL_STOCK
+        rows = connection.execute(
+            "SELECT movement_id, previous_quantity, new_quantity FROM stock_movements WHERE product_id = ? ORDER BY movement_id",
+            (product_id,)
+        ).fetchall()
+        for movement_id, previous_quantity, new_quantity in rows:
+            if previous_quantity != previous or new_quantity < 0:
+                failures.append(f"product {product_id}: movement {movement_id} breaks the chain "
+                                f"({previous_quantity} -> {new_quantity}, expected from {previous})")
+                break
+            previous = new_quantity
+    connection.close()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent stock movement stress test')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='requests per thread')
+    parser.add_argument('--products', type=int, default=3, help='fewer products means more contention')
+    args = parser.parse_args()
+
+    product_ids = seed(args.products)
+
+    Config.BACKGROUND_JOBS = False  # no sweeper or alert engine running alongside the timed requests
+    from app import app
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        token = create_access_token(identity='1')  # the seeded admin
+
+    tally = {}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker, args=(app, token, product_ids, args.requests, i, tally, lock))
+               for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = args.threads * args.requests
+    accepted = sum(count for (_, _, status), (count, _) in tally.items() if status == 200)
+    rejected = sum(count for (_, _, status), (count, _) in tally.items() if status == 400)
+    errors = total - accepted - rejected
+    print(f"{total} requests from {args.threads} threads on {args.products} products in {elapsed:.2f}s")
+    print(f"  accepted movements:        {accepted} ({accepted / elapsed:.0f}/s)")
+    print(f"  rejected (insufficient):   {rejected}")
+    print(f"  errors:                    {errors}")
+
+    failures = check(product_ids, tally)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if errors:
+        print(f"FAIL {errors} requests failed with a server error")
+    print('OK: no lost updates, no overselling' if not failures and not errors else 'FAILED')
+    return 1 if failures or errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -26,3 +26,8 @@ CREATE TABLE IF NOT EXISTS transactions (
     FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL
 );
+
+-- Indexes for active alerts, alert history and transaction listing
+CREATE INDEX idx_alerts_ack_created ON alerts(is_acknowledged, created_at);
+CREATE INDEX idx_alerts_ack_acknowledged ON alerts(is_acknowledged, acknowledged_at);
+CREATE INDEX idx_transactions_date ON transactions(transaction_date);
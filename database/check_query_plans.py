@@ -0,0 +1,266 @@
+"""
+Query plan checker for the SQLite schema
+
+Collects every SQL statement literal issued from backend/*.py, builds a
+scratch database with init_db(), runs EXPLAIN QUERY PLAN on each statement
+and fails (exit code 1) if a query on a hot table falls back to a full
+table scan. Whole-table statements that are scans by design (reports,
+exports) are listed in FULL_SCAN_ALLOWED.
+
+f-string statements are rendered before they are checked: placeholders
+become ?, `x if use_sqlite else y` takes the SQLite branch, and every other
+{...} is replaced with each of its SQLite variants from RENDERINGS. A
+statement with a {...} that has no rendering is an error, so new dynamic
+SQL cannot slip past the check.
+
+Usage:
+    python database/check_query_plans.py [--verbose]
+"""
+import argparse
+import ast
+import glob
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[0] = ROOT  # run from the project root so 'database' resolves to the package directory
+
+from backend.config import Config
+from database.database import init_db
+from backend.dimensions import DIMENSIONS
+from backend.inventory import PRODUCT_FIELDS
+
+# Tables that grow with business activity; a full scan on these fails the check
+HOT_TABLES = {'products', 'stock_movements', 'orders', 'alerts', 'transactions'}
+
+# Statements that read a whole hot table on purpose, matched by substring
+FULL_SCAN_ALLOWED = {
+    "GROUP BY category": 'admin analytics category breakdown covers every product',
+    "SUM(unit_price * quantity_in_stock)": 'admin analytics inventory value covers every product',
+    "WHERE created_at <= ? ORDER BY product_name": 'stock as of a date lists every product that existed then',
+    "ORDER BY a.alert_id DESC LIMIT": 'the first inbox page walks alerts newest-first and stops at the limit',
+}
+
+# MySQL-only syntax; the SQLite variant of the same query is checked instead
+MYSQL_ONLY = re.compile(r'\bAGAINST\s*\(|\bINSERT\s+IGNORE\b|\bON\s+DUPLICATE\s+KEY\b|\bFOR\s+UPDATE\b|\bINTERVAL\b', re.IGNORECASE)
+
+# Placeholder names in f-strings; ', '.join([p] * n) renders as one ? too
+PLACEHOLDERS = {'p', 'placeholder', 'placeholders'}
+PLACEHOLDER_LIST = re.compile(r"^', '\.join\(\[(\w+)\] \* .+\)$")
+
+# SQLite variants of the other {...} pieces of f-string statements, by their
+# source text ('module.py:expr' where a name means different things per
+# module). A tuple key renders several pieces together.
+RENDERINGS = {
+    'lock_clause': [''],
+    'insert': ['INSERT OR IGNORE'],
+    ('table', 'key', 'name_column'): list(DIMENSIONS.values()),
+    "', '.join(PRODUCT_FIELDS)": [', '.join(PRODUCT_FIELDS)],
+    'alerts.py:keyset': ['', 'AND acknowledged_at <= ? AND (acknowledged_at < ? OR alert_id < ?)'],
+    'alerts.py:cutoff': ["datetime('now', ?)"],
+    "alerts.py:' AND '.join(conditions)": [
+        'alert_id IN (?, ?)',
+        'alert_type = ? AND product_id = ?',
+        'product_id IN (SELECT product_id FROM products WHERE category_id = '
+        '(SELECT category_id FROM categories WHERE category_name = ?))',
+    ],
+    'catalog.py:where': ['is_active = 1', 'product_id IN (?, ?)', 'updated_at >= ?'],
+    'inbox.py:where': ['', 'WHERE a.alert_id < ?', 'WHERE a.alert_id > ? AND d.alert_id IS NULL'],
+    "inventory.py:', '.join(update_fields)": [
+        'product_name = ?, category = ?, category_id = ?, updated_by = ?, updated_at = CURRENT_TIMESTAMP'],
+    'inventory.py:conditions': [
+        'product_id = ?',
+        'product_id = ? AND created_at >= ? AND created_at <= ? AND movement_type IN (?, ?)',
+        'product_id = ? AND created_at <= ? AND (created_at < ? OR movement_id < ?)',
+    ],
+    'inventory.py:day': ['substr(created_at, 1, 10)'],
+    "orders.py:' AND '.join(conditions)": [
+        'o.user_id = (SELECT user_id FROM users WHERE username = ?)',
+        'o.created_at >= ? AND o.created_at <= ?',
+        'o.payment_status = ? AND o.created_at >= ?',
+    ],
+    'orders.py:where': [
+        '',
+        'WHERE o.status = ?',
+        'WHERE o.payment_status = ?',
+        'WHERE o.user_id = (SELECT user_id FROM users WHERE username = ?) AND o.status = ?',
+        'WHERE o.created_at >= ? AND o.created_at <= ?',
+        'WHERE o.status = ? AND o.created_at <= ? AND (o.created_at < ? OR o.order_id < ?)',
+    ],
+    'stock.py:change': ['quantity_in_stock = quantity_in_stock + ?', 'quantity_in_stock = quantity_in_stock - ?'],
+    'stock.py:touch': ['updated_at = CURRENT_TIMESTAMP, updated_by = ?'],
+    'stock.py:active_clause': ['', ' AND is_active = 1'],
+    'stock.py:guard': ['', ' AND quantity_in_stock - reserved_quantity >= ?'],
+    'stock_history.py:product_clause': ['', ' AND product_id = ?'],
+}
+
+SQL_START = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|JOIN|LEFT|INNER|ON|ORDER|GROUP|LIMIT)(\w+))?', re.IGNORECASE)
+
+def collect_statements():
+    """Return ({normalized_sql: [source locations]}, [(location, expression)] that could not be rendered)"""
+    statements = {}
+    unrendered = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'backend', '*.py'))):
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        module = os.path.basename(path)
+        # Constant pieces of f-strings are partial statements; the f-string is checked whole
+        fragments = {id(part) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for part in node.values}
+        for node in ast.walk(tree):
+            location = f"{os.path.relpath(path, ROOT)}:{getattr(node, 'lineno', 0)}"
+            if isinstance(node, ast.JoinedStr):
+                # Judge the template with each {...} spelled out, so f"{insert} INTO ..." counts
+                template = ''.join(part.value if isinstance(part, ast.Constant) else ast.unparse(part.value)
+                                   for part in node.values)
+                if not is_statement(template):
+                    continue
+                try:
+                    variants = render(node, module)
+                except KeyError as e:
+                    unrendered.append((location, e.args[0]))
+                    continue
+            elif isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in fragments:
+                variants = [node.value]
+            else:
+                continue
+            for variant in variants:
+                if not is_statement(variant) or MYSQL_ONLY.search(variant):
+                    continue
+                locations = statements.setdefault(normalize(variant), [])
+                if location not in locations:
+                    locations.append(location)
+    return statements, unrendered
+
+def is_statement(text):
+    """True for text that reads like a whole SQL statement"""
+    return bool(SQL_START.match(text) and re.search(r'\b(FROM|INTO|SET)\b', text, re.IGNORECASE))
+
+def render(node, module):
+    """Every SQLite rendering of an f-string; KeyError names a {...} with no rendering"""
+    pieces = []     # constant text, or (group index, name index) of a rendered piece
+    groups = []     # (names, variants) of the RENDERINGS entries in use
+    for part in node.values:
+        if isinstance(part, ast.Constant):
+            pieces.append(part.value)
+            continue
+        fixed = render_fixed(part.value)
+        if fixed is not None:
+            pieces.append(fixed)
+            continue
+        source = ast.unparse(part.value)
+        group = next((index for index, (names, _) in enumerate(groups) if source in names), None)
+        if group is None:
+            groups.append(rendering(source, module))
+            group = len(groups) - 1
+        pieces.append((group, groups[group][0].index(source)))
+
+    rendered = []
+    for choice in itertools.product(*(variants for _, variants in groups)):
+        rendered.append(''.join(piece if isinstance(piece, str) else choice[piece[0]][piece[1]]
+                                for piece in pieces))
+    return rendered
+
+def render_fixed(expression):
+    """The SQLite text of a placeholder or a use_sqlite conditional, or None"""
+    source = ast.unparse(expression)
+    if isinstance(expression, ast.Name) and expression.id in PLACEHOLDERS:
+        return '?'
+    match = PLACEHOLDER_LIST.match(source)
+    if match and match.group(1) in PLACEHOLDERS:
+        return '?'
+    if isinstance(expression, ast.IfExp) and ast.unparse(expression.test).split('.')[-1].lower() == 'use_sqlite':
+        if isinstance(expression.body, ast.Constant):
+            return str(expression.body.value)
+        return render_fixed(expression.body)
+    return None
+
+def rendering(source, module):
+    """(names, variants) for a {...} piece; each variant holds one text per name"""
+    for key in (f"{module}:{source}", source):
+        if key in RENDERINGS:
+            return (source,), [(variant,) for variant in RENDERINGS[key]]
+    for key, variants in RENDERINGS.items():
+        if isinstance(key, tuple) and source in key:
+            return key, [tuple(variant) for variant in variants]
+    raise KeyError(source)
+
+def normalize(statement):
+    """Rewrite a MySQL or str.format() template into runnable SQLite"""
+    statement = statement.replace('%s', '?').replace('{}', '1')
+    return ' '.join(statement.split())
+
+def explain(connection, statement):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    params = (None,) * statement.count('?')
+    rows = connection.execute(f"EXPLAIN QUERY PLAN {statement}", params).fetchall()
+    return [row[3] for row in rows]
+
+def full_scans(statement, plan):
+    """Return the hot tables read by a full table scan in a plan"""
+    # The plan names aliased tables by their alias
+    aliases = {}
+    for table, alias in TABLE_ALIAS.findall(statement):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+
+    tables = set()
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in HOT_TABLES:
+                tables.add(table)
+    return tables
+
+def main():
+    parser = argparse.ArgumentParser(description='Check backend queries for full table scans')
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every statement')
+    args = parser.parse_args()
+
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='query-plans-'), 'plans.db')
+    if not init_db():
+        print('Could not initialize scratch database')
+        return 1
+    connection = sqlite3.connect(Config.SQLITE_DB_PATH)
+
+    failures = []
+    errors = []
+    statements, unrendered = collect_statements()
+    for location, expression in unrendered:
+        errors.append(('', [location], f"no rendering for {{{expression}}}; add it to RENDERINGS"))
+    for statement, locations in statements.items():
+        try:
+            plan = explain(connection, statement)
+        except sqlite3.Error as e:
+            errors.append((statement, locations, str(e)))
+            continue
+
+        scanned = full_scans(statement, plan)
+        allowed = any(marker in statement for marker in FULL_SCAN_ALLOWED)
+        if scanned and not allowed:
+            failures.append((statement, locations, plan, scanned))
+        if args.verbose:
+            print(f"{locations[0]}: {statement}")
+            for detail in plan:
+                print(f"    {detail}")
+
+    for statement, locations, message in errors:
+        print(f"ERROR  {', '.join(locations)}: {message}" + (f"\n       {statement}" if statement else ''))
+    for statement, locations, plan, scanned in failures:
+        print(f"SCAN   {', '.join(locations)}: full scan of {', '.join(sorted(scanned))}\n       {statement}")
+        for detail in plan:
+            print(f"         {detail}")
+
+    print(f"\n{len(statements)} statements checked, {len(failures)} full scans, {len(errors)} errors")
+    connection.close()
+    return 1 if failures or errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,10 +2,35 @@
 Database connection and utilities
 """
 import sqlite3
+import threading
+import time
 import pymysql
 from backend.config import Config
 import os
 
+# PRAGMA settings applied to every SQLite connection, selected by Config.SQLITE_PROFILE.
+# 'default' keeps SQLite's stock rollback-journal behaviour.
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',        # readers no longer block on writers
+        'synchronous': 'NORMAL',      # durable at checkpoints, safe with WAL
+        'busy_timeout': 5000,         # ms to wait on a locked database
+        'mmap_size': 268435456,       # 256 MB memory-mapped reads
+        'cache_size': -65536,         # 64 MB page cache (negative = KiB)
+        'temp_store': 'MEMORY'
+    }
+}
+
+def apply_sqlite_profile(connection, profile=None):
+    """Apply the PRAGMAs of a named performance profile to a SQLite connection"""
+    name = profile or Config.SQLITE_PROFILE
+    if name not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile '{name}'. Choose one of: {', '.join(SQLITE_PROFILES)}")
+    for pragma, value in SQLITE_PROFILES[name].items():
+        connection.execute(f"PRAGMA {pragma} = {value}")
+    return connection
+
 def get_db_connection():
     """Create and return a database connection (SQLite or MySQL)"""
     try:
@@ -13,6 +38,7 @@ def get_db_connection():
             # Use SQLite
             connection = sqlite3.connect(Config.SQLITE_DB_PATH, check_same_thread=False)
             connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+            apply_sqlite_profile(connection)
             return connection
         else:
             # Use MySQL
@@ -30,216 +56,237 @@ def get_db_connection():
         print(f"Error connecting to database: {e}")
         raise
 
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available within the checkout timeout"""
+    pass
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections (SQLite or MySQL)
+
+    Connections are opened lazily up to `size`. A checkout blocks for at most
+    `timeout` seconds waiting for a free connection. Connections that have been
+    idle longer than `health_check_after` seconds are pinged before being handed
+    out and replaced if the ping fails. Returned connections are rolled back so
+    an unfinished transaction never leaks into the next request.
+    """
+
+    def __init__(self, size=None, timeout=None, health_check_after=None, factory=None):
+        self.size = size or Config.DB_POOL_SIZE
+        self.timeout = Config.DB_POOL_TIMEOUT if timeout is None else timeout
+        self.health_check_after = (Config.DB_POOL_HEALTH_CHECK_AFTER
+                                   if health_check_after is None else health_check_after)
+        self._factory = factory or get_db_connection
+        self._lock = threading.Condition(threading.Lock())
+        self._idle = []  # (connection, returned_at) pairs, most recently used last
+        self._waiters = []  # checkout tickets in arrival order
+        self._opened = 0
+        self._closed = False
+
+        # Counters for sizing the pool
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._replaced = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._peak_in_use = 0
+
+    def acquire(self):
+        """Check out a connection, waiting up to the pool timeout"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        ticket = object()
+        with self._lock:
+            # Serve waiters first-come first-served so a busy thread cannot starve the others
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolTimeoutError('Connection pool is closed')
+                    if self._waiters[0] is ticket:
+                        if self._idle:
+                            connection, returned_at = self._idle.pop()
+                            break
+                        if self._opened < self.size:
+                            self._opened += 1
+                            connection, returned_at = None, None
+                            break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f'No database connection available within {self.timeout} seconds')
+                    waited = True
+                    self._lock.wait(remaining)
+            finally:
+                self._waiters.remove(ticket)
+                self._lock.notify_all()
+
+            wait_time = time.monotonic() - started
+            self._checkouts += 1
+            self._total_wait += wait_time
+            self._max_wait = max(self._max_wait, wait_time)
+            if waited:
+                self._waits += 1
+            self._peak_in_use = max(self._peak_in_use, self._opened - len(self._idle))
+
+        # Open or health-check outside the lock so slow I/O does not block other threads
+        try:
+            if connection is None:
+                connection = self._factory()
+            elif time.monotonic() - returned_at > self.health_check_after and not self._is_healthy(connection):
+                close_db_connection_quietly(connection)
+                with self._lock:
+                    self._replaced += 1
+                connection = self._factory()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+                self._lock.notify_all()
+            raise
+        return connection
+
+    def release(self, connection):
+        """Return a connection to the pool, discarding any uncommitted work"""
+        try:
+            connection.rollback()
+        except Exception:
+            # Broken connection: drop it so a fresh one is opened on demand
+            close_db_connection_quietly(connection)
+            with self._lock:
+                self._opened -= 1
+                self._lock.notify_all()
+            return
+
+        with self._lock:
+            if self._closed:
+                self._opened -= 1
+                close_db_connection_quietly(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._lock.notify_all()
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+            self._lock.notify_all()
+        for connection, _ in idle:
+            close_db_connection_quietly(connection)
+
+    def stats(self):
+        """Return wait-time and utilization counters"""
+        with self._lock:
+            in_use = self._opened - len(self._idle)
+            return {
+                'size': self.size,
+                'open': self._opened,
+                'in_use': in_use,
+                'idle': len(self._idle),
+                'peak_in_use': self._peak_in_use,
+                'utilization': round(in_use / self.size, 3),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'replaced': self._replaced,
+                'avg_wait_ms': round(self._total_wait * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3)
+            }
+
+    @staticmethod
+    def _is_healthy(connection):
+        """Ping a connection that has been idle for a while"""
+        try:
+            if isinstance(connection, sqlite3.Connection):
+                connection.execute("SELECT 1").fetchone()
+            else:
+                connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
 def init_db():
-    """Initialize database with schema"""
+    """
+    Bring the database schema up to date by applying pending migrations
+    (see database/migrations.py). When the schema is already current this
+    costs a single version lookup.
+    """
+    from database.migrations import migrate
+    connection = None
     try:
         if Config.USE_SQLITE:
-            # Initialize SQLite database
             connection = sqlite3.connect(Config.SQLITE_DB_PATH)
-            cursor = connection.cursor()
-            
-            # Create users table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    role TEXT NOT NULL DEFAULT 'employee',
-                    first_name TEXT,
-                    last_name TEXT,
-                    phone TEXT,
-                    is_active INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP NULL,
-                    created_by INTEGER,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL
-                )
-            """)
-            
-            # Create default admin user (password: Admin@123)
-            cursor.execute("""
-                INSERT OR IGNORE INTO users (username, email, password_hash, role, first_name, last_name, is_active)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                'admin',
-                'admin@inventory.com',
-                '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY5agyPY.9F7Lca',
-                'admin',
-                'System',
-                'Administrator',
-                1
-            ))
-            
-            # Create products table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS products (
-                    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sku TEXT UNIQUE NOT NULL,
-                    product_name TEXT NOT NULL,
-                    description TEXT,
-                    category TEXT,
-                    supplier TEXT,
-                    unit_price REAL NOT NULL,
-                    quantity_in_stock INTEGER NOT NULL DEFAULT 0,
-                    min_stock_level INTEGER DEFAULT 10,
-                    unit_of_measure TEXT DEFAULT 'units',
-                    image_url TEXT,
-                    is_active INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    created_by INTEGER,
-                    updated_by INTEGER,
-                    FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL,
-                    FOREIGN KEY (updated_by) REFERENCES users(user_id) ON DELETE SET NULL
-                )
-            """)
-            # Migration: add image_url to existing databases
+            apply_sqlite_profile(connection)
+            version = migrate(connection, use_sqlite=True)
+            print(f"SQLite database ready at {Config.SQLITE_DB_PATH} (schema version {version})")
+        else:
             try:
-                cursor.execute("ALTER TABLE products ADD COLUMN image_url TEXT")
-                connection.commit()
-            except Exception:
-                pass  # Column already exists
-            
-            # Create stock movements table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS stock_movements (
-                    movement_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    product_id INTEGER NOT NULL,
-                    movement_type TEXT NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    previous_quantity INTEGER NOT NULL,
-                    new_quantity INTEGER NOT NULL,
-                    reference_number TEXT,
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    created_by INTEGER,
-                    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
-                    FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL
-                )
-            """)
-            
-            # Create alerts table - Milestone 3
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS alerts (
-                    alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    product_id INTEGER,
-                    alert_type TEXT NOT NULL,
-                    alert_message TEXT NOT NULL,
-                    is_acknowledged INTEGER DEFAULT 0,
-                    acknowledged_at TIMESTAMP,
-                    acknowledged_by INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
-                    FOREIGN KEY (acknowledged_by) REFERENCES users(user_id) ON DELETE SET NULL
-                )
-            """)
-            
-            # Create transactions table - Milestone 4
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    product_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    transaction_type TEXT NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    unit_price REAL NOT NULL,
-                    total_amount REAL NOT NULL,
-                    transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    notes TEXT,
-                    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL
-                )
-            """)
-
-            # Create orders table - Milestone 5
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS orders (
-                    order_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    product_id INTEGER NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    unit_price REAL NOT NULL,
-                    total_amount REAL NOT NULL,
-                    status TEXT NOT NULL DEFAULT 'Pending',
-                    payment_status TEXT NOT NULL DEFAULT 'Paid', 
-                    payment_method TEXT,
-                    shipping_address TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-                    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
-                )
-            """)
-            
-            # Create categories table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS categories (
-                    category_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category_name TEXT UNIQUE NOT NULL,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                connection = get_db_connection()
+            except pymysql.err.OperationalError as e:
+                if e.args[0] != 1049:  # ER_BAD_DB_ERROR: database does not exist yet
+                    raise
+                connection = pymysql.connect(
+                    host=Config.DB_HOST,
+                    user=Config.DB_USER,
+                    password=Config.DB_PASSWORD,
+                    port=Config.DB_PORT,
+                    cursorclass=pymysql.cursors.DictCursor,
+                    autocommit=False
                 )
-            """)
-            
-            # Create suppliers table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS suppliers (
-                    supplier_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    supplier_name TEXT UNIQUE NOT NULL,
-                    contact_person TEXT,
-                    email TEXT,
-                    phone TEXT,
-                    address TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            connection.commit()
+                with connection.cursor() as cursor:
+                    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{Config.DB_NAME}`")
+                connection.select_db(Config.DB_NAME)
+            version = migrate(connection, use_sqlite=False)
+            print(f"MySQL database ready (schema version {version})")
+        return True
 
-            cursor.close()
-            connection.close()
-            
-            print(f"SQLite database initialized successfully at {Config.SQLITE_DB_PATH}")
-            return True
-        else:
-            # Initialize MySQL database
-            connection = pymysql.connect(
-                host=Config.DB_HOST,
-                user=Config.DB_USER,
-                password=Config.DB_PASSWORD,
-                port=Config.DB_PORT
-            )
-            
-            cursor = connection.cursor()
-            
-            # Read and execute schema file
-            with open('database/schema.sql', 'r') as f:
-                schema = f.read()
-                
-            # Split by semicolon and execute each statement
-            statements = schema.split(';')
-            for statement in statements:
-                if statement.strip():
-                    cursor.execute(statement)
-            
-            connection.commit()
-            cursor.close()
-            connection.close()
-            
-            print("MySQL database initialized successfully")
-            return True
-        
     except Exception as e:
         print(f"Error initializing database: {e}")
         return False
+    finally:
+        if connection:
+            connection.close()
+
+def begin_write(connection):
+    """
+    Start a transaction for a read-then-write sequence
+    SQLite takes the database write lock up front (BEGIN IMMEDIATE) so rows
+    read inside the transaction cannot change before commit; on MySQL the
+    caller locks the rows it reads with SELECT ... FOR UPDATE.
+    """
+    if Config.USE_SQLITE:
+        connection.execute("BEGIN IMMEDIATE")
+    else:
+        connection.begin()
 
 def close_db_connection(connection):
     """Close database connection"""
     if connection:
         connection.close()
 
+def close_db_connection_quietly(connection):
+    """Close a connection, ignoring errors from one that is already broken"""
+    try:
+        close_db_connection(connection)
+    except Exception:
+        pass
+
 def dict_from_row(row):
     """Convert SQLite row to dictionary"""
     if row is None:
@@ -0,0 +1,902 @@
+"""
+Versioned schema migrations for SQLite and MySQL
+
+Each migration is a (version, name, function) entry in MIGRATIONS. The
+function receives a cursor and the use_sqlite flag and issues the DDL for
+that dialect. Applied versions are recorded in the schema_migrations table.
+
+migrate() reads the current version with a single query and returns
+immediately when nothing is pending. Otherwise each pending migration runs
+in its own transaction together with its schema_migrations row. (MySQL
+commits DDL implicitly, so there a failed migration may leave partial DDL
+behind; the helpers below are written to be safely re-run.)
+
+To change the schema, append a new migration - never edit one that has
+already shipped.
+"""
+
+DEFAULT_ADMIN = (
+    'admin',
+    'admin@inventory.com',
+    '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY5agyPY.9F7Lca',  # Admin@123
+    'admin',
+    'System',
+    'Administrator',
+    1
+)
+
+SQLITE_BASELINE = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT NOT NULL DEFAULT 'employee',
+        first_name TEXT,
+        last_name TEXT,
+        phone TEXT,
+        is_active INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP NULL,
+        created_by INTEGER,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sku TEXT UNIQUE NOT NULL,
+        product_name TEXT NOT NULL,
+        description TEXT,
+        category TEXT,
+        supplier TEXT,
+        unit_price REAL NOT NULL,
+        quantity_in_stock INTEGER NOT NULL DEFAULT 0,
+        min_stock_level INTEGER DEFAULT 10,
+        unit_of_measure TEXT DEFAULT 'units',
+        is_active INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_by INTEGER,
+        updated_by INTEGER,
+        FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL,
+        FOREIGN KEY (updated_by) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_movements (
+        movement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        movement_type TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        previous_quantity INTEGER NOT NULL,
+        new_quantity INTEGER NOT NULL,
+        reference_number TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_by INTEGER,
+        FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
+        FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alerts (
+        alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER,
+        alert_type TEXT NOT NULL,
+        alert_message TEXT NOT NULL,
+        is_acknowledged INTEGER DEFAULT 0,
+        acknowledged_at TIMESTAMP,
+        acknowledged_by INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
+        FOREIGN KEY (acknowledged_by) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        transaction_type TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_price REAL NOT NULL,
+        total_amount REAL NOT NULL,
+        transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        notes TEXT,
+        FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS orders (
+        order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_price REAL NOT NULL,
+        total_amount REAL NOT NULL,
+        status TEXT NOT NULL DEFAULT 'Pending',
+        payment_status TEXT NOT NULL DEFAULT 'Paid',
+        payment_method TEXT,
+        shipping_address TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+        FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_name TEXT UNIQUE NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS suppliers (
+        supplier_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        supplier_name TEXT UNIQUE NOT NULL,
+        contact_person TEXT,
+        email TEXT,
+        phone TEXT,
+        address TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+MYSQL_BASELINE = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(20) NOT NULL DEFAULT 'employee',
+        first_name VARCHAR(50),
+        last_name VARCHAR(50),
+        phone VARCHAR(20),
+        is_active BOOLEAN DEFAULT TRUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP NULL,
+        created_by INT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        product_id INT AUTO_INCREMENT PRIMARY KEY,
+        sku VARCHAR(50) UNIQUE NOT NULL,
+        product_name VARCHAR(200) NOT NULL,
+        description TEXT,
+        category VARCHAR(100),
+        supplier VARCHAR(200),
+        unit_price DECIMAL(10, 2) NOT NULL,
+        quantity_in_stock INT NOT NULL DEFAULT 0,
+        min_stock_level INT DEFAULT 10,
+        unit_of_measure VARCHAR(20) DEFAULT 'units',
+        is_active BOOLEAN DEFAULT TRUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        created_by INT,
+        updated_by INT,
+        FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL,
+        FOREIGN KEY (updated_by) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_movements (
+        movement_id INT AUTO_INCREMENT PRIMARY KEY,
+        product_id INT NOT NULL,
+        movement_type VARCHAR(20) NOT NULL,
+        quantity INT NOT NULL,
+        previous_quantity INT NOT NULL,
+        new_quantity INT NOT NULL,
+        reference_number VARCHAR(100),
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_by INT,
+        FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
+        FOREIGN KEY (created_by) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alerts (
+        alert_id INT AUTO_INCREMENT PRIMARY KEY,
+        product_id INT NULL,
+        alert_type VARCHAR(50) NOT NULL,
+        alert_message TEXT NOT NULL,
+        is_acknowledged BOOLEAN DEFAULT FALSE,
+        acknowledged_at TIMESTAMP NULL,
+        acknowledged_by INT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
+        FOREIGN KEY (acknowledged_by) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        transaction_id INT AUTO_INCREMENT PRIMARY KEY,
+        product_id INT NOT NULL,
+        user_id INT NULL,
+        transaction_type VARCHAR(20) NOT NULL,
+        quantity INT NOT NULL,
+        unit_price DECIMAL(10, 2) NOT NULL,
+        total_amount DECIMAL(12, 2) NOT NULL,
+        transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        notes TEXT,
+        FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS orders (
+        order_id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        product_id INT NOT NULL,
+        quantity INT NOT NULL,
+        unit_price DECIMAL(10, 2) NOT NULL,
+        total_amount DECIMAL(12, 2) NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'Pending',
+        payment_status VARCHAR(20) NOT NULL DEFAULT 'Paid',
+        payment_method VARCHAR(50),
+        shipping_address TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+        FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        category_id INT AUTO_INCREMENT PRIMARY KEY,
+        category_name VARCHAR(100) UNIQUE NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS suppliers (
+        supplier_id INT AUTO_INCREMENT PRIMARY KEY,
+        supplier_name VARCHAR(200) UNIQUE NOT NULL,
+        contact_person VARCHAR(100),
+        email VARCHAR(100),
+        phone VARCHAR(20),
+        address TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+# Helpers that make DDL safe to re-run on both dialects
+
+def column_exists(cursor, use_sqlite, table, column):
+    """Check whether a table already has a column"""
+    if use_sqlite:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+    cursor.execute("""
+        SELECT COUNT(*) AS total FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()['total'] > 0
+
+def add_column(cursor, use_sqlite, table, column, definition):
+    """Add a column unless it already exists"""
+    if not column_exists(cursor, use_sqlite, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def mysql_index_exists(cursor, table, name):
+    """Check whether a MySQL table already has an index"""
+    cursor.execute("""
+        SELECT COUNT(*) AS total FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, name))
+    return cursor.fetchone()['total'] > 0
+
+def create_index(cursor, use_sqlite, name, table, columns, unique=False):
+    """Create an index unless it already exists"""
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    if use_sqlite:
+        cursor.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table}({columns})")
+    elif not mysql_index_exists(cursor, table, name):
+        cursor.execute(f"CREATE {kind} {name} ON {table}({columns})")
+
+def drop_index(cursor, use_sqlite, name, table):
+    """Drop an index if it exists"""
+    if use_sqlite:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    elif mysql_index_exists(cursor, table, name):
+        cursor.execute(f"DROP INDEX {name} ON {table}")
+
+# Migrations
+
+def _baseline(cursor, use_sqlite):
+    for statement in (SQLITE_BASELINE if use_sqlite else MYSQL_BASELINE):
+        cursor.execute(statement)
+    if use_sqlite:
+        cursor.execute("""
+            INSERT OR IGNORE INTO users (username, email, password_hash, role, first_name, last_name, is_active)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, DEFAULT_ADMIN)
+    else:
+        cursor.execute("""
+            INSERT IGNORE INTO users (username, email, password_hash, role, first_name, last_name, is_active)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, DEFAULT_ADMIN)
+
+def _product_image_url(cursor, use_sqlite):
+    add_column(cursor, use_sqlite, 'products', 'image_url', 'TEXT')
+
+def _hot_query_indexes(cursor, use_sqlite):
+    # Product listing: WHERE is_active ORDER BY product_name, plus category/supplier filters
+    create_index(cursor, use_sqlite, 'idx_products_active_name', 'products', 'is_active, product_name')
+    create_index(cursor, use_sqlite, 'idx_products_category', 'products', 'category, is_active, product_name')
+    create_index(cursor, use_sqlite, 'idx_products_supplier', 'products', 'supplier, is_active, product_name')
+    create_index(cursor, use_sqlite, 'idx_products_active_stock', 'products', 'is_active, quantity_in_stock')
+    # Movement history per product, dashboard recent/today and per-user activity
+    create_index(cursor, use_sqlite, 'idx_movements_product_created', 'stock_movements', 'product_id, created_at')
+    create_index(cursor, use_sqlite, 'idx_movements_created', 'stock_movements', 'created_at')
+    create_index(cursor, use_sqlite, 'idx_movements_creator_created', 'stock_movements', 'created_by, created_at')
+    # Orders per customer and admin listing
+    create_index(cursor, use_sqlite, 'idx_orders_user_created', 'orders', 'user_id, created_at')
+    create_index(cursor, use_sqlite, 'idx_orders_created', 'orders', 'created_at')
+    # Active alerts and alert history
+    create_index(cursor, use_sqlite, 'idx_alerts_ack_created', 'alerts', 'is_acknowledged, created_at')
+    create_index(cursor, use_sqlite, 'idx_alerts_ack_acknowledged', 'alerts', 'is_acknowledged, acknowledged_at')
+    # Transaction listing
+    create_index(cursor, use_sqlite, 'idx_transactions_date', 'transactions', 'transaction_date')
+
+SEARCH_COLUMNS = 'sku, product_name, description, category, supplier'
+
+def _product_search_index(cursor, use_sqlite):
+    if not use_sqlite:
+        # InnoDB keeps FULLTEXT indexes in sync with the table itself
+        if not mysql_index_exists(cursor, 'products', 'ft_products_search'):
+            cursor.execute(f"CREATE FULLTEXT INDEX ft_products_search ON products({SEARCH_COLUMNS})")
+        return
+
+    # External-content FTS5 table over products, kept in sync by triggers
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            {SEARCH_COLUMNS},
+            content='products', content_rowid='product_id',
+            prefix='2 3'
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, {SEARCH_COLUMNS})
+            VALUES (new.product_id, new.sku, new.product_name, new.description, new.category, new.supplier);
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, {SEARCH_COLUMNS})
+            VALUES ('delete', old.product_id, old.sku, old.product_name, old.description, old.category, old.supplier);
+        END
+    """)
+    # Only re-index when a searchable column changes, not on every stock update
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF {SEARCH_COLUMNS} ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, {SEARCH_COLUMNS})
+            VALUES ('delete', old.product_id, old.sku, old.product_name, old.description, old.category, old.supplier);
+            INSERT INTO products_fts(rowid, {SEARCH_COLUMNS})
+            VALUES (new.product_id, new.sku, new.product_name, new.description, new.category, new.supplier);
+        END
+    """)
+    cursor.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+def _table_versions(cursor, use_sqlite):
+    tracked = ['products', 'stock_movements', 'orders', 'alerts', 'transactions', 'users']
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS table_versions (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.executemany("INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)",
+                           [(table,) for table in tracked])
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS table_versions (
+                table_name VARCHAR(64) PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.executemany("INSERT IGNORE INTO table_versions (table_name) VALUES (%s)",
+                           [(table,) for table in tracked])
+
+def _dimension_tables(cursor, use_sqlite):
+    # Products reference categories/suppliers rows that carry their active-product counts
+    add_column(cursor, use_sqlite, 'categories', 'product_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, use_sqlite, 'suppliers', 'product_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, use_sqlite, 'products', 'category_id', 'INTEGER')
+    add_column(cursor, use_sqlite, 'products', 'supplier_id', 'INTEGER')
+
+    for table, key, name, column in (('categories', 'category_id', 'category_name', 'category'),
+                                     ('suppliers', 'supplier_id', 'supplier_name', 'supplier')):
+        insert = 'INSERT OR IGNORE' if use_sqlite else 'INSERT IGNORE'
+        cursor.execute(f"""
+            {insert} INTO {table} ({name})
+            SELECT DISTINCT {column} FROM products WHERE {column} IS NOT NULL AND {column} != ''
+        """)
+        if use_sqlite:
+            cursor.execute(f"""
+                UPDATE products SET {key} = (SELECT {key} FROM {table} WHERE {name} = products.{column})
+            """)
+        else:
+            cursor.execute(f"""
+                UPDATE products p JOIN {table} d ON d.{name} = p.{column} SET p.{key} = d.{key}
+            """)
+        cursor.execute(f"""
+            UPDATE {table} SET product_count = (
+                SELECT COUNT(*) FROM products WHERE products.{key} = {table}.{key} AND products.is_active = 1
+            )
+        """)
+
+    # Listing filters now go through the ids; the text-column indexes are replaced
+    create_index(cursor, use_sqlite, 'idx_products_category_id', 'products', 'category_id, is_active, product_name')
+    create_index(cursor, use_sqlite, 'idx_products_supplier_id', 'products', 'supplier_id, is_active, product_name')
+    drop_index(cursor, use_sqlite, 'idx_products_category', 'products')
+    drop_index(cursor, use_sqlite, 'idx_products_supplier', 'products')
+
+def _low_stock_set(cursor, use_sqlite):
+    # Active products at or below their reorder threshold, kept current by every stock write
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS low_stock_products (
+                product_id INTEGER PRIMARY KEY,
+                status TEXT NOT NULL CHECK(status IN ('low', 'out')),
+                quantity_in_stock INTEGER NOT NULL,
+                min_stock_level INTEGER NOT NULL,
+                FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS low_stock_products (
+                product_id INT PRIMARY KEY,
+                status ENUM('low', 'out') NOT NULL,
+                quantity_in_stock INT NOT NULL,
+                min_stock_level INT NOT NULL,
+                FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+            )
+        """)
+    create_index(cursor, use_sqlite, 'idx_low_stock_status', 'low_stock_products', 'status')
+    create_index(cursor, use_sqlite, 'idx_low_stock_quantity', 'low_stock_products', 'quantity_in_stock')
+    cursor.execute("DELETE FROM low_stock_products")
+    cursor.execute("""
+        INSERT INTO low_stock_products (product_id, status, quantity_in_stock, min_stock_level)
+        SELECT product_id, CASE WHEN quantity_in_stock <= 0 THEN 'out' ELSE 'low' END,
+               quantity_in_stock, min_stock_level
+        FROM products
+        WHERE is_active = 1 AND quantity_in_stock <= min_stock_level
+    """)
+
+def _stock_checkpoints(cursor, use_sqlite):
+    # Periodic per-product quantity snapshots for point-in-time stock reports
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_checkpoints (
+                checkpoint_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                taken_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                last_movement_id INTEGER NOT NULL,
+                product_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_checkpoint_items (
+                checkpoint_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                PRIMARY KEY (checkpoint_id, product_id),
+                FOREIGN KEY (checkpoint_id) REFERENCES stock_checkpoints(checkpoint_id) ON DELETE CASCADE
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_checkpoints (
+                checkpoint_id INT AUTO_INCREMENT PRIMARY KEY,
+                taken_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                last_movement_id INT NOT NULL,
+                product_count INT NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_checkpoint_items (
+                checkpoint_id INT NOT NULL,
+                product_id INT NOT NULL,
+                quantity INT NOT NULL,
+                PRIMARY KEY (checkpoint_id, product_id),
+                FOREIGN KEY (checkpoint_id) REFERENCES stock_checkpoints(checkpoint_id) ON DELETE CASCADE
+            )
+        """)
+    create_index(cursor, use_sqlite, 'idx_checkpoints_taken', 'stock_checkpoints', 'taken_at')
+
+def _products_updated_index(cursor, use_sqlite):
+    # The in-memory catalog re-reads products changed since its last sync
+    create_index(cursor, use_sqlite, 'idx_products_updated', 'products', 'updated_at')
+
+def _order_items(cursor, use_sqlite):
+    # Order lines; the orders row becomes the header (its product columns describe the first line)
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_items (
+                order_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                unit_price REAL NOT NULL,
+                line_total REAL NOT NULL,
+                FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE,
+                FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_items (
+                order_item_id INT AUTO_INCREMENT PRIMARY KEY,
+                order_id INT NOT NULL,
+                product_id INT NOT NULL,
+                quantity INT NOT NULL,
+                unit_price DECIMAL(10, 2) NOT NULL,
+                line_total DECIMAL(12, 2) NOT NULL,
+                FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE,
+                FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+            )
+        """)
+    create_index(cursor, use_sqlite, 'idx_order_items_order', 'order_items', 'order_id, product_id')
+    create_index(cursor, use_sqlite, 'idx_order_items_product', 'order_items', 'product_id')
+
+    # Every existing order becomes a one-line order
+    cursor.execute("""
+        INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total)
+        SELECT order_id, product_id, quantity, unit_price, total_amount FROM orders
+        WHERE order_id NOT IN (SELECT order_id FROM order_items)
+    """)
+
+def _stock_reservations(cursor, use_sqlite):
+    # Stock held by open orders; products.reserved_quantity is the running total of active rows
+    from backend.config import Config
+    add_column(cursor, use_sqlite, 'products', 'reserved_quantity',
+               'INTEGER NOT NULL DEFAULT 0' if use_sqlite else 'INT NOT NULL DEFAULT 0')
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_reservations (
+                reservation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'active' CHECK(status IN ('active', 'released', 'fulfilled', 'expired')),
+                expires_at TIMESTAMP NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                released_at TIMESTAMP NULL,
+                FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE,
+                FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_reservations (
+                reservation_id INT AUTO_INCREMENT PRIMARY KEY,
+                order_id INT NOT NULL,
+                product_id INT NOT NULL,
+                quantity INT NOT NULL,
+                status ENUM('active', 'released', 'fulfilled', 'expired') NOT NULL DEFAULT 'active',
+                expires_at TIMESTAMP NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                released_at TIMESTAMP NULL,
+                FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE,
+                FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+            )
+        """)
+    create_index(cursor, use_sqlite, 'idx_reservations_order', 'stock_reservations', 'order_id, status')
+    create_index(cursor, use_sqlite, 'idx_reservations_expiry', 'stock_reservations', 'status, expires_at')
+
+    # Open orders placed before reservations existed hold their stock from now on
+    # (shipped orders hold it until delivered or cancelled: no expiry)
+    if use_sqlite:
+        cursor.execute("""
+            INSERT INTO stock_reservations (order_id, product_id, quantity, expires_at)
+            SELECT i.order_id, i.product_id, i.quantity,
+                   CASE WHEN o.status = 'Shipped' THEN NULL ELSE datetime('now', ?) END
+            FROM order_items i JOIN orders o ON o.order_id = i.order_id
+            WHERE o.status IN ('Under Process', 'Shipped')
+              AND i.order_id NOT IN (SELECT order_id FROM stock_reservations)
+        """, (f'+{Config.RESERVATION_TTL} seconds',))
+    else:
+        cursor.execute("""
+            INSERT INTO stock_reservations (order_id, product_id, quantity, expires_at)
+            SELECT i.order_id, i.product_id, i.quantity,
+                   CASE WHEN o.status = 'Shipped' THEN NULL ELSE NOW() + INTERVAL %s SECOND END
+            FROM order_items i JOIN orders o ON o.order_id = i.order_id
+            WHERE o.status IN ('Under Process', 'Shipped')
+              AND i.order_id NOT IN (SELECT order_id FROM stock_reservations)
+        """, (Config.RESERVATION_TTL,))
+    cursor.execute("""
+        UPDATE products SET reserved_quantity = (
+            SELECT COALESCE(SUM(quantity), 0) FROM stock_reservations
+            WHERE stock_reservations.product_id = products.product_id AND stock_reservations.status = 'active'
+        )
+    """)
+
+def _order_listing_indexes(cursor, use_sqlite):
+    # Admin order listing: newest first, filtered by status or payment status
+    create_index(cursor, use_sqlite, 'idx_orders_status_created', 'orders', 'status, created_at')
+    create_index(cursor, use_sqlite, 'idx_orders_payment_created', 'orders', 'payment_status, created_at')
+
+    # Orders per (status, payment status), kept current by every order write
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_status_counts (
+                status TEXT NOT NULL,
+                payment_status TEXT NOT NULL,
+                order_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (status, payment_status)
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_status_counts (
+                status VARCHAR(20) NOT NULL,
+                payment_status VARCHAR(20) NOT NULL,
+                order_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (status, payment_status)
+            )
+        """)
+    cursor.execute("DELETE FROM order_status_counts")
+    cursor.execute("""
+        INSERT INTO order_status_counts (status, payment_status, order_count)
+        SELECT status, payment_status, COUNT(*) FROM orders
+        WHERE user_id IN (SELECT user_id FROM users)
+        GROUP BY status, payment_status
+    """)
+    insert = 'INSERT OR IGNORE' if use_sqlite else 'INSERT IGNORE'
+    for status in ('Under Process', 'Shipped', 'Delivered', 'Cancelled'):
+        for payment_status in ('Paid', 'Pending'):
+            if use_sqlite:
+                cursor.execute(f"{insert} INTO order_status_counts (status, payment_status, order_count) VALUES (?, ?, 0)",
+                               (status, payment_status))
+            else:
+                cursor.execute(f"{insert} INTO order_status_counts (status, payment_status, order_count) VALUES (%s, %s, 0)",
+                               (status, payment_status))
+
+def _idempotency_keys(cursor, use_sqlite):
+    # Responses of create requests sent with an Idempotency-Key, replayed on retries
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                user_id INTEGER NOT NULL,
+                endpoint TEXT NOT NULL,
+                idempotency_key TEXT NOT NULL,
+                request_hash TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'completed')),
+                response_status INTEGER NULL,
+                response_body TEXT NULL,
+                response_type TEXT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (user_id, endpoint, idempotency_key)
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                user_id INT NOT NULL,
+                endpoint VARCHAR(100) NOT NULL,
+                idempotency_key VARCHAR(255) NOT NULL,
+                request_hash CHAR(64) NOT NULL,
+                status ENUM('pending', 'completed') NOT NULL DEFAULT 'pending',
+                response_status SMALLINT NULL,
+                response_body MEDIUMTEXT NULL,
+                response_type VARCHAR(100) NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (user_id, endpoint, idempotency_key)
+            )
+        """)
+    create_index(cursor, use_sqlite, 'idx_idempotency_expiry', 'idempotency_keys', 'expires_at')
+
+def _alert_resolution(cursor, use_sqlite):
+    # Stock alerts stay open until the alert engine sees the product recover
+    add_column(cursor, use_sqlite, 'alerts', 'resolved_at', 'TIMESTAMP NULL')
+    create_index(cursor, use_sqlite, 'idx_alerts_open_product', 'alerts', 'resolved_at, product_id')
+
+def _alert_occurrences(cursor, use_sqlite):
+    # Compacted history: one row stands for occurrence_count closed alerts, the first raised at first_occurred_at
+    add_column(cursor, use_sqlite, 'alerts', 'occurrence_count',
+               'INTEGER NOT NULL DEFAULT 1' if use_sqlite else 'INT NOT NULL DEFAULT 1')
+    add_column(cursor, use_sqlite, 'alerts', 'first_occurred_at', 'TIMESTAMP NULL')
+    # Compaction folds one product's alerts of one type at a time
+    create_index(cursor, use_sqlite, 'idx_alerts_product_type', 'alerts', 'product_id, alert_type')
+
+def _alert_inbox(cursor, use_sqlite):
+    # Per-user read state: everything up to read_through is read, plus the alerts dismissed above it
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS alert_read_cursors (
+                user_id INTEGER PRIMARY KEY,
+                read_through INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS alert_dismissals (
+                user_id INTEGER NOT NULL,
+                alert_id INTEGER NOT NULL,
+                dismissed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, alert_id),
+                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS alert_read_cursors (
+                user_id INT PRIMARY KEY,
+                read_through INT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS alert_dismissals (
+                user_id INT NOT NULL,
+                alert_id INT NOT NULL,
+                dismissed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, alert_id),
+                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
+        """)
+
+def _alert_read_versions(cursor, use_sqlite):
+    # Change counter for per-user read state, so alert listings that depend on it revalidate
+    if use_sqlite:
+        cursor.execute("INSERT OR IGNORE INTO table_versions (table_name) VALUES ('alert_reads')")
+    else:
+        cursor.execute("INSERT IGNORE INTO table_versions (table_name) VALUES ('alert_reads')")
+
+def _alert_dismissal_index(cursor, use_sqlite):
+    # History compaction drops the dismissals of the alerts it folds away
+    create_index(cursor, use_sqlite, 'idx_alert_dismissals_alert', 'alert_dismissals', 'alert_id')
+
+def _existing_read_cursors(cursor, use_sqlite):
+    # Accounts created before the inbox start at the newest alert too, like new users,
+    # instead of being handed the whole backlog as unread
+    if use_sqlite:
+        cursor.execute("""
+            INSERT OR IGNORE INTO alert_read_cursors (user_id, read_through)
+            SELECT user_id, (SELECT COALESCE(MAX(alert_id), 0) FROM alerts) FROM users
+        """)
+    else:
+        cursor.execute("""
+            INSERT IGNORE INTO alert_read_cursors (user_id, read_through)
+            SELECT user_id, (SELECT COALESCE(MAX(alert_id), 0) FROM alerts) FROM users
+        """)
+    cursor.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'alert_reads'")
+
+MIGRATIONS = [
+    (1, 'baseline schema', _baseline),
+    (2, 'products.image_url', _product_image_url),
+    (3, 'indexes for hot queries', _hot_query_indexes),
+    (4, 'product full-text search', _product_search_index),
+    (5, 'table change counters', _table_versions),
+    (6, 'category and supplier dimension tables', _dimension_tables),
+    (7, 'materialized low-stock set', _low_stock_set),
+    (8, 'stock checkpoints', _stock_checkpoints),
+    (9, 'products.updated_at index', _products_updated_index),
+    (10, 'order items', _order_items),
+    (11, 'stock reservations', _stock_reservations),
+    (12, 'order listing indexes and status counts', _order_listing_indexes),
+    (13, 'idempotency keys', _idempotency_keys),
+    (14, 'alerts.resolved_at', _alert_resolution),
+    (15, 'alert occurrence counts', _alert_occurrences),
+    (16, 'per-user alert inbox', _alert_inbox),
+    (17, 'alert read state counter', _alert_read_versions),
+    (18, 'alert_dismissals.alert_id index', _alert_dismissal_index),
+    (19, 'read cursors for existing users', _existing_read_cursors),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Runner
+
+def current_version(connection, use_sqlite):
+    """Return the highest applied migration version (0 for a fresh database)"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) AS version FROM schema_migrations")
+        row = cursor.fetchone()
+        version = row[0] if use_sqlite else row['version']
+        return version or 0
+    except Exception:
+        # schema_migrations does not exist yet
+        connection.rollback()
+        return 0
+    finally:
+        cursor.close()
+
+def _create_version_table(connection, use_sqlite):
+    cursor = connection.cursor()
+    if use_sqlite:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    connection.commit()
+    cursor.close()
+
+def _apply(connection, use_sqlite, version, name, migration):
+    """Apply one migration and record it, in a single transaction"""
+    cursor = connection.cursor()
+    try:
+        if use_sqlite:
+            # Take the write lock up front so concurrent starters apply each migration once
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,))
+        else:
+            connection.begin()
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+        if cursor.fetchone():
+            connection.rollback()
+            return False
+
+        migration(cursor, use_sqlite)
+
+        if use_sqlite:
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (version, name))
+        else:
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        connection.commit()
+        return True
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def migrate(connection, use_sqlite):
+    """Apply pending migrations and return the resulting schema version"""
+    version = current_version(connection, use_sqlite)
+    if version >= LATEST_VERSION:
+        return version
+
+    _create_version_table(connection, use_sqlite)
+
+    lock_cursor = None
+    if not use_sqlite:
+        # Serialize migrators across processes (SQLite uses BEGIN IMMEDIATE instead)
+        lock_cursor = connection.cursor()
+        lock_cursor.execute("SELECT GET_LOCK('schema_migrations', 60)")
+
+    try:
+        for migration_version, name, migration in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            if _apply(connection, use_sqlite, migration_version, name, migration):
+                print(f"Applied migration {migration_version}: {name}")
+            version = migration_version
+    finally:
+        if lock_cursor is not None:
+            lock_cursor.execute("SELECT RELEASE_LOCK('schema_migrations')")
+            lock_cursor.close()
+
+    return version
@@ -1,4 +1,5 @@
 -- Smart Inventory Management System Database Schema
+-- Reference only: init_db() builds and upgrades the schema from database/migrations.py
 -- Users Table for Authentication and Role Management
 
 CREATE DATABASE IF NOT EXISTS inventory_db;
@@ -132,3 +133,11 @@ CREATE INDEX idx_stock_level ON products(quantity_in_stock);
 CREATE INDEX idx_product_movement ON stock_movements(product_id);
 CREATE INDEX idx_movement_type ON stock_movements(movement_type);
 CREATE INDEX idx_movement_date ON stock_movements(created_at);
+
+-- Composite indexes for hot access paths (mirrors migration 3 in migrations.py)
+CREATE INDEX idx_products_active_name ON products(is_active, product_name);
+CREATE INDEX idx_products_category_active ON products(category, is_active, product_name);
+CREATE INDEX idx_products_supplier_active ON products(supplier, is_active, product_name);
+CREATE INDEX idx_products_active_stock ON products(is_active, quantity_in_stock);
+CREATE INDEX idx_movements_product_created ON stock_movements(product_id, created_at);
+CREATE INDEX idx_movements_creator_created ON stock_movements(created_by, created_at);
@@ -10,15 +10,43 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     loadAllOrders();
-    setupSearch();
+    setupFilters();
 });
 
 let allOrders = [];
+const ORDER_STATUSES = ['Under Process', 'Shipped', 'Delivered', 'Cancelled'];
+// Moves the server accepts (backend/orders.py ORDER_TRANSITIONS); Delivered and Cancelled are final
+const ORDER_TRANSITIONS = {
+    'Under Process': ['Shipped', 'Delivered', 'Cancelled'],
+    'Shipped': ['Delivered', 'Cancelled'],
+    'Delivered': [],
+    'Cancelled': []
+};
+// Cursor for the page after the loaded rows, null when none is left
+let nextCursor = null;
+// Order IDs ticked for a bulk status change
+let selectedOrders = new Set();
+
+// Load the first page for the current filters, or append the next one
+async function loadAllOrders(append = false) {
+    const params = new URLSearchParams({ limit: 50 });
+    const filters = {
+        status: document.getElementById('filter-status').value,
+        payment_status: document.getElementById('filter-payment').value,
+        customer: document.getElementById('order-search').value.trim(),
+        from: document.getElementById('filter-from').value,
+        to: document.getElementById('filter-to').value
+    };
+    Object.entries(filters).forEach(([key, value]) => { if (value) params.set(key, value); });
+    if (append && nextCursor) params.set('cursor', nextCursor);
 
-async function loadAllOrders() {
     try {
-        const data = await apiCall('/admin/orders', 'GET');
-        allOrders = data.orders;
+        const data = await apiCall(`/admin/orders?${params}`, 'GET');
+        allOrders = append ? allOrders.concat(data.orders) : data.orders;
+        nextCursor = data.next_cursor;
+        document.getElementById('orders-more').style.display = data.has_more ? 'block' : 'none';
+        renderStatusCounts(data.status_counts);
+        selectedOrders = new Set([...selectedOrders].filter(id => allOrders.some(o => o.order_id === id)));
         renderAllOrders(allOrders);
     } catch (error) {
         showError('Fail to load system orders');
@@ -30,17 +58,20 @@ function renderAllOrders(orders) {
     list.innerHTML = '';
 
     if (!orders || orders.length === 0) {
-        list.innerHTML = '<tr><td colspan="8" style="text-align: center; padding: 2rem; color: var(--slate-500);">No orders found in the system.</td></tr>';
+        list.innerHTML = '<tr><td colspan="10" style="text-align: center; padding: 2rem; color: var(--slate-500);">No orders found in the system.</td></tr>';
+        updateSelection();
         return;
     }
 
     orders.forEach(order => {
         const tr = document.createElement('tr');
         tr.innerHTML = `
+            <td><input type="checkbox" class="order-select" ${selectedOrders.has(order.order_id) ? 'checked' : ''}
+                onchange="toggleOrder(${order.order_id}, this.checked)"></td>
             <td>#ORD-${order.order_id}</td>
             <td style="font-weight: 600;">${order.customer_name}</td>
-            <td>${order.product_name}</td>
-            <td>${order.quantity}</td>
+            <td>${order.product_name}${order.item_count > 1 ? ` <span style="color: var(--slate-500);">+${order.item_count - 1} more</span>` : ''}</td>
+            <td>${order.item_count > 1 ? `${order.item_count} items` : order.quantity}</td>
             <td style="font-weight: 600;">${formatCurrency(order.total_amount)}</td>
             <td>
                 <div style="font-size: 0.85rem;">${order.payment_method}</div>
@@ -50,17 +81,61 @@ function renderAllOrders(orders) {
             </td>
             <td>${getStatusBadge(order.status)}</td>
             <td>
-                <select class="status-select" onchange="updateStatus(${order.order_id}, this.value)">
-                    <option value="Under Process" ${order.status === 'Under Process' ? 'selected' : ''}>Under Process</option>
-                    <option value="Shipped" ${order.status === 'Shipped' ? 'selected' : ''}>Shipped</option>
-                    <option value="Delivered" ${order.status === 'Delivered' ? 'selected' : ''}>Delivered</option>
-                    <option value="Cancelled" ${order.status === 'Cancelled' ? 'selected' : ''}>Cancelled</option>
+                <select class="status-select" onchange="updateStatus(${order.order_id}, this.value)"
+                    ${ORDER_TRANSITIONS[order.status] && ORDER_TRANSITIONS[order.status].length ? '' : 'disabled'}>
+                    ${ORDER_STATUSES.map(status => `
+                    <option value="${status}" ${order.status === status ? 'selected' : ''}
+                        ${status === order.status || (ORDER_TRANSITIONS[order.status] || []).includes(status) ? '' : 'disabled'}>${status}</option>`).join('')}
                 </select>
             </td>
             <td style="color: var(--slate-500); font-size: 0.85rem;">${new Date(order.created_at).toLocaleDateString()}</td>
         `;
         list.appendChild(tr);
     });
+    updateSelection();
+}
+
+function toggleOrder(orderId, checked) {
+    if (checked) {
+        selectedOrders.add(orderId);
+    } else {
+        selectedOrders.delete(orderId);
+    }
+    updateSelection();
+}
+
+function toggleAllOrders(checked) {
+    document.querySelectorAll('#admin-orders-list .order-select').forEach(box => {
+        box.checked = checked;
+        box.onchange();
+    });
+}
+
+function updateSelection() {
+    document.getElementById('selected-count').textContent = selectedOrders.size;
+    document.getElementById('bulk-apply-btn').disabled = selectedOrders.size === 0;
+    const boxes = [...document.querySelectorAll('#admin-orders-list .order-select')];
+    document.getElementById('select-all-orders').checked = boxes.length > 0 && boxes.every(box => box.checked);
+}
+
+// One request for every selected order; a failing order is reported and the rest still move
+async function applyBulkStatus() {
+    const status = document.getElementById('bulk-status').value;
+    const orderIds = [...selectedOrders];
+    if (!confirm(`Set ${orderIds.length} order(s) to ${status}?`)) return;
+
+    try {
+        const data = await apiCall('/admin/orders/status', 'POST', { order_ids: orderIds, status, atomic: false });
+        showSuccess(data.message);
+        const failed = data.results.filter(r => r.status === 'failed');
+        if (failed.length) {
+            showError(failed.map(r => `#ORD-${r.order_id}: ${r.error}`).join('\n'));
+        }
+        selectedOrders = new Set(failed.map(r => r.order_id));
+    } catch (error) {
+        showError('Bulk update failed: ' + error.message);
+    }
+    loadAllOrders();
 }
 
 async function updateStatus(orderId, newStatus) {
@@ -88,15 +163,22 @@ function getStatusBadge(status) {
     return `<span class="badge ${badgeClass}">${status}</span>`;
 }
 
-function setupSearch() {
-    document.getElementById('order-search').addEventListener('input', (e) => {
-        const q = e.target.value.toLowerCase();
-        const filtered = allOrders.filter(o => 
-            o.customer_name.toLowerCase().includes(q) || 
-            o.product_name.toLowerCase().includes(q) ||
-            o.order_id.toString().includes(q)
-        );
-        renderAllOrders(filtered);
+// Show how many orders each status holds under the other filters
+function renderStatusCounts(counts) {
+    const options = document.getElementById('filter-status').options;
+    let total = 0;
+    for (const option of options) {
+        if (!option.value) continue;
+        const count = counts[option.value] || 0;
+        total += count;
+        option.textContent = `${option.value} (${count})`;
+    }
+    options[0].textContent = `All statuses (${total})`;
+}
+
+function setupFilters() {
+    ['filter-status', 'filter-payment', 'order-search', 'filter-from', 'filter-to'].forEach(id => {
+        document.getElementById(id).addEventListener('change', () => loadAllOrders());
     });
 }
 
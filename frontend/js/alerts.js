@@ -3,6 +3,11 @@ protectPage();
 const currentUser = getCurrentUser();
 const isAdmin = currentUser && currentUser.role === 'admin';
 
+// Unacknowledged alerts on screen, kept current by the event stream
+let activeAlerts = [];
+const selectedAlerts = new Set();
+let historyCursor = null;
+
 document.addEventListener('DOMContentLoaded', () => {
     if (isAdmin) {
         document.getElementById('admin-view').style.display = 'block';
@@ -11,21 +16,57 @@ document.addEventListener('DOMContentLoaded', () => {
         document.getElementById('create-alert-form').addEventListener('submit', createAlert);
     } else {
         document.getElementById('user-view').style.display = 'block';
-        loadUserNotifications();
+        loadInbox();
     }
+    openEventStream({
+        alert: applyAlertEvent,
+        inbox: applyInboxEvent,
+        resync: () => isAdmin ? (loadActiveAlerts(), loadAlertHistory()) : loadInbox()
+    });
 });
 
+// New alerts are added and acknowledged or resolved ones removed without re-fetching the list
+function applyAlertEvent(event) {
+    if (!isAdmin) {
+        // The inbox keeps acknowledged and resolved alerts; only new ones change it
+        if (event.action === 'created') applyInboxAlert(event.alert);
+        return;
+    }
+    if (event.action === 'created') {
+        if (activeAlerts.some(alert => alert.alert_id === event.alert.alert_id)) return;
+        activeAlerts.unshift(event.alert);
+    } else {
+        activeAlerts = activeAlerts.filter(alert => !event.alert_ids.includes(alert.alert_id));
+        event.alert_ids.forEach(id => selectedAlerts.delete(id));
+    }
+    renderActiveAlerts();
+}
+
 async function loadActiveAlerts() {
     const tbody = document.getElementById('active-alerts-table');
     try {
         const data = await apiCall('/alerts', 'GET');
-        const alerts = data.alerts || [];
-        if (alerts.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="5" class="no-data">✅ No active alerts</td></tr>';
-            return;
-        }
-        tbody.innerHTML = alerts.map(alert => `
+        activeAlerts = data.alerts || [];
+        renderActiveAlerts();
+    } catch (error) {
+        tbody.innerHTML = `<tr><td colspan="6" class="no-data">Failed to load alerts. <button class="btn btn-primary" onclick="loadActiveAlerts()">Retry</button></td></tr>`;
+    }
+}
+
+function renderActiveAlerts() {
+    const tbody = document.getElementById('active-alerts-table');
+    const alerts = activeAlerts;
+    const onScreen = new Set(alerts.map(alert => alert.alert_id));
+    selectedAlerts.forEach(id => { if (!onScreen.has(id)) selectedAlerts.delete(id); });
+    updateAlertSelection();
+    if (alerts.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="6" class="no-data">✅ No active alerts</td></tr>';
+        return;
+    }
+    tbody.innerHTML = alerts.map(alert => `
             <tr>
+                <td><input type="checkbox" ${selectedAlerts.has(alert.alert_id) ? 'checked' : ''}
+                    onchange="toggleAlert(${alert.alert_id}, this.checked)"></td>
                 <td>${alert.product_name || 'System Broadcast'}</td>
                 <td>${getAlertTypeBadge(alert.alert_type)}</td>
                 <td>${alert.alert_message}</td>
@@ -36,31 +77,55 @@ async function loadActiveAlerts() {
                 </td>
             </tr>
         `).join('');
-    } catch (error) {
-        tbody.innerHTML = `<tr><td colspan="5" class="no-data">Failed to load alerts. <button class="btn btn-primary" onclick="loadActiveAlerts()">Retry</button></td></tr>`;
-    }
 }
 
-async function loadAlertHistory() {
+function toggleAlert(alertId, checked) {
+    if (checked) selectedAlerts.add(alertId); else selectedAlerts.delete(alertId);
+    updateAlertSelection();
+}
+
+function toggleAllAlerts(checked) {
+    selectedAlerts.clear();
+    if (checked) activeAlerts.forEach(alert => selectedAlerts.add(alert.alert_id));
+    renderActiveAlerts();
+}
+
+function updateAlertSelection() {
+    document.getElementById('ack-selected-count').textContent = selectedAlerts.size;
+    document.getElementById('ack-selected-btn').disabled = selectedAlerts.size === 0;
+    document.getElementById('select-all-alerts').checked =
+        activeAlerts.length > 0 && selectedAlerts.size === activeAlerts.length;
+}
+
+// One page of history at a time; append=true continues from the last cursor
+async function loadAlertHistory(append = false) {
     const tbody = document.getElementById('alert-history-table');
+    const more = document.getElementById('history-more');
     try {
-        const data = await apiCall('/alerts/history', 'GET');
+        let query = '?limit=50';
+        if (append && historyCursor) query += `&cursor=${encodeURIComponent(historyCursor)}`;
+        const data = await apiCall('/alerts/history' + query, 'GET');
         const alerts = data.alerts || [];
-        if (alerts.length === 0) {
+        historyCursor = data.next_cursor;
+        more.style.display = data.has_more ? 'block' : 'none';
+        if (!append && alerts.length === 0) {
             tbody.innerHTML = '<tr><td colspan="6" class="no-data">No alert history found.</td></tr>';
             return;
         }
-        tbody.innerHTML = alerts.map(alert => `
+        const rows = alerts.map(alert => `
             <tr>
                 <td>${alert.product_name || 'System Broadcast'}</td>
                 <td>${getAlertTypeBadge(alert.alert_type)}</td>
-                <td>${alert.alert_message}</td>
+                <td>${alert.alert_message}${alert.occurrence_count > 1
+                    ? ` <span class="badge badge-info" title="Since ${new Date(alert.first_occurred_at).toLocaleString()}">×${alert.occurrence_count}</span>` : ''}</td>
                 <td>${new Date(alert.created_at).toLocaleString()}</td>
-                <td>${alert.acknowledged_by_username || 'N/A'}</td>
+                <td>${alert.acknowledged_by_username || (alert.resolved_at && !alert.acknowledged_by ? 'Resolved automatically' : 'N/A')}</td>
                 <td>${alert.acknowledged_at ? new Date(alert.acknowledged_at).toLocaleString() : 'N/A'}</td>
             </tr>
         `).join('');
+        if (append) tbody.insertAdjacentHTML('beforeend', rows); else tbody.innerHTML = rows;
     } catch (error) {
+        if (append) { showError('Failed to load more history: ' + error.message); return; }
         tbody.innerHTML = `<tr><td colspan="6" class="no-data">Failed to load history. <button class="btn btn-primary" onclick="loadAlertHistory()">Retry</button></td></tr>`;
     }
 }
@@ -76,6 +141,36 @@ async function acknowledgeAlert(alertId) {
     }
 }
 
+async function acknowledgeSelected() {
+    const alertIds = Array.from(selectedAlerts);
+    if (alertIds.length === 0) return;
+    try {
+        const data = await apiCall('/alerts/acknowledge', 'PUT', { alert_ids: alertIds });
+        showSuccess(`${data.acknowledged} alert(s) acknowledged.`);
+        selectedAlerts.clear();
+        loadActiveAlerts();
+        loadAlertHistory();
+    } catch (error) {
+        showError('Failed to acknowledge alerts: ' + error.message);
+    }
+}
+
+async function acknowledgeMatching() {
+    const filter = { alert_type: document.getElementById('ack-filter-type').value };
+    const category = document.getElementById('ack-filter-category').value.trim();
+    if (category) filter.category = category;
+    const scope = category ? ` in ${category}` : '';
+    if (!confirm(`Acknowledge every active ${filter.alert_type.replace(/_/g, ' ')} alert${scope}?`)) return;
+    try {
+        const data = await apiCall('/alerts/acknowledge', 'PUT', { filter });
+        showSuccess(`${data.acknowledged} alert(s) acknowledged.`);
+        loadActiveAlerts();
+        loadAlertHistory();
+    } catch (error) {
+        showError('Failed to acknowledge alerts: ' + error.message);
+    }
+}
+
 async function createAlert(e) {
     e.preventDefault();
     const message = document.getElementById('alert-message-input').value.trim();
@@ -93,30 +188,101 @@ async function createAlert(e) {
 
 function getAlertTypeBadge(type) {
     const map = {
-        'low_stock':   'badge-danger',
+        'low_stock':   'badge-warning',
+        'out_of_stock': 'badge-danger',
         'broadcast':   'badge-broadcast',
         'maintenance': 'badge-warning',
         'info':        'badge-info',
     };
     const cls = map[type] || 'badge-blue';
-    const label = type.replace('_', ' ').replace(/\b\w/g, c => c.toUpperCase());
+    const label = type.replace(/_/g, ' ').replace(/\b\w/g, c => c.toUpperCase());
     return `<span class="badge ${cls}">${label}</span>`;
 }
 
-async function loadUserNotifications() {
+// Per-user inbox: read state lives in the user's read mark, not in the alert
+let inboxAlerts = [];
+let inboxCursor = null;
+let inboxUnread = { count: 0, more: false };
+
+async function loadInbox(append = false) {
     const container = document.getElementById('user-notifications-list');
     try {
-        const data = await apiCall('/alerts', 'GET');
-        const alerts = data.alerts || [];
-        if (alerts.length === 0) {
-            container.innerHTML = '<p class="no-data">✅ No new notifications!</p>';
-            return;
-        }
-        container.innerHTML = alerts.map(alert => `
+        let query = '?limit=50';
+        if (append && inboxCursor) query += `&cursor=${encodeURIComponent(inboxCursor)}`;
+        const data = await apiCall('/inbox' + query, 'GET');
+        inboxAlerts = append ? inboxAlerts.concat(data.alerts || []) : (data.alerts || []);
+        inboxCursor = data.next_cursor;
+        document.getElementById('inbox-more').style.display = data.has_more ? 'block' : 'none';
+        setInboxUnread(data.unread_count, data.unread_more);
+        renderUserNotifications();
+    } catch (error) {
+        if (append) { showError('Failed to load more notifications: ' + error.message); return; }
+        container.innerHTML = '<p class="no-data">Failed to load notifications.</p>';
+    }
+}
+
+function setInboxUnread(count, more) {
+    inboxUnread = { count, more };
+    document.getElementById('inbox-unread-label').textContent = count ? `(${count}${more ? '+' : ''} unread)` : '';
+    document.getElementById('inbox-read-all').disabled = count === 0;
+    setInboxBadge(count, more);
+}
+
+function applyInboxAlert(alert) {
+    if (inboxAlerts.some(existing => existing.alert_id === alert.alert_id)) return;
+    inboxAlerts.unshift({ ...alert, is_read: false });
+    setInboxUnread(inboxUnread.count + 1, inboxUnread.more);
+    renderUserNotifications();
+}
+
+// Read state changed, possibly from another tab
+function applyInboxEvent(event) {
+    inboxAlerts.forEach(alert => {
+        if (alert.alert_id <= event.read_through || event.dismissed.includes(alert.alert_id)) alert.is_read = true;
+    });
+    renderUserNotifications();
+    refreshInboxBadge().then(summary => summary && setInboxUnread(summary.unread_count, summary.unread_more));
+}
+
+async function markRead(alertId) {
+    try {
+        const data = await apiCall(`/inbox/${alertId}/read`, 'PUT');
+        const alert = inboxAlerts.find(existing => existing.alert_id === alertId);
+        if (alert) alert.is_read = true;
+        setInboxUnread(data.unread_count, data.unread_more);
+        renderUserNotifications();
+    } catch (error) {
+        showError('Failed to mark notification as read: ' + error.message);
+    }
+}
+
+async function markAllRead() {
+    if (inboxAlerts.length === 0) return;
+    try {
+        // Up to the newest alert on screen, so one that arrives meanwhile stays unread
+        const through = Math.max(...inboxAlerts.map(alert => alert.alert_id));
+        const data = await apiCall('/inbox/read', 'PUT', { through });
+        inboxAlerts.forEach(alert => { if (alert.alert_id <= through) alert.is_read = true; });
+        setInboxUnread(data.unread_count, data.unread_more);
+        renderUserNotifications();
+    } catch (error) {
+        showError('Failed to mark notifications as read: ' + error.message);
+    }
+}
+
+function renderUserNotifications() {
+    const container = document.getElementById('user-notifications-list');
+    const alerts = inboxAlerts;
+    if (alerts.length === 0) {
+        container.innerHTML = '<p class="no-data">✅ No new notifications!</p>';
+        return;
+    }
+    container.innerHTML = alerts.map(alert => `
             <div style="display:flex;align-items:flex-start;gap:1rem;padding:1rem;border-radius:8px;
-                background:rgba(255,255,255,0.05);border:1px solid rgba(255,255,255,0.1);margin-bottom:0.75rem;">
-                <span style="font-size:1.5rem;">🔔</span>
-                <div>
+                background:rgba(255,255,255,${alert.is_read ? '0.02' : '0.08'});border:1px solid rgba(255,255,255,0.1);
+                margin-bottom:0.75rem;opacity:${alert.is_read ? '.6' : '1'};">
+                <span style="font-size:1.5rem;">${alert.is_read ? '🔕' : '🔔'}</span>
+                <div style="flex:1;">
                     <div style="font-weight:600;margin-bottom:.25rem;">
                         ${alert.product_name || 'System Broadcast'}
                         <span style="margin-left:.5rem;">${getAlertTypeBadge(alert.alert_type)}</span>
@@ -124,9 +290,8 @@ async function loadUserNotifications() {
                     <div style="opacity:.85;">${alert.alert_message}</div>
                     <div style="font-size:.8rem;opacity:.6;margin-top:.25rem;">${new Date(alert.created_at).toLocaleString()}</div>
                 </div>
+                ${alert.is_read ? '' : `<button class="btn btn-secondary" style="font-size:.8rem;padding:.3rem .7rem;"
+                    onclick="markRead(${alert.alert_id})">Mark read</button>`}
             </div>
         `).join('');
-    } catch (error) {
-        container.innerHTML = '<p class="no-data">Failed to load notifications.</p>';
-    }
 }
@@ -7,6 +7,11 @@ document.addEventListener('DOMContentLoaded', () => {
     if (currentUser) {
         document.getElementById('welcome-name').textContent = currentUser.first_name || currentUser.username;
         loadDashboardStats();
+        openEventStream({
+            counters: applyCounters,
+            alert: applyBroadcast,
+            resync: loadDashboardStats
+        });
         // setupNavbar is called automatically by protectPage() in utils.js
         // so we don't strictly need to call it again here if protectPage is at the top.
     }
@@ -66,6 +71,24 @@ async function loadDashboardStats() {
     }
 }
 
+// Live counter updates from the event stream, no /api/stats round trip
+function applyCounters(counters) {
+    document.getElementById('low-stock-count').textContent = counters.low_stock_count || 0;
+    document.getElementById('total-transactions').textContent = counters.movements_today || 0;
+    document.getElementById('last-sync-time').textContent = new Date().toLocaleTimeString();
+}
+
+// A new announcement replaces the broadcast banner
+function applyBroadcast(event) {
+    const broadcastTypes = ['broadcast', 'urgent', 'maintenance'];
+    if (event.action !== 'created' || event.alert.product_id !== null ||
+        !broadcastTypes.includes(event.alert.alert_type.toLowerCase())) {
+        return;
+    }
+    document.getElementById('banner-message').textContent = event.alert.alert_message;
+    document.getElementById('broadcast-banner').style.display = 'flex';
+}
+
 function renderQuickActions(role) {
     const container = document.getElementById('quick-actions-grid');
     let actions = [];
@@ -2,7 +2,12 @@
 protectPage();
 
 // Global state
+// Products on screen, one page at a time for the current filters
 let allProducts = [];
+// Cursor for the page after the loaded products, null when none is left
+let productsCursor = null;
+// Timer that waits for typing in the search box to pause
+let searchTimer = null;
 const currentUser = getCurrentUser();
 const isAdmin = currentUser && currentUser.role === 'admin';
 
@@ -31,7 +36,10 @@ function setupEventListeners() {
     document.getElementById('product-form').onsubmit = handleProductSubmit;
     document.getElementById('stock-form').onsubmit = handleStockSubmit;
 
-    document.getElementById('search-input').oninput = applyFilters;
+    document.getElementById('search-input').oninput = () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(applyFilters, 300);
+    };
     document.getElementById('category-filter').onchange = applyFilters;
     document.getElementById('supplier-filter').onchange = applyFilters;
     document.getElementById('low-stock-filter').onchange = applyFilters;
@@ -49,14 +57,28 @@ function setupEventListeners() {
     };
 }
 
-async function loadProducts() {
+// Load the first page for the current filters, or append the next one
+async function loadProducts(append = false) {
     const tbody = document.getElementById('products-tbody');
+    const params = new URLSearchParams({ limit: 100 });
+    const search = document.getElementById('search-input').value.trim();
+    const cat = document.getElementById('category-filter').value;
+    const sup = document.getElementById('supplier-filter').value;
+    if (search) params.set('search', search);
+    if (cat) params.set('category', cat);
+    if (sup) params.set('supplier', sup);
+    if (document.getElementById('low-stock-filter').checked) params.set('low_stock', 'true');
+    if (append && productsCursor) params.set('cursor', productsCursor);
+
     try {
-        const data = await apiCall('/products', 'GET');
-        allProducts = data.products || [];
+        const data = await apiCall(`/products?${params}`, 'GET');
+        allProducts = append ? allProducts.concat(data.products) : data.products;
+        productsCursor = data.next_cursor;
+        document.getElementById('products-more').style.display = data.has_more ? 'block' : 'none';
         renderProducts(allProducts);
-        updateSummary();
+        if (!append) updateSummary();
     } catch (error) {
+        if (append) { showError('Failed to load more products'); return; }
         showError('Failed to load products');
         const colCount = isAdmin ? 9 : 8;
         tbody.innerHTML = `<tr><td colspan="${colCount}" style="text-align:center; padding:2rem; color:var(--accent-rose);">Error loading products.</td></tr>`;
@@ -109,11 +131,15 @@ function renderProducts(products) {
     }).join('');
 }
 
-function updateSummary() {
-    const total = allProducts.length;
-    const lowStock = allProducts.filter(p => p.is_low_stock).length;
-    document.getElementById('total-products').textContent = total;
-    document.getElementById('low-stock-count').textContent = lowStock;
+// Catalog-wide counts, not just the loaded pages
+async function updateSummary() {
+    try {
+        const stats = await apiCall('/stats', 'GET');
+        document.getElementById('total-products').textContent = stats.total_products;
+        document.getElementById('low-stock-count').textContent = stats.low_stock_count;
+    } catch (e) {
+        console.error('Failed to load product counts');
+    }
 }
 
 async function loadFiltersData() {
@@ -148,21 +174,9 @@ async function loadFiltersData() {
     }
 }
 
+// Filters run on the server, so they cover products not loaded yet
 function applyFilters() {
-    const search = document.getElementById('search-input').value.toLowerCase();
-    const cat = document.getElementById('category-filter').value;
-    const sup = document.getElementById('supplier-filter').value;
-    const low = document.getElementById('low-stock-filter').checked;
-
-    let filtered = allProducts.filter(p => {
-        const matchesSearch = p.product_name.toLowerCase().includes(search) || p.sku.toLowerCase().includes(search);
-        const matchesCat = !cat || p.category === cat;
-        const matchesSup = !sup || p.supplier === sup;
-        const matchesLow = !low || p.is_low_stock;
-        return matchesSearch && matchesCat && matchesSup && matchesLow;
-    });
-
-    renderProducts(filtered);
+    loadProducts();
 }
 
 function clearFilters() {
@@ -170,7 +184,7 @@ function clearFilters() {
     document.getElementById('category-filter').value = '';
     document.getElementById('supplier-filter').value = '';
     document.getElementById('low-stock-filter').checked = false;
-    renderProducts(allProducts);
+    loadProducts();
 }
 
 function openProductModal(product = null) {
@@ -312,10 +326,46 @@ async function handleStockSubmit(e) {
     }
 }
 
+function renderMovement(m) {
+    return `
+        <div style="padding: 0.75rem; border-radius: 8px; background: white; border: 1px solid var(--slate-100);">
+            <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
+                <span class="badge ${m.movement_type === 'stock-in' ? 'badge-success' : 'badge-danger'}">${m.movement_type.toUpperCase()}</span>
+                <span style="font-size: 0.75rem; color: var(--slate-400);">${new Date(m.created_at).toLocaleString()}</span>
+            </div>
+            <div style="font-size: 0.875rem;">
+                <strong>Qty: ${m.quantity}</strong> (${m.previous_quantity} → ${m.new_quantity})
+                ${m.notes ? `<p style="margin-top: 0.25rem; font-style: italic;">Note: ${m.notes}</p>` : ''}
+            </div>
+        </div>
+    `;
+}
+
+// Append one page of movement history; a "Load more" button fetches the next page
+async function loadMovements(id, cursor = null) {
+    const query = cursor ? `?limit=50&cursor=${encodeURIComponent(cursor)}` : '?limit=50';
+    const mdata = await apiCall(`/products/${id}/movements${query}`, 'GET');
+    const mcont = document.getElementById('movements-container');
+    const more = document.getElementById('movements-more');
+    if (more) more.remove();
+
+    if (!cursor && (!mdata.movements || mdata.movements.length === 0)) {
+        mcont.innerHTML = '<div style="text-align:center; color:var(--slate-400);">No movement history</div>';
+        return;
+    }
+    if (!cursor) mcont.innerHTML = '';
+    mcont.insertAdjacentHTML('beforeend', mdata.movements.map(renderMovement).join(''));
+    if (mdata.has_more) {
+        mcont.insertAdjacentHTML('beforeend',
+            '<button id="movements-more" class="btn btn-secondary" style="width: 100%;">Load more</button>');
+        document.getElementById('movements-more').onclick = () =>
+            loadMovements(id, mdata.next_cursor).catch(() => showError('Load failed'));
+    }
+}
+
 async function viewProduct(id) {
     try {
         const data = await apiCall(`/products/${id}`, 'GET');
-        const mdata = await apiCall(`/products/${id}/movements`, 'GET');
         const p = data.product;
         
         document.getElementById('product-details').innerHTML = `
@@ -332,23 +382,7 @@ async function viewProduct(id) {
             </div>
         `;
         
-        const mcont = document.getElementById('movements-container');
-        if (!mdata.movements || mdata.movements.length === 0) {
-            mcont.innerHTML = '<div style="text-align:center; color:var(--slate-400);">No movement history</div>';
-        } else {
-            mcont.innerHTML = mdata.movements.map(m => `
-                <div style="padding: 0.75rem; border-radius: 8px; background: white; border: 1px solid var(--slate-100);">
-                    <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
-                        <span class="badge ${m.movement_type === 'stock-in' ? 'badge-success' : 'badge-danger'}">${m.movement_type.toUpperCase()}</span>
-                        <span style="font-size: 0.75rem; color: var(--slate-400);">${new Date(m.created_at).toLocaleString()}</span>
-                    </div>
-                    <div style="font-size: 0.875rem;">
-                        <strong>Qty: ${m.quantity}</strong> (${m.previous_quantity} → ${m.new_quantity})
-                        ${m.notes ? `<p style="margin-top: 0.25rem; font-style: italic;">Note: ${m.notes}</p>` : ''}
-                    </div>
-                </div>
-            `).join('');
-        }
+        await loadMovements(id);
         document.getElementById('details-modal').style.display = 'block';
     } catch (e) {
         showError('Load failed');
@@ -32,8 +32,8 @@ function renderOrders(orders) {
         const dateStr = order.created_at ? new Date(order.created_at).toLocaleDateString() : '—';
         tr.innerHTML =
             '<td style="font-weight:600;">#ORD-' + order.order_id + '</td>' +
-            '<td>' + order.product_name + '</td>' +
-            '<td>' + order.quantity + '</td>' +
+            '<td>' + orderProducts(order) + '</td>' +
+            '<td>' + orderUnits(order) + '</td>' +
             '<td style="font-weight:600;">' + formatCurrency(parseFloat(order.total_amount)) + '</td>' +
             '<td>' +
                 '<div style="font-size:0.85rem;">' + (order.payment_method || '—') + '</div>' +
@@ -45,6 +45,17 @@ function renderOrders(orders) {
     });
 }
 
+// Orders placed from a cart have several lines; older orders have one
+function orderProducts(order) {
+    if (!order.items || order.items.length === 0) return order.product_name;
+    return order.items.map(item => item.quantity > 1 ? `${item.product_name} × ${item.quantity}` : item.product_name).join(', ');
+}
+
+function orderUnits(order) {
+    if (!order.items || order.items.length === 0) return order.quantity;
+    return order.items.reduce((sum, item) => sum + item.quantity, 0);
+}
+
 function getStatusBadge(status) {
     let badgeClass = 'badge-blue';
     if (status === 'Delivered') badgeClass = 'badge-success';
@@ -64,7 +75,7 @@ function exportCSV() {
     let csv = 'Order ID,Product,Quantity,Total,Payment Method,Payment Status,Order Status,Date\n';
     userOrders.forEach(o => {
         const date = new Date(o.created_at).toLocaleDateString();
-        csv += `"#ORD-${o.order_id}","${o.product_name}",${o.quantity},${parseFloat(o.total_amount).toFixed(2)},"${o.payment_method}","${o.payment_status}","${o.status}","${date}"\n`;
+        csv += `"#ORD-${o.order_id}","${orderProducts(o)}",${orderUnits(o)},${parseFloat(o.total_amount).toFixed(2)},"${o.payment_method}","${o.payment_status}","${o.status}","${date}"\n`;
     });
 
     const blob = new Blob([csv], { type: 'text/csv' });
@@ -28,8 +28,8 @@ function setupAdminView() {
 // Load all reports data (admin)
 async function loadReportsData() {
     try {
-        const data = await apiCall('/products', 'GET');
-        allProducts = data.products;
+        // Every page: the totals, category breakdown and CSV export cover the whole catalog
+        allProducts = await apiCallAllPages('/products?limit=500&fields=sku,product_name,category,supplier,unit_price,quantity_in_stock,min_stock_level', 'products');
         calculateStats();
         renderCategoryReport();
         renderLowStockReport();
@@ -3,6 +3,7 @@ protectPage();
 
 document.addEventListener('DOMContentLoaded', async () => {
     await loadProducts();
+    await loadCartProducts();
     setupEventListeners();
     
     // Check for product ID in URL (coming from landing page)
@@ -13,13 +14,32 @@ document.addEventListener('DOMContentLoaded', async () => {
     }
 });
 
+const PRODUCT_FIELDS = 'product_name,description,category,unit_price,quantity_in_stock,reserved_quantity,unit_of_measure,image_url,is_active';
+// Products on screen, one page at a time
 let currentProducts = [];
+// Cursor for the page after the loaded products, null when none is left
+let productsCursor = null;
+// Every product fetched so far by ID: the listed pages and cart lines beyond them
+const knownProducts = new Map();
+// Cart lines [{product_id, quantity}], kept across page loads
+let cart = JSON.parse(localStorage.getItem('cart') || '[]');
+// Idempotency-Key of the checkout being submitted, reused by retries of the same cart
+let checkoutAttempt = null;
 
-async function loadProducts() {
+// Load the first page of products, or append the next one
+async function loadProducts(append = false) {
+    const params = new URLSearchParams({ limit: 48, fields: PRODUCT_FIELDS });
+    if (append && productsCursor) params.set('cursor', productsCursor);
     try {
-        const data = await apiCall('/products', 'GET');
-        currentProducts = data.products.filter(p => p.is_active);
+        const data = await apiCall(`/products?${params}`, 'GET');
+        const products = data.products.filter(p => p.is_active);
+        if (!append) knownProducts.clear();
+        products.forEach(p => knownProducts.set(p.product_id, p));
+        currentProducts = append ? currentProducts.concat(products) : products;
+        productsCursor = data.next_cursor;
+        document.getElementById('shop-more').style.display = data.has_more ? 'block' : 'none';
         renderProducts(currentProducts);
+        updateCartCount();
         document.getElementById('shop-loading').style.display = 'none';
         document.getElementById('product-list').style.display = 'grid';
     } catch (error) {
@@ -27,6 +47,23 @@ async function loadProducts() {
     }
 }
 
+// Fetch a product that is not on a loaded page; null when it is gone
+async function fetchProduct(productId) {
+    if (knownProducts.has(productId)) return knownProducts.get(productId);
+    try {
+        const data = await apiCall(`/products/${productId}`, 'GET');
+        knownProducts.set(productId, data.product);
+        return data.product;
+    } catch (error) {
+        return null;
+    }
+}
+
+// Cart lines saved on an earlier visit may be for products past the first page
+async function loadCartProducts() {
+    await Promise.all(cart.map(line => fetchProduct(line.product_id)));
+}
+
 function renderProducts(products) {
     const list = document.getElementById('product-list');
     list.innerHTML = '';
@@ -49,18 +86,25 @@ function renderProducts(products) {
             <h3 style="margin-bottom: 0.5rem; height: 3rem; overflow: hidden;">${p.product_name}</h3>
             <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 1rem;">
                 <span style="font-size: 1.25rem; font-weight: 700; color: var(--primary-600);">${formatCurrency(p.unit_price)}</span>
-                <span class="badge ${p.quantity_in_stock > 0 ? 'badge-success' : 'badge-danger'}">
-                    ${p.quantity_in_stock > 0 ? p.quantity_in_stock + ' in stock' : 'Out of Stock'}
+                <span class="badge ${p.available_quantity > 0 ? 'badge-success' : 'badge-danger'}">
+                    ${p.available_quantity > 0 ? p.available_quantity + ' in stock' : 'Out of Stock'}
                 </span>
             </div>
             <p style="font-size: 0.85rem; color: var(--slate-500); margin-bottom: 1.5rem; height: 3rem; overflow: hidden;">
                 ${p.description || 'No description available.'}
             </p>
-            <button class="btn btn-primary" style="width: 100%;" 
-                onclick="openBuyModal(${p.product_id})" 
-                ${p.quantity_in_stock <= 0 ? 'disabled' : ''}>
-                ${p.quantity_in_stock > 0 ? 'Buy Now' : 'Wait for Stock'}
-            </button>
+            <div style="display: flex; gap: 0.5rem;">
+                <button class="btn btn-secondary" style="flex: 1;" 
+                    onclick="addToCart(${p.product_id})" 
+                    ${p.available_quantity <= 0 ? 'disabled' : ''}>
+                    Add to Cart
+                </button>
+                <button class="btn btn-primary" style="flex: 1;" 
+                    onclick="openBuyModal(${p.product_id})" 
+                    ${p.available_quantity <= 0 ? 'disabled' : ''}>
+                    ${p.available_quantity > 0 ? 'Buy Now' : 'Wait for Stock'}
+                </button>
+            </div>
         `;
         list.appendChild(card);
     });
@@ -79,38 +123,111 @@ function getEmojiByCategory(cat) {
     return map[cat] || '📦';
 }
 
-function openBuyModal(productId) {
-    const p = currentProducts.find(item => item.product_id === productId);
+function saveCart() {
+    localStorage.setItem('cart', JSON.stringify(cart));
+    updateCartCount();
+}
+
+function updateCartCount() {
+    document.getElementById('cart-count').textContent = cart.reduce((sum, line) => sum + line.quantity, 0);
+}
+
+function addToCart(productId, quantity = 1) {
+    const p = knownProducts.get(productId);
     if (!p) return;
 
-    document.getElementById('order-product-id').value = p.product_id;
-    document.getElementById('checkout-name').textContent = p.product_name;
-    document.getElementById('checkout-price').textContent = formatCurrency(p.unit_price);
-    document.getElementById('stock-hint').textContent = `Available stock: ${p.quantity_in_stock} ${p.unit_of_measure}`;
-    
-    const qtyInput = document.getElementById('order-quantity');
-    qtyInput.value = 1;
-    qtyInput.max = p.quantity_in_stock;
-    
-    updateTotals(p.unit_price, 1);
-    
+    const line = cart.find(item => item.product_id === productId);
+    const inCart = line ? line.quantity : 0;
+    if (inCart + quantity > p.available_quantity) {
+        showError(`Only ${p.available_quantity} ${p.unit_of_measure} of ${p.product_name} available`);
+        return;
+    }
+    if (line) {
+        line.quantity += quantity;
+    } else {
+        cart.push({ product_id: productId, quantity });
+    }
+    saveCart();
+    showSuccess(`${p.product_name} added to cart`);
+}
+
+// "Buy Now" adds the product and goes straight to checkout
+async function openBuyModal(productId) {
+    await fetchProduct(productId);
+    if (!cart.some(item => item.product_id === productId)) {
+        addToCart(productId);
+    }
+    openCart();
+}
+
+function openCart() {
+    // Drop lines for products that are gone or sold out
+    cart = cart.filter(line => {
+        const p = knownProducts.get(line.product_id);
+        return p && p.available_quantity > 0;
+    });
+    saveCart();
+    renderCart();
     document.getElementById('buy-modal').style.display = 'block';
 }
 
-function updateTotals(price, qty) {
-    const total = price * qty;
+function renderCart() {
+    const container = document.getElementById('cart-lines');
+    const confirmBtn = document.getElementById('confirm-order-btn');
+
+    if (cart.length === 0) {
+        container.innerHTML = '<div style="text-align: center; color: var(--slate-500);">Your cart is empty.</div>';
+        confirmBtn.disabled = true;
+        updateTotals();
+        return;
+    }
+
+    container.innerHTML = cart.map(line => {
+        const p = knownProducts.get(line.product_id);
+        return `
+            <div style="display: flex; gap: 1rem; align-items: center;">
+                <div style="font-size: 1.5rem;">${getEmojiByCategory(p.category)}</div>
+                <div style="flex: 1;">
+                    <div style="font-weight: 600;">${p.product_name}</div>
+                    <div style="font-size: 0.8rem; color: var(--slate-500);">${formatCurrency(p.unit_price)} · ${p.available_quantity} available</div>
+                </div>
+                <input type="number" class="form-control" style="width: 5rem;" min="1" max="${p.available_quantity}"
+                    value="${line.quantity}" onchange="setCartQuantity(${p.product_id}, this.value)">
+                <button type="button" class="btn btn-secondary" onclick="removeFromCart(${p.product_id})">✕</button>
+            </div>
+        `;
+    }).join('');
+    // UPI orders stay disabled until the payment step re-enables them
+    if (document.getElementById('payment-method').value !== 'UPI') {
+        confirmBtn.disabled = false;
+    }
+    updateTotals();
+}
+
+function setCartQuantity(productId, value) {
+    const line = cart.find(item => item.product_id === productId);
+    const p = knownProducts.get(productId);
+    if (!line || !p) return;
+    line.quantity = Math.min(Math.max(parseInt(value) || 1, 1), p.available_quantity);
+    saveCart();
+    renderCart();
+}
+
+function removeFromCart(productId) {
+    cart = cart.filter(item => item.product_id !== productId);
+    saveCart();
+    renderCart();
+}
+
+function updateTotals() {
+    const total = cart.reduce((sum, line) => {
+        const p = knownProducts.get(line.product_id);
+        return p ? sum + p.unit_price * line.quantity : sum;
+    }, 0);
     document.getElementById('order-subtotal').textContent = formatCurrency(total);
     document.getElementById('order-total').textContent = formatCurrency(total);
 }
 
-document.getElementById('order-quantity').addEventListener('input', (e) => {
-    const id = document.getElementById('order-product-id').value;
-    const p = currentProducts.find(item => item.product_id == id);
-    if (p) {
-        updateTotals(p.unit_price, e.target.value);
-    }
-});
-
 function setupEventListeners() {
     const modal = document.getElementById('buy-modal');
     const closeBtn = document.querySelector('.close-modal');
@@ -187,9 +304,14 @@ function setupEventListeners() {
             return;
         }
 
+        if (cart.length === 0) {
+            showError('Your cart is empty');
+            return;
+        }
+
+        // The whole cart is one order, placed in a single request
         const payload = {
-            product_id: parseInt(document.getElementById('order-product-id').value),
-            quantity: parseInt(document.getElementById('order-quantity').value),
+            items: cart.map(line => ({ product_id: line.product_id, quantity: line.quantity })),
             shipping_address: document.getElementById('order-address').value,
             payment_method: method
         };
@@ -198,8 +320,17 @@ function setupEventListeners() {
         submitBtn.disabled = true;
         submitBtn.textContent = 'Finalizing Order...';
 
+        // A retry after a lost response replays the first order instead of placing a second one
+        const body = JSON.stringify(payload);
+        if (!checkoutAttempt || checkoutAttempt.body !== body) {
+            checkoutAttempt = { body, key: crypto.randomUUID() };
+        }
+
         try {
-            await apiCall('/orders', 'POST', payload);
+            await apiCall('/orders/checkout', 'POST', payload, { 'Idempotency-Key': checkoutAttempt.key });
+            checkoutAttempt = null;
+            cart = [];
+            saveCart();
             // Close modal first so the toast is clearly visible
             modal.style.display = 'none';
             resetOrderForm();
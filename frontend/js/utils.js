@@ -2,10 +2,11 @@
 const API_BASE_URL = 'http://localhost:5000/api';
 
 // Utility for API calls
-async function apiCall(endpoint, method = 'GET', data = null) {
+async function apiCall(endpoint, method = 'GET', data = null, extraHeaders = {}) {
     const token = localStorage.getItem('token');
     const headers = {
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        ...extraHeaders
     };
 
     if (token) {
@@ -48,6 +49,60 @@ async function apiCall(endpoint, method = 'GET', data = null) {
     }
 }
 
+// Fetch every page of a cursor-paginated list endpoint and return the combined items
+// Only for views that need the whole set (reports); lists page with a "Load more" button
+async function apiCallAllPages(endpoint, key) {
+    const items = [];
+    let cursor = null;
+    do {
+        const separator = endpoint.includes('?') ? '&' : '?';
+        const page = await apiCall(cursor ? `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}` : endpoint, 'GET');
+        items.push(...(page[key] || []));
+        cursor = page.next_cursor;
+    } while (cursor);
+    return items;
+}
+
+// Live updates from /api/stream (Server-Sent Events)
+// handlers maps event names ('alert', 'stock', 'counters', 'order', 'inbox') to
+// callbacks taking the event data; handlers.resync runs when updates may have
+// been missed (after a reconnect, or when the server dropped a connection that
+// fell behind) and should reload the page's data.
+function openEventStream(handlers) {
+    if (!localStorage.getItem('token') || typeof EventSource === 'undefined') return;
+
+    let connected = false;
+    // The stream URL carries a short-lived stream token, never the login token.
+    // The browser's own reconnect would reuse an expired one, so every
+    // (re)connect asks for a fresh token instead
+    async function connect() {
+        if (!localStorage.getItem('token')) return;
+        let stream;
+        try {
+            stream = await apiCall('/stream/token', 'POST');
+        } catch (error) {
+            setTimeout(connect, 3000);
+            return;
+        }
+        const source = new EventSource(`${API_BASE_URL}/stream?jwt=${encodeURIComponent(stream.token)}`);
+        source.addEventListener('ready', () => {
+            if (connected && handlers.resync) handlers.resync();
+            connected = true;
+        });
+        ['alert', 'stock', 'counters', 'order', 'inbox'].forEach(name => {
+            if (!handlers[name]) return;
+            source.addEventListener(name, event => handlers[name](JSON.parse(event.data)));
+        });
+        // Dropped connections and 'resync' both end here; the next 'ready'
+        // triggers the reload
+        source.addEventListener('error', () => {
+            source.close();
+            setTimeout(connect, 3000);
+        });
+    }
+    connect();
+}
+
 // Auth utilities
 function login(token, user) {
     localStorage.setItem('token', token);
@@ -164,6 +219,7 @@ function setupNavbar() {
         const icon = _navIcons[link.href] || '';
         return `<a href="${link.href}" class="nav-item ${currentPath === link.href || (currentPath === '' && link.href === 'index.html') ? 'active' : ''}">${icon} ${link.name}</a>`;
     }).join('');
+    if (user && user.role !== 'admin') refreshInboxBadge();
 
     // Render Auth Section
     if (user) {
@@ -222,6 +278,31 @@ function setupNavbar() {
     }
 }
 
+// Unread notification count on the Notifications link
+async function refreshInboxBadge() {
+    try {
+        const summary = await apiCall('/inbox/unread', 'GET');
+        setInboxBadge(summary.unread_count, summary.unread_more);
+        return summary;
+    } catch (error) {
+        return null;
+    }
+}
+
+function setInboxBadge(count, more) {
+    const link = document.querySelector('#main-nav-links a[href="alerts.html"]');
+    if (!link) return;
+    let badge = link.querySelector('.inbox-badge');
+    if (!badge) {
+        badge = document.createElement('span');
+        badge.className = 'badge badge-danger inbox-badge';
+        badge.style.marginLeft = '.35rem';
+        link.appendChild(badge);
+    }
+    badge.textContent = `${count}${more ? '+' : ''}`;
+    badge.style.display = count ? 'inline-block' : 'none';
+}
+
 // Toast notification system — top-right stacking
 const _toastConfig = {
     success: { icon: '✓', bg: 'linear-gradient(135deg,#10b981,#059669)', border: '#059669' },
@@ -0,0 +1,1339 @@
+"""
+Backend tests against a scratch SQLite database
+
+Most tests drive the Flask app through its test client. The concurrency
+tests do so from many threads at once and then check the invariants the
+guarded updates exist for:
+- stock never goes below zero and no accepted movement is lost
+- reserved stock never exceeds the stock on hand
+- a request repeated with one Idempotency-Key, or a delivery sent twice,
+  takes effect once
+The rest cover the behaviour of each endpoint and background job.
+
+Run with: python -m pytest -q tests
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+
+THREADS = 8
+ADMIN_ID = 1  # seeded by init_db
+
+@pytest.fixture(scope='module')
+def app():
+    Config.SQLITE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='inventory-tests-'), 'test.db')
+    Config.BACKGROUND_JOBS = False  # no sweeper or alert engine changing rows under the assertions
+    from database.database import init_db
+    init_db()
+    from app import app
+    return app
+
+@pytest.fixture(scope='module')
+def admin_headers(app):
+    return auth_headers(app, ADMIN_ID)
+
+def auth_headers(app, user_id):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+def connect():
+    connection = sqlite3.connect(Config.SQLITE_DB_PATH)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+def create_products(count, quantity):
+    connection = connect()
+    cursor = connection.cursor()
+    product_ids = []
+    for _ in range(count):
+        cursor.execute("""
+            INSERT INTO products (sku, product_name, category, supplier, unit_price, quantity_in_stock)
+            VALUES ('TEST-' || hex(randomblob(6)), 'Test product', 'Test', 'Test', 2.5, ?)
+        """, (quantity,))
+        product_ids.append(cursor.lastrowid)
+    connection.commit()
+    connection.close()
+    return product_ids
+
+def create_clients(app, count):
+    """Client accounts, returned as request headers"""
+    connection = connect()
+    cursor = connection.cursor()
+    user_ids = []
+    for _ in range(count):
+        cursor.execute("""
+            INSERT INTO users (username, email, password_hash, role, first_name)
+            VALUES ('client-' || hex(randomblob(6)), hex(randomblob(6)) || '@example.com', 'x', 'client', 'Test')
+        """)
+        user_ids.append(cursor.lastrowid)
+    connection.commit()
+    connection.close()
+    return [auth_headers(app, user_id) for user_id in user_ids]
+
+def product_row(product_id):
+    connection = connect()
+    row = connection.execute(
+        "SELECT quantity_in_stock, reserved_quantity FROM products WHERE product_id = ?", (product_id,)
+    ).fetchone()
+    connection.close()
+    return row
+
+def run_concurrently(targets):
+    """Start every target at the same moment and re-raise the first failure"""
+    barrier = threading.Barrier(len(targets))
+    errors = []
+
+    def run(target):
+        try:
+            barrier.wait()
+            target()
+        except BaseException as e:  # surfaced below; a thread cannot fail the test itself
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+def import_products(app, headers, rows):
+    """Create products through the bulk import endpoint (NDJSON), so categories and counts are maintained"""
+    body = '\n'.join(json.dumps(row) for row in rows)
+    response = app.test_client().post('/api/products/bulk', headers=headers, data=body,
+                                      content_type='application/x-ndjson')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def catalog_rows(count, category, quantity=10):
+    tag = os.urandom(4).hex()
+    return [{'sku': f'{category}-{tag}-{index:03d}', 'product_name': f'{category} item {index:03d}',
+             'category': category, 'supplier': 'Test', 'unit_price': 2.5, 'quantity_in_stock': quantity}
+            for index in range(count)]
+
+def place_order(app, headers, product_id, quantity):
+    response = app.test_client().post('/api/orders/checkout', headers=headers,
+                                      json={'items': [{'product_id': product_id, 'quantity': quantity}]})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['order_id']
+
+def test_concurrent_stock_movements_lose_no_updates(app, admin_headers):
+    initial = 40
+    product_ids = create_products(2, initial)
+    accepted = {product_id: 0 for product_id in product_ids}
+    lock = threading.Lock()
+
+    def worker(seed):
+        client = app.test_client()
+        rng = random.Random(seed)
+        for _ in range(40):
+            product_id = rng.choice(product_ids)
+            # Mostly stock-outs, so the products keep running dry
+            movement_type = 'stock-out' if rng.random() < 0.6 else 'stock-in'
+            quantity = rng.randint(1, 5)
+            response = client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                                  json={'movement_type': movement_type, 'quantity': quantity})
+            assert response.status_code in (200, 400), response.get_json()
+            if response.status_code == 200:
+                with lock:
+                    accepted[product_id] += quantity if movement_type == 'stock-in' else -quantity
+
+    run_concurrently([lambda seed=seed: worker(seed) for seed in range(THREADS)])
+
+    connection = connect()
+    for product_id in product_ids:
+        quantity = product_row(product_id)['quantity_in_stock']
+        assert quantity == initial + accepted[product_id]
+        assert quantity >= 0
+        # The movements chain: each one starts where the one before it ended
+        previous = initial
+        for movement in connection.execute(
+                "SELECT previous_quantity, new_quantity FROM stock_movements WHERE product_id = ? ORDER BY movement_id",
+                (product_id,)):
+            assert movement['previous_quantity'] == previous
+            assert movement['new_quantity'] >= 0
+            previous = movement['new_quantity']
+        assert previous == quantity
+    connection.close()
+
+def test_concurrent_checkouts_never_oversell(app):
+    stock = 25
+    product_id, = create_products(1, stock)
+    clients = create_clients(app, THREADS)
+    placed = []
+    lock = threading.Lock()
+
+    def worker(headers, seed):
+        client = app.test_client()
+        rng = random.Random(seed)
+        for _ in range(5):
+            quantity = rng.randint(1, 3)
+            response = client.post('/api/orders/checkout', headers=headers,
+                                   json={'items': [{'product_id': product_id, 'quantity': quantity}]})
+            assert response.status_code in (201, 400), response.get_json()
+            if response.status_code == 201:
+                with lock:
+                    placed.append(quantity)
+
+    run_concurrently([lambda headers=headers, seed=seed: worker(headers, seed)
+                      for seed, headers in enumerate(clients)])
+
+    row = product_row(product_id)
+    assert row['quantity_in_stock'] == stock  # reserving does not move stock
+    assert row['reserved_quantity'] == sum(placed)
+    assert row['reserved_quantity'] <= row['quantity_in_stock']
+    connection = connect()
+    active = connection.execute(
+        "SELECT COALESCE(SUM(quantity), 0) FROM stock_reservations WHERE product_id = ? AND status = 'active'",
+        (product_id,)).fetchone()[0]
+    connection.close()
+    assert active == sum(placed)
+
+def test_stock_outs_cannot_take_reserved_stock(app, admin_headers):
+    product_id, = create_products(1, 30)
+    clients = create_clients(app, 4)
+    order_ids = [place_order(app, clients[0], product_id, 2)]  # at least one order to deliver
+    lock = threading.Lock()
+
+    def order(headers):
+        client = app.test_client()
+        for _ in range(3):
+            response = client.post('/api/orders/checkout', headers=headers,
+                                   json={'items': [{'product_id': product_id, 'quantity': 2}]})
+            assert response.status_code in (201, 400), response.get_json()
+            if response.status_code == 201:
+                with lock:
+                    order_ids.append(response.get_json()['order_id'])
+
+    def stock_out():
+        client = app.test_client()
+        for _ in range(10):
+            response = client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                                  json={'movement_type': 'stock-out', 'quantity': 3})
+            assert response.status_code in (200, 400), response.get_json()
+
+    run_concurrently([lambda headers=headers: order(headers) for headers in clients] + [stock_out] * 4)
+
+    row = product_row(product_id)
+    assert row['reserved_quantity'] == 2 * len(order_ids)
+    assert 0 <= row['reserved_quantity'] <= row['quantity_in_stock']
+
+    # Every order that was accepted can still be delivered
+    response = app.test_client().post('/api/admin/orders/status', headers=admin_headers,
+                                      json={'order_ids': order_ids, 'status': 'Delivered'})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['updated'] == len(order_ids)
+    delivered = product_row(product_id)
+    assert delivered['reserved_quantity'] == 0
+    assert delivered['quantity_in_stock'] == row['quantity_in_stock'] - 2 * len(order_ids)
+
+def test_repeated_idempotency_key_places_one_order(app):
+    product_id, = create_products(1, 50)
+    headers, = create_clients(app, 1)
+    keyed = {**headers, 'Idempotency-Key': 'checkout-test-1'}
+    body = {'items': [{'product_id': product_id, 'quantity': 4}]}
+    statuses = []
+    order_ids = set()
+    lock = threading.Lock()
+
+    def submit():
+        response = app.test_client().post('/api/orders/checkout', headers=keyed, json=body)
+        with lock:
+            statuses.append(response.status_code)
+            if response.status_code == 201:
+                order_ids.add(response.get_json()['order_id'])
+
+    run_concurrently([submit] * THREADS)
+    # Retries while the first is still running are told to wait; later ones replay it
+    submit()
+
+    assert set(statuses) <= {201, 409}
+    assert statuses[-1] == 201
+    assert len(order_ids) == 1
+    assert product_row(product_id)['reserved_quantity'] == 4
+
+def test_concurrent_bulk_deliveries_deduct_once(app, admin_headers):
+    product_ids = create_products(2, 20)
+    clients = create_clients(app, 3)
+    order_ids = [place_order(app, headers, product_id, 3) for headers in clients for product_id in product_ids]
+    results = []
+    lock = threading.Lock()
+
+    def deliver():
+        response = app.test_client().post('/api/admin/orders/status', headers=admin_headers,
+                                          json={'order_ids': order_ids, 'status': 'Delivered', 'atomic': False})
+        assert response.status_code == 200, response.get_json()
+        with lock:
+            results.append(response.get_json())
+
+    run_concurrently([deliver] * 4)
+
+    # One request delivers every order; the others find them delivered already
+    assert sorted(result['updated'] for result in results) == [0, 0, 0, len(order_ids)]
+    assert all(result['failed'] == 0 for result in results)
+    connection = connect()
+    for product_id in product_ids:
+        row = product_row(product_id)
+        assert row['quantity_in_stock'] == 20 - 3 * len(clients)
+        assert row['reserved_quantity'] == 0
+        movements = connection.execute(
+            "SELECT COUNT(*) FROM stock_movements WHERE product_id = ? AND movement_type = 'stock-out'",
+            (product_id,)).fetchone()[0]
+        assert movements == len(clients)
+    connection.close()
+
+def test_delivered_and_cancelled_orders_cannot_reopen(app, admin_headers):
+    product_id, = create_products(1, 100)
+    headers, = create_clients(app, 1)
+    delivered = place_order(app, headers, product_id, 6)
+    cancelled = place_order(app, headers, product_id, 2)
+    client = app.test_client()
+    assert client.put(f'/api/admin/orders/{delivered}/status', headers=admin_headers,
+                      json={'status': 'Delivered'}).status_code == 200
+    assert client.put(f'/api/admin/orders/{cancelled}/status', headers=admin_headers,
+                      json={'status': 'Cancelled'}).status_code == 200
+
+    for order_id in (delivered, cancelled):
+        response = client.put(f'/api/admin/orders/{order_id}/status', headers=admin_headers,
+                              json={'status': 'Under Process'})
+        assert response.status_code == 400
+    response = client.post('/api/admin/orders/status', headers=admin_headers,
+                           json={'order_ids': [delivered, cancelled], 'status': 'Shipped', 'atomic': False})
+    assert response.status_code == 200
+    assert [result['status'] for result in response.get_json()['results']] == ['failed', 'failed']
+
+    # Delivered once, deducted once
+    row = product_row(product_id)
+    assert row['quantity_in_stock'] == 94
+    assert row['reserved_quantity'] == 0
+
+def test_delivery_cannot_take_stock_reserved_by_other_orders(app, admin_headers):
+    product_id, = create_products(1, 10)
+    first, second = create_clients(app, 2)
+    order_a = place_order(app, first, product_id, 6)
+    # Order A loses its reservation (as orders placed before reservations did), B reserves everything
+    connection = connect()
+    connection.execute("UPDATE stock_reservations SET status = 'released' WHERE order_id = ?", (order_a,))
+    connection.execute("UPDATE products SET reserved_quantity = 0 WHERE product_id = ?", (product_id,))
+    connection.commit()
+    connection.close()
+    order_b = place_order(app, second, product_id, 10)
+
+    client = app.test_client()
+    response = client.put(f'/api/admin/orders/{order_a}/status', headers=admin_headers, json={'status': 'Delivered'})
+    assert response.status_code == 400
+    assert 'reserved by other orders' in response.get_json()['error']
+    response = client.put(f'/api/admin/orders/{order_b}/status', headers=admin_headers, json={'status': 'Delivered'})
+    assert response.status_code == 200
+    row = product_row(product_id)
+    assert (row['quantity_in_stock'], row['reserved_quantity']) == (0, 0)
+
+def test_expired_reservations_cancel_their_orders(app):
+    from backend.reservations import expire_reservations
+    from database.database import get_db_connection
+    product_id, = create_products(1, 10)
+    headers, = create_clients(app, 1)
+    order_id = place_order(app, headers, product_id, 4)
+    connection = connect()
+    connection.execute("UPDATE stock_reservations SET expires_at = datetime('now', '-1 seconds') WHERE order_id = ?",
+                       (order_id,))
+    connection.commit()
+    connection.close()
+
+    db = get_db_connection()
+    try:
+        assert expire_reservations(db, 100) == 1
+    finally:
+        db.close()
+    connection = connect()
+    status = connection.execute("SELECT status FROM orders WHERE order_id = ?", (order_id,)).fetchone()[0]
+    reservation = connection.execute("SELECT status FROM stock_reservations WHERE order_id = ?", (order_id,)).fetchone()[0]
+    connection.close()
+    assert (status, reservation) == ('Cancelled', 'expired')
+    assert product_row(product_id)['reserved_quantity'] == 0
+
+class FlakyPool:
+    """The process pool, except that the first `failures` checkouts time out"""
+    def __init__(self, pool, failures):
+        self.pool = pool
+        self.failures = failures
+
+    def acquire(self):
+        from database.database import PoolTimeoutError
+        if self.failures:
+            self.failures -= 1
+            raise PoolTimeoutError('No database connection available')
+        return self.pool.acquire()
+
+    def release(self, connection):
+        self.pool.release(connection)
+
+def test_alert_engine_survives_pool_timeout(app, monkeypatch):
+    import database.database
+    from backend.alert_engine import AlertEngine
+    monkeypatch.setattr(database.database, 'get_pool', lambda flaky=FlakyPool(database.database.get_pool(), 1): flaky)
+    product_id, = create_products(1, 0)
+
+    engine = AlertEngine(0.01, 100)
+    engine.reconcile = False
+    engine.start()
+    try:
+        engine.notify([product_id])
+        assert engine.wait_idle(10)
+        assert engine.thread.is_alive()
+    finally:
+        engine.stop()
+    connection = connect()
+    alert_type = connection.execute(
+        "SELECT alert_type FROM alerts WHERE product_id = ? AND resolved_at IS NULL", (product_id,)).fetchone()[0]
+    connection.close()
+    assert alert_type == 'out_of_stock'
+
+def test_stream_hub_survives_pool_timeout(app, monkeypatch):
+    import database.database
+    from backend.stream import StreamHub
+    monkeypatch.setattr(database.database, 'get_pool', lambda flaky=FlakyPool(database.database.get_pool(), 1): flaky)
+    product_id, = create_products(1, 7)
+
+    hub = StreamHub(10, 10, 0.01)
+    threading.Thread(target=hub.run, daemon=True).start()
+    client = hub.connect(ADMIN_ID, True)
+    hub.on_products([product_id])
+    # The first read times out; the batch is kept and pushed on the retry
+    message = client.queue.get(timeout=10)
+    assert message.startswith('event: stock')
+    assert f'"product_id": {product_id}' in message
+
+def test_stream_opens_only_with_a_stream_token(app, admin_headers):
+    client = app.test_client()
+    access_token = admin_headers['Authorization'].split()[1]
+    assert client.get(f'/api/stream?jwt={access_token}').status_code == 401
+
+    response = client.post('/api/stream/token', headers=admin_headers)
+    assert response.status_code == 200
+    stream_token = response.get_json()['token']
+    assert client.get('/api/stats', headers={'Authorization': f'Bearer {stream_token}'}).status_code == 401
+
+    response = client.get(f'/api/stream?jwt={stream_token}')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert b'event: ready' in next(response.response)
+    response.close()
+
+def test_anonymous_listing_pages_through_a_category(app, admin_headers):
+    category = f'Landing{os.urandom(3).hex()}'
+    rows = catalog_rows(7, category)
+    assert import_products(app, admin_headers, rows)['created'] == 7
+    client = app.test_client()
+
+    # The public landing page builds its chips from the category list
+    response = client.get('/api/categories')
+    assert response.status_code == 200
+    assert category in response.get_json()['categories']
+
+    skus = []
+    cursor = None
+    while True:
+        query = f'/api/products?category={category}&limit=3' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(query).get_json()
+        skus += [product['sku'] for product in page['products']]
+        cursor = page['next_cursor']
+        if not page['has_more']:
+            break
+    assert skus == [row['sku'].upper() for row in rows]
+
+def test_read_cursor_migration_seeds_existing_users(tmp_path):
+    from database.migrations import migrate
+    connection = sqlite3.connect(str(tmp_path / 'inbox.db'))
+    connection.row_factory = sqlite3.Row
+    migrate(connection, True)
+    # Back to the state before migration 19: a user with no read mark and a backlog of alerts
+    connection.execute("DELETE FROM alert_read_cursors")
+    connection.execute("DELETE FROM schema_migrations WHERE version = 19")
+    connection.execute("""
+        INSERT INTO users (username, email, password_hash, role) VALUES ('early', 'early@example.com', 'x', 'client')
+    """)
+    for _ in range(3):
+        connection.execute("INSERT INTO alerts (alert_type, alert_message) VALUES ('custom', 'Backlog')")
+    newest = connection.execute("SELECT MAX(alert_id) FROM alerts").fetchone()[0]
+    connection.commit()
+
+    assert migrate(connection, True) == 19
+    marks = connection.execute("SELECT user_id, read_through FROM alert_read_cursors").fetchall()
+    users = connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    connection.close()
+    assert len(marks) == users == 2
+    assert {mark['read_through'] for mark in marks} == {newest}
+
+def test_stock_batch_atomic_must_be_a_boolean(app, admin_headers):
+    product_id, = create_products(1, 10)
+    client = app.test_client()
+    for atomic in ('false', 0, None):
+        response = client.put('/api/stock/batch', headers=admin_headers, json={
+            'atomic': atomic, 'movements': [{'product_id': product_id, 'movement_type': 'stock-out', 'quantity': 3}]})
+        assert response.status_code == 400
+        assert 'atomic' in response.get_json()['error']
+    assert product_row(product_id)['quantity_in_stock'] == 10
+
+def test_bulk_status_atomic_must_be_a_boolean(app, admin_headers):
+    product_id, = create_products(1, 10)
+    headers, = create_clients(app, 1)
+    order_id = place_order(app, headers, product_id, 2)
+    client = app.test_client()
+    for atomic in ('false', 1, []):
+        response = client.post('/api/admin/orders/status', headers=admin_headers,
+                               json={'order_ids': [order_id], 'status': 'Shipped', 'atomic': atomic})
+        assert response.status_code == 400
+        assert 'atomic' in response.get_json()['error']
+    connection = connect()
+    status = connection.execute("SELECT status FROM orders WHERE order_id = ?", (order_id,)).fetchone()[0]
+    connection.close()
+    assert status == 'Under Process'
+
+def test_idempotent_response_commits_with_the_order(app, monkeypatch):
+    import app as app_module
+    from backend.idempotency import get_cache
+    # A separate completion step that never happens, as when the worker dies after the order commits
+    def worker_died(*args):
+        raise RuntimeError('worker died')
+    monkeypatch.setattr(app_module, 'complete_key', worker_died)
+    product_id, = create_products(1, 10)
+    headers, = create_clients(app, 1)
+    headers = dict(headers, **{'Idempotency-Key': f'crash-{os.urandom(4).hex()}'})
+    body = {'items': [{'product_id': product_id, 'quantity': 2}]}
+    client = app.test_client()
+
+    first = client.post('/api/orders/checkout', headers=headers, json=body)
+    assert first.status_code == 201
+    get_cache().entries.clear()  # the retry lands on another process
+    retry = client.post('/api/orders/checkout', headers=headers, json=body)
+    assert retry.status_code == 201
+    assert retry.headers.get('Idempotent-Replayed') == 'true'
+    assert retry.get_json() == first.get_json()
+    assert product_row(product_id)['reserved_quantity'] == 2
+
+def test_pool_reuses_connections_and_times_out_when_exhausted(app):
+    from database.database import ConnectionPool, PoolTimeoutError
+    pool = ConnectionPool(size=2, timeout=0.05)
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    # Returned connections are rolled back and handed out again
+    first.execute("INSERT INTO categories (category_name) VALUES ('Uncommitted')")
+    pool.release(first)
+    again = pool.acquire()
+    assert again is first
+    assert again.execute("SELECT COUNT(*) FROM categories WHERE category_name = 'Uncommitted'").fetchone()[0] == 0
+
+    stats = pool.stats()
+    assert (stats['open'], stats['in_use'], stats['checkouts'], stats['timeouts']) == (2, 2, 3, 1)
+    pool.release(again)
+    pool.release(second)
+    pool.close()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+def test_pool_replaces_a_broken_idle_connection(app):
+    from database.database import ConnectionPool
+    pool = ConnectionPool(size=1, timeout=0.05, health_check_after=0)
+    connection = pool.acquire()
+    pool.release(connection)
+    connection.close()  # dies while idle
+    replacement = pool.acquire()
+    assert replacement is not connection
+    assert replacement.execute("SELECT 1").fetchone()[0] == 1
+    assert pool.stats()['replaced'] == 1
+    pool.release(replacement)
+    pool.close()
+
+def test_sqlite_production_profile_is_applied(app):
+    from database.database import get_db_connection, apply_sqlite_profile
+    connection = get_db_connection()
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert connection.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert connection.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+        with pytest.raises(ValueError):
+            apply_sqlite_profile(connection, 'fastest')
+    finally:
+        connection.close()
+
+def test_backend_statements_have_query_plans_without_full_scans(app):
+    from database import check_query_plans as checker
+    statements, unrendered = checker.collect_statements()
+    assert unrendered == []
+    # Statements built from f-strings are rendered and checked too
+    assert any('IN (?)' in statement for statement in statements)
+
+    connection = connect()
+    failures = []
+    for statement, locations in statements.items():
+        scanned = checker.full_scans(statement, checker.explain(connection, statement))
+        if scanned and not any(marker in statement for marker in checker.FULL_SCAN_ALLOWED):
+            failures.append((locations, scanned))
+    connection.close()
+    assert failures == []
+
+def test_query_plan_checker_refuses_unknown_fstring_pieces():
+    import ast
+    from database import check_query_plans as checker
+    node = ast.parse('f"SELECT * FROM products WHERE product_id IN ({p}) {mystery}"').body[0].value
+    with pytest.raises(KeyError):
+        checker.render(node, 'inventory.py')
+    node = ast.parse('f"UPDATE products SET {change} WHERE product_id = {p}{guard}"').body[0].value
+    assert checker.render(node, 'stock.py') == [
+        'UPDATE products SET quantity_in_stock = quantity_in_stock + ? WHERE product_id = ?',
+        'UPDATE products SET quantity_in_stock = quantity_in_stock + ? WHERE product_id = ? AND quantity_in_stock - reserved_quantity >= ?',
+        'UPDATE products SET quantity_in_stock = quantity_in_stock - ? WHERE product_id = ?',
+        'UPDATE products SET quantity_in_stock = quantity_in_stock - ? WHERE product_id = ? AND quantity_in_stock - reserved_quantity >= ?',
+    ]
+
+def test_migrations_apply_once_and_noop_when_current(tmp_path):
+    from database.migrations import migrate, MIGRATIONS, LATEST_VERSION
+    connection = sqlite3.connect(str(tmp_path / 'migrations.db'))
+    assert migrate(connection, True) == LATEST_VERSION
+    versions = [row[0] for row in connection.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+
+    # An up-to-date schema costs one version lookup
+    statements = []
+    connection.set_trace_callback(statements.append)
+    assert migrate(connection, True) == LATEST_VERSION
+    connection.set_trace_callback(None)
+    assert len(statements) == 1
+    connection.close()
+
+@pytest.mark.parametrize('snapshot', [False, True])
+def test_product_pages_project_fields_and_reject_bad_cursors(app, admin_headers, monkeypatch, snapshot):
+    monkeypatch.setattr(Config, 'CATALOG_SNAPSHOT', snapshot)
+    category = f'Paged{os.urandom(3).hex()}'
+    rows = catalog_rows(5, category)
+    import_products(app, admin_headers, rows)
+    client = app.test_client()
+
+    first = client.get(f'/api/products?category={category}&limit=2&fields=sku').get_json()
+    assert [set(product) for product in first['products']] == [{'product_id', 'product_name', 'sku'}] * 2
+    assert first['has_more'] and first['next_cursor']
+    # A product added before the cursor does not shift the next page
+    import_products(app, admin_headers, [dict(rows[0], sku=f'{category}-early', product_name=f'{category} item 000a')])
+    second = client.get(f"/api/products?category={category}&limit=2&fields=sku&cursor={first['next_cursor']}").get_json()
+    assert [product['sku'] for product in first['products'] + second['products']] == \
+        [row['sku'].upper() for row in rows[:4]]
+
+    assert client.get('/api/products?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/products?fields=sku,password').status_code == 400
+    assert client.get('/api/products?limit=0').status_code == 400
+
+def product_ids_for(rows):
+    connection = connect()
+    skus = [row['sku'].upper() for row in rows]
+    found = dict(connection.execute(
+        f"SELECT sku, product_id FROM products WHERE sku IN ({', '.join('?' * len(skus))})", skus).fetchall())
+    connection.close()
+    return [found[sku] for sku in skus]
+
+def test_full_text_search_matches_word_prefixes(app, admin_headers):
+    tag = os.urandom(3).hex()
+    rows = [
+        {'sku': f'FTS{tag}A', 'product_name': f'Zephyr{tag} quantum widget', 'description': 'Ultrasonic cleaner',
+         'category': 'Search', 'supplier': 'Test', 'unit_price': 4, 'quantity_in_stock': 5},
+        {'sku': f'FTS{tag}B', 'product_name': f'Zephyr{tag} plain bracket', 'description': 'Steel',
+         'category': 'Search', 'supplier': 'Test', 'unit_price': 4, 'quantity_in_stock': 5},
+    ]
+    import_products(app, admin_headers, rows)
+    widget, bracket = product_ids_for(rows)
+    client = app.test_client()
+
+    def search(text):
+        response = client.get('/api/products', query_string={'search': text, 'fields': 'sku'})
+        assert response.status_code == 200
+        return {product['product_id'] for product in response.get_json()['products']}
+
+    assert search(f'zephyr{tag}') == {widget, bracket}
+    assert search('zeph') >= {widget, bracket}                # prefix of a word
+    assert search(f'zephyr{tag} ultra') == {widget}        # every word must match, description included
+    assert search(f'fts{tag}b') == {bracket}               # SKU prefix
+    assert search(f'zephyr{tag} "quan') == {widget}        # quotes in the input are not FTS syntax
+
+    # The index follows renames and deactivation
+    response = client.put(f'/api/products/{bracket}', headers=admin_headers, json={'product_name': f'Nimbus{tag} bracket'})
+    assert response.status_code == 200
+    assert search(f'nimbus{tag}') == {bracket}
+    assert search(f'zephyr{tag}') == {widget}
+    assert client.delete(f'/api/products/{widget}', headers=admin_headers).status_code == 200
+    assert search(f'zephyr{tag}') == set()
+
+def test_list_endpoints_answer_304_until_their_tables_change(app, admin_headers):
+    client = app.test_client()
+    first = client.get('/api/transactions', headers=admin_headers)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+
+    revalidated = client.get('/api/transactions', headers=dict(admin_headers, **{'If-None-Match': etag}))
+    assert revalidated.status_code == 304 and revalidated.data == b''
+    # Another user, or another query string, is another representation
+    other, = create_clients(app, 1)
+    assert client.get('/api/transactions', headers=dict(other, **{'If-None-Match': etag})).status_code == 200
+    assert client.get('/api/transactions?page=2', headers=dict(admin_headers, **{'If-None-Match': etag})).status_code == 200
+    # A write to other tables keeps the ETag; a new transaction changes it
+    product_id, = create_products(1, 5)
+    assert client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                      json={'movement_type': 'stock-in', 'quantity': 1}).status_code == 200
+    assert client.get('/api/transactions', headers=dict(admin_headers, **{'If-None-Match': etag})).status_code == 304
+
+    response = client.post('/api/transactions', headers=admin_headers, json={
+        'product_id': product_id, 'transaction_type': 'purchase', 'quantity': 1, 'unit_price': 3})
+    assert response.status_code == 201
+    changed = client.get('/api/transactions', headers=dict(admin_headers, **{'If-None-Match': etag}))
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+def test_bulk_import_reports_duplicate_and_invalid_rows(app, admin_headers, monkeypatch):
+    monkeypatch.setattr(Config, 'BULK_IMPORT_CHUNK_SIZE', 2)  # several chunks, one transaction each
+    tag = os.urandom(3).hex()
+    existing = catalog_rows(1, f'Import{tag}')
+    import_products(app, admin_headers, existing)
+    category = f'Import{tag}'
+    csv_body = '\n'.join([
+        'SKU,Product_Name,Category,Supplier,Unit_Price,Quantity_In_Stock',
+        f'imp-{tag}-a,Alpha,{category},Test,2.5,4',
+        f'imp-{tag}-b,Beta,{category},Test,3,0',
+        f'IMP-{tag}-A,Alpha again,{category},Test,2.5,1',       # same SKU as row 1 after normalizing
+        f'imp-{tag}-c,,{category},Test,2.5,1',                  # no name
+        f"{existing[0]['sku']},Old,{category},Test,2.5,1",      # already in the database
+        f'imp-{tag}-d,Delta,{category},Test,1,7',
+    ])
+    client = app.test_client()
+    response = client.post('/api/products/bulk', headers=admin_headers, data=csv_body, content_type='text/csv')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['received'], result['created'], result['failed']) == (6, 3, 3)
+    errors = {error['row']: error['error'] for error in result['errors']}
+    assert sorted(errors) == [3, 4, 5]
+    assert 'Duplicate SKU' in errors[3]
+    assert 'already exists' in errors[5]
+
+    # Initial stock is recorded as movements and the category count follows
+    connection = connect()
+    moved = connection.execute("""
+        SELECT p.sku, m.quantity FROM stock_movements m JOIN products p ON p.product_id = m.product_id
+        WHERE p.sku LIKE ? AND m.reference_number = 'INITIAL'
+    """, (f'IMP-{tag}-%',)).fetchall()
+    count = connection.execute("SELECT product_count FROM categories WHERE category_name = ?", (category,)).fetchone()[0]
+    connection.close()
+    assert sorted(map(tuple, moved)) == [(f'IMP-{tag}-A'.upper(), 4), (f'IMP-{tag}-D'.upper(), 7)]
+    assert count == 4
+
+    assert client.post('/api/products/bulk', headers=admin_headers, data='{}', content_type='application/json').status_code == 415
+
+def test_stock_batch_applies_lines_in_order(app, admin_headers):
+    first, second = create_products(2, 5)
+    client = app.test_client()
+    batch = [
+        {'product_id': first, 'movement_type': 'stock-in', 'quantity': 10},
+        {'product_id': first, 'movement_type': 'stock-out', 'quantity': 12},   # fits after the stock-in
+        {'product_id': second, 'movement_type': 'stock-out', 'quantity': 6},   # more than on hand
+        {'product_id': second, 'movement_type': 'adjustment', 'quantity': 9},
+    ]
+
+    response = client.put('/api/stock/batch', headers=admin_headers, json={'movements': batch})
+    assert response.status_code == 400
+    assert [result['status'] for result in response.get_json()['results']] == \
+        ['rolled_back', 'rolled_back', 'failed', 'rolled_back']
+    assert (product_row(first)['quantity_in_stock'], product_row(second)['quantity_in_stock']) == (5, 5)
+
+    response = client.put('/api/stock/batch', headers=admin_headers, json={'movements': batch, 'atomic': False})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['applied', 'applied', 'failed', 'applied']
+    assert [(result.get('previous_quantity'), result.get('new_quantity')) for result in results] == \
+        [(5, 15), (15, 3), (None, None), (5, 9)]
+    assert (product_row(first)['quantity_in_stock'], product_row(second)['quantity_in_stock']) == (3, 9)
+    connection = connect()
+    movements = connection.execute(
+        "SELECT product_id, movement_type, previous_quantity, new_quantity FROM stock_movements "
+        "WHERE product_id IN (?, ?) ORDER BY movement_id", (first, second)).fetchall()
+    connection.close()
+    assert [tuple(row) for row in movements] == [
+        (first, 'stock-in', 5, 15), (first, 'stock-out', 15, 3), (second, 'adjustment', 5, 9)]
+
+def test_rejected_stock_out_changes_nothing(app, admin_headers):
+    product_id, = create_products(1, 4)
+    client = app.test_client()
+    response = client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                          json={'movement_type': 'stock-out', 'quantity': 5})
+    assert response.status_code == 400
+    response = client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                          json={'movement_type': 'stock-out', 'quantity': 4})
+    assert response.status_code == 200
+    movement = response.get_json()['movement']
+    assert (movement['previous_quantity'], movement['new_quantity']) == (4, 0)
+
+    assert client.delete(f'/api/products/{product_id}', headers=admin_headers).status_code == 200
+    response = client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                          json={'movement_type': 'stock-in', 'quantity': 1})
+    assert response.status_code == 404
+    connection = connect()
+    movements = connection.execute("SELECT COUNT(*) FROM stock_movements WHERE product_id = ?", (product_id,)).fetchone()[0]
+    connection.close()
+    assert movements == 1
+    assert product_row(product_id)['quantity_in_stock'] == 0
+
+def test_category_and_supplier_lists_follow_product_writes(app, admin_headers):
+    tag = os.urandom(3).hex()
+    old_category, new_category, supplier = f'Dim{tag}old', f'Dim{tag}new', f'Supplier{tag}'
+    rows = [dict(row, supplier=supplier) for row in catalog_rows(2, old_category)]
+    import_products(app, admin_headers, rows)
+    first, second = product_ids_for(rows)
+    client = app.test_client()
+
+    def listed():
+        categories = client.get('/api/categories', headers=admin_headers).get_json()['categories']
+        suppliers = client.get('/api/suppliers', headers=admin_headers).get_json()['suppliers']
+        return old_category in categories, new_category in categories, supplier in suppliers
+
+    assert listed() == (True, False, True)
+    assert client.put(f'/api/products/{first}', headers=admin_headers, json={'category': new_category}).status_code == 200
+    assert listed() == (True, True, True)
+    assert client.put(f'/api/products/{second}', headers=admin_headers, json={'category': new_category}).status_code == 200
+    assert listed() == (False, True, True)
+    for product_id in (first, second):
+        assert client.delete(f'/api/products/{product_id}', headers=admin_headers).status_code == 200
+    assert listed() == (False, False, False)
+
+@pytest.mark.parametrize('snapshot', [False, True])
+def test_low_stock_set_follows_quantity_and_threshold(app, admin_headers, monkeypatch, snapshot):
+    monkeypatch.setattr(Config, 'CATALOG_SNAPSHOT', snapshot)
+    category = f'Low{os.urandom(3).hex()}'
+    rows = [dict(row, min_stock_level=5) for row in catalog_rows(1, category, quantity=8)]
+    import_products(app, admin_headers, rows)
+    product_id, = product_ids_for(rows)
+    client = app.test_client()
+
+    def state():
+        connection = connect()
+        row = connection.execute("SELECT status FROM low_stock_products WHERE product_id = ?", (product_id,)).fetchone()
+        connection.close()
+        listed = client.get(f'/api/products?low_stock=true&category={category}').get_json()['products']
+        assert [product['product_id'] for product in listed] == ([product_id] if row else [])
+        return row['status'] if row else None
+
+    def move(movement_type, quantity):
+        assert client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                          json={'movement_type': movement_type, 'quantity': quantity}).status_code == 200
+
+    assert state() is None
+    move('stock-out', 3)
+    assert state() == 'low'   # at the threshold counts as low
+    move('stock-out', 5)
+    assert state() == 'out'
+    move('stock-in', 10)
+    assert state() is None
+    assert client.put(f'/api/products/{product_id}', headers=admin_headers, json={'min_stock_level': 10}).status_code == 200
+    assert state() == 'low'
+    assert client.delete(f'/api/products/{product_id}', headers=admin_headers).status_code == 200
+    assert state() is None
+
+def record_history(product_id, created_at, moves):
+    """Backdate a product and write its movements directly: moves are (created_at, type, previous, new)"""
+    connection = connect()
+    connection.execute("UPDATE products SET created_at = ?, quantity_in_stock = ? WHERE product_id = ?",
+                       (created_at, moves[-1][3], product_id))
+    connection.executemany("""
+        INSERT INTO stock_movements (product_id, movement_type, quantity, previous_quantity, new_quantity, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(product_id, kind, abs(new - previous), previous, new, at) for at, kind, previous, new in moves])
+    connection.commit()
+    connection.close()
+
+def test_stock_as_of_replays_from_checkpoints(app, admin_headers):
+    product_id, = create_products(1, 0)
+    record_history(product_id, '2020-01-01 00:00:00', [
+        ('2020-01-02 09:00:00', 'stock-in', 0, 10),
+        ('2020-01-05 09:00:00', 'stock-out', 10, 4),
+        ('2020-01-09 09:00:00', 'stock-in', 4, 7)])
+    client = app.test_client()
+
+    def as_of(date):
+        response = client.get(f'/api/reports/stock-as-of?date={date}&product_id={product_id}', headers=admin_headers)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        return body['product']['quantity'], body['checkpoint'] and body['checkpoint']['direction']
+
+    expected = {'2020-01-01 12:00:00': 0, '2020-01-02': 10, '2020-01-05 08:59:59': 10,
+                '2020-01-05 09:00:00': 4, '2020-01-08': 4, '2020-01-09': 7}
+    assert {date: as_of(date)[0] for date in expected} == expected
+
+    # A later checkpoint is replayed backward, an earlier one forward
+    response = client.post('/api/reports/stock-checkpoints', headers=admin_headers)
+    assert response.status_code == 201
+    assert response.get_json()['checkpoint']['product_count'] >= 1
+    assert {date: as_of(date) for date in expected} == {date: (quantity, 'backward') for date, quantity in expected.items()}
+    assert client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                      json={'movement_type': 'stock-out', 'quantity': 2}).status_code == 200
+    assert as_of('2099-01-01') == (5, 'forward')
+
+    # The whole catalog lists only the products that existed then
+    body = client.get('/api/reports/stock-as-of?date=2020-01-08', headers=admin_headers).get_json()
+    assert [(product['product_id'], product['quantity']) for product in body['products']] == [(product_id, 4)]
+    assert body['total_quantity'] == 4
+
+    assert client.get(f'/api/reports/stock-as-of?date=2019-12-31&product_id={product_id}',
+                      headers=admin_headers).status_code == 404
+    assert client.get('/api/reports/stock-as-of', headers=admin_headers).status_code == 400
+    assert client.post('/api/reports/stock-checkpoints', headers=create_clients(app, 1)[0]).status_code == 403
+
+def test_movement_history_pages_filters_and_aggregates(app, admin_headers):
+    product_id, = create_products(1, 0)
+    # Two movements share a timestamp, so pages must break the tie on movement_id
+    record_history(product_id, '2021-03-01 00:00:00', [
+        ('2021-03-01 08:00:00', 'stock-in', 0, 20),
+        ('2021-03-01 17:00:00', 'stock-out', 20, 15),
+        ('2021-03-02 10:00:00', 'stock-out', 15, 12),
+        ('2021-03-02 10:00:00', 'adjustment', 12, 14),
+        ('2021-03-03 09:00:00', 'stock-in', 14, 19)])
+    client = app.test_client()
+    url = f'/api/products/{product_id}/movements'
+
+    def pages(query):
+        seen, cursor = [], ''
+        while True:
+            response = client.get(f'{url}?limit=2&{query}{cursor}', headers=admin_headers)
+            assert response.status_code == 200, response.get_json()
+            body = response.get_json()
+            seen.append([(movement['movement_type'], movement['new_quantity']) for movement in body['movements']])
+            if not body['has_more']:
+                assert body['next_cursor'] is None
+                return seen
+            cursor = f"&cursor={body['next_cursor']}"
+
+    assert pages('') == [[('stock-in', 19), ('adjustment', 14)], [('stock-out', 12), ('stock-out', 15)],
+                         [('stock-in', 20)]]
+    assert pages('from=2021-03-02&to=2021-03-02') == [[('adjustment', 14), ('stock-out', 12)]]
+    assert pages('movement_type=stock-in,adjustment') == [[('stock-in', 19), ('adjustment', 14)], [('stock-in', 20)]]
+
+    body = client.get(f'{url}?aggregate=daily&to=2021-03-02', headers=admin_headers).get_json()
+    assert body['days'] == [
+        {'date': '2021-03-01', 'movements': 2, 'stock_in': 20, 'stock_out': 5, 'net_change': 15},
+        {'date': '2021-03-02', 'movements': 2, 'stock_in': 2, 'stock_out': 3, 'net_change': -1}]
+    assert (body['total_in'], body['total_out']) == (22, 8)
+
+    for query in ('movement_type=refund', 'aggregate=weekly', 'from=yesterday', 'cursor=garbage'):
+        assert client.get(f'{url}?{query}', headers=admin_headers).status_code == 400, query
+    assert client.get('/api/products/999999/movements', headers=admin_headers).status_code == 404
+
+def test_catalog_snapshot_follows_published_and_outside_writes(app, admin_headers, monkeypatch):
+    monkeypatch.setattr(Config, 'CATALOG_SNAPSHOT', True)
+    monkeypatch.setattr(Config, 'CATALOG_SYNC_INTERVAL', 3600)
+    category = f'Sync{os.urandom(3).hex()}'
+    rows = catalog_rows(3, category)
+    import_products(app, admin_headers, rows)
+    first, second, third = product_ids_for(rows)
+    client = app.test_client()
+
+    def listed():
+        products = client.get(f'/api/products?category={category}').get_json()['products']
+        return {product['product_id']: product['quantity_in_stock'] for product in products}
+
+    assert listed() == {first: 10, second: 10, third: 10}
+    # Writes made through the API are published and show up at once
+    assert client.put(f'/api/products/{first}/stock', headers=admin_headers,
+                      json={'movement_type': 'stock-out', 'quantity': 4}).status_code == 200
+    assert listed() == {first: 6, second: 10, third: 10}
+
+    # Another process's writes only bump the change counter; one commits late
+    connection = connect()
+    connection.execute("UPDATE products SET quantity_in_stock = 3, updated_at = CURRENT_TIMESTAMP WHERE product_id = ?",
+                       (second,))
+    connection.execute("UPDATE products SET is_active = 0, updated_at = datetime('now', '-30 seconds') WHERE product_id = ?",
+                       (third,))
+    connection.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'products'")
+    connection.commit()
+    connection.close()
+    assert listed() == {first: 6, second: 10, third: 10}  # not probed until the interval passes
+    monkeypatch.setattr(Config, 'CATALOG_SYNC_INTERVAL', 0)
+    assert listed() == {first: 6, second: 3}
+
+    # Listings are cached per ETag until the snapshot changes
+    response = client.get(f'/api/products?category={category}')
+    etag = response.headers['ETag']
+    assert client.get(f'/api/products?category={category}', headers={'If-None-Match': etag}).status_code == 304
+    assert client.put(f'/api/products/{second}', headers=admin_headers, json={'product_name': 'Renamed'}).status_code == 200
+    assert client.get(f'/api/products?category={category}', headers={'If-None-Match': etag}).status_code == 200
+
+def test_checkout_places_every_line_or_none(app, admin_headers, monkeypatch):
+    first, second, third = create_products(3, 5)
+    headers, = create_clients(app, 1)
+    client = app.test_client()
+    assert client.delete(f'/api/products/{third}', headers=admin_headers).status_code == 200
+
+    # Every failing line is reported and nothing is reserved
+    response = client.post('/api/orders/checkout', headers=headers, json={'items': [
+        {'product_id': first, 'quantity': 2}, {'product_id': second, 'quantity': 6}, {'product_id': third, 'quantity': 1}]})
+    assert response.status_code == 400
+    assert [(error['product_id'], error['error'], error.get('available')) for error in response.get_json()['errors']] == [
+        (second, 'Insufficient stock available', 5), (third, 'Product not found', None)]
+    assert [product_row(product_id)['reserved_quantity'] for product_id in (first, second)] == [0, 0]
+
+    # Repeated products are merged into one line
+    response = client.post('/api/orders/checkout', headers=headers, json={'items': [
+        {'product_id': first, 'quantity': 2}, {'product_id': second, 'quantity': 1}, {'product_id': first, 'quantity': 3}]})
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    assert (body['item_count'], body['total_amount']) == (2, 15.0)
+    connection = connect()
+    lines = connection.execute("SELECT product_id, quantity, line_total FROM order_items WHERE order_id = ? ORDER BY order_item_id",
+                               (body['order_id'],)).fetchall()
+    connection.close()
+    assert [tuple(line) for line in lines] == [(first, 5, 12.5), (second, 1, 2.5)]
+    assert [product_row(product_id)['reserved_quantity'] for product_id in (first, second)] == [5, 1]
+
+    monkeypatch.setattr(Config, 'CHECKOUT_MAX_LINES', 2)
+    for items in ([], None, [{'product_id': first, 'quantity': 0}], [{'product_id': 'x', 'quantity': 1}],
+                  [{'product_id': first, 'quantity': 1}] * 3):
+        assert client.post('/api/orders/checkout', headers=headers, json={'items': items}).status_code == 400, items
+
+def test_reservations_end_once_and_shipped_orders_keep_theirs(app, admin_headers):
+    from backend.reservations import expire_reservations
+    from database.database import get_db_connection
+    product_id, = create_products(1, 10)
+    first, second = create_clients(app, 2)
+    client = app.test_client()
+
+    def available():
+        response = client.get(f'/api/products/{product_id}', headers=admin_headers)
+        return response.get_json()['product']['available_quantity']
+
+    def reservations():
+        connection = connect()
+        rows = connection.execute("""
+            SELECT order_id, status, expires_at IS NULL AS held FROM stock_reservations
+            WHERE product_id = ? ORDER BY order_id
+        """, (product_id,)).fetchall()
+        connection.close()
+        return [tuple(row) for row in rows]
+
+    cancelled = place_order(app, first, product_id, 4)
+    shipped = place_order(app, second, product_id, 3)
+    expiring = [place_order(app, first, product_id, 1) for _ in range(3)]
+    assert available() == 0
+    response = client.post('/api/orders/checkout', headers=second, json={'items': [{'product_id': product_id, 'quantity': 1}]})
+    assert response.status_code == 400
+
+    assert client.put(f'/api/admin/orders/{cancelled}/status', headers=admin_headers,
+                      json={'status': 'Cancelled'}).status_code == 200
+    assert client.put(f'/api/admin/orders/{shipped}/status', headers=admin_headers,
+                      json={'status': 'Shipped'}).status_code == 200
+    assert available() == 4
+
+    # Every open reservation is past its expiry; the sweeper works in batches and skips shipped orders
+    connection = connect()
+    connection.execute("UPDATE stock_reservations SET expires_at = datetime('now', '-1 seconds') WHERE order_id IN (?, ?, ?)",
+                       expiring)
+    connection.commit()
+    connection.close()
+    db = get_db_connection()
+    try:
+        assert expire_reservations(db, 2) == 3
+        assert expire_reservations(db, 2) == 0
+    finally:
+        db.close()
+    assert available() == 7
+    assert reservations() == [(cancelled, 'released', 0), (shipped, 'active', 1)] + [
+        (order_id, 'expired', 0) for order_id in expiring]
+    row = product_row(product_id)
+    assert (row['quantity_in_stock'], row['reserved_quantity']) == (10, 3)
+
+def test_admin_orders_page_filter_and_count_by_status(app, admin_headers):
+    product_id, = create_products(1, 100)
+    headers, = create_clients(app, 1)
+    connection = connect()
+    customer = connection.execute("SELECT username FROM users ORDER BY user_id DESC LIMIT 1").fetchone()[0]
+    connection.close()
+    order_ids = [place_order(app, headers, product_id, 1) for _ in range(5)]
+    oldest, delivered, cancelled = order_ids[0], order_ids[1], order_ids[2]
+    client = app.test_client()
+    for order_id, status in ((delivered, 'Delivered'), (cancelled, 'Cancelled')):
+        assert client.put(f'/api/admin/orders/{order_id}/status', headers=admin_headers,
+                          json={'status': status}).status_code == 200
+    connection = connect()
+    connection.execute("UPDATE orders SET created_at = '2022-06-01 12:00:00' WHERE order_id = ?", (oldest,))
+    connection.commit()
+    connection.close()
+
+    def pages(query):
+        seen, cursor = [], ''
+        while True:
+            response = client.get(f'/api/admin/orders?customer={customer}&limit=2&{query}{cursor}', headers=admin_headers)
+            assert response.status_code == 200, response.get_json()
+            body = response.get_json()
+            seen.extend(order['order_id'] for order in body['orders'])
+            if not body['has_more']:
+                return seen, body['status_counts']
+            cursor = f"&cursor={body['next_cursor']}"
+
+    assert pages('') == (order_ids[::-1], {'Under Process': 3, 'Delivered': 1, 'Cancelled': 1})
+    # status narrows the rows but not the counts
+    assert pages('status=Under Process') == ([order_ids[4], order_ids[3], oldest],
+                                             {'Under Process': 3, 'Delivered': 1, 'Cancelled': 1})
+    assert pages('payment_status=Paid') == ([delivered], {'Delivered': 1})
+    assert pages('to=2022-06-01') == ([oldest], {'Under Process': 1})
+    assert pages('from=2022-06-02')[0] == order_ids[:0:-1]
+
+    # Unfiltered counts come from the maintained counters and match the table
+    connection = connect()
+    counted = dict(connection.execute("SELECT status, COUNT(*) FROM orders GROUP BY status").fetchall())
+    paid = dict(connection.execute("SELECT status, COUNT(*) FROM orders WHERE payment_status = 'Paid' GROUP BY status").fetchall())
+    connection.close()
+    assert client.get('/api/admin/orders?limit=1', headers=admin_headers).get_json()['status_counts'] == counted
+    assert client.get('/api/admin/orders?limit=1&payment_status=Paid', headers=admin_headers).get_json()['status_counts'] == paid
+
+    for query in ('status=Lost', 'payment_status=Later', 'from=soon', 'cursor=garbage', 'limit=0'):
+        assert client.get(f'/api/admin/orders?{query}', headers=admin_headers).status_code == 400, query
+    assert client.get('/api/admin/orders', headers=headers).status_code == 403
+
+def test_alert_engine_keeps_one_open_alert_per_product(app, admin_headers):
+    from backend.alert_engine import AlertEngine
+    rows = [dict(row, min_stock_level=5) for row in catalog_rows(2, f'Alert{os.urandom(3).hex()}', quantity=8)]
+    import_products(app, admin_headers, rows)
+    product_id, unwatched = product_ids_for(rows)
+    # Made low behind the engine's back; only the reconcile on start can find it
+    connection = connect()
+    connection.execute("UPDATE products SET quantity_in_stock = 2 WHERE product_id = ?", (unwatched,))
+    connection.execute("INSERT INTO low_stock_products (product_id, status, quantity_in_stock, min_stock_level) VALUES (?, 'low', 2, 5)",
+                       (unwatched,))
+    connection.commit()
+    connection.close()
+    client = app.test_client()
+
+    def move(movement_type, quantity):
+        assert client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                          json={'movement_type': movement_type, 'quantity': quantity}).status_code == 200
+
+    def alerts(product):
+        connection = connect()
+        rows = connection.execute("""
+            SELECT alert_type, resolved_at IS NOT NULL AS resolved FROM alerts WHERE product_id = ? ORDER BY alert_id
+        """, (product,)).fetchall()
+        connection.close()
+        return [tuple(row) for row in rows]
+
+    engine = AlertEngine(0.2, 100)
+    engine.start()
+    try:
+        assert engine.wait_idle(10)
+        assert alerts(unwatched) == [('low_stock', 0)]
+        batches = engine.stats['batches']
+        # A burst is evaluated once, after the debounce
+        move('stock-out', 1)
+        move('stock-out', 2)
+        move('stock-out', 1)
+        assert engine.wait_idle(10)
+        assert engine.stats['batches'] == batches + 1
+        assert alerts(product_id) == [('low_stock', 0)]
+        move('stock-out', 1)
+        assert engine.wait_idle(10)
+        assert alerts(product_id) == [('low_stock', 0)]
+        move('stock-out', 3)
+        assert engine.wait_idle(10)
+        assert alerts(product_id) == [('low_stock', 1), ('out_of_stock', 0)]
+        move('stock-in', 20)
+        assert engine.wait_idle(10)
+        assert alerts(product_id) == [('low_stock', 1), ('out_of_stock', 1)]
+    finally:
+        engine.stop()
+
+def insert_alert(product_id, alert_type, created_at="datetime('now')", acknowledged_at=None):
+    """Write an alert row directly; timestamps are SQL expressions, an acknowledged_at closes it"""
+    connection = connect()
+    cursor = connection.execute(f"""
+        INSERT INTO alerts (product_id, alert_type, alert_message, is_acknowledged, created_at, acknowledged_at, resolved_at)
+        VALUES (?, ?, 'Test alert', {0 if acknowledged_at is None else 1}, {created_at},
+                {acknowledged_at or 'NULL'}, {acknowledged_at or 'NULL'})
+    """, (product_id, alert_type))
+    connection.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'alerts'")
+    connection.commit()
+    alert_id = cursor.lastrowid
+    connection.close()
+    return alert_id
+
+def test_alerts_acknowledge_in_bulk_page_history_and_compact(app, admin_headers):
+    category = f'Ack{os.urandom(3).hex()}'
+    rows = catalog_rows(2, category)
+    import_products(app, admin_headers, rows)
+    first, second = product_ids_for(rows)
+    closed = [insert_alert(first, 'low_stock', f"datetime('now', '-{days + 1} days')", f"datetime('now', '-{days} days')")
+              for days in (4, 3, 2)]
+    low, out = insert_alert(first, 'low_stock'), insert_alert(second, 'out_of_stock')
+    headers, = create_clients(app, 1)
+    client = app.test_client()
+
+    for body in ({}, {'alert_ids': []}, {'alert_ids': ['x']}, {'filter': {}}, {'filter': {'severity': 'high'}},
+                 {'alert_ids': [low], 'filter': {'alert_type': 'low_stock'}}):
+        assert client.put('/api/alerts/acknowledge', headers=admin_headers, json=body).status_code == 400, body
+    assert client.put('/api/alerts/acknowledge', headers=headers, json={'alert_ids': [low]}).status_code == 403
+
+    response = client.put('/api/alerts/acknowledge', headers=admin_headers,
+                          json={'filter': {'category': category, 'alert_type': 'low_stock'}})
+    assert response.get_json()['alert_ids'] == [low]
+    response = client.put('/api/alerts/acknowledge', headers=admin_headers, json={'alert_ids': [low, out, closed[0]]})
+    assert response.get_json()['alert_ids'] == [out]
+
+    # History pages newest-closed first without repeats
+    seen, cursor = [], ''
+    while True:
+        body = client.get(f'/api/alerts/history?limit=2{cursor}', headers=admin_headers).get_json()
+        seen.extend(alert['alert_id'] for alert in body['alerts'])
+        if not body['has_more']:
+            break
+        cursor = f"&cursor={body['next_cursor']}"
+    assert len(seen) == len(set(seen))
+    assert [alert_id for alert_id in seen if alert_id in closed + [low, out]] == [out, low] + closed[::-1]
+
+    # Old closed alerts of one product and type fold into the newest; dismissals of the folded rows go too
+    connection = connect()
+    connection.execute("INSERT INTO alert_dismissals (user_id, alert_id) VALUES (?, ?), (?, ?)",
+                       (ADMIN_ID, closed[0], ADMIN_ID, closed[2]))
+    connection.commit()
+    connection.close()
+    assert client.post('/api/alerts/compact?min_age=-1', headers=admin_headers).status_code == 400
+    assert client.post('/api/alerts/compact', headers=headers).status_code == 403
+    response = client.post('/api/alerts/compact?min_age=3600', headers=admin_headers)
+    assert response.status_code == 200
+    assert (response.get_json()['groups'], response.get_json()['removed']) == (1, 2)
+    connection = connect()
+    kept = connection.execute("""
+        SELECT alert_id, occurrence_count, first_occurred_at = datetime(created_at, '-2 days') AS earliest
+        FROM alerts WHERE product_id = ? ORDER BY alert_id
+    """, (first,)).fetchall()
+    dismissed = connection.execute("SELECT alert_id FROM alert_dismissals WHERE user_id = ? AND alert_id IN (?, ?, ?)",
+                                   [ADMIN_ID] + closed).fetchall()
+    connection.close()
+    assert [tuple(row) for row in kept] == [(closed[2], 3, 1), (low, 1, None)]
+    assert [row[0] for row in dismissed] == [closed[2]]
+
+def test_inbox_read_mark_and_dismissals_are_per_user(app, admin_headers, monkeypatch):
+    client = app.test_client()
+    tag = os.urandom(3).hex()
+    response = client.post('/api/auth/register', json={
+        'username': f'inbox-{tag}', 'email': f'inbox-{tag}@example.com', 'password': 'Passw0rd!',
+        'role': 'client', 'first_name': 'Inbox', 'last_name': 'Test'})
+    assert response.status_code == 201
+    user_id = response.get_json()['user']['user_id']
+    headers = auth_headers(app, user_id)
+    product_id, = create_products(1, 0)
+
+    def unread():
+        body = client.get('/api/inbox/unread', headers=headers).get_json()
+        return body['unread_count'], body['unread_more']
+
+    def inbox(query=''):
+        body = client.get(f'/api/inbox?{query}', headers=headers).get_json()
+        return [(alert['alert_id'], alert['is_read']) for alert in body['alerts']]
+
+    # Alerts raised before the account existed start out read
+    assert unread() == (0, False)
+    first, second, third = (insert_alert(product_id, 'low_stock') for _ in range(3))
+    assert unread() == (3, False)
+    assert inbox('limit=3') == [(third, False), (second, False), (first, False)]
+
+    # Dismissing one alert is this user's read state only
+    assert client.put(f'/api/inbox/{second}/read', headers=headers).get_json()['unread_count'] == 2
+    assert client.put(f'/api/alerts/{first}/acknowledge', headers=headers).status_code == 200
+    assert inbox('unread=1') == [(third, False)]
+    assert [alert['alert_id'] for alert in client.get('/api/alerts', headers=headers).get_json()['alerts']] == [third]
+    connection = connect()
+    assert connection.execute("SELECT is_acknowledged FROM alerts WHERE alert_id = ?", (first,)).fetchone()[0] == 0
+    connection.close()
+    admin_inbox = client.get('/api/inbox?limit=3', headers=admin_headers).get_json()['alerts']
+    assert [alert['is_read'] for alert in admin_inbox] == [False, False, False]
+
+    # The mark folds the dismissals below it and never moves back
+    response = client.put('/api/inbox/read', headers=headers, json={'through': second})
+    assert (response.get_json()['read_through'], response.get_json()['unread_count']) == (second, 1)
+    connection = connect()
+    assert connection.execute("SELECT COUNT(*) FROM alert_dismissals WHERE user_id = ?", (user_id,)).fetchone()[0] == 0
+    connection.close()
+    assert client.put('/api/inbox/read', headers=headers, json={'through': first}).get_json()['read_through'] == second
+    assert inbox('limit=3') == [(third, False), (second, True), (first, True)]
+
+    # Marking past the newest alert stops at it, so later alerts still arrive unread
+    assert client.put('/api/inbox/read', headers=headers, json={'through': third + 1000}).get_json()['read_through'] == third
+    later = [insert_alert(product_id, 'out_of_stock') for _ in range(2)]
+    monkeypatch.setattr(Config, 'INBOX_UNREAD_CAP', 1)
+    assert unread() == (1, True)
+    body = client.get('/api/inbox?limit=1', headers=headers).get_json()
+    assert [alert['alert_id'] for alert in body['alerts']] == [later[1]]
+    body = client.get(f"/api/inbox?limit=1&cursor={body['next_cursor']}", headers=headers).get_json()
+    assert [alert['alert_id'] for alert in body['alerts']] == [later[0]]
+
+    assert client.put('/api/inbox/read', headers=headers, json={'through': -1}).status_code == 400
+    assert client.put('/api/inbox/999999999/read', headers=headers).status_code == 404
+    assert client.get('/api/inbox?cursor=garbage', headers=headers).status_code == 400
+
+def test_dashboard_stats_are_cached_until_their_tables_change(app, admin_headers):
+    product_id, = create_products(1, 10)
+    headers, = create_clients(app, 1)
+    connection = connect()
+    client_id = connection.execute("SELECT MAX(user_id) FROM users").fetchone()[0]
+    connection.close()
+    client = app.test_client()
+
+    def stats(request_headers=admin_headers):
+        response = client.get('/api/stats', headers=request_headers)
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+
+    def counted():
+        connection = connect()
+        row = connection.execute("""
+            SELECT (SELECT COUNT(*) FROM products WHERE is_active = 1),
+                   (SELECT COUNT(*) FROM low_stock_products),
+                   (SELECT COUNT(*) FROM stock_movements WHERE created_at >= date('now')),
+                   (SELECT COUNT(*) FROM users WHERE is_active = 1)
+        """).fetchone()
+        connection.close()
+        return tuple(row)
+
+    def figures(body):
+        return body['total_products'], body['low_stock_count'], body['total_transactions'], body['active_users']
+
+    assert figures(stats()) == counted()
+    assert client.put(f'/api/products/{product_id}/stock', headers=admin_headers,
+                      json={'movement_type': 'stock-out', 'quantity': 10}).status_code == 200
+    body = stats()
+    assert figures(body) == counted()
+    assert body['recent_movements'][0]['product_id'] == product_id
+    quantities = [product['quantity_in_stock'] for product in body['top_products']]
+    assert len(quantities) == min(body['total_products'], 3) and quantities == sorted(quantities, reverse=True)
+
+    # A write that skips the change counters is not seen until they move
+    connection = connect()
+    connection.execute("""
+        INSERT INTO stock_movements (product_id, movement_type, quantity, previous_quantity, new_quantity, created_by)
+        VALUES (?, 'stock-in', 1, 0, 1, ?)
+    """, (product_id, client_id))
+    connection.commit()
+    assert stats()['total_transactions'] == body['total_transactions']
+    connection.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'stock_movements'")
+    connection.commit()
+    connection.close()
+    assert stats()['total_transactions'] == body['total_transactions'] + 1
+
+    # Other users get their own movements and no top products
+    own = stats(headers)
+    assert ([movement['created_by'] for movement in own['recent_movements']], own['top_products']) == ([client_id], [])
+    assert stats()['recent_movements'][0]['created_by'] == client_id